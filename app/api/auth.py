@@ -3,14 +3,24 @@ Authentication API Routes
 Login, Dashboard Panel, and Session Management
 """
 import os
-from fastapi import APIRouter, Depends, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import APIRouter, Depends, Query, Request, Form
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional
 
-from app.core.database import get_db
-from app.core.security import verify_password, get_password_hash
+from app.core.analytics import get_dashboard
+from app.core.archive import load_conversation
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.core.identity import TenantSnapshot, identity_cache
+from app.core.knowledge import knowledge_base
+from app.core.search import search_conversations
+from app.core.security import PasswordPoolBusyError, verify_password_async
+from app.core.write_queue import WriteQueueFullError, write_queue
 from app.models.tenant import Tenant
 
 
@@ -22,26 +32,67 @@ templates_path = os.path.join(BASE_DIR, "templates")
 templates = Jinja2Templates(directory=templates_path)
 
 
-def get_current_user(request: Request, db: Session = Depends(get_db)) -> Optional[Tenant]:
+def _remember_identity(request: Request, snapshot: TenantSnapshot) -> None:
+    """
+    Store the tenant snapshot in the signed session and the identity cache
+    
+    Args:
+        request: FastAPI request object
+        snapshot: Current tenant snapshot
+    """
+    identity_cache.put(snapshot)
+    request.session["tenant"] = snapshot.session_data()
+    request.session["tenant_id"] = snapshot.id
+    request.session["username"] = snapshot.username
+    request.session["business_name"] = snapshot.business_name
+
+
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_async_db)) -> Optional[TenantSnapshot]:
     """
     Get currently logged in user from session
     
+    Served from the identity cache when the session's config version matches,
+    so most page loads need no database round trip and no API key decryption.
+    
     Args:
         request: FastAPI request object
         db: Database session
         
     Returns:
-        Tenant object if logged in, None otherwise
+        TenantSnapshot if logged in, None otherwise
     """
     tenant_id = request.session.get("tenant_id")
     if not tenant_id:
         return None
     
-    tenant = db.query(Tenant).filter(Tenant.id == tenant_id).first()
-    return tenant
+    identity = request.session.get("tenant") or {}
+    snapshot = identity_cache.get_fresh(tenant_id, identity.get("version"))
+    if snapshot:
+        return snapshot
+    
+    # Revalidate: a version-only read decides whether the cached snapshot is still current
+    cached = identity_cache.get(tenant_id)
+    if cached:
+        result = await db.execute(select(Tenant.config_version).where(Tenant.id == tenant_id))
+        version = result.scalar_one_or_none()
+        if version is None:
+            identity_cache.invalidate(tenant_id)
+            return None
+        if version == cached.version:
+            _remember_identity(request, cached)
+            return cached
+    
+    tenant = await db.get(Tenant, tenant_id)
+    if not tenant:
+        identity_cache.invalidate(tenant_id)
+        return None
+    
+    snapshot = TenantSnapshot.from_tenant(tenant)
+    _remember_identity(request, snapshot)
+    return snapshot
 
 
-def require_auth(request: Request, db: Session = Depends(get_db)) -> Tenant:
+async def require_auth(request: Request, db: AsyncSession = Depends(get_async_db)) -> TenantSnapshot:
     """
     Require authentication, redirect to login if not authenticated
     
@@ -50,12 +101,12 @@ def require_auth(request: Request, db: Session = Depends(get_db)) -> Tenant:
         db: Database session
         
     Returns:
-        Tenant object
+        TenantSnapshot
         
     Raises:
         RedirectResponse if not authenticated
     """
-    tenant = get_current_user(request, db)
+    tenant = await get_current_user(request, db)
     if not tenant:
         return RedirectResponse(url="/giris", status_code=302)
     return tenant
@@ -92,7 +143,7 @@ async def login_submit(
     username: str = Form(...),
     password: str = Form(...),
     remember: Optional[str] = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Handle login form submission (POST)
@@ -108,10 +159,24 @@ async def login_submit(
         Redirect to panel on success, login page with error on failure
     """
     # Find tenant by username
-    tenant = db.query(Tenant).filter(Tenant.username == username).first()
+    result = await db.execute(select(Tenant).where(Tenant.username == username))
+    tenant = result.scalar_one_or_none()
+    
+    # Verify credentials (bcrypt runs in the password pool)
+    try:
+        password_valid = bool(tenant) and await verify_password_async(password, tenant.password_hash)
+    except PasswordPoolBusyError:
+        return templates.TemplateResponse(
+            "giris.html",
+            {
+                "request": request,
+                "error": "Sunucu şu anda yoğun, lütfen biraz sonra tekrar deneyin",
+                "username": username
+            },
+            status_code=503
+        )
     
-    # Verify credentials
-    if not tenant or not verify_password(password, tenant.password_hash):
+    if not password_valid:
         return templates.TemplateResponse(
             "giris.html",
             {
@@ -122,10 +187,8 @@ async def login_submit(
             status_code=401
         )
     
-    # Create session
-    request.session["tenant_id"] = tenant.id
-    request.session["username"] = tenant.username
-    request.session["business_name"] = tenant.business_name
+    # Create session (with identity snapshot, so the panel needs no lookup or decrypt)
+    _remember_identity(request, TenantSnapshot.from_tenant(tenant))
     
     # Set session expiry if remember me is checked
     if remember:
@@ -136,7 +199,7 @@ async def login_submit(
 
 
 @router.get("/panel", response_class=HTMLResponse)
-async def panel_page(request: Request, db: Session = Depends(get_db)):
+async def panel_page(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Display dashboard panel (GET)
     
@@ -148,7 +211,7 @@ async def panel_page(request: Request, db: Session = Depends(get_db)):
         HTML panel page or redirect to login
     """
     # Check authentication
-    tenant = get_current_user(request, db)
+    tenant = await get_current_user(request, db)
     if not tenant:
         return RedirectResponse(url="/giris", status_code=302)
     
@@ -160,66 +223,185 @@ async def panel_page(request: Request, db: Session = Depends(get_db)):
             "username": tenant.username,
             "business_name": tenant.business_name,
             "system_prompt": tenant.system_prompt,
-            "api_key": tenant.get_openai_api_key() if tenant.openai_api_key else None,
+            "knowledge_base": await run_in_threadpool(knowledge_base.panel_content, tenant.id),
+            "api_key": tenant.api_key,
             "success": None
         }
     )
 
 
+@router.get("/panel/analytics")
+async def panel_analytics(
+    request: Request,
+    days: int = Query(30, ge=1, le=365),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Dashboard analytics of the logged-in tenant (served from the rollups)
+    
+    Args:
+        request: FastAPI request object
+        days: Number of days to cover
+        db: Database session
+        
+    Returns:
+        Analytics JSON, or 401 if not logged in
+    """
+    tenant = await get_current_user(request, db)
+    if not tenant:
+        return JSONResponse({"detail": "Oturum bulunamadı"}, status_code=401)
+    
+    return await run_in_threadpool(get_dashboard, tenant.id, days)
+
+
+@router.get("/panel/search")
+async def panel_search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    before_id: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Search the logged-in tenant's conversations
+    
+    Args:
+        request: FastAPI request object
+        q: Search text
+        limit: Maximum number of results
+        before_id: Cursor from the previous page
+        db: Database session
+        
+    Returns:
+        Search results JSON, or 401 if not logged in
+    """
+    tenant = await get_current_user(request, db)
+    if not tenant:
+        return JSONResponse({"detail": "Oturum bulunamadı"}, status_code=401)
+    
+    return await run_in_threadpool(search_conversations, tenant.id, q, limit, before_id)
+
+
+@router.get("/panel/conversations/{conversation_id}")
+async def panel_conversation(
+    request: Request,
+    conversation_id: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Open a conversation of the logged-in tenant (archived messages are read through)
+    
+    Args:
+        request: FastAPI request object
+        conversation_id: Conversation ID
+        db: Database session
+        
+    Returns:
+        Conversation JSON, 401 if not logged in or 404 if not found
+    """
+    tenant = await get_current_user(request, db)
+    if not tenant:
+        return JSONResponse({"detail": "Oturum bulunamadı"}, status_code=401)
+    
+    messages = await run_in_threadpool(load_conversation, tenant.id, conversation_id)
+    if messages is None:
+        return JSONResponse({"detail": "Konuşma bulunamadı"}, status_code=404)
+    
+    return {"conversation_id": conversation_id, "messages": messages}
+
+
 @router.post("/panel", response_class=HTMLResponse)
 async def panel_submit(
     request: Request,
     api_key: Optional[str] = Form(None),
     system_prompt: str = Form(...),
     business_name: str = Form(...),
-    db: Session = Depends(get_db)
+    knowledge_base_text: str = Form("", alias="knowledge_base")
 ):
     """
     Handle panel form submission (POST)
-    Update tenant settings
+    Update tenant settings (written through the write queue)
     
     Args:
         request: FastAPI request object
         api_key: OpenAI API key (optional, only update if provided and not masked)
         system_prompt: Bot instructions
         business_name: Business name
-        db: Database session
+        knowledge_base_text: Knowledge base text (prices, doctors, FAQ), empty text removes it
         
     Returns:
         Panel page with success message or redirect to login
     """
     # Check authentication
-    tenant = get_current_user(request, db)
-    if not tenant:
+    tenant_id = request.session.get("tenant_id")
+    if not tenant_id:
         return RedirectResponse(url="/giris", status_code=302)
     
-    # Update business name
-    tenant.business_name = business_name
-    
-    # Update system prompt
-    tenant.system_prompt = system_prompt
+    def _save_settings(session: Session) -> Optional[Tenant]:
+        tenant = session.get(Tenant, tenant_id)
+        if not tenant:
+            return None
+        
+        # Update business name
+        tenant.business_name = business_name
+        
+        # Update system prompt
+        tenant.system_prompt = system_prompt
+        
+        # Update API key only if it's not masked (not all bullets)
+        if api_key and not all(c == '•' for c in api_key.strip()):
+            if api_key.strip():  # Only update if not empty
+                tenant.set_openai_api_key(api_key)
+        
+        session.flush()
+        return tenant
     
-    # Update API key only if it's not masked (not all bullets)
-    if api_key and not all(c == '•' for c in api_key.strip()):
-        if api_key.strip():  # Only update if not empty
-            tenant.set_openai_api_key(api_key)
+    def _busy() -> HTMLResponse:
+        # The write queue is full: keep the submitted form and ask for a retry
+        return templates.TemplateResponse(
+            "panel.html",
+            {
+                "request": request,
+                "tenant_id": tenant_id,
+                "username": request.session.get("username"),
+                "business_name": business_name,
+                "system_prompt": system_prompt,
+                "knowledge_base": knowledge_base_text,
+                "api_key": api_key,
+                "error": "Sunucu şu anda yoğun, ayarlarınız kaydedilemedi. Lütfen biraz sonra tekrar deneyin"
+            },
+            status_code=503,
+            headers={"Retry-After": str(settings.WRITE_QUEUE_RETRY_AFTER_SECONDS)}
+        )
     
     # Save to database
-    db.commit()
-    db.refresh(tenant)
+    try:
+        tenant = await write_queue.run(_save_settings)
+    except WriteQueueFullError:
+        return _busy()
+    if not tenant:
+        identity_cache.invalidate(tenant_id)
+        return RedirectResponse(url="/giris", status_code=302)
     
-    # Update session with new business name
-    request.session["business_name"] = tenant.business_name
+    # Update session and cache with the new config version
+    snapshot = TenantSnapshot.from_tenant(tenant)
+    _remember_identity(request, snapshot)
+    
+    try:
+        await run_in_threadpool(knowledge_base.save_panel_content, tenant_id, knowledge_base_text)
+    except WriteQueueFullError:
+        return _busy()
     
     return templates.TemplateResponse(
         "panel.html",
         {
             "request": request,
-            "tenant_id": tenant.id,
-            "username": tenant.username,
-            "business_name": tenant.business_name,
-            "system_prompt": tenant.system_prompt,
-            "api_key": tenant.get_openai_api_key() if tenant.openai_api_key else None,
+            "tenant_id": snapshot.id,
+            "username": snapshot.username,
+            "business_name": snapshot.business_name,
+            "system_prompt": snapshot.system_prompt,
+            "knowledge_base": knowledge_base_text,
+            "api_key": snapshot.api_key,
             "success": "Ayarlarınız başarıyla kaydedildi!"
         }
     )
@@ -0,0 +1,127 @@
+"""
+Messaging Channel Routes
+Webhooks of WhatsApp, SMS and Instagram, and the outbound queue status
+"""
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.channels import ChannelError, ChannelSignatureError, ChannelTenantError, channel_gateway, outbound_queue
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.models.tenant import Tenant
+
+
+router = APIRouter()
+
+
+def _adapter(channel: str):
+    """Adapter of a channel, 404 if the channel is unknown or channels are disabled"""
+    if not settings.CHANNELS_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Messaging channels are disabled"
+        )
+    try:
+        return channel_gateway.adapter(channel)
+    except ChannelError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+
+
+@router.get("/channels/outbound/status")
+async def outbound_status():
+    """
+    Outbound message queue state
+    
+    Returns:
+        Message counts by channel and status, and delivery counters
+    """
+    return await run_in_threadpool(outbound_queue.status)
+
+
+@router.get("/channels/{channel}/{tenant_id}/webhook")
+async def verify_webhook(channel: str, tenant_id: int, request: Request):
+    """
+    Webhook subscription check (Meta sends hub.mode, hub.verify_token and hub.challenge)
+    
+    Args:
+        channel: Channel name
+        tenant_id: Tenant ID
+        request: Incoming request
+    
+    Returns:
+        The challenge as plain text
+    
+    Raises:
+        HTTPException: If the channel is unknown or the token does not match
+    """
+    answer = _adapter(channel).challenge(request.query_params)
+    if answer is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Doğrulama başarısız"
+        )
+    return Response(content=answer, media_type="text/plain")
+
+
+@router.post("/channels/{channel}/{tenant_id}/webhook")
+async def receive_webhook(
+    channel: str,
+    tenant_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Receive channel messages of a tenant
+    
+    The webhook is acknowledged immediately; messages are answered in the background
+    and replies are delivered through the outbound queue. Messages must be addressed
+    to the tenant's business identity on the channel (WhatsApp phone number ID, SMS
+    number, Instagram account ID).
+    
+    Args:
+        channel: Channel name (whatsapp, sms, instagram)
+        tenant_id: Tenant ID
+        request: Incoming request
+        db: Database session
+    
+    Returns:
+        Acknowledgement in the format the provider expects
+    
+    Raises:
+        HTTPException: If the channel or tenant is unknown, the signature is wrong, the messages
+            belong to another tenant or the body is invalid
+    """
+    adapter = _adapter(channel)
+    tenant = await db.get(Tenant, tenant_id)
+    if tenant is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Müşteri bulunamadı"
+        )
+    
+    body = await request.body()
+    try:
+        channel_gateway.receive(
+            channel,
+            tenant_id,
+            body,
+            request.headers,
+            str(request.url),
+            request.headers.get("content-type", ""),
+            getattr(tenant, adapter.tenant_field)
+        )
+    except (ChannelSignatureError, ChannelTenantError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=str(e)
+        )
+    except ChannelError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return Response(content=adapter.ack_body, media_type=adapter.ack_media_type)
@@ -3,13 +3,20 @@ Chat API Routes
 Endpoints for interacting with the AI assistant
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import Iterator, List, Optional, Dict
+import time
 
-from app.core.database import get_db
-from app.core.ai_service import create_ai_service, AIServiceError
+from app.core.database import get_async_db
+from app.core.ai_service import AIService, create_ai_service_async, AIServiceError, AIServiceQuotaError
+from app.core.config import settings
+from app.core.conversation_store import conversation_log
+from app.core.model_router import AUTO_MODEL, model_router
+from app.core.moderation import ModerationVerdict, moderation_filter
+from app.models.tenant import Tenant
 
 
 router = APIRouter()
@@ -30,10 +37,11 @@ class ChatRequest(BaseModel):
         default=None,
         description="Previous conversation messages"
     )
-    model: str = Field(default="gpt-4o", description="OpenAI model to use")
+    model: str = Field(default=AUTO_MODEL, description="OpenAI model to use, auto = chosen per message by the model router")
     temperature: float = Field(default=0.7, ge=0.0, le=2.0, description="Response randomness")
     max_tokens: Optional[int] = Field(default=None, description="Maximum tokens in response")
     stream: bool = Field(default=False, description="Enable streaming response")
+    conversation_id: Optional[str] = Field(default=None, max_length=64, description="Client conversation ID")
 
 
 class ChatResponse(BaseModel):
@@ -52,10 +60,92 @@ class ErrorResponse(BaseModel):
     detail: str
 
 
+def _elapsed_ms(started: float) -> int:
+    """Milliseconds since a time.perf_counter() value"""
+    return int((time.perf_counter() - started) * 1000)
+
+
+async def _moderate(request: ChatRequest, started: float) -> Optional[ModerationVerdict]:
+    """
+    Run the moderation pre-filter before any model call
+    
+    Args:
+        request: Chat request
+        started: time.perf_counter() value at request start
+    
+    Returns:
+        Verdict of a blocked message (answer with verdict.reply), None if the message may pass
+    
+    Raises:
+        HTTPException: If the message is rejected
+    """
+    if not settings.MODERATION_ENABLED:
+        return None
+    verdict = await run_in_threadpool(moderation_filter.check, request.tenant_id, request.user_message)
+    if verdict is None:
+        return None
+    conversation_log.record(
+        tenant_id=request.tenant_id,
+        user_message=request.user_message,
+        assistant_message=verdict.reply,
+        model=verdict.model,
+        latency_ms=_elapsed_ms(started),
+        conversation_id=request.conversation_id
+    )
+    if verdict.reply is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Mesajınız gönderilemedi"
+        )
+    return verdict
+
+
+def _logged_stream(
+    chunks: Iterator[str],
+    ai_service: AIService,
+    request: ChatRequest,
+    started: float
+) -> Iterator[str]:
+    """
+    Pass a response stream through and log the complete turn once it ends
+    
+    Args:
+        chunks: Stream from AIService.chat_completion_stream
+        ai_service: Service that produced the stream
+        request: Original chat request
+        started: time.perf_counter() value at request start
+    
+    Yields:
+        The original chunks
+    """
+    parts: List[str] = []
+    error = None
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+    except AIServiceError as e:
+        error = str(e)
+        raise
+    finally:
+        usage = ai_service.last_usage or {}
+        conversation_log.record(
+            tenant_id=request.tenant_id,
+            user_message=request.user_message,
+            assistant_message="".join(parts) if parts else None,
+            model=ai_service.last_model or request.model,
+            latency_ms=_elapsed_ms(started),
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+            conversation_id=request.conversation_id,
+            error=error
+        )
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_completion(
     request: ChatRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Generate a chat completion using the tenant's AI assistant
@@ -70,9 +160,23 @@ async def chat_completion(
     Raises:
         HTTPException: If tenant not found or API error
     """
+    started = time.perf_counter()
+    verdict = await _moderate(request, started)
+    if verdict is not None:
+        tenant = await db.get(Tenant, request.tenant_id)
+        return ChatResponse(
+            tenant_id=request.tenant_id,
+            business_name=tenant.business_name if tenant else "",
+            user_message=request.user_message,
+            assistant_message=verdict.reply,
+            model=verdict.model,
+            success=True
+        )
+    
+    ai_service = None
     try:
         # Create AI service for tenant
-        ai_service = create_ai_service(tenant_id=request.tenant_id, db=db)
+        ai_service = await create_ai_service_async(tenant_id=request.tenant_id, db=db)
         
         # Convert conversation history to dict format
         history = None
@@ -88,7 +192,21 @@ async def chat_completion(
             conversation_history=history,
             model=request.model,
             temperature=request.temperature,
-            max_tokens=request.max_tokens
+            max_tokens=request.max_tokens,
+            conversation_id=request.conversation_id
+        )
+        
+        # Log the turn (buffered, written in the background)
+        usage = ai_service.last_usage or {}
+        conversation_log.record(
+            tenant_id=request.tenant_id,
+            user_message=request.user_message,
+            assistant_message=assistant_message,
+            model=ai_service.last_model or request.model,
+            latency_ms=_elapsed_ms(started),
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+            conversation_id=request.conversation_id
         )
         
         return ChatResponse(
@@ -96,11 +214,25 @@ async def chat_completion(
             business_name=ai_service.tenant.business_name,
             user_message=request.user_message,
             assistant_message=assistant_message,
-            model=request.model,
+            model=ai_service.last_model or request.model,
             success=True
         )
         
+    except AIServiceQuotaError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
     except AIServiceError as e:
+        if ai_service is not None:
+            conversation_log.record(
+                tenant_id=request.tenant_id,
+                user_message=request.user_message,
+                model=ai_service.last_model or request.model,
+                latency_ms=_elapsed_ms(started),
+                conversation_id=request.conversation_id,
+                error=str(e)
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
@@ -115,7 +247,7 @@ async def chat_completion(
 @router.post("/chat/stream")
 async def chat_completion_stream(
     request: ChatRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Generate a streaming chat completion
@@ -130,9 +262,18 @@ async def chat_completion_stream(
     Raises:
         HTTPException: If tenant not found or API error
     """
+    started = time.perf_counter()
+    verdict = await _moderate(request, started)
+    if verdict is not None:
+        return StreamingResponse(
+            iter([verdict.reply]),
+            media_type="text/plain",
+            headers={"X-Tenant-ID": str(request.tenant_id), "X-Model": verdict.model}
+        )
+    
     try:
         # Create AI service for tenant
-        ai_service = create_ai_service(tenant_id=request.tenant_id, db=db)
+        ai_service = await create_ai_service_async(tenant_id=request.tenant_id, db=db)
         
         # Convert conversation history to dict format
         history = None
@@ -148,18 +289,24 @@ async def chat_completion_stream(
             conversation_history=history,
             model=request.model,
             temperature=request.temperature,
-            max_tokens=request.max_tokens
+            max_tokens=request.max_tokens,
+            conversation_id=request.conversation_id
         )
         
         return StreamingResponse(
-            stream_generator,
+            _logged_stream(stream_generator, ai_service, request, started),
             media_type="text/plain",
             headers={
                 "X-Tenant-ID": str(request.tenant_id),
-                "X-Model": request.model
+                "X-Model": ai_service.last_model or request.model
             }
         )
         
+    except AIServiceQuotaError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
     except AIServiceError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -172,10 +319,21 @@ async def chat_completion_stream(
         )
 
 
+@router.get("/chat/routing")
+async def get_model_routing():
+    """
+    Model router state of this worker process
+    
+    Returns:
+        Configured models, average call latency per model and decision counts by model and reason
+    """
+    return model_router.status()
+
+
 @router.get("/tenant/{tenant_id}/models")
 async def get_available_models(
     tenant_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get available OpenAI models for a tenant
@@ -188,7 +346,7 @@ async def get_available_models(
         List of available models
     """
     try:
-        ai_service = create_ai_service(tenant_id=tenant_id, db=db)
+        ai_service = await create_ai_service_async(tenant_id=tenant_id, db=db)
         models = ai_service.get_available_models()
         
         return {
@@ -207,7 +365,7 @@ async def get_available_models(
 @router.get("/tenant/{tenant_id}/validate")
 async def validate_api_key(
     tenant_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Validate tenant's OpenAI API key
@@ -220,7 +378,7 @@ async def validate_api_key(
         Validation result
     """
     try:
-        ai_service = create_ai_service(tenant_id=tenant_id, db=db)
+        ai_service = await create_ai_service_async(tenant_id=tenant_id, db=db)
         is_valid = ai_service.validate_api_key()
         
         return {
@@ -240,7 +398,7 @@ async def validate_api_key(
 @router.get("/tenant/{tenant_id}/info")
 async def get_tenant_ai_info(
     tenant_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get tenant's AI configuration info
@@ -253,7 +411,7 @@ async def get_tenant_ai_info(
         Tenant AI configuration details
     """
     try:
-        ai_service = create_ai_service(tenant_id=tenant_id, db=db)
+        ai_service = await create_ai_service_async(tenant_id=tenant_id, db=db)
         info = ai_service.get_tenant_info()
         
         return {
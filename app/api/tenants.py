@@ -1,17 +1,52 @@
 """
 Tenant API Routes
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from datetime import date, datetime
+from typing import AsyncIterator, List, Optional
+import json
 from pydantic import BaseModel, Field
 
-from app.core.database import get_db
-from app.core.security import get_password_hash, verify_password
+from app.core.analytics import get_dashboard
+from app.core.appointments import AppointmentError, BookingConflictError, appointment_book, parse_clock
+from app.core.archive import load_conversation
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, get_async_db
+from app.core.identity import identity_cache
+from app.core.knowledge import KnowledgeBaseError, knowledge_base
+from app.core.moderation import ModerationError, moderation_filter
+from app.core.search import search_conversations
+from app.core.security import PasswordPoolBusyError, get_password_hash_async
+from app.core.usage import usage_meter
+from app.core.tenant_import import IMPORT_FORMATS, import_tenants, iter_lines, parse_records
+from app.core.write_queue import WriteQueueFullError, write_queue
 from app.models.tenant import Tenant
 
 
-router = APIRouter()
+async def _write_queue_busy() -> AsyncIterator[None]:
+    """
+    Router dependency answering writes rejected by a full write queue
+    
+    Raises:
+        HTTPException: 503 with Retry-After if the endpoint hit WriteQueueFullError
+    """
+    try:
+        yield
+    except WriteQueueFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sunucu şu anda yoğun, lütfen tekrar deneyin",
+            headers={"Retry-After": str(settings.WRITE_QUEUE_RETRY_AFTER_SECONDS)}
+        )
+
+
+router = APIRouter(dependencies=[Depends(_write_queue_busy)])
 
 
 # Pydantic schemas
@@ -33,6 +68,60 @@ class TenantUpdate(BaseModel):
     openai_api_key: str | None = Field(None, min_length=20)
     system_prompt: str | None = Field(None, min_length=10)
     password: str | None = Field(None, min_length=6)
+    daily_token_quota: int | None = Field(None, ge=0, description="null = unlimited")
+    monthly_token_quota: int | None = Field(None, ge=0, description="null = unlimited")
+    retention_days: int | None = Field(None, ge=1, description="null = CHAT_RETENTION_DAYS")
+    latency_slo_ms: int | None = Field(None, ge=100, description="Model call latency target, null = MODEL_ROUTING_LATENCY_SLO_MS")
+    address: str | None = Field(None, max_length=500, description="Answered directly for address questions")
+    phone: str | None = Field(None, max_length=30, description="Answered directly for phone questions")
+    whatsapp_phone_number_id: str | None = Field(None, max_length=50, description="WhatsApp Cloud API phone number ID webhooks must be addressed to")
+    sms_number: str | None = Field(None, max_length=30, description="Number SMS webhooks must be addressed to")
+    instagram_account_id: str | None = Field(None, max_length=50, description="Instagram account ID webhooks must be addressed to")
+
+
+class WorkingInterval(BaseModel):
+    """Weekly working interval of a staff member"""
+    weekday: int = Field(..., ge=0, le=6, description="0 = Monday")
+    start: str = Field(..., pattern=r"^\d{1,2}:\d{2}$", examples=["09:00"])
+    end: str = Field(..., pattern=r"^\d{1,2}:\d{2}$", examples=["18:00"])
+
+
+class StaffCreate(BaseModel):
+    """Schema for creating or updating (same name) a staff member"""
+    name: str = Field(..., min_length=1, max_length=100)
+    service_ids: List[int] | None = Field(None, description="null = unchanged, [] = all services")
+    hours: List[WorkingInterval] | None = Field(None, description="null = unchanged")
+    active: bool = True
+
+
+class ServiceCreate(BaseModel):
+    """Schema for creating or updating (same name) a service"""
+    name: str = Field(..., min_length=1, max_length=100)
+    duration_minutes: int = Field(..., ge=5, le=720)
+    price: int | None = Field(None, ge=0, description="TL, null = not published")
+    active: bool = True
+
+
+class BookingCreate(BaseModel):
+    """Schema for booking an appointment"""
+    service_id: int
+    start: datetime = Field(..., description="Clinic local time, or any time with a UTC offset (converted to clinic time)")
+    customer_name: str = Field(..., min_length=1, max_length=100)
+    customer_phone: str | None = Field(None, max_length=30)
+    staff_id: int | None = Field(None, description="null = first free staff member")
+
+
+class ModerationRuleCreate(BaseModel):
+    """Schema for creating or updating (same normalized pattern) a moderation rule"""
+    pattern: str = Field(..., min_length=1, max_length=200, description='Word or phrase, "*" at either end matches inside longer words')
+    action: str = Field("block", description="block (fixed reply), reject (no reply) or allow (exempt)")
+    reply: str | None = Field(None, max_length=1000, description="Reply of block rules, null = default reply")
+
+
+class KnowledgeDocumentCreate(BaseModel):
+    """Schema for creating or replacing a knowledge base document"""
+    title: str = Field(..., min_length=1, max_length=200)
+    content: str = Field(..., min_length=1, max_length=200000)
 
 
 class TenantResponse(BaseModel):
@@ -41,13 +130,34 @@ class TenantResponse(BaseModel):
     username: str
     business_name: str
     system_prompt: str
+    address: str | None = None
+    phone: str | None = None
+    whatsapp_phone_number_id: str | None = None
+    sms_number: str | None = None
+    instagram_account_id: str | None = None
     
     class Config:
         from_attributes = True
 
 
+async def _hash_password(password: str) -> str:
+    """
+    Hash a password in the password pool
+    
+    Raises:
+        HTTPException: 503 if the password pool is saturated
+    """
+    try:
+        return await get_password_hash_async(password)
+    except PasswordPoolBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sunucu şu anda yoğun, lütfen tekrar deneyin"
+        )
+
+
 @router.post("/", response_model=TenantResponse, status_code=status.HTTP_201_CREATED)
-async def create_tenant(tenant_data: TenantCreate, db: Session = Depends(get_db)):
+async def create_tenant(tenant_data: TenantCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Create a new tenant (Müşteri)
     
@@ -59,7 +169,8 @@ async def create_tenant(tenant_data: TenantCreate, db: Session = Depends(get_db)
         Created tenant
     """
     # Check if username already exists
-    existing_tenant = db.query(Tenant).filter(Tenant.username == tenant_data.username).first()
+    result = await db.execute(select(Tenant.id).where(Tenant.username == tenant_data.username))
+    existing_tenant = result.first()
     if existing_tenant:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -69,7 +180,7 @@ async def create_tenant(tenant_data: TenantCreate, db: Session = Depends(get_db)
     # Create new tenant
     new_tenant = Tenant(
         username=tenant_data.username,
-        password_hash=get_password_hash(tenant_data.password),
+        password_hash=await _hash_password(tenant_data.password),
         business_name=tenant_data.business_name,
         system_prompt=tenant_data.system_prompt
     )
@@ -77,32 +188,127 @@ async def create_tenant(tenant_data: TenantCreate, db: Session = Depends(get_db)
     # Encrypt and set API key
     new_tenant.set_openai_api_key(tenant_data.openai_api_key)
     
-    db.add(new_tenant)
-    db.commit()
-    db.refresh(new_tenant)
+    def _insert(session: Session) -> Tenant:
+        session.add(new_tenant)
+        session.flush()
+        return new_tenant
     
-    return new_tenant
+    try:
+        return await write_queue.run(_insert)
+    except IntegrityError:
+        # Username taken by a concurrent request between the check and the insert
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Bu kullanıcı adı zaten kullanılıyor"
+        )
+
+
+# Columns served by the listing endpoints (no full ORM hydration)
+TENANT_LIST_COLUMNS = (Tenant.id, Tenant.username, Tenant.business_name, Tenant.system_prompt)
+
+# Rows fetched per round trip by the NDJSON export
+EXPORT_BATCH_SIZE = 500
 
 
 @router.get("/", response_model=List[TenantResponse])
-async def list_tenants(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def list_tenants(
+    response: Response,
+    after_id: Optional[int] = Query(None, ge=0, description="Return tenants with an ID greater than this cursor"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    List all tenants
+    List tenants with keyset pagination
+    
+    Pages are read from the primary key index (id > cursor), so page N costs the same
+    as page 1. The cursor for the next page is returned in the X-Next-Cursor header
+    (absent on the last page).
     
     Args:
-        skip: Number of records to skip
+        response: Response object (for the cursor header)
+        after_id: ID of the last tenant of the previous page
         limit: Maximum number of records to return
         db: Database session
         
     Returns:
         List of tenants
     """
-    tenants = db.query(Tenant).offset(skip).limit(limit).all()
+    query = select(*TENANT_LIST_COLUMNS).order_by(Tenant.id).limit(limit)
+    if after_id is not None:
+        query = query.where(Tenant.id > after_id)
+    
+    result = await db.execute(query)
+    tenants = result.mappings().all()
+    
+    if len(tenants) == limit:
+        response.headers["X-Next-Cursor"] = str(tenants[-1]["id"])
+    
     return tenants
 
 
+@router.post("/import")
+async def import_tenants_bulk(request: Request, format: Optional[str] = Query(None)):
+    """
+    Bulk import tenants from a CSV (header row) or NDJSON request body
+    
+    The body is parsed as it streams in. Each batch is checked for existing usernames
+    with one query, hashed/encrypted in a process pool and inserted in one transaction.
+    
+    Args:
+        request: Raw request (body is streamed)
+        format: "csv" or "ndjson" (defaults to the Content-Type)
+    
+    Returns:
+        Summary counts and one result per row (created / duplicate / invalid)
+    
+    Raises:
+        HTTPException: If the format is not supported
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if "csv" in content_type else "ndjson"
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Format must be csv or ndjson"
+        )
+    
+    records = parse_records(iter_lines(request.stream()), format)
+    return await import_tenants(records, TenantCreate)
+
+
+@router.get("/export")
+async def export_tenants():
+    """
+    Stream all tenants as NDJSON (one JSON object per line)
+    
+    Rows are fetched in server-side batches of EXPORT_BATCH_SIZE and written as they
+    arrive, so memory use does not grow with the number of tenants.
+    
+    Returns:
+        Streaming NDJSON response
+    """
+    async def generate() -> AsyncIterator[bytes]:
+        # Own session: the request's dependencies are finalized before the body is streamed
+        async with AsyncSessionLocal() as db:
+            query = select(*TENANT_LIST_COLUMNS).order_by(Tenant.id).execution_options(
+                yield_per=EXPORT_BATCH_SIZE
+            )
+            result = await db.stream(query)
+            async for rows in result.mappings().partitions():
+                yield "".join(
+                    json.dumps(dict(row), ensure_ascii=False) + "\n" for row in rows
+                ).encode("utf-8")
+    
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="tenants.ndjson"'}
+    )
+
+
 @router.get("/{tenant_id}", response_model=TenantResponse)
-async def get_tenant(tenant_id: int, db: Session = Depends(get_db)):
+async def get_tenant(tenant_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Get a specific tenant by ID
     
@@ -113,7 +319,7 @@ async def get_tenant(tenant_id: int, db: Session = Depends(get_db)):
     Returns:
         Tenant details
     """
-    tenant = db.query(Tenant).filter(Tenant.id == tenant_id).first()
+    tenant = await db.get(Tenant, tenant_id)
     
     if not tenant:
         raise HTTPException(
@@ -124,60 +330,597 @@ async def get_tenant(tenant_id: int, db: Session = Depends(get_db)):
     return tenant
 
 
-@router.put("/{tenant_id}", response_model=TenantResponse)
-async def update_tenant(
+@router.get("/{tenant_id}/usage")
+async def get_tenant_usage(tenant_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Get a tenant's token usage for the current UTC day and month
+    
+    Args:
+        tenant_id: Tenant ID
+        db: Database session
+        
+    Returns:
+        Usage totals and quotas (null = unlimited)
+        
+    Raises:
+        HTTPException: If tenant not found
+    """
+    result = await db.execute(
+        select(Tenant.daily_token_quota, Tenant.monthly_token_quota).where(Tenant.id == tenant_id)
+    )
+    quotas = result.first()
+    if quotas is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Müşteri bulunamadı"
+        )
+    
+    return {
+        "tenant_id": tenant_id,
+        **usage_meter.usage(tenant_id),
+        "daily_token_quota": quotas.daily_token_quota,
+        "monthly_token_quota": quotas.monthly_token_quota,
+    }
+
+
+@router.get("/{tenant_id}/analytics")
+async def get_tenant_analytics(tenant_id: int, days: int = Query(30, ge=1, le=365)):
+    """
+    Get a tenant's chat analytics (served from the hourly/daily rollups)
+    
+    Args:
+        tenant_id: Tenant ID
+        days: Number of days to cover
+        
+    Returns:
+        Totals, per-day series, messages per hour of day and peak hours
+    """
+    return await run_in_threadpool(get_dashboard, tenant_id, days)
+
+
+@router.get("/{tenant_id}/conversations/search")
+async def search_tenant_conversations(
     tenant_id: int,
-    tenant_data: TenantUpdate,
-    db: Session = Depends(get_db)
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    before_id: Optional[int] = Query(None, description="next_cursor of the previous page")
 ):
     """
-    Update tenant information
+    Full-text search in a tenant's chat messages (newest first)
     
     Args:
         tenant_id: Tenant ID
-        tenant_data: Update data
+        q: Search text (Turkish characters and case are folded)
+        limit: Maximum number of results
+        before_id: Cursor from the previous page
+        
+    Returns:
+        Results with highlighted snippets and next_cursor
+    """
+    return await run_in_threadpool(search_conversations, tenant_id, q, limit, before_id)
+
+
+@router.get("/{tenant_id}/conversations/{conversation_id}")
+async def get_tenant_conversation(tenant_id: int, conversation_id: str):
+    """
+    Get all messages of a conversation, including archived ones
+    
+    Args:
+        tenant_id: Tenant ID
+        conversation_id: Conversation ID
+        
+    Returns:
+        Messages ordered by time
+        
+    Raises:
+        HTTPException: If the conversation does not exist
+    """
+    messages = await run_in_threadpool(load_conversation, tenant_id, conversation_id)
+    if messages is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Konuşma bulunamadı"
+        )
+    
+    return {"tenant_id": tenant_id, "conversation_id": conversation_id, "messages": messages}
+
+
+@router.get("/{tenant_id}/knowledge")
+async def list_knowledge_documents(tenant_id: int):
+    """
+    List a tenant's knowledge base documents
+    
+    Args:
+        tenant_id: Tenant ID
+        
+    Returns:
+        Documents without content and the state of the tenant's search index
+    """
+    documents = await run_in_threadpool(knowledge_base.list_documents, tenant_id)
+    index = await run_in_threadpool(knowledge_base.index_status, tenant_id)
+    return {"tenant_id": tenant_id, "documents": documents, "index": index}
+
+
+@router.post("/{tenant_id}/knowledge")
+async def save_knowledge_document(
+    tenant_id: int,
+    document: KnowledgeDocumentCreate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Create or replace (same title) a knowledge base document
+    
+    Args:
+        tenant_id: Tenant ID
+        document: Title and content
         db: Database session
         
     Returns:
-        Updated tenant
+        Saved document with its number of passages
+        
+    Raises:
+        HTTPException: If tenant not found or the document is empty
     """
-    tenant = db.query(Tenant).filter(Tenant.id == tenant_id).first()
+    if await db.get(Tenant, tenant_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Müşteri bulunamadı"
+        )
     
-    if not tenant:
+    try:
+        return await run_in_threadpool(knowledge_base.save_document, tenant_id, document.title, document.content)
+    except KnowledgeBaseError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.get("/{tenant_id}/knowledge/search")
+async def search_knowledge(
+    tenant_id: int,
+    q: str = Query(..., min_length=1, max_length=1000),
+    k: int = Query(3, ge=1, le=20)
+):
+    """
+    Preview the passages a message would add to the prompt
+    
+    Args:
+        tenant_id: Tenant ID
+        q: Message text
+        k: Maximum number of passages
+        
+    Returns:
+        Passages with scores, best first
+    """
+    passages = await run_in_threadpool(knowledge_base.retrieve, tenant_id, q, k)
+    return {"tenant_id": tenant_id, "query": q, "passages": passages}
+
+
+@router.get("/{tenant_id}/knowledge/{document_id}")
+async def get_knowledge_document(tenant_id: int, document_id: int):
+    """
+    Get a knowledge base document with its content
+    
+    Args:
+        tenant_id: Tenant ID
+        document_id: Document ID
+        
+    Returns:
+        Document
+        
+    Raises:
+        HTTPException: If the document does not exist
+    """
+    document = await run_in_threadpool(knowledge_base.get_document, tenant_id, document_id)
+    if document is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Doküman bulunamadı"
+        )
+    
+    return document
+
+
+@router.delete("/{tenant_id}/knowledge/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_knowledge_document(tenant_id: int, document_id: int):
+    """
+    Delete a knowledge base document
+    
+    Args:
+        tenant_id: Tenant ID
+        document_id: Document ID
+        
+    Raises:
+        HTTPException: If the document does not exist
+    """
+    if not await run_in_threadpool(knowledge_base.delete_document, tenant_id, document_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Doküman bulunamadı"
+        )
+    
+    return None
+
+
+@router.get("/{tenant_id}/staff")
+async def list_staff(tenant_id: int):
+    """
+    List a tenant's staff with their services and working hours
+    
+    Args:
+        tenant_id: Tenant ID
+        
+    Returns:
+        Staff members
+    """
+    staff = await run_in_threadpool(appointment_book.list_staff, tenant_id)
+    return {"tenant_id": tenant_id, "staff": staff}
+
+
+def _interval_tuples(hours: Optional[List[WorkingInterval]]) -> Optional[List[tuple]]:
+    """(weekday, start minute, end minute) tuples of working intervals"""
+    if hours is None:
+        return None
+    return [(interval.weekday, parse_clock(interval.start), parse_clock(interval.end)) for interval in hours]
+
+
+@router.post("/{tenant_id}/staff")
+async def save_staff(tenant_id: int, member: StaffCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Create or update (same name) a staff member
+    
+    Args:
+        tenant_id: Tenant ID
+        member: Name, services and working hours
+        db: Database session
+        
+    Returns:
+        Saved staff member
+        
+    Raises:
+        HTTPException: If tenant not found or the working hours are invalid
+    """
+    if await db.get(Tenant, tenant_id) is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Müşteri bulunamadı"
         )
     
-    # Update fields if provided
-    if tenant_data.business_name:
-        tenant.business_name = tenant_data.business_name
+    try:
+        return await run_in_threadpool(
+            appointment_book.save_staff,
+            tenant_id,
+            member.name,
+            member.service_ids,
+            _interval_tuples(member.hours),
+            member.active
+        )
+    except AppointmentError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.put("/{tenant_id}/staff/{staff_id}/hours")
+async def set_staff_hours(tenant_id: int, staff_id: int, hours: List[WorkingInterval]):
+    """
+    Replace a staff member's weekly working hours
     
-    if tenant_data.system_prompt:
-        tenant.system_prompt = tenant_data.system_prompt
+    Args:
+        tenant_id: Tenant ID
+        staff_id: Staff ID
+        hours: Working intervals (several per day for breaks)
+        
+    Returns:
+        Number of intervals
+        
+    Raises:
+        HTTPException: If the staff member does not exist or the hours are invalid
+    """
+    try:
+        saved = await run_in_threadpool(appointment_book.set_working_hours, tenant_id, staff_id, _interval_tuples(hours))
+    except AppointmentError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    if tenant_data.openai_api_key:
-        tenant.set_openai_api_key(tenant_data.openai_api_key)
+    if not saved:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Personel bulunamadı"
+        )
     
-    if tenant_data.password:
-        tenant.password_hash = get_password_hash(tenant_data.password)
+    return {"staff_id": staff_id, "intervals": len(hours)}
+
+
+@router.get("/{tenant_id}/services")
+async def list_services(tenant_id: int):
+    """
+    List a tenant's services
     
-    db.commit()
-    db.refresh(tenant)
+    Args:
+        tenant_id: Tenant ID
+        
+    Returns:
+        Services with the staff providing them
+    """
+    services = await run_in_threadpool(appointment_book.list_services, tenant_id)
+    return {"tenant_id": tenant_id, "services": services}
+
+
+@router.post("/{tenant_id}/services")
+async def save_service(tenant_id: int, service: ServiceCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Create or update (same name) a service
     
-    return tenant
+    Args:
+        tenant_id: Tenant ID
+        service: Name, duration and price
+        db: Database session
+        
+    Returns:
+        Saved service
+        
+    Raises:
+        HTTPException: If tenant not found
+    """
+    if await db.get(Tenant, tenant_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Müşteri bulunamadı"
+        )
+    
+    return await run_in_threadpool(
+        appointment_book.save_service,
+        tenant_id,
+        service.name,
+        service.duration_minutes,
+        service.price,
+        service.active
+    )
 
 
-@router.delete("/{tenant_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_tenant(tenant_id: int, db: Session = Depends(get_db)):
+@router.get("/{tenant_id}/availability")
+async def get_availability(
+    tenant_id: int,
+    service_id: int,
+    after: Optional[datetime] = Query(None, description="Clinic local time or a time with UTC offset, default now"),
+    staff_id: Optional[int] = None,
+    limit: int = Query(5, ge=1, le=50)
+):
+    """
+    Next free appointment times for a service
+    
+    Args:
+        tenant_id: Tenant ID
+        service_id: Service ID
+        after: Earliest start
+        staff_id: Only this staff member
+        limit: Maximum number of times
+        
+    Returns:
+        Free slots in time order
+        
+    Raises:
+        HTTPException: If the service does not exist
+    """
+    try:
+        slots = await run_in_threadpool(
+            appointment_book.find_slots,
+            tenant_id,
+            service_id,
+            after,
+            limit,
+            staff_id
+        )
+    except AppointmentError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    
+    return {"tenant_id": tenant_id, "service_id": service_id, "slots": slots}
+
+
+@router.get("/{tenant_id}/bookings")
+async def list_bookings(tenant_id: int, day: date):
+    """
+    List a tenant's bookings on a day
+    
+    Args:
+        tenant_id: Tenant ID
+        day: Clinic day (YYYY-MM-DD)
+        
+    Returns:
+        Bookings in time order (cancelled ones included)
+    """
+    bookings = await run_in_threadpool(appointment_book.list_bookings, tenant_id, day)
+    return {"tenant_id": tenant_id, "day": day.isoformat(), "bookings": bookings}
+
+
+@router.post("/{tenant_id}/bookings", status_code=status.HTTP_201_CREATED)
+async def create_booking(tenant_id: int, booking: BookingCreate):
     """
-    Delete a tenant
+    Book an appointment
     
     Args:
         tenant_id: Tenant ID
+        booking: Service, time and customer
+        
+    Returns:
+        Created booking
+        
+    Raises:
+        HTTPException: 409 if the time is taken, 400 if the service or time is invalid
+    """
+    try:
+        return await run_in_threadpool(
+            appointment_book.book,
+            tenant_id,
+            booking.service_id,
+            booking.start,
+            booking.customer_name,
+            booking.customer_phone,
+            booking.staff_id
+        )
+    except BookingConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except AppointmentError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.delete("/{tenant_id}/bookings/{booking_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_booking(tenant_id: int, booking_id: int):
+    """
+    Cancel a booking
+    
+    Args:
+        tenant_id: Tenant ID
+        booking_id: Booking ID
+        
+    Raises:
+        HTTPException: If there is no such active booking
+    """
+    if await run_in_threadpool(appointment_book.cancel, tenant_id, booking_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Randevu bulunamadı"
+        )
+
+
+@router.get("/{tenant_id}/moderation/rules")
+async def list_moderation_rules(tenant_id: int):
+    """
+    List a tenant's moderation rules
+    
+    Args:
+        tenant_id: Tenant ID
+    
+    Returns:
+        Rules with their hit counts
+    """
+    rules = await run_in_threadpool(moderation_filter.list_rules, tenant_id)
+    return {"tenant_id": tenant_id, "rules": rules}
+
+
+@router.post("/{tenant_id}/moderation/rules")
+async def save_moderation_rule(tenant_id: int, rule: ModerationRuleCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Create or update a moderation rule (applies to the next message)
+    
+    Args:
+        tenant_id: Tenant ID
+        rule: Pattern, action and reply
         db: Database session
+    
+    Returns:
+        Saved rule
+    
+    Raises:
+        HTTPException: If tenant not found or the rule is invalid
     """
-    tenant = db.query(Tenant).filter(Tenant.id == tenant_id).first()
+    if await db.get(Tenant, tenant_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Müşteri bulunamadı"
+        )
+    
+    try:
+        return await run_in_threadpool(moderation_filter.save_rule, tenant_id, rule.pattern, rule.action, rule.reply)
+    except ModerationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.delete("/{tenant_id}/moderation/rules/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_moderation_rule(tenant_id: int, rule_id: int):
+    """
+    Delete a moderation rule
+    
+    Args:
+        tenant_id: Tenant ID
+        rule_id: Rule ID
+    
+    Raises:
+        HTTPException: If the rule does not exist
+    """
+    if not await run_in_threadpool(moderation_filter.delete_rule, tenant_id, rule_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Kural bulunamadı"
+        )
+
+
+@router.get("/{tenant_id}/moderation/stats")
+async def get_moderation_stats(tenant_id: int):
+    """
+    Moderation hit statistics of a tenant (this worker process, since start)
+    
+    Args:
+        tenant_id: Tenant ID
+    
+    Returns:
+        Checked, blocked, rejected and allowed counts, and hits by rule ID
+    """
+    return {"tenant_id": tenant_id, **moderation_filter.stats(tenant_id)}
+
+
+@router.put("/{tenant_id}", response_model=TenantResponse)
+async def update_tenant(tenant_id: int, tenant_data: TenantUpdate):
+    """
+    Update tenant information (written through the write queue)
+    
+    Args:
+        tenant_id: Tenant ID
+        tenant_data: Update data
+        
+    Returns:
+        Updated tenant
+    """
+    # Hash outside the writer so the write transaction stays short
+    password_hash = await _hash_password(tenant_data.password) if tenant_data.password else None
+    
+    def _update(session: Session) -> Tenant | None:
+        tenant = session.get(Tenant, tenant_id)
+        if not tenant:
+            return None
+        
+        # Update fields if provided
+        if tenant_data.business_name:
+            tenant.business_name = tenant_data.business_name
+        
+        if tenant_data.system_prompt:
+            tenant.system_prompt = tenant_data.system_prompt
+        
+        if tenant_data.openai_api_key:
+            tenant.set_openai_api_key(tenant_data.openai_api_key)
+        
+        if password_hash:
+            tenant.password_hash = password_hash
+        
+        # Quotas, retention, latency target, business details and channel identities can be reset with an explicit null
+        for field in (
+            "daily_token_quota", "monthly_token_quota", "retention_days", "latency_slo_ms", "address", "phone",
+            "whatsapp_phone_number_id", "sms_number", "instagram_account_id"
+        ):
+            if field in tenant_data.model_fields_set:
+                setattr(tenant, field, getattr(tenant_data, field))
+        
+        session.flush()
+        return tenant
+    
+    tenant = await write_queue.run(_update)
     
     if not tenant:
         raise HTTPException(
@@ -185,7 +928,34 @@ async def delete_tenant(tenant_id: int, db: Session = Depends(get_db)):
             detail="Müşteri bulunamadı"
         )
     
-    db.delete(tenant)
-    db.commit()
+    # Panel sessions pick up the new config version on their next request
+    identity_cache.invalidate(tenant_id)
+    
+    return tenant
+
+
+@router.delete("/{tenant_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_tenant(tenant_id: int):
+    """
+    Delete a tenant (written through the write queue)
+    
+    Args:
+        tenant_id: Tenant ID
+    """
+    def _delete(session: Session) -> bool:
+        tenant = session.get(Tenant, tenant_id)
+        if not tenant:
+            return False
+        session.delete(tenant)
+        return True
+    
+    deleted = await write_queue.run(_delete)
+    identity_cache.invalidate(tenant_id)
+    
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Müşteri bulunamadı"
+        )
     
     return None
@@ -2,11 +2,31 @@
 AI Service for OpenAI Integration
 Handles dynamic tenant-based OpenAI API calls with Turkish prompt strategy
 """
-from typing import List, Dict, Optional
+from collections import OrderedDict
+from typing import Any, Iterator, List, Dict, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from openai import OpenAI, OpenAIError
+from openai import APIConnectionError, InternalServerError, OpenAI, OpenAIError, RateLimitError
 import logging
+import threading
+import time
 
+from app.core.config import settings
+from app.core.intents import fast_path_model, intent_router
+from app.core.knowledge import knowledge_base
+from app.core.model_router import AUTO_MODEL, RouteDecision, model_router
+from app.core.redaction import REDACTION_NOTE, Redaction, pii_redactor
+from app.core.tools import (
+    StreamedToolCalls,
+    ToolContext,
+    appointment_tools_for,
+    assistant_tool_message,
+    tool_instructions,
+    tool_messages,
+    tool_registry,
+)
+from app.core.usage import QuotaExceededError, usage_meter
 from app.models.tenant import Tenant
 
 
@@ -14,6 +34,17 @@ from app.models.tenant import Tenant
 logger = logging.getLogger(__name__)
 
 
+# OpenAI clients shared by API key: creating one loads the CA bundle (~60 ms) and a
+# shared client keeps its HTTP connections alive between requests
+MAX_CACHED_CLIENTS = 256
+_clients: "OrderedDict[str, OpenAI]" = OrderedDict()
+_clients_lock = threading.Lock()
+
+# API errors that say the model is slow or unavailable (fed to the model router as failed
+# calls); errors of the request itself, such as a bad API key, do not count
+MODEL_FAILURES = (APIConnectionError, InternalServerError, RateLimitError)
+
+
 # Turkish base system prompt that will be prepended to all tenant prompts
 TURKISH_BASE_PROMPT = """Sen yardımsever bir Türk asistansın. Adın 'Asistan'. Asla İngilizce cevap verme. Sadece Türkçe konuş. Kısa, net ve samimi ol. Kullanıcının verdiği talimatlara harfiyen uy."""
 
@@ -23,6 +54,33 @@ class AIServiceError(Exception):
     pass
 
 
+class AIServiceQuotaError(AIServiceError):
+    """Raised before an upstream call when the tenant's token quota is used up"""
+    pass
+
+
+def _check_tenant(tenant: Optional[Tenant], tenant_id: int) -> Tenant:
+    """
+    Validate a tenant lookup result
+    
+    Args:
+        tenant: Tenant returned by the query (or None)
+        tenant_id: Requested tenant ID
+        
+    Returns:
+        Tenant object
+        
+    Raises:
+        AIServiceError: If tenant not found
+    """
+    if not tenant:
+        logger.error(f"Tenant not found: {tenant_id}")
+        raise AIServiceError(f"Tenant with ID {tenant_id} not found")
+    
+    logger.info(f"Tenant loaded: {tenant.business_name} (ID: {tenant.id})")
+    return tenant
+
+
 class AIService:
     """
     AI Service for handling OpenAI API interactions
@@ -31,23 +89,27 @@ class AIService:
     ensuring each tenant uses their own API key and system prompt.
     """
     
-    def __init__(self, tenant_id: int, db: Session):
+    def __init__(self, tenant_id: int, db: Optional[Session] = None, tenant: Optional[Tenant] = None):
         """
         Initialize AI Service for a specific tenant
         
         Args:
             tenant_id: The tenant ID to fetch configuration for
-            db: Database session
+            db: Database session (used when tenant is not provided)
+            tenant: Already loaded tenant, skips the database lookup
             
         Raises:
             AIServiceError: If tenant not found or API key not configured
         """
         self.tenant_id = tenant_id
         self.db = db
-        self.tenant = self._fetch_tenant()
+        self.tenant = tenant if tenant is not None else self._fetch_tenant()
         self.api_key = self._get_decrypted_api_key()
         self.system_prompt = self._build_system_prompt()
         self.client = self._initialize_client()
+        self.last_usage: Optional[Dict[str, int]] = None  # Token usage of the last completion (all tool rounds)
+        self.last_model: Optional[str] = None  # Model that produced the last answer ("fast-path:<intent>" if local)
+        self.last_route: Optional[RouteDecision] = None  # Model router decision of the last model call
     
     def _fetch_tenant(self) -> Tenant:
         """
@@ -60,13 +122,7 @@ class AIService:
             AIServiceError: If tenant not found
         """
         tenant = self.db.query(Tenant).filter(Tenant.id == self.tenant_id).first()
-        
-        if not tenant:
-            logger.error(f"Tenant not found: {self.tenant_id}")
-            raise AIServiceError(f"Tenant with ID {self.tenant_id} not found")
-        
-        logger.info(f"Tenant loaded: {tenant.business_name} (ID: {tenant.id})")
-        return tenant
+        return _check_tenant(tenant, self.tenant_id)
     
     def _get_decrypted_api_key(self) -> str:
         """
@@ -105,6 +161,89 @@ class AIService:
         logger.debug(f"System prompt built for tenant {self.tenant_id}")
         return complete_prompt
     
+    def _system_prompt_for(
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> str:
+        """
+        System prompt of one call: the tenant prompt plus the knowledge base passages relevant to the message
+        
+        Args:
+            user_message: The user's message
+            conversation_history: Previous messages (the last user turn helps with short follow-ups)
+        
+        Returns:
+            System prompt string
+        """
+        query = user_message
+        if conversation_history:
+            previous = next((m["content"] for m in reversed(conversation_history) if m.get("role") == "user"), None)
+            if previous:
+                query = f"{previous}\n{user_message}"
+        
+        try:
+            context = knowledge_base.build_context(self.tenant_id, query)
+        except Exception as e:
+            # Answer without knowledge rather than failing the chat
+            logger.error(f"Knowledge retrieval failed for tenant {self.tenant_id}: {e}")
+            context = None
+        
+        if not context:
+            return self.system_prompt
+        return f"{self.system_prompt}\n\n{context}"
+    
+    def _messages_for(
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]],
+        tools: Optional[List[Dict[str, Any]]],
+        redaction: Optional[Redaction] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Messages array of one call: system prompt, history and the user's message
+        
+        Args:
+            user_message: The user's message
+            conversation_history: Previous messages
+            tools: Tool definitions offered in this call (adds the date and booking rules to the prompt)
+            redaction: Placeholders of the request (personal data in the message and history is replaced)
+        
+        Returns:
+            Messages list
+        """
+        if redaction is not None:
+            user_message = pii_redactor.redact(user_message, redaction)
+            conversation_history = pii_redactor.redact_messages(conversation_history, redaction)
+            if redaction:
+                logger.debug(f"Redacted {len(redaction)} value(s) for tenant {self.tenant_id}")
+        system_prompt = self._system_prompt_for(user_message, conversation_history)
+        if tools:
+            system_prompt = f"{system_prompt}\n\n{tool_instructions()}"
+        if redaction:
+            system_prompt = f"{system_prompt}\n\n{REDACTION_NOTE}"
+        messages: List[Dict[str, Any]] = [{"role": "system", "content": system_prompt}]
+        if conversation_history:
+            messages.extend(conversation_history)
+        messages.append({"role": "user", "content": user_message})
+        return messages
+    
+    def _tool_options(self, tools: Optional[List[Dict[str, Any]]], iteration: int) -> Dict[str, Any]:
+        """
+        Tool arguments of one API call
+        
+        Args:
+            tools: Tool definitions (None = no tools)
+            iteration: Zero-based model call number within the message
+        
+        Returns:
+            Keyword arguments for chat.completions.create (the last allowed call must answer in text)
+        """
+        if not tools:
+            return {}
+        final = iteration >= settings.AI_TOOL_MAX_ITERATIONS - 1
+        return {"tools": tools, "tool_choice": "none" if final else "auto"}
+    
     def _initialize_client(self) -> OpenAI:
         """
         Initialize OpenAI client with tenant's API key
@@ -115,64 +254,190 @@ class AIService:
         Raises:
             AIServiceError: If client initialization fails
         """
+        with _clients_lock:
+            client = _clients.get(self.api_key)
+            if client is not None:
+                _clients.move_to_end(self.api_key)
+                return client
         try:
             client = OpenAI(api_key=self.api_key)
             logger.info(f"OpenAI client initialized for tenant: {self.tenant_id}")
+            with _clients_lock:
+                _clients[self.api_key] = client
+                if len(_clients) > MAX_CACHED_CLIENTS:
+                    _clients.popitem(last=False)
             return client
         except Exception as e:
             logger.error(f"Failed to initialize OpenAI client for tenant {self.tenant_id}: {e}")
             raise AIServiceError(f"Failed to initialize OpenAI client: {str(e)}")
     
+    def fast_answer(self, user_message: str) -> Optional[str]:
+        """
+        Answer a structured question (hours, address, phone, prices) locally if the intent is confident
+        
+        Args:
+            user_message: The user's message
+        
+        Returns:
+            Answer text, None if the model should answer
+        """
+        if not settings.INTENT_FAST_PATH_ENABLED:
+            return None
+        answer = intent_router.answer(self.tenant, user_message)
+        if answer is None:
+            return None
+        intent, text = answer
+        self.last_usage = None
+        self.last_model = fast_path_model(intent)
+        return text
+    
+    def route_model(
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]],
+        model: str
+    ) -> str:
+        """
+        Model of a call: the requested one, or the model router's choice for "auto"
+        
+        Args:
+            user_message: The user's message
+            conversation_history: Previous messages
+            model: Requested model
+        
+        Returns:
+            Model to call
+        """
+        self.last_route = model_router.route(self.tenant, user_message, conversation_history, model)
+        return self.last_route.model
+    
+    def check_quota(self) -> None:
+        """
+        Check the tenant's token quotas (in-memory lookup, no database access)
+        
+        Raises:
+            AIServiceQuotaError: If the daily or monthly quota is used up
+        """
+        daily_quota = self.tenant.daily_token_quota
+        monthly_quota = self.tenant.monthly_token_quota
+        try:
+            usage_meter.check(
+                self.tenant_id,
+                daily_quota if daily_quota is not None else settings.DEFAULT_DAILY_TOKEN_QUOTA,
+                monthly_quota if monthly_quota is not None else settings.DEFAULT_MONTHLY_TOKEN_QUOTA
+            )
+        except QuotaExceededError as e:
+            logger.warning(f"Quota exceeded for tenant {self.tenant_id}: {e}")
+            raise AIServiceQuotaError(str(e))
+    
+    def _record_usage(self, usage: Any) -> None:
+        """
+        Store and meter the token usage reported by the provider
+        
+        Args:
+            usage: CompletionUsage object or dict (stream chunks carry a plain dict)
+        """
+        if isinstance(usage, dict):
+            prompt_tokens = usage.get("prompt_tokens") or 0
+            completion_tokens = usage.get("completion_tokens") or 0
+        else:
+            prompt_tokens = usage.prompt_tokens or 0
+            completion_tokens = usage.completion_tokens or 0
+        
+        if self.last_usage is None:
+            self.last_usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+        else:
+            self.last_usage["prompt_tokens"] += prompt_tokens
+            self.last_usage["completion_tokens"] += completion_tokens
+        usage_meter.record(self.tenant_id, prompt_tokens, completion_tokens)
+    
     def chat_completion(
         self,
         user_message: str,
         conversation_history: Optional[List[Dict[str, str]]] = None,
-        model: str = "gpt-4o",
+        model: str = AUTO_MODEL,
         temperature: float = 0.7,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        conversation_id: Optional[str] = None
     ) -> str:
         """
         Generate a chat completion using OpenAI API
         
+        Structured questions (hours, address, phone, prices) are answered locally
+        first, see fast_answer(). Tenants with bookable services get the appointment tools: the model's tool calls
+        are executed (parallel calls concurrently) and fed back until it answers in text,
+        at most AI_TOOL_MAX_ITERATIONS model calls. With PII_REDACTION_ENABLED the model
+        sees placeholders instead of personal data, restored in the answer. Model "auto"
+        is resolved by the model router, see route_model().
+        
         Args:
             user_message: The user's message
             conversation_history: Optional list of previous messages [{"role": "user/assistant", "content": "..."}]
-            model: OpenAI model to use (default: gpt-4o)
+            model: OpenAI model to use (default: auto, chosen by the model router)
             temperature: Response randomness (0-2, default: 0.7)
             max_tokens: Maximum tokens in response (optional)
+            conversation_id: Client conversation ID (recorded on bookings made by tools)
             
         Returns:
             Assistant's response text
             
         Raises:
+            AIServiceQuotaError: If the tenant's token quota is used up
             AIServiceError: If API call fails
         """
+        # Structured questions are answered without the model (and without using quota)
+        answer = self.fast_answer(user_message)
+        if answer is not None:
+            return answer
+        
+        self.check_quota()
+        model = self.route_model(user_message, conversation_history, model)
+        
         try:
-            # Build messages array
-            messages = [
-                {"role": "system", "content": self.system_prompt}
-            ]
-            
-            # Add conversation history if provided
-            if conversation_history:
-                messages.extend(conversation_history)
-            
-            # Add current user message
-            messages.append({"role": "user", "content": user_message})
+            redaction = Redaction() if settings.PII_REDACTION_ENABLED else None
+            tools = appointment_tools_for(self.tenant_id)
+            context = ToolContext(self.tenant_id, conversation_id, redaction)
+            messages = self._messages_for(user_message, conversation_history, tools, redaction)
+            self.last_usage = None
+            self.last_model = model
             
             logger.info(f"Sending chat completion request for tenant {self.tenant_id}")
             logger.debug(f"Model: {model}, Temperature: {temperature}, Messages: {len(messages)}")
             
-            # Make API call
-            response = self.client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
+            iteration = 0
+            while True:
+                # Make API call
+                call_started = time.perf_counter()
+                try:
+                    response = self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        **self._tool_options(tools, iteration)
+                    )
+                except MODEL_FAILURES:
+                    model_router.observe(model, (time.perf_counter() - call_started) * 1000, failed=True)
+                    raise
+                model_router.observe(model, (time.perf_counter() - call_started) * 1000)
+                if response.usage is not None:
+                    self._record_usage(response.usage)
+                
+                message = response.choices[0].message
+                if not message.tool_calls:
+                    break
+                
+                # Run the requested tools and send the results back
+                calls = [(call.id, call.function.name, call.function.arguments) for call in message.tool_calls]
+                logger.info(f"Tool calls for tenant {self.tenant_id}: {', '.join(name for _, name, _ in calls)}")
+                messages.append(assistant_tool_message(message.content, calls))
+                messages.extend(tool_messages(calls, tool_registry.run_all(context, calls)))
+                iteration += 1
             
             # Extract response
-            assistant_message = response.choices[0].message.content
+            assistant_message = message.content or ""
+            if redaction is not None:
+                assistant_message = redaction.restore(assistant_message)
             
             logger.info(f"Chat completion successful for tenant {self.tenant_id}")
             logger.debug(f"Response length: {len(assistant_message)} chars")
@@ -190,54 +455,112 @@ class AIService:
         self,
         user_message: str,
         conversation_history: Optional[List[Dict[str, str]]] = None,
-        model: str = "gpt-4o",
+        model: str = AUTO_MODEL,
         temperature: float = 0.7,
-        max_tokens: Optional[int] = None
-    ):
+        max_tokens: Optional[int] = None,
+        conversation_id: Optional[str] = None
+    ) -> Iterator[str]:
         """
         Generate a streaming chat completion using OpenAI API
         
+        The quota is checked when this is called, before any response is started.
+        Structured questions answered by the intent fast path come back as one chunk.
+        Tool calls are assembled from the streamed deltas and each one starts as soon
+        as its arguments are complete; the answer after the results streams on.
+        
         Args:
             user_message: The user's message
             conversation_history: Optional list of previous messages
-            model: OpenAI model to use (default: gpt-4o)
+            model: OpenAI model to use (default: auto, chosen by the model router)
             temperature: Response randomness (0-2, default: 0.7)
             max_tokens: Maximum tokens in response (optional)
+            conversation_id: Client conversation ID (recorded on bookings made by tools)
             
-        Yields:
-            Chunks of assistant's response text
+        Returns:
+            Iterator over chunks of assistant's response text
             
         Raises:
-            AIServiceError: If API call fails
+            AIServiceQuotaError: If the tenant's token quota is used up
+            AIServiceError: If API call fails (raised while iterating)
         """
+        answer = self.fast_answer(user_message)
+        if answer is not None:
+            return iter([answer])
+        
+        self.check_quota()
+        model = self.route_model(user_message, conversation_history, model)
+        self.last_model = model
+        if not settings.PII_REDACTION_ENABLED:
+            return self._stream_completion(user_message, conversation_history, model, temperature, max_tokens, conversation_id)
+        redaction = Redaction()
+        return redaction.restore_stream(
+            self._stream_completion(user_message, conversation_history, model, temperature, max_tokens, conversation_id, redaction)
+        )
+    
+    def _stream_completion(
+        self,
+        user_message: str,
+        conversation_history: Optional[List[Dict[str, str]]],
+        model: str,
+        temperature: float,
+        max_tokens: Optional[int],
+        conversation_id: Optional[str],
+        redaction: Optional[Redaction] = None
+    ) -> Iterator[str]:
+        """Run the streaming API calls, see chat_completion_stream() (output still has the placeholders)"""
         try:
-            # Build messages array
-            messages = [
-                {"role": "system", "content": self.system_prompt}
-            ]
-            
-            # Add conversation history if provided
-            if conversation_history:
-                messages.extend(conversation_history)
-            
-            # Add current user message
-            messages.append({"role": "user", "content": user_message})
+            tools = appointment_tools_for(self.tenant_id)
+            context = ToolContext(self.tenant_id, conversation_id, redaction)
+            messages = self._messages_for(user_message, conversation_history, tools, redaction)
+            self.last_usage = None
+            self.last_model = model
             
             logger.info(f"Sending streaming chat completion request for tenant {self.tenant_id}")
             
-            # Make streaming API call
-            stream = self.client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                stream=True
-            )
-            
-            # Yield chunks as they arrive
-            for chunk in stream:
-                if chunk.choices[0].delta.content is not None:
-                    yield chunk.choices[0].delta.content
+            iteration = 0
+            while True:
+                # Make streaming API call
+                call_started = time.perf_counter()
+                calls = StreamedToolCalls(tool_registry, context)
+                parts: List[str] = []
+                try:
+                    stream = self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        stream=True,
+                        # Ask for a final usage chunk (not a named argument in this client version)
+                        extra_body={"stream_options": {"include_usage": True}},
+                        **self._tool_options(tools, iteration)
+                    )
+                    
+                    # Yield text as it arrives and collect tool calls, the usage chunk has no choices
+                    for chunk in stream:
+                        if chunk.choices:
+                            delta = chunk.choices[0].delta
+                            if delta.content is not None:
+                                parts.append(delta.content)
+                                yield delta.content
+                            if delta.tool_calls:
+                                calls.add(delta.tool_calls)
+                        usage = getattr(chunk, "usage", None)
+                        if usage:
+                            self._record_usage(usage)
+                except MODEL_FAILURES:
+                    model_router.observe(model, (time.perf_counter() - call_started) * 1000, failed=True)
+                    raise
+                model_router.observe(model, (time.perf_counter() - call_started) * 1000)
+                
+                if not calls:
+                    break
+                
+                # Send the tool results back and stream the next answer
+                results = calls.results()
+                logger.info(f"Tool calls for tenant {self.tenant_id}: {', '.join(name for _, name, _ in calls.calls)}")
+                messages.append(assistant_tool_message("".join(parts), calls.calls))
+                messages.extend(tool_messages(calls.calls, results))
+                iteration += 1
             
             logger.info(f"Streaming chat completion completed for tenant {self.tenant_id}")
             
@@ -319,3 +642,24 @@ def create_ai_service(tenant_id: int, db: Session) -> AIService:
         AIServiceError: If service creation fails
     """
     return AIService(tenant_id=tenant_id, db=db)
+
+
+async def create_ai_service_async(tenant_id: int, db: AsyncSession) -> AIService:
+    """
+    Factory function to create an AI Service instance from an async session
+    
+    The tenant lookup is awaited so it does not block the event loop.
+    
+    Args:
+        tenant_id: The tenant ID
+        db: Async database session
+        
+    Returns:
+        Configured AIService instance
+        
+    Raises:
+        AIServiceError: If service creation fails
+    """
+    result = await db.execute(select(Tenant).where(Tenant.id == tenant_id))
+    tenant = _check_tenant(result.scalar_one_or_none(), tenant_id)
+    return AIService(tenant_id=tenant_id, tenant=tenant)
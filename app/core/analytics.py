@@ -0,0 +1,191 @@
+"""
+Chat analytics
+Maintains hourly/daily rollups while chat events are written and serves dashboard data from them
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+import logging
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.intents import FAST_PATH_MODEL
+from app.core.sharding import tenant_read_session
+from app.models.chat_rollup import ChatRollup
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+ROLLUP_COUNTERS = (
+    "messages",
+    "errors",
+    "latency_ms_total",
+    "latency_samples",
+    "prompt_tokens",
+    "completion_tokens",
+    "fast_path",
+)
+
+# Local time zone of the rollup periods (peak hours should be clinic hours, not UTC)
+analytics_tz = ZoneInfo(settings.ANALYTICS_TIMEZONE)
+
+
+def _local_periods(created_at: datetime) -> Tuple[datetime, datetime]:
+    """
+    Hour and day start of an event in analytics local time
+    
+    Args:
+        created_at: Event time (naive values are UTC)
+    
+    Returns:
+        (hour start, day start) as naive local datetimes
+    """
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    local = created_at.astimezone(analytics_tz).replace(tzinfo=None)
+    hour = local.replace(minute=0, second=0, microsecond=0)
+    return hour, hour.replace(hour=0)
+
+
+def build_rollups(events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Aggregate chat events into hourly and daily rollup deltas
+    
+    Args:
+        events: Chat event rows (as buffered by the conversation log)
+    
+    Returns:
+        One delta row per (tenant, granularity, period)
+    """
+    deltas: Dict[Tuple[int, str, datetime], List[int]] = defaultdict(lambda: [0] * len(ROLLUP_COUNTERS))
+    
+    for event in events:
+        latency = event.get("latency_ms")
+        values = (
+            1,
+            1 if event.get("status") == "error" else 0,
+            latency or 0,
+            1 if latency is not None else 0,
+            event.get("prompt_tokens") or 0,
+            event.get("completion_tokens") or 0,
+            1 if (event.get("model") or "").startswith(FAST_PATH_MODEL) else 0,
+        )
+        hour, day = _local_periods(event["created_at"])
+        for key in ((event["tenant_id"], "hour", hour), (event["tenant_id"], "day", day)):
+            counters = deltas[key]
+            for i, value in enumerate(values):
+                counters[i] += value
+    
+    return [
+        {"tenant_id": tenant_id, "granularity": granularity, "period_start": period_start,
+         **dict(zip(ROLLUP_COUNTERS, counters))}
+        for (tenant_id, granularity, period_start), counters in deltas.items()
+    ]
+
+
+def apply_rollups(session: Session, events: List[Dict[str, Any]]) -> None:
+    """
+    Add chat events to the rollups (call in the transaction that inserts the events)
+    
+    Args:
+        session: Write session of the events' database
+        events: Chat event rows
+    """
+    rows = build_rollups(events)
+    if not rows:
+        return
+    
+    stmt = sqlite_insert(ChatRollup)
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[ChatRollup.tenant_id, ChatRollup.granularity, ChatRollup.period_start],
+            set_={name: getattr(ChatRollup, name) + getattr(stmt.excluded, name) for name in ROLLUP_COUNTERS}
+        ),
+        rows
+    )
+
+
+def _average_latency(counters: Dict[str, int]) -> Optional[int]:
+    """Average response time in ms, None without samples"""
+    if not counters["latency_samples"]:
+        return None
+    return round(counters["latency_ms_total"] / counters["latency_samples"])
+
+
+def get_dashboard(tenant_id: int, days: int = 30) -> Dict[str, Any]:
+    """
+    Dashboard data of a tenant, read only from the rollups
+    
+    At most days daily rows and days * 24 hourly rows are read, independent
+    of how many chat events the tenant has.
+    
+    Args:
+        tenant_id: Tenant ID
+        days: Number of days to cover (including today)
+    
+    Returns:
+        Totals, per-day series, messages per hour of day and the peak hours
+    """
+    today = datetime.now(analytics_tz).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    since = today - timedelta(days=days - 1)
+    
+    with tenant_read_session(tenant_id) as db:
+        rows = db.execute(
+            select(ChatRollup)
+            .where(
+                ChatRollup.tenant_id == tenant_id,
+                ChatRollup.period_start >= since
+            )
+        ).scalars().all()
+    
+    totals = dict.fromkeys(ROLLUP_COUNTERS, 0)
+    daily: Dict[datetime, Dict[str, int]] = {}
+    by_hour = [0] * 24
+    
+    for row in rows:
+        counters = {name: getattr(row, name) for name in ROLLUP_COUNTERS}
+        if row.granularity == "day":
+            daily[row.period_start] = counters
+            for name in ROLLUP_COUNTERS:
+                totals[name] += counters[name]
+        else:
+            by_hour[row.period_start.hour] += counters["messages"]
+    
+    series = []
+    for offset in range(days):
+        day = since + timedelta(days=offset)
+        counters = daily.get(day, dict.fromkeys(ROLLUP_COUNTERS, 0))
+        series.append({
+            "date": day.date().isoformat(),
+            "messages": counters["messages"],
+            "errors": counters["errors"],
+            "avg_latency_ms": _average_latency(counters),
+            "tokens": counters["prompt_tokens"] + counters["completion_tokens"],
+            "fast_path": counters["fast_path"],
+        })
+    
+    peak_hours = sorted((hour for hour in range(24) if by_hour[hour]), key=lambda hour: -by_hour[hour])[:3]
+    
+    return {
+        "tenant_id": tenant_id,
+        "days": days,
+        "timezone": settings.ANALYTICS_TIMEZONE,
+        "totals": {
+            "messages": totals["messages"],
+            "errors": totals["errors"],
+            "avg_latency_ms": _average_latency(totals),
+            "prompt_tokens": totals["prompt_tokens"],
+            "completion_tokens": totals["completion_tokens"],
+            "tokens": totals["prompt_tokens"] + totals["completion_tokens"],
+            "fast_path": totals["fast_path"],
+            "fast_path_rate": round(totals["fast_path"] / totals["messages"], 3) if totals["messages"] else None,
+        },
+        "daily": series,
+        "messages_by_hour": by_hour,
+        "peak_hours": peak_hours,
+    }
@@ -0,0 +1,259 @@
+"""
+Conversation archive
+Append-only compressed segments of old chat events, partitioned by tenant and month, with read-through
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import gzip
+import json
+import logging
+import os
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.sharding import tenant_read_session
+from app.models.archived_conversation import ArchivedConversation
+from app.models.chat_event import ChatEvent
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".ndjson.gz"
+
+
+class ArchiveError(Exception):
+    """Custom exception for archive errors"""
+    pass
+
+
+def tenant_archive_dir(tenant_id: int) -> str:
+    """
+    Archive directory of a tenant
+    
+    Args:
+        tenant_id: Tenant ID
+    
+    Returns:
+        Absolute directory path
+    """
+    return os.path.join(os.path.abspath(settings.ARCHIVE_ROOT), f"tenant_{tenant_id}")
+
+
+def segment_path(segment: str) -> str:
+    """
+    Absolute path of a segment stored in the index
+    
+    Args:
+        segment: Path relative to ARCHIVE_ROOT
+    
+    Returns:
+        Absolute path
+    
+    Raises:
+        ArchiveError: If the path leaves the archive root
+    """
+    root = os.path.abspath(settings.ARCHIVE_ROOT)
+    path = os.path.abspath(os.path.join(root, segment))
+    if os.path.commonpath([root, path]) != root:
+        raise ArchiveError(f"Invalid segment path: {segment}")
+    return path
+
+
+def _next_segment_number(directory: str) -> int:
+    """Number following the highest existing segment in a month directory"""
+    numbers = [
+        int(name[4:-len(SEGMENT_SUFFIX)])
+        for name in os.listdir(directory)
+        if name.startswith("seg-") and name.endswith(SEGMENT_SUFFIX) and name[4:-len(SEGMENT_SUFFIX)].isdigit()
+    ]
+    return max(numbers, default=0) + 1
+
+
+def write_segment(
+    tenant_id: int,
+    month: str,
+    records: List[Dict[str, Any]]
+) -> Tuple[str, Dict[Optional[str], Tuple[int, int]]]:
+    """
+    Write a new, immutable archive segment
+    
+    Each conversation's records are one gzip member (a file of concatenated members
+    is still one valid gzip stream), so a conversation can be read by decompressing
+    only its byte range. The segment is written to a temporary file, fsynced and then
+    hard-linked to its final name, which fails instead of overwriting if another
+    writer took the name. Existing segments are never modified.
+    
+    Args:
+        tenant_id: Tenant ID
+        month: Partition (YYYY-MM)
+        records: Event records (ChatEvent.to_dict())
+    
+    Returns:
+        Segment path relative to ARCHIVE_ROOT and the (offset, length) of each conversation's member
+    """
+    directory = os.path.join(tenant_archive_dir(tenant_id), month)
+    os.makedirs(directory, exist_ok=True)
+    
+    groups: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for record in records:
+        groups.setdefault(record.get("conversation_id"), []).append(record)
+    
+    members: Dict[Optional[str], Tuple[int, int]] = {}
+    chunks: List[bytes] = []
+    offset = 0
+    for conversation_id, group in groups.items():
+        chunk = gzip.compress(
+            "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in group).encode("utf-8"),
+            compresslevel=6,
+            mtime=0
+        )
+        members[conversation_id] = (offset, len(chunk))
+        chunks.append(chunk)
+        offset += len(chunk)
+    data = b"".join(chunks)
+    
+    temp_path = os.path.join(directory, f".tmp-{os.getpid()}-{id(records)}")
+    with open(temp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    
+    try:
+        number = _next_segment_number(directory)
+        while True:
+            final_path = os.path.join(directory, f"seg-{number:06d}{SEGMENT_SUFFIX}")
+            try:
+                os.link(temp_path, final_path)
+                break
+            except FileExistsError:
+                number += 1
+    finally:
+        os.unlink(temp_path)
+    
+    # Persist the directory entry as well
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+    
+    relative = os.path.relpath(final_path, os.path.abspath(settings.ARCHIVE_ROOT))
+    logger.info(f"Archived {len(records)} chat events of tenant {tenant_id} to {relative} ({len(data)} bytes)")
+    return relative, members
+
+
+def read_segment(segment: str, offset: Optional[int] = None, length: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Read the records of a segment, or of one conversation's member
+    
+    Args:
+        segment: Path relative to ARCHIVE_ROOT
+        offset: Start of the member in the file (None = read the whole segment)
+        length: Compressed size of the member
+    
+    Returns:
+        Event records
+    
+    Raises:
+        ArchiveError: If the segment is missing
+    """
+    path = segment_path(segment)
+    try:
+        with open(path, "rb") as f:
+            if offset is None:
+                compressed = f.read()
+            else:
+                f.seek(offset)
+                compressed = f.read(length)
+    except FileNotFoundError:
+        raise ArchiveError(f"Archive segment not found: {segment}")
+    data = gzip.decompress(compressed)
+    return [json.loads(line) for line in data.decode("utf-8").splitlines() if line]
+
+
+def load_conversation(tenant_id: int, conversation_id: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    All events of a conversation, from the hot table and the archive (read-through)
+    
+    Args:
+        tenant_id: Tenant ID
+        conversation_id: Conversation ID
+    
+    Returns:
+        Events ordered by ID, archived ones marked with "archived": True,
+        or None if the conversation does not exist
+    """
+    with tenant_read_session(tenant_id) as db:
+        hot = db.execute(
+            select(ChatEvent)
+            .where(ChatEvent.tenant_id == tenant_id, ChatEvent.conversation_id == conversation_id)
+            .order_by(ChatEvent.id)
+        ).scalars().all()
+        members = db.execute(
+            select(ArchivedConversation.segment, ArchivedConversation.member_offset, ArchivedConversation.member_length)
+            .where(
+                ArchivedConversation.tenant_id == tenant_id,
+                ArchivedConversation.conversation_id == conversation_id
+            )
+            .distinct()
+        ).all()
+    
+    events: Dict[int, Dict[str, Any]] = {}
+    for segment, offset, length in members:
+        # Segments written before members were indexed are read whole
+        for record in read_segment(segment, offset, length):
+            if record.get("conversation_id") == conversation_id:
+                record["archived"] = True
+                events[record["id"]] = record
+    # A crash between archiving and deleting can leave an event in both places
+    for event in hot:
+        record = event.to_dict()
+        record["archived"] = False
+        events[event.id] = record
+    
+    if not events:
+        return None
+    return [events[event_id] for event_id in sorted(events)]
+
+
+def conversation_index_rows(
+    tenant_id: int,
+    month: str,
+    segment: str,
+    events: Iterable[ChatEvent],
+    members: Optional[Dict[Optional[str], Tuple[int, int]]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Index rows (one per conversation) for a freshly written segment
+    
+    Args:
+        tenant_id: Tenant ID
+        month: Partition (YYYY-MM)
+        segment: Segment path relative to ARCHIVE_ROOT
+        events: Events written to the segment, ordered by ID
+        members: Conversation members of the segment, as returned by write_segment()
+    
+    Returns:
+        Rows for archived_conversations
+    """
+    groups: Dict[Optional[str], List[ChatEvent]] = {}
+    for event in events:
+        groups.setdefault(event.conversation_id, []).append(event)
+    
+    return [
+        {
+            "tenant_id": tenant_id,
+            "conversation_id": conversation_id,
+            "month": month,
+            "segment": segment,
+            "first_event_id": group[0].id,
+            "last_event_id": group[-1].id,
+            "first_at": group[0].created_at,
+            "last_at": group[-1].created_at,
+            "messages": len(group),
+            "member_offset": members[conversation_id][0] if members else None,
+            "member_length": members[conversation_id][1] if members else None,
+        }
+        for conversation_id, group in groups.items()
+    ]
@@ -0,0 +1,1208 @@
+"""
+Messaging channels
+Connects the assistant to WhatsApp, SMS and Instagram. Channel adapters turn provider
+webhooks into plain inbound messages that are answered with the same AIService call as
+the web chat. Replies (and other outbound messages such as reminders) go through a
+persistent outbound queue: rows in outbound_messages are claimed in batches per channel,
+sent within the channel's rate limit and retried with exponential backoff.
+Local stub providers (OUTBOUND_PROVIDER=stub) let the whole pipeline run offline.
+"""
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, List, Mapping, Optional, Sequence, Tuple
+from urllib.parse import parse_qs
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import random
+import re
+import threading
+import time
+
+import requests
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.ai_service import AIServiceError, AIServiceQuotaError, create_ai_service
+from app.core.config import settings
+from app.core.conversation_store import conversation_log
+from app.core.database import SessionLocal
+from app.core.model_router import AUTO_MODEL
+from app.core.moderation import moderation_filter
+from app.core.sharding import tenant_read_session
+from app.core.write_queue import write_queue
+from app.models.chat_event import ChatEvent
+from app.models.outbound_message import FAILED, PENDING, SENDING, SENT, OutboundMessage
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Longest message each channel accepts, longer replies are split
+CHANNEL_MAX_CHARS = {
+    "whatsapp": 4096,
+    "sms": 1600,
+    "instagram": 1000,
+}
+
+# Sent to the customer when the assistant cannot answer
+FALLBACK_REPLY = "Şu anda mesajınızı yanıtlayamıyoruz, lütfen biraz sonra tekrar deneyin."
+QUOTA_REPLY = "Şu anda yoğunluk nedeniyle yanıt veremiyoruz, lütfen daha sonra tekrar yazın."
+
+
+class ChannelError(Exception):
+    """Custom exception for messaging channel errors"""
+    pass
+
+
+class ChannelTenantError(ChannelError):
+    """Raised when a webhook is addressed to another business than the tenant of its URL"""
+    pass
+
+
+class ChannelSignatureError(ChannelError):
+    """Raised when a webhook signature does not match"""
+    pass
+
+
+def _utcnow() -> datetime:
+    """Current naive UTC time (outbound queue times)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def split_text(text: str, limit: int) -> List[str]:
+    """
+    Split a message into parts of at most limit characters, at whitespace where possible
+    
+    Args:
+        text: Message text
+        limit: Maximum part length
+    
+    Returns:
+        Message parts (one part if the text fits)
+    """
+    text = text.strip()
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind(" ", 0, limit + 1)
+        if cut <= limit // 2:
+            cut = limit
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        parts.append(text)
+    return parts
+
+
+def parse_rate_limits(value: str) -> Dict[str, float]:
+    """
+    Parse the OUTBOUND_RATE_LIMITS setting
+    
+    Args:
+        value: Comma separated channel:messages-per-second pairs (e.g. "whatsapp:80,sms:10")
+    
+    Returns:
+        Messages per second by channel (0 = unlimited)
+    """
+    limits = {}
+    for part in value.split(","):
+        if not part.strip():
+            continue
+        channel, _, rate = part.partition(":")
+        limits[channel.strip()] = float(rate)
+    return limits
+
+
+# Inbound
+
+class InboundMessage:
+    """A customer message received over a channel"""
+    
+    __slots__ = ("channel", "sender", "text", "message_id", "recipient")
+    
+    def __init__(
+        self,
+        channel: str,
+        sender: str,
+        text: str,
+        message_id: Optional[str] = None,
+        recipient: Optional[str] = None
+    ):
+        self.channel = channel
+        self.sender = sender
+        self.text = text
+        self.message_id = message_id
+        self.recipient = recipient  # Business identity the message was sent to (phone number ID, number, account)
+    
+    def __repr__(self):
+        return f"<InboundMessage(channel='{self.channel}', sender='{self.sender}', message_id='{self.message_id}')>"
+
+
+class ChannelAdapter:
+    """
+    Interface of inbound webhook adapters
+    
+    Subclasses set name and implement parse(); verify() and challenge() cover the
+    provider's request signing and subscription handshake. ack_body is returned to
+    the provider after a webhook was accepted. With require_signature set, webhooks
+    are rejected while the provider secret is not configured.
+    
+    Provider credentials are shared by all tenants, so a valid signature does not
+    tell which tenant a webhook belongs to: check_recipients() compares the business
+    identity in the payload with the tenant's tenant_field.
+    """
+    
+    name = "base"
+    ack_body = ""
+    ack_media_type = "text/plain"
+    require_signature = True
+    tenant_field = ""  # Tenant column holding the channel's business identity
+    
+    def verify(self, headers: Mapping[str, str], body: bytes, url: str) -> None:
+        """
+        Check the webhook signature
+        
+        Args:
+            headers: Request headers (lower-case names)
+            body: Raw request body
+            url: Full request URL
+        
+        Raises:
+            ChannelSignatureError: If the signature is missing or wrong, or no secret is configured
+        """
+    
+    def _unsigned(self) -> None:
+        """Accept or reject a webhook of a channel without a configured secret"""
+        if self.require_signature:
+            raise ChannelSignatureError(f"Webhook secret of channel '{self.name}' is not configured")
+    
+    def same_identity(self, recipient: Optional[str], identity: str) -> bool:
+        """Whether a message's recipient is the tenant's identity"""
+        return recipient == identity
+    
+    def check_recipients(self, messages: Sequence[InboundMessage], identity: Optional[str]) -> None:
+        """
+        Check that every message was sent to the tenant of the webhook URL
+        
+        Args:
+            messages: Parsed messages
+            identity: The tenant's business identity on this channel (None = not configured)
+        
+        Raises:
+            ChannelTenantError: If a message is addressed to another business, or the tenant has no
+                identity configured while signatures are required
+        """
+        if not messages:
+            return
+        if not identity:
+            if self.require_signature:
+                raise ChannelTenantError(f"{self.tenant_field} of the tenant is not configured")
+            return
+        for message in messages:
+            if not self.same_identity(message.recipient, identity):
+                raise ChannelTenantError("Webhook is not addressed to this tenant")
+    
+    def challenge(self, params: Mapping[str, str]) -> Optional[str]:
+        """
+        Answer the provider's webhook subscription check
+        
+        Args:
+            params: Query parameters of the GET request
+        
+        Returns:
+            Response body, None if the check failed
+        """
+        return None
+    
+    def parse(self, body: bytes, content_type: str) -> List[InboundMessage]:
+        """
+        Extract text messages from a webhook
+        
+        Args:
+            body: Raw request body
+            content_type: Request content type
+        
+        Returns:
+            Text messages (delivery receipts, media and echoes are skipped)
+        
+        Raises:
+            ChannelError: If the body cannot be parsed
+        """
+        raise NotImplementedError
+
+
+class MetaWebhookAdapter(ChannelAdapter):
+    """Common part of the Meta (WhatsApp Cloud API, Instagram) webhooks"""
+    
+    ack_body = "EVENT_RECEIVED"
+    
+    def __init__(self, app_secret: str = "", verify_token: str = "", require_signature: bool = True):
+        """
+        Args:
+            app_secret: App secret for X-Hub-Signature-256
+            verify_token: Token expected in the subscription check
+            require_signature: False = accept unsigned webhooks while app_secret is empty
+        """
+        self.app_secret = app_secret
+        self.verify_token = verify_token
+        self.require_signature = require_signature
+    
+    def verify(self, headers: Mapping[str, str], body: bytes, url: str) -> None:
+        """Check X-Hub-Signature-256, see ChannelAdapter.verify()"""
+        if not self.app_secret:
+            return self._unsigned()
+        expected = "sha256=" + hmac.new(self.app_secret.encode(), body, hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(headers.get("x-hub-signature-256", ""), expected):
+            raise ChannelSignatureError("Invalid webhook signature")
+    
+    def challenge(self, params: Mapping[str, str]) -> Optional[str]:
+        """Echo hub.challenge when hub.verify_token matches, see ChannelAdapter.challenge()"""
+        if (
+            self.verify_token
+            and params.get("hub.mode") == "subscribe"
+            and hmac.compare_digest(params.get("hub.verify_token", ""), self.verify_token)
+        ):
+            return params.get("hub.challenge", "")
+        return None
+    
+    def _load(self, body: bytes) -> Dict[str, Any]:
+        """Decode a JSON webhook body"""
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise ChannelError(f"Invalid webhook body: {e}")
+        if not isinstance(payload, dict):
+            raise ChannelError("Invalid webhook body: expected an object")
+        return payload
+
+
+class WhatsAppAdapter(MetaWebhookAdapter):
+    """WhatsApp Cloud API webhooks (entry[].changes[].value.messages[])"""
+    
+    name = "whatsapp"
+    tenant_field = "whatsapp_phone_number_id"
+    
+    def parse(self, body: bytes, content_type: str) -> List[InboundMessage]:
+        """Extract text, button and list replies, see ChannelAdapter.parse()"""
+        messages = []
+        for entry in self._load(body).get("entry", []):
+            for change in entry.get("changes", []):
+                value = change.get("value", {})
+                recipient = (value.get("metadata") or {}).get("phone_number_id")
+                for message in value.get("messages", []):
+                    kind = message.get("type")
+                    if kind == "text":
+                        text = message.get("text", {}).get("body")
+                    elif kind == "button":
+                        text = message.get("button", {}).get("text")
+                    elif kind == "interactive":
+                        interactive = message.get("interactive", {})
+                        reply = interactive.get("button_reply") or interactive.get("list_reply") or {}
+                        text = reply.get("title")
+                    else:
+                        text = None
+                    if text and message.get("from"):
+                        messages.append(InboundMessage(self.name, message["from"], text, message.get("id"), recipient))
+        return messages
+
+
+class InstagramAdapter(MetaWebhookAdapter):
+    """Instagram messaging webhooks (entry[].messaging[])"""
+    
+    name = "instagram"
+    tenant_field = "instagram_account_id"
+
+    def parse(self, body: bytes, content_type: str) -> List[InboundMessage]:
+        """Extract text messages, see ChannelAdapter.parse()"""
+        messages = []
+        for entry in self._load(body).get("entry", []):
+            for event in entry.get("messaging", []):
+                message = event.get("message") or {}
+                sender = (event.get("sender") or {}).get("id")
+                # Our own replies come back as echoes
+                if message.get("is_echo") or not message.get("text") or not sender:
+                    continue
+                recipient = (event.get("recipient") or {}).get("id")
+                messages.append(InboundMessage(self.name, sender, message["text"], message.get("mid"), recipient))
+        return messages
+
+
+class SmsAdapter(ChannelAdapter):
+    """SMS webhooks in the Twilio format (form fields From, To, Body, MessageSid)"""
+    
+    name = "sms"
+    ack_body = "<Response></Response>"
+    ack_media_type = "application/xml"
+    tenant_field = "sms_number"
+    
+    def __init__(self, auth_token: str = "", require_signature: bool = True):
+        """
+        Args:
+            auth_token: Account auth token for X-Twilio-Signature
+            require_signature: False = accept unsigned webhooks while auth_token is empty
+        """
+        self.auth_token = auth_token
+        self.require_signature = require_signature
+    
+    def _form(self, body: bytes) -> Dict[str, str]:
+        """Decode a form encoded body"""
+        return {key: values[0] for key, values in parse_qs(body.decode("utf-8"), keep_blank_values=True).items()}
+    
+    def verify(self, headers: Mapping[str, str], body: bytes, url: str) -> None:
+        """Check X-Twilio-Signature (HMAC-SHA1 of the URL and sorted form fields), see ChannelAdapter.verify()"""
+        if not self.auth_token:
+            return self._unsigned()
+        signed = url + "".join(f"{key}{value}" for key, value in sorted(self._form(body).items()))
+        expected = base64.b64encode(hmac.new(self.auth_token.encode(), signed.encode(), hashlib.sha1).digest()).decode()
+        if not hmac.compare_digest(headers.get("x-twilio-signature", ""), expected):
+            raise ChannelSignatureError("Invalid webhook signature")
+    
+    def parse(self, body: bytes, content_type: str) -> List[InboundMessage]:
+        """Extract the message, see ChannelAdapter.parse()"""
+        try:
+            form = self._form(body)
+        except UnicodeDecodeError as e:
+            raise ChannelError(f"Invalid webhook body: {e}")
+        if not form.get("From") or not form.get("Body", "").strip():
+            return []
+        return [InboundMessage(self.name, form["From"], form["Body"], form.get("MessageSid"), form.get("To"))]
+    
+    def same_identity(self, recipient: Optional[str], identity: str) -> bool:
+        """Compare the last 10 digits (country prefix and formatting differ), see ChannelAdapter.same_identity()"""
+        digits = re.sub(r"\D", "", identity)[-10:]
+        return bool(digits) and re.sub(r"\D", "", recipient or "")[-10:] == digits
+
+
+def signatures_required() -> bool:
+    """Unsigned webhooks are only accepted with the local stub provider (offline tests)"""
+    return settings.OUTBOUND_PROVIDER != "stub"
+
+
+CHANNEL_ADAPTERS = {
+    WhatsAppAdapter.name: lambda: WhatsAppAdapter(
+        settings.CHANNEL_APP_SECRET, settings.CHANNEL_VERIFY_TOKEN, signatures_required()
+    ),
+    InstagramAdapter.name: lambda: InstagramAdapter(
+        settings.CHANNEL_APP_SECRET, settings.CHANNEL_VERIFY_TOKEN, signatures_required()
+    ),
+    SmsAdapter.name: lambda: SmsAdapter(settings.TWILIO_AUTH_TOKEN, signatures_required()),
+}
+
+
+def check_channel_config() -> List[str]:
+    """
+    Log configuration errors that make channel webhooks unusable
+    
+    Returns:
+        Error messages (empty if the configuration is usable)
+    """
+    errors = []
+    if signatures_required():
+        if not settings.CHANNEL_APP_SECRET:
+            errors.append("CHANNEL_APP_SECRET is not set, WhatsApp and Instagram webhooks will be rejected")
+        if not settings.TWILIO_AUTH_TOKEN:
+            errors.append("TWILIO_AUTH_TOKEN is not set, SMS webhooks will be rejected")
+    for error in errors:
+        logger.error(f"Channel configuration: {error}")
+    return errors
+
+
+# Outbound providers
+
+class OutboundProvider:
+    """
+    Interface of outbound delivery providers
+    
+    send_batch() returns one (status, detail) pair per message: (SENT, provider message ID),
+    (PENDING, error) for temporary failures that are retried, or (FAILED, error) for
+    messages the provider will never accept.
+    """
+    
+    channel = "base"
+    
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.max_chars = CHANNEL_MAX_CHARS.get(channel, 1000)
+    
+    def send_batch(self, messages: Sequence[Dict[str, Any]]) -> List[Tuple[str, Optional[str]]]:
+        """
+        Deliver claimed messages
+        
+        Args:
+            messages: Outbound message dictionaries
+        
+        Returns:
+            (status, provider message ID or error) per message
+        """
+        raise NotImplementedError
+
+
+class StubProvider(OutboundProvider):
+    """
+    Local stub: records messages in memory after an optional delay, can fail at random (tests, load tests)
+    """
+    
+    def __init__(self, channel: str, latency_ms: float = 0.0, failure_rate: float = 0.0, keep: int = 1000):
+        """
+        Args:
+            channel: Channel name
+            latency_ms: Simulated provider latency per batch
+            failure_rate: Share of messages failing with a temporary error
+            keep: Number of delivered messages kept in memory
+        """
+        super().__init__(channel)
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.sent: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self.delivered = 0
+        self._random = random.Random()
+    
+    def send_batch(self, messages: Sequence[Dict[str, Any]]) -> List[Tuple[str, Optional[str]]]:
+        """Record messages, see OutboundProvider.send_batch()"""
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        results = []
+        for message in messages:
+            if self._random.random() < self.failure_rate:
+                results.append((PENDING, "stub failure"))
+                continue
+            self.sent.append(message)
+            self.delivered += 1
+            results.append((SENT, f"stub-{self.channel}-{message['id']}"))
+        return results
+
+
+class HttpProvider(OutboundProvider):
+    """
+    Provider API over HTTP: one request per message on a kept-alive session
+    
+    Network errors, 429 and 5xx responses are retried; other 4xx responses are final.
+    """
+    
+    def __init__(self, channel: str, timeout: float = 10.0):
+        super().__init__(channel)
+        self.timeout = timeout
+        self.session = requests.Session()
+    
+    def _request(self, message: Dict[str, Any]) -> requests.Response:
+        """Send one message"""
+        raise NotImplementedError
+    
+    def _message_id(self, response: requests.Response) -> Optional[str]:
+        """Provider message ID of a successful response"""
+        return None
+    
+    def send_batch(self, messages: Sequence[Dict[str, Any]]) -> List[Tuple[str, Optional[str]]]:
+        """Send messages one by one, see OutboundProvider.send_batch()"""
+        results = []
+        for message in messages:
+            try:
+                response = self._request(message)
+            except requests.RequestException as e:
+                results.append((PENDING, str(e)))
+                continue
+            if response.ok:
+                try:
+                    results.append((SENT, self._message_id(response)))
+                except ValueError:
+                    results.append((SENT, None))
+            elif response.status_code == 429 or response.status_code >= 500:
+                results.append((PENDING, f"HTTP {response.status_code}: {response.text[:500]}"))
+            else:
+                results.append((FAILED, f"HTTP {response.status_code}: {response.text[:500]}"))
+        return results
+
+
+class WhatsAppCloudProvider(HttpProvider):
+    """WhatsApp Cloud API (POST /{phone-number-id}/messages)"""
+    
+    def __init__(self, phone_number_id: str, access_token: str, api_version: str = "v19.0"):
+        super().__init__("whatsapp")
+        self.url = f"https://graph.facebook.com/{api_version}/{phone_number_id}/messages"
+        self.session.headers["Authorization"] = f"Bearer {access_token}"
+    
+    def _request(self, message: Dict[str, Any]) -> requests.Response:
+        return self.session.post(self.url, timeout=self.timeout, json={
+            "messaging_product": "whatsapp",
+            "to": re.sub(r"\D", "", message["recipient"]),
+            "type": "text",
+            "text": {"body": message["text"]},
+        })
+    
+    def _message_id(self, response: requests.Response) -> Optional[str]:
+        return (response.json().get("messages") or [{}])[0].get("id")
+
+
+class InstagramProvider(HttpProvider):
+    """Instagram Messaging API (POST /me/messages)"""
+    
+    def __init__(self, access_token: str, api_version: str = "v19.0"):
+        super().__init__("instagram")
+        self.url = f"https://graph.facebook.com/{api_version}/me/messages"
+        self.session.params = {"access_token": access_token}
+    
+    def _request(self, message: Dict[str, Any]) -> requests.Response:
+        return self.session.post(self.url, timeout=self.timeout, json={
+            "recipient": {"id": message["recipient"]},
+            "message": {"text": message["text"]},
+        })
+    
+    def _message_id(self, response: requests.Response) -> Optional[str]:
+        return response.json().get("message_id")
+
+
+class TwilioSmsProvider(HttpProvider):
+    """Twilio Messages API"""
+    
+    def __init__(self, account_sid: str, auth_token: str, from_number: str):
+        super().__init__("sms")
+        self.url = f"https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Messages.json"
+        self.session.auth = (account_sid, auth_token)
+        self.from_number = from_number
+    
+    def _request(self, message: Dict[str, Any]) -> requests.Response:
+        recipient = message["recipient"]
+        if not recipient.startswith("+"):
+            # Local numbers (0555...) get the Turkish country code
+            digits = re.sub(r"\D", "", recipient)
+            recipient = "+90" + digits[1:] if digits.startswith("0") else "+" + digits
+        return self.session.post(self.url, timeout=self.timeout, data={
+            "To": recipient,
+            "From": self.from_number,
+            "Body": message["text"],
+        })
+    
+    def _message_id(self, response: requests.Response) -> Optional[str]:
+        return response.json().get("sid")
+
+
+def _stub_providers() -> Dict[str, OutboundProvider]:
+    """Stub provider for every channel"""
+    return {channel: StubProvider(channel) for channel in CHANNEL_MAX_CHARS}
+
+
+def _live_providers() -> Dict[str, OutboundProvider]:
+    """Provider APIs of the channels that have credentials configured"""
+    providers: Dict[str, OutboundProvider] = {}
+    if settings.WHATSAPP_PHONE_NUMBER_ID and settings.WHATSAPP_ACCESS_TOKEN:
+        providers["whatsapp"] = WhatsAppCloudProvider(settings.WHATSAPP_PHONE_NUMBER_ID, settings.WHATSAPP_ACCESS_TOKEN)
+    if settings.INSTAGRAM_ACCESS_TOKEN:
+        providers["instagram"] = InstagramProvider(settings.INSTAGRAM_ACCESS_TOKEN)
+    if settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN and settings.TWILIO_FROM_NUMBER:
+        providers["sms"] = TwilioSmsProvider(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, settings.TWILIO_FROM_NUMBER)
+    return providers
+
+
+OUTBOUND_PROVIDERS = {
+    "stub": _stub_providers,
+    "live": _live_providers,
+}
+
+
+def create_outbound_providers(name: str) -> Dict[str, OutboundProvider]:
+    """
+    Create the configured outbound providers
+    
+    Args:
+        name: Provider set (see OUTBOUND_PROVIDERS)
+    
+    Returns:
+        Provider by channel name
+    
+    Raises:
+        ValueError: If the provider set is unknown
+    """
+    if name not in OUTBOUND_PROVIDERS:
+        raise ValueError(f"Unknown outbound provider '{name}', choose one of: {', '.join(OUTBOUND_PROVIDERS)}")
+    return OUTBOUND_PROVIDERS[name]()
+
+
+# Outbound queue
+
+class TokenBucket:
+    """Rate limiter: rate tokens per second, at most burst saved up (rate 0 = unlimited)"""
+    
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def take(self, wanted: int) -> int:
+        """
+        Take up to wanted tokens
+        
+        Returns:
+            Number of tokens taken
+        """
+        if self.rate <= 0:
+            return wanted
+        with self._lock:
+            self._refill()
+            taken = min(wanted, int(self.tokens))
+            self.tokens -= taken
+            return taken
+    
+    def refund(self, count: int) -> None:
+        """Return tokens that were not used"""
+        if self.rate <= 0 or count <= 0:
+            return
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + count)
+    
+    def wait_seconds(self) -> float:
+        """Seconds until the next token is available"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class OutboundQueue:
+    """
+    Persistent outbound message queue
+    
+    enqueue() writes rows through the write queue and wakes the dispatcher thread.
+    The dispatcher claims up to batch_size due messages per channel with one update
+    (status sending, next_attempt_at = now + lease), as many as the channel's token
+    bucket allows, and hands each batch to a sender thread; a channel has at most one
+    batch in flight so batches of a channel are sent in order. Results are written back
+    in one job per batch: sent, retried after retry_seconds * 2^(attempts - 1), or
+    failed after max_attempts. Messages of a dispatcher that died mid-send are claimed
+    again when their lease expires (at-least-once delivery).
+    """
+    
+    def __init__(
+        self,
+        providers: Dict[str, OutboundProvider],
+        rate_limits: Optional[Dict[str, float]] = None,
+        batch_size: int = 50,
+        poll_seconds: float = 1.0,
+        max_attempts: int = 6,
+        retry_seconds: float = 5.0,
+        lease_seconds: float = 120.0
+    ):
+        """
+        Initialize queue
+        
+        Args:
+            providers: Provider by channel name
+            rate_limits: Messages per second by channel (missing or 0 = unlimited)
+            batch_size: Messages claimed per channel and batch
+            poll_seconds: Time between checks for due retries when idle
+            max_attempts: Delivery attempts before a message is marked failed
+            retry_seconds: First retry delay, doubled on every further attempt
+            lease_seconds: Time after which an unfinished send is claimed again
+        """
+        self.providers = providers
+        rate_limits = rate_limits or {}
+        self.buckets = {channel: TokenBucket(rate_limits.get(channel, 0.0)) for channel in providers}
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.lease = timedelta(seconds=lease_seconds)
+        self._busy: set = set()  # Channels with a batch in flight
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.stats = {"queued": 0, "sent": 0, "retried": 0, "failed": 0, "batches": 0}
+    
+    def _count(self, name: str, amount: int = 1) -> None:
+        """Increment a delivery counter"""
+        with self._lock:
+            self.stats[name] += amount
+    
+    def enqueue(
+        self,
+        tenant_id: int,
+        channel: str,
+        recipient: str,
+        text: str,
+        reference: Optional[str] = None
+    ) -> "Future[List[int]]":
+        """
+        Queue a message (split into several if it is longer than the channel allows)
+        
+        Args:
+            tenant_id: Tenant ID
+            channel: Channel name
+            recipient: Phone number or channel user ID
+            text: Message text
+            reference: Inbound message or reminder this message answers
+        
+        Returns:
+            Future resolved with the message IDs once they are stored
+        
+        Raises:
+            ChannelError: If the channel has no provider
+        """
+        provider = self.providers.get(channel)
+        if provider is None:
+            raise ChannelError(f"No outbound provider for channel '{channel}'")
+        parts = split_text(text, provider.max_chars)
+        now = _utcnow()
+        
+        def _insert(session: Session) -> List[int]:
+            messages = [
+                OutboundMessage(
+                    tenant_id=tenant_id,
+                    channel=channel,
+                    recipient=recipient,
+                    text=part,
+                    reference=reference,
+                    status=PENDING,
+                    attempts=0,
+                    next_attempt_at=now
+                )
+                for part in parts
+            ]
+            session.add_all(messages)
+            session.flush()
+            return [message.id for message in messages]
+        
+        future = write_queue.submit(_insert)
+        future.add_done_callback(lambda _: self._wakeup.set())
+        self._count("queued", len(parts))
+        if not self._stop.is_set() and not (self._thread and self._thread.is_alive()):
+            self.start()
+        return future
+    
+    def _due_ids(self, channel: str, now: datetime, limit: int) -> List[int]:
+        """IDs of due messages of a channel, oldest first"""
+        with SessionLocal() as db:
+            return db.execute(
+                select(OutboundMessage.id)
+                .where(
+                    OutboundMessage.status.in_([PENDING, SENDING]),
+                    OutboundMessage.next_attempt_at <= now,
+                    OutboundMessage.channel == channel
+                )
+                .order_by(OutboundMessage.next_attempt_at, OutboundMessage.id)
+                .limit(limit)
+            ).scalars().all()
+    
+    def _claim(self, ids: Sequence[int], now: datetime) -> List[Dict[str, Any]]:
+        """Claim due messages (messages claimed by another dispatcher in the meantime are skipped)"""
+        lease_until = now + self.lease
+        max_attempts = self.max_attempts
+        
+        def _claim_rows(session: Session) -> List[Dict[str, Any]]:
+            messages = session.execute(
+                select(OutboundMessage).where(
+                    OutboundMessage.id.in_(ids),
+                    OutboundMessage.status.in_([PENDING, SENDING]),
+                    OutboundMessage.next_attempt_at <= now
+                )
+            ).scalars().all()
+            claimed = []
+            for message in messages:
+                if message.attempts >= max_attempts:
+                    # Lease expired on the last attempt
+                    message.status = FAILED
+                    message.last_error = message.last_error or "Delivery did not finish"
+                    continue
+                message.status = SENDING
+                message.attempts += 1
+                message.next_attempt_at = lease_until
+                claimed.append(message)
+            session.flush()
+            return [message.to_dict() for message in claimed]
+        
+        return write_queue.submit(_claim_rows).result()
+    
+    def dispatch(self) -> int:
+        """
+        Claim one batch per idle channel and hand it to the sender threads (sent inline
+        when the dispatcher thread is not running)
+        
+        Returns:
+            Number of messages claimed
+        """
+        now = _utcnow()
+        claimed_total = 0
+        for channel, provider in self.providers.items():
+            with self._lock:
+                if channel in self._busy:
+                    continue
+            bucket = self.buckets[channel]
+            allowed = bucket.take(self.batch_size)
+            if not allowed:
+                continue
+            ids = self._due_ids(channel, now, allowed)
+            claimed = self._claim(ids, now) if ids else []
+            bucket.refund(allowed - len(claimed))
+            if not claimed:
+                continue
+            claimed_total += len(claimed)
+            with self._lock:
+                self._busy.add(channel)
+            if self._executor is not None:
+                self._executor.submit(self._send, provider, claimed)
+            else:
+                self._send(provider, claimed)
+        return claimed_total
+    
+    def _send(self, provider: OutboundProvider, messages: List[Dict[str, Any]]) -> None:
+        """Send a claimed batch and store the results"""
+        try:
+            try:
+                results = provider.send_batch(messages)
+            except Exception as e:
+                results = [(PENDING, str(e))] * len(messages)
+            self._store_results(messages, results)
+        except Exception as e:
+            # Rows stay claimed and are sent again when the lease expires
+            logger.error(f"Storing {provider.channel} delivery results failed: {e}")
+        finally:
+            with self._lock:
+                self._busy.discard(provider.channel)
+            self._wakeup.set()
+    
+    def _store_results(self, messages: List[Dict[str, Any]], results: List[Tuple[str, Optional[str]]]) -> None:
+        """Mark a batch sent, retried or failed in one write"""
+        now = _utcnow()
+        updates = []
+        for message, (status, detail) in zip(messages, results):
+            if status == SENT:
+                updates.append((message["id"], {"status": SENT, "sent_at": now, "provider_message_id": detail, "last_error": None}))
+                continue
+            attempts = message["attempts"]
+            if status == FAILED or attempts >= self.max_attempts:
+                updates.append((message["id"], {"status": FAILED, "last_error": (detail or "")[:1000]}))
+                logger.warning(f"Outbound message {message['id']} ({message['channel']}) failed: {detail}")
+            else:
+                retry_at = now + timedelta(seconds=self.retry_seconds * 2 ** (attempts - 1))
+                updates.append((message["id"], {"status": PENDING, "next_attempt_at": retry_at, "last_error": (detail or "")[:1000]}))
+        
+        def _update(session: Session) -> None:
+            for message_id, values in updates:
+                session.execute(update(OutboundMessage).where(OutboundMessage.id == message_id).values(**values))
+        
+        write_queue.submit(_update).result()
+        statuses = [values["status"] for _, values in updates]
+        self._count("batches")
+        self._count("sent", statuses.count(SENT))
+        self._count("retried", statuses.count(PENDING))
+        self._count("failed", statuses.count(FAILED))
+    
+    # Background thread
+    
+    def start(self) -> None:
+        """Start the dispatcher thread (idempotent)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._executor = ThreadPoolExecutor(max_workers=max(len(self.providers), 1), thread_name_prefix="outbound-sender")
+            self._thread = threading.Thread(target=self._run, name="outbound-queue", daemon=True)
+            self._thread.start()
+        logger.info("Outbound queue started")
+    
+    def stop(self) -> None:
+        """Stop the dispatcher and wait for batches in flight (queued messages stay in the database)"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(10.0)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+    
+    def _run(self) -> None:
+        """Dispatcher thread main loop"""
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            try:
+                claimed = self.dispatch()
+            except Exception as e:
+                logger.error(f"Outbound dispatch failed: {e}")
+                claimed = 0
+            if claimed:
+                continue
+            # Idle, rate limited or every channel busy: wait for a finished batch,
+            # a new message, a token or the next retry check
+            wait = self.poll_seconds
+            for bucket in self.buckets.values():
+                if bucket.rate > 0:
+                    wait = min(wait, max(bucket.wait_seconds(), 0.01))
+            self._wakeup.wait(wait)
+    
+    def status(self) -> Dict[str, Any]:
+        """
+        Queue state for monitoring
+        
+        Returns:
+            Message counts by channel and status, and delivery counters
+        """
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(OutboundMessage.channel, OutboundMessage.status, func.count())
+                .group_by(OutboundMessage.channel, OutboundMessage.status)
+            ).all()
+        channels: Dict[str, Dict[str, int]] = {}
+        for channel, status, count in rows:
+            channels.setdefault(channel, {})[status] = count
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "channels": channels,
+            **self.stats,
+        }
+
+
+# Gateway
+
+class ChannelGateway:
+    """
+    Answers inbound channel messages
+    
+    Webhooks are acknowledged right away; each message is answered on a worker thread
+    with AIService (the sender's recent turns as history, conversation ID
+    "<channel>:<sender>"), logged like web chat turns and the reply is queued for
+    delivery. Provider retries of a webhook are recognized by message ID.
+    """
+    
+    def __init__(
+        self,
+        outbox: OutboundQueue,
+        model: str = AUTO_MODEL,
+        history_turns: int = 6,
+        workers: int = 8,
+        dedup_size: int = 10000
+    ):
+        """
+        Initialize gateway
+        
+        Args:
+            outbox: Queue replies are sent through
+            model: OpenAI model used for channel conversations (auto = model router)
+            history_turns: Earlier turns of the conversation sent with each message
+            workers: Threads answering messages
+            dedup_size: Number of recent message IDs remembered
+        """
+        self.outbox = outbox
+        self.model = model
+        self.history_turns = history_turns
+        self.workers = workers
+        self.dedup_size = dedup_size
+        self._adapters: Dict[str, ChannelAdapter] = {}
+        self._seen: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+    
+    def adapter(self, channel: str) -> ChannelAdapter:
+        """
+        Adapter of a channel
+        
+        Args:
+            channel: Channel name
+        
+        Returns:
+            Adapter instance
+        
+        Raises:
+            ChannelError: If the channel is unknown
+        """
+        adapter = self._adapters.get(channel)
+        if adapter is None:
+            if channel not in CHANNEL_ADAPTERS:
+                raise ChannelError(f"Unknown channel '{channel}', choose one of: {', '.join(CHANNEL_ADAPTERS)}")
+            adapter = self._adapters.setdefault(channel, CHANNEL_ADAPTERS[channel]())
+        return adapter
+    
+    def _first_seen(self, message: InboundMessage) -> bool:
+        """Whether a message ID was not received before"""
+        if not message.message_id:
+            return True
+        key = (message.channel, message.message_id)
+        with self._lock:
+            if key in self._seen:
+                return False
+            self._seen[key] = None
+            if len(self._seen) > self.dedup_size:
+                self._seen.popitem(last=False)
+        return True
+    
+    def receive(
+        self,
+        channel: str,
+        tenant_id: int,
+        body: bytes,
+        headers: Mapping[str, str],
+        url: str,
+        content_type: str = "",
+        identity: Optional[str] = None
+    ) -> List[InboundMessage]:
+        """
+        Accept a webhook and answer its messages in the background
+        
+        Args:
+            channel: Channel name
+            tenant_id: Tenant the webhook belongs to
+            body: Raw request body
+            headers: Request headers (lower-case names)
+            url: Full request URL
+            content_type: Request content type
+            identity: The tenant's business identity on the channel (value of adapter.tenant_field)
+        
+        Returns:
+            Messages accepted for answering (duplicates left out)
+        
+        Raises:
+            ChannelSignatureError: If the signature is wrong
+            ChannelTenantError: If the messages are not addressed to the tenant
+            ChannelError: If the channel is unknown or the body cannot be parsed
+        """
+        adapter = self.adapter(channel)
+        adapter.verify(headers, body, url)
+        messages = adapter.parse(body, content_type)
+        adapter.check_recipients(messages, identity)
+        messages = [message for message in messages if self._first_seen(message)]
+        if messages:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="channel-worker")
+                executor = self._executor
+            for message in messages:
+                executor.submit(self.process, tenant_id, message)
+        return messages
+    
+    def _history(self, tenant_id: int, conversation_id: str) -> List[Dict[str, str]]:
+        """
+        Last history_turns successful turns of a conversation as chat messages
+        
+        Turns still buffered in the conversation log are merged in, so a quick
+        follow-up message sees the previous answer before it was written.
+        """
+        if self.history_turns <= 0:
+            return []
+        # Read before the database: a turn committed in between shows up in both and is skipped once
+        unwritten = [
+            event for event in conversation_log.unwritten(tenant_id, conversation_id) if event["status"] == "ok"
+        ]
+        with tenant_read_session(tenant_id) as db:
+            events = db.execute(
+                select(ChatEvent)
+                .where(
+                    ChatEvent.tenant_id == tenant_id,
+                    ChatEvent.conversation_id == conversation_id,
+                    ChatEvent.status == "ok"
+                )
+                .order_by(ChatEvent.id.desc())
+                .limit(self.history_turns)
+            ).scalars().all()
+            stored = {event.created_at.replace(tzinfo=None) for event in events}
+            turns = [(event.user_message, event.assistant_message) for event in reversed(events)]
+        turns += [
+            (event["user_message"], event["assistant_message"])
+            for event in unwritten
+            if event["created_at"].replace(tzinfo=None) not in stored
+        ]
+        turns = turns[-self.history_turns:]
+        history = []
+        for user_message, assistant_message in turns:
+            history.append({"role": "user", "content": user_message})
+            history.append({"role": "assistant", "content": assistant_message or ""})
+        return history
+    
+    def process(self, tenant_id: int, message: InboundMessage) -> Optional[str]:
+        """
+        Answer a message and queue the reply
+        
+        Messages hit by a moderation rule are not sent to the model: blocked ones get
+        the rule's reply, rejected ones no reply at all.
+        
+        Args:
+            tenant_id: Tenant ID
+            message: Inbound message
+        
+        Returns:
+            Reply text, None if the message was rejected or could not be answered at all
+        """
+        started = time.perf_counter()
+        conversation_id = f"{message.channel}:{message.sender}"[:64]
+        model = self.model
+        usage: Dict[str, int] = {}
+        error = None
+        try:
+            verdict = moderation_filter.check(tenant_id, message.text) if settings.MODERATION_ENABLED else None
+            if verdict is not None:
+                model, reply = verdict.model, verdict.reply
+            else:
+                history = self._history(tenant_id, conversation_id)
+                with SessionLocal() as db:
+                    ai_service = create_ai_service(tenant_id, db)
+                reply = ai_service.chat_completion(
+                    user_message=message.text,
+                    conversation_history=history or None,
+                    model=self.model,
+                    conversation_id=conversation_id
+                )
+                model = ai_service.last_model or self.model
+                usage = ai_service.last_usage or {}
+        except AIServiceQuotaError as e:
+            error, reply = str(e), QUOTA_REPLY
+        except AIServiceError as e:
+            error, reply = str(e), FALLBACK_REPLY
+        except Exception as e:
+            logger.error(f"Answering {message.channel} message of tenant {tenant_id} failed: {e}")
+            error, reply = str(e), FALLBACK_REPLY
+        
+        conversation_log.record(
+            tenant_id=tenant_id,
+            user_message=message.text,
+            assistant_message=None if error else reply,
+            model=model,
+            latency_ms=int((time.perf_counter() - started) * 1000),
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+            conversation_id=conversation_id,
+            channel=message.channel,
+            error=error
+        )
+        if reply is None:
+            return None
+        try:
+            self.outbox.enqueue(tenant_id, message.channel, message.sender, reply, reference=message.message_id)
+        except Exception as e:
+            logger.error(f"Queueing {message.channel} reply of tenant {tenant_id} failed: {e}")
+            return None
+        return reply
+    
+    def stop(self) -> None:
+        """Wait for messages being answered"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+# Global outbound queue and gateway instances
+outbound_queue = OutboundQueue(
+    providers=create_outbound_providers(settings.OUTBOUND_PROVIDER),
+    rate_limits=parse_rate_limits(settings.OUTBOUND_RATE_LIMITS),
+    batch_size=settings.OUTBOUND_BATCH_SIZE,
+    poll_seconds=settings.OUTBOUND_POLL_SECONDS,
+    max_attempts=settings.OUTBOUND_MAX_ATTEMPTS,
+    retry_seconds=settings.OUTBOUND_RETRY_SECONDS,
+    lease_seconds=settings.OUTBOUND_LEASE_SECONDS
+)
+
+channel_gateway = ChannelGateway(
+    outbox=outbound_queue,
+    model=settings.CHANNEL_MODEL,
+    history_turns=settings.CHANNEL_HISTORY_TURNS,
+    workers=settings.CHANNEL_WORKERS
+)
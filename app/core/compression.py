@@ -0,0 +1,322 @@
+"""
+Message compression
+Stored chat messages are zstd-compressed with per-tenant trained dictionaries, versioned so older rows stay readable
+"""
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+import logging
+import threading
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+import zstandard as zstd
+
+from app.core.config import settings
+from app.core.sharding import submit_tenant_write, tenant_read_session
+from app.models.compression_dict import CompressionDictionary
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Values of chat_events.body_dict besides dictionary versions (1, 2, ...)
+NO_DICTIONARY = 0  # zstd without dictionary (tenant has no trained dictionary yet)
+# None: plain UTF-8 (compression disabled)
+
+
+class CompressionError(Exception):
+    """Custom exception for message compression errors"""
+    pass
+
+
+class MessageCodec:
+    """
+    Encoder/decoder of stored chat message bodies
+    
+    Chat messages are short and repetitive within a tenant (greetings, service
+    names, opening hours), too short for zstd to find the repetitions on its own.
+    A dictionary trained on the tenant's recent messages supplies them. Every
+    training stores a new dictionary version and rows record the version they
+    were compressed with; dictionaries are never changed, so old rows stay
+    decodable. Compression runs in the conversation log's flusher thread,
+    decompression when a ChatEvent's user_message/assistant_message is read.
+    
+    A tenant is (re)trained in a background thread after min_samples messages
+    were written while it had no dictionary, and after every retrain_every
+    messages afterwards, so the dictionary follows changing content.
+    
+    Loaded dictionaries and each thread's (de)compressors are kept in LRU caches
+    of cache_size and codec_cache_size entries; an evicted one is loaded or
+    created again on its next use.
+    """
+    
+    def __init__(
+        self,
+        enabled: bool = True,
+        level: int = 3,
+        dict_size: int = 16384,
+        train_samples: int = 4000,
+        min_samples: int = 200,
+        retrain_every: int = 20000,
+        cache_size: int = 1024,
+        codec_cache_size: int = 64
+    ):
+        """
+        Initialize message codec
+        
+        Args:
+            enabled: Compress new messages (existing rows are always readable)
+            level: zstd compression level
+            dict_size: Maximum dictionary size in bytes
+            train_samples: Most recent messages used for training
+            min_samples: Messages needed before the first training
+            retrain_every: Written messages between trainings
+            cache_size: Dictionaries kept in memory
+            codec_cache_size: Compressors and decompressors kept per thread
+        """
+        self.enabled = enabled
+        self.level = level
+        self.dict_size = dict_size
+        self.train_samples = train_samples
+        self.min_samples = min_samples
+        self.retrain_every = retrain_every
+        self.cache_size = cache_size
+        self.codec_cache_size = codec_cache_size
+        self._dicts: "OrderedDict[Tuple[int, int], zstd.ZstdCompressionDict]" = OrderedDict()
+        self._current: Dict[int, int] = {}
+        self._written: Dict[int, int] = defaultdict(int)
+        self._training: Set[int] = set()
+        self._lock = threading.Lock()
+        # zstd (de)compressor objects must not be shared between threads
+        self._local = threading.local()
+        self._trainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dict-trainer")
+    
+    def _dictionary(self, tenant_id: int, version: int) -> Optional[zstd.ZstdCompressionDict]:
+        """
+        Dictionary of a tenant by version, loaded on first use
+        
+        Raises:
+            CompressionError: If the version does not exist
+        """
+        if version == NO_DICTIONARY:
+            return None
+        key = (tenant_id, version)
+        with self._lock:
+            dictionary = self._dicts.get(key)
+            if dictionary is not None:
+                self._dicts.move_to_end(key)
+        if dictionary is None:
+            with tenant_read_session(tenant_id) as db:
+                data = db.execute(
+                    select(CompressionDictionary.data)
+                    .where(CompressionDictionary.tenant_id == tenant_id, CompressionDictionary.version == version)
+                ).scalar()
+            if data is None:
+                raise CompressionError(f"Compression dictionary {version} of tenant {tenant_id} not found")
+            dictionary = self._remember(key, zstd.ZstdCompressionDict(data))
+        return dictionary
+    
+    def _remember(self, key: Tuple[int, int], dictionary: zstd.ZstdCompressionDict) -> zstd.ZstdCompressionDict:
+        """Add a dictionary to the LRU cache (one loaded concurrently wins), evicting the least recently used"""
+        with self._lock:
+            dictionary = self._dicts.setdefault(key, dictionary)
+            self._dicts.move_to_end(key)
+            while len(self._dicts) > self.cache_size:
+                self._dicts.popitem(last=False)
+        return dictionary
+    
+    def current_version(self, tenant_id: int) -> int:
+        """
+        Dictionary version new messages of a tenant are compressed with
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            Latest dictionary version, NO_DICTIONARY if the tenant has none
+        """
+        version = self._current.get(tenant_id)
+        if version is None:
+            with tenant_read_session(tenant_id) as db:
+                version = db.execute(
+                    select(func.max(CompressionDictionary.version))
+                    .where(CompressionDictionary.tenant_id == tenant_id)
+                ).scalar() or NO_DICTIONARY
+            with self._lock:
+                version = self._current.setdefault(tenant_id, version)
+        return version
+    
+    def _codec(self, kind: str, tenant_id: int, version: int):
+        """Per-thread cached compressor ("c") or decompressor ("d")"""
+        cache = getattr(self._local, "codecs", None)
+        if cache is None:
+            cache = self._local.codecs = OrderedDict()
+        key = (kind, tenant_id, version)
+        codec = cache.get(key)
+        if codec is not None:
+            cache.move_to_end(key)
+            return codec
+        dictionary = self._dictionary(tenant_id, version)
+        if kind == "c":
+            codec = zstd.ZstdCompressor(level=self.level, dict_data=dictionary, write_dict_id=False)
+        else:
+            codec = zstd.ZstdDecompressor(dict_data=dictionary)
+        cache[key] = codec
+        while len(cache) > self.codec_cache_size:
+            cache.popitem(last=False)
+        return codec
+    
+    def encode_event(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Storage row of a buffered chat event (messages replaced by compressed bodies)
+        
+        Args:
+            event: Chat event row as buffered by the conversation log
+        
+        Returns:
+            Row for chat_events
+        """
+        row = {key: value for key, value in event.items() if key not in ("user_message", "assistant_message")}
+        user_message = event["user_message"] or ""
+        assistant_message = event.get("assistant_message")
+        
+        if not self.enabled:
+            row["body_dict"] = None
+            row["user_body"] = user_message.encode("utf-8")
+            row["assistant_body"] = assistant_message.encode("utf-8") if assistant_message is not None else None
+            return row
+        
+        version = self.current_version(event["tenant_id"])
+        compressor = self._codec("c", event["tenant_id"], version)
+        row["body_dict"] = version
+        row["user_body"] = compressor.compress(user_message.encode("utf-8"))
+        row["assistant_body"] = (
+            compressor.compress(assistant_message.encode("utf-8")) if assistant_message is not None else None
+        )
+        return row
+    
+    def decode(self, tenant_id: int, version: Optional[int], body: Optional[bytes]) -> Optional[str]:
+        """
+        Text of a stored message body
+        
+        Args:
+            tenant_id: Tenant ID of the row
+            version: chat_events.body_dict of the row
+            body: Stored body
+        
+        Returns:
+            Message text (None if body is None)
+        """
+        if body is None:
+            return None
+        if version is None:
+            return body.decode("utf-8") if isinstance(body, bytes) else body
+        return self._codec("d", tenant_id, version).decompress(body).decode("utf-8")
+    
+    def note_written(self, tenant_id: int, count: int) -> None:
+        """
+        Count written messages and schedule a training when due
+        
+        Args:
+            tenant_id: Tenant ID
+            count: Number of events just written
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._written[tenant_id] += count
+            threshold = self.retrain_every if self._current.get(tenant_id) else self.min_samples
+            if self._written[tenant_id] < threshold or tenant_id in self._training:
+                return
+            self._written[tenant_id] = 0
+            self._training.add(tenant_id)
+        self._trainer.submit(self._train_in_background, tenant_id)
+    
+    def _train_in_background(self, tenant_id: int) -> None:
+        """Trainer thread job"""
+        try:
+            self.train(tenant_id)
+        except Exception as e:
+            logger.error(f"Compression dictionary training failed for tenant {tenant_id}: {e}")
+        finally:
+            with self._lock:
+                self._training.discard(tenant_id)
+    
+    def sample_messages(self, tenant_id: int) -> List[bytes]:
+        """
+        Recent messages of a tenant as training samples
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            UTF-8 encoded user and assistant messages
+        """
+        from app.models.chat_event import ChatEvent
+        
+        with tenant_read_session(tenant_id) as db:
+            events = db.execute(
+                select(ChatEvent)
+                .where(ChatEvent.tenant_id == tenant_id)
+                .order_by(ChatEvent.id.desc())
+                .limit(self.train_samples // 2)
+            ).scalars().all()
+        
+        samples = []
+        for event in events:
+            for text in (event.user_message, event.assistant_message):
+                if text:
+                    samples.append(text.encode("utf-8"))
+        return samples
+    
+    def train(self, tenant_id: int) -> Optional[int]:
+        """
+        Train and store a new dictionary version for a tenant
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            New dictionary version, None if the tenant has too few messages
+        """
+        samples = self.sample_messages(tenant_id)
+        if len(samples) < self.min_samples:
+            logger.info(f"Not enough messages to train a compression dictionary for tenant {tenant_id} ({len(samples)})")
+            return None
+        
+        # The dictionary cannot be larger than the samples it was trained on
+        dict_size = min(self.dict_size, sum(len(sample) for sample in samples) // 4)
+        dictionary = zstd.train_dictionary(dict_size, samples, level=self.level)
+        data = dictionary.as_bytes()
+        
+        def _store(session: Session) -> int:
+            version = (session.execute(
+                select(func.max(CompressionDictionary.version))
+                .where(CompressionDictionary.tenant_id == tenant_id)
+            ).scalar() or NO_DICTIONARY) + 1
+            session.add(CompressionDictionary(tenant_id=tenant_id, version=version, data=data, samples=len(samples)))
+            return version
+        
+        version = submit_tenant_write(tenant_id, _store).result()
+        self._remember((tenant_id, version), zstd.ZstdCompressionDict(data))
+        with self._lock:
+            self._current[tenant_id] = version
+        logger.info(
+            f"Trained compression dictionary {version} for tenant {tenant_id} "
+            f"({len(data)} bytes from {len(samples)} messages)"
+        )
+        return version
+
+
+# Global message codec instance
+message_codec = MessageCodec(
+    enabled=settings.MESSAGE_COMPRESSION,
+    level=settings.COMPRESSION_LEVEL,
+    dict_size=settings.COMPRESSION_DICT_SIZE,
+    train_samples=settings.COMPRESSION_TRAIN_SAMPLES,
+    min_samples=settings.COMPRESSION_MIN_SAMPLES,
+    retrain_every=settings.COMPRESSION_RETRAIN_EVERY,
+    cache_size=settings.COMPRESSION_CACHE_SIZE,
+    codec_cache_size=settings.COMPRESSION_CODEC_CACHE_SIZE
+)
@@ -15,12 +15,169 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///./randevu_asistani.db"
+    ASYNC_DATABASE_URL: Optional[str] = None  # Derived from DATABASE_URL if not provided
+    DATABASE_PROFILE: str = "performance"  # default, performance, durable (see app/core/db_profiles.py)
+    DATABASE_POOL_SIZE: Optional[int] = None  # Overrides the profile's pool size
+    SQLITE_BUSY_TIMEOUT_MS: Optional[int] = None  # Overrides the profile's PRAGMA busy_timeout
+    SQLITE_MMAP_SIZE_MB: Optional[int] = None  # Overrides the profile's PRAGMA mmap_size
+    SQLITE_CACHE_SIZE_MB: Optional[int] = None  # Overrides the profile's PRAGMA cache_size
+    
+    # Write queue (single writer thread per process)
+    WRITE_QUEUE_MAX_BATCH: int = 100  # Writes grouped into one transaction
+    WRITE_QUEUE_MAX_DELAY_MS: float = 2.0  # Time the writer waits to fill a batch
+    WRITE_QUEUE_MAX_PENDING: int = 10000  # Queued writes before new ones are rejected
+    WRITE_QUEUE_RETRY_AFTER_SECONDS: int = 1  # Retry-After of the 503 answering a rejected write
+    
+    # Tenant sharding (one SQLite file per tenant for conversation and usage data)
+    TENANT_SHARDING: bool = False
+    SHARD_ROOTS: str = "s0=./shards/s0"  # Comma separated name=directory entries
+    SHARD_CACHE_SIZE: int = 256  # Open tenant databases kept in the LRU cache
+    SHARD_ROUTE_TTL_SECONDS: float = 30.0  # How long a tenant -> shard lookup is cached
+    
+    # Chat event log (buffered in memory, flushed in batches)
+    CHAT_LOG_FLUSH_MS: float = 500.0  # Maximum time an event waits before being written
+    CHAT_LOG_BATCH_ROWS: int = 200  # Buffered events that trigger an immediate flush
+    CHAT_LOG_MAX_PENDING: int = 50000  # Buffered events before the oldest are dropped
+    CHAT_LOG_REDACT_PII: bool = True  # Stored turns get placeholders for PII_REDACTION_KINDS values
+    ANALYTICS_TIMEZONE: str = "Europe/Istanbul"  # Local time of the hourly/daily rollups
+    
+    # Compression of stored chat messages (zstd with per-tenant trained dictionaries)
+    MESSAGE_COMPRESSION: bool = True  # Compress new messages (stored ones stay readable either way)
+    COMPRESSION_LEVEL: int = 3  # zstd level
+    COMPRESSION_DICT_SIZE: int = 16384  # Maximum dictionary size in bytes
+    COMPRESSION_TRAIN_SAMPLES: int = 4000  # Most recent messages used for training
+    COMPRESSION_MIN_SAMPLES: int = 200  # Messages needed before a tenant's first dictionary
+    COMPRESSION_RETRAIN_EVERY: int = 20000  # New messages between retrainings
+    COMPRESSION_CACHE_SIZE: int = 1024  # Dictionaries kept in memory
+    COMPRESSION_CODEC_CACHE_SIZE: int = 64  # Compressors and decompressors kept per thread
+    
+    # Retention and archival of chat events
+    RETENTION_ENABLED: bool = False  # Run the retention engine in the background
+    CHAT_RETENTION_DAYS: int = 180  # Default age at which events move to the archive
+    ARCHIVE_ROOT: str = "./archive"  # Segments: <root>/tenant_<id>/<YYYY-MM>/seg-NNNNNN.ndjson.gz
+    ARCHIVE_SEGMENT_MAX_EVENTS: int = 5000  # Events per archive segment
+    ARCHIVE_EXPIRY_DAYS: Optional[int] = None  # Archived months older than this are deleted (None = keep)
+    RETENTION_DELETE_CHUNK: int = 500  # Events deleted per transaction
+    RETENTION_CHUNK_PAUSE_MS: float = 50.0  # Pause between delete transactions
+    RETENTION_INTERVAL_SECONDS: float = 3600.0  # Time between background runs
+    RETENTION_LEASE_SECONDS: float = 900.0  # Per-tenant run lease, so one worker archives a tenant at a time
+    
+    # Tenant knowledge base (BM25 retrieval of the passages added to each prompt)
+    KNOWLEDGE_TOP_K: int = 3  # Passages added to a prompt
+    KNOWLEDGE_PASSAGE_CHARS: int = 600  # Maximum passage length
+    KNOWLEDGE_MAX_CONTEXT_CHARS: int = 2000  # Maximum knowledge characters per prompt
+    KNOWLEDGE_CACHE_SIZE: int = 256  # Tenant indexes kept in memory
+    KNOWLEDGE_CACHE_TTL_SECONDS: float = 30.0  # Indexes are rebuilt after this (picks up other workers' edits)
+    KNOWLEDGE_RETRIEVAL: str = "hybrid"  # bm25, semantic or hybrid (both, fused by rank)
+    KNOWLEDGE_REINDEX_RETRIES: int = 5  # Retries of a failed background indexing
+    KNOWLEDGE_REINDEX_BACKOFF_SECONDS: float = 2.0  # Delay before the first retry, doubled for each next one
+    
+    # Semantic retrieval (embedding vectors of the knowledge passages)
+    EMBEDDING_PROVIDER: str = "hashing"  # hashing (local, deterministic) or openai
+    EMBEDDING_MODEL: str = "text-embedding-3-small"  # Used by the openai provider
+    EMBEDDING_API_KEY: Optional[str] = None  # Platform key of the openai provider (None = OPENAI_API_KEY)
+    EMBEDDING_DIMENSIONS: int = 256  # Vector length
+    EMBEDDING_MIN_SCORE: float = 0.25  # Cosine similarity below which a passage is not relevant
+    VECTOR_INDEX_ROOT: str = "./vector_index"  # Indexes: <root>/tenant_<id>/v<NNNNNN>/*.npy
+    VECTOR_IVF_MIN_VECTORS: int = 20000  # Tenants with more passages get an IVF (partitioned) index
+    VECTOR_IVF_NPROBE: int = 8  # Partitions scanned per IVF query
+    
+    # Appointments (in-memory availability index: one slot bitset per staff member per day)
+    APPOINTMENT_TIMEZONE: str = "Europe/Istanbul"  # Clinic time of working hours and bookings
+    APPOINTMENT_SLOT_MINUTES: int = 15  # Slot length, must divide a day (5, 10, 15, 30...)
+    APPOINTMENT_HORIZON_DAYS: int = 90  # Days ahead that can be booked
+    AVAILABILITY_CACHE_SIZE: int = 1000  # Tenant indexes kept in memory
+    AVAILABILITY_CACHE_TTL_SECONDS: float = 30.0  # Indexes are reloaded after this (picks up other workers' bookings)
+    
+    # Moderation pre-filter (per-tenant Aho-Corasick blocklist/allowlist, see app/core/moderation.py)
+    MODERATION_ENABLED: bool = True  # Check messages before any model call
+    MODERATION_CACHE_SIZE: int = 1024  # Tenant automatons kept in memory
+    MODERATION_REFRESH_SECONDS: float = 30.0  # Rule changes of other workers apply within this
+    MODERATION_MAX_RULES: int = 5000  # Rules per tenant
+    MODERATION_BLOCK_REPLY: str = "Bu mesaja yanıt veremiyoruz. Randevu ve bilgi talepleriniz için size yardımcı olmaktan memnuniyet duyarız."
+    
+    # Messaging channels (WhatsApp, SMS, Instagram webhooks, see app/core/channels.py)
+    CHANNELS_ENABLED: bool = False  # Accept webhooks and run the outbound queue
+    CHANNEL_MODEL: str = "auto"  # Model answering channel messages (auto = model router)
+    CHANNEL_HISTORY_TURNS: int = 6  # Earlier turns sent with each channel message
+    CHANNEL_WORKERS: int = 8  # Threads answering inbound messages
+    CHANNEL_VERIFY_TOKEN: str = ""  # Meta webhook subscription token
+    CHANNEL_APP_SECRET: str = ""  # Meta app secret for webhook signatures (required unless OUTBOUND_PROVIDER=stub)
+    WHATSAPP_PHONE_NUMBER_ID: str = ""
+    WHATSAPP_ACCESS_TOKEN: str = ""
+    INSTAGRAM_ACCESS_TOKEN: str = ""
+    TWILIO_ACCOUNT_SID: str = ""
+    TWILIO_AUTH_TOKEN: str = ""  # Also checks SMS webhook signatures (required unless OUTBOUND_PROVIDER=stub)
+    TWILIO_FROM_NUMBER: str = ""
+    
+    # Outbound message queue
+    OUTBOUND_PROVIDER: str = "stub"  # stub = local, live = provider APIs
+    OUTBOUND_RATE_LIMITS: str = "whatsapp:80,sms:10,instagram:20"  # Messages per second by channel
+    OUTBOUND_BATCH_SIZE: int = 50  # Messages claimed per channel and batch
+    OUTBOUND_POLL_SECONDS: float = 1.0  # Time between retry checks when idle
+    OUTBOUND_MAX_ATTEMPTS: int = 6  # Delivery attempts before a message is marked failed
+    OUTBOUND_RETRY_SECONDS: float = 5.0  # First retry delay, doubled per attempt
+    OUTBOUND_LEASE_SECONDS: float = 120.0  # Unfinished sends are claimed again after this
+    
+    # Appointment reminders (hierarchical timing wheel, see app/core/reminders.py)
+    REMINDERS_ENABLED: bool = False  # Run the reminder scheduler in the background
+    REMINDER_OFFSETS_MINUTES: str = "1440,60"  # Comma separated minutes before the appointment
+    REMINDER_CHANNEL: str = "log"  # Delivery channel: log (local stub), whatsapp or sms (outbound queue)
+    REMINDER_TICK_SECONDS: float = 1.0  # Wheel resolution
+    REMINDER_WINDOW_MINUTES: int = 120  # Reminders due within this are held in memory
+    REMINDER_LOAD_INTERVAL_SECONDS: float = 60.0  # Time between window loads
+    REMINDER_MAX_ATTEMPTS: int = 5  # Delivery attempts before a reminder is marked failed
+    REMINDER_RETRY_SECONDS: float = 60.0  # First retry delay, doubled per attempt
+    REMINDER_LEASE_SECONDS: float = 300.0  # A reminder left in "sending" this long is claimed again
+    
+    # Assistant tools (OpenAI tool calls to the appointment book)
+    AI_TOOLS_ENABLED: bool = True  # Offer tools to tenants with bookable services
+    AI_TOOL_MAX_ITERATIONS: int = 4  # Model calls per message; the last one must answer in text
+    AI_TOOL_WORKERS: int = 8  # Threads running parallel tool calls
+    
+    # Intent fast path (frequent structured questions answered without the model)
+    INTENT_FAST_PATH_ENABLED: bool = True
+    INTENT_MIN_CONFIDENCE: float = 0.6  # Classifier probability needed to answer locally
+    INTENT_MAX_MESSAGE_CHARS: int = 120  # Longer messages always go to the model
+    INTENT_MAX_PRICE_LINES: int = 10  # Services listed in a price answer
+    
+    # Model routing (requests with model "auto")
+    MODEL_ROUTING_ENABLED: bool = True  # False = "auto" always uses MODEL_ROUTING_STRONG_MODEL
+    MODEL_ROUTING_FAST_MODEL: str = "gpt-4o-mini"  # Trivial turns
+    MODEL_ROUTING_STRONG_MODEL: str = "gpt-4o"  # Complex turns and the default
+    MODEL_ROUTING_SHORT_CHARS: int = 60  # Messages up to this length count as trivial
+    MODEL_ROUTING_LONG_CHARS: int = 400  # Messages from this length go to the strong model
+    MODEL_ROUTING_DEEP_TURNS: int = 6  # Earlier user turns from which the strong model is used
+    MODEL_ROUTING_LATENCY_SLO_MS: int = 5000  # Per-call latency target of tenants without their own
+    MODEL_ROUTING_LATENCY_ALPHA: float = 0.2  # Weight of the newest call in the latency average
+    MODEL_ROUTING_MIN_SAMPLES: int = 5  # Calls observed before a model's latency is used
+    MODEL_ROUTING_PROBE_SECONDS: float = 30.0  # A swapped-out model still gets one request per interval
+    MODEL_ROUTING_FAILURE_MS: int = 30000  # Latency a failed or timed-out call counts as (at least)
+    
+    # PII redaction (personal data replaced with placeholders before model calls)
+    PII_REDACTION_ENABLED: bool = True
+    PII_REDACTION_KINDS: str = "tckn,iban,phone,email"  # Comma separated: tckn, iban, phone, email
+    
+    # Token usage metering and quotas (per tenant, None = unlimited)
+    USAGE_FLUSH_SECONDS: float = 5.0  # Interval between usage rollup writes
+    DEFAULT_DAILY_TOKEN_QUOTA: Optional[int] = None  # Used when the tenant has no own quota
+    DEFAULT_MONTHLY_TOKEN_QUOTA: Optional[int] = None
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
-    ENCRYPTION_KEY: Optional[str] = None  # Will be generated if not provided
+    ENCRYPTION_KEY: Optional[str] = None  # Fernet key of stored API keys (None = random per process, development only)
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    PASSWORD_POOL_WORKERS: int = 2  # Processes used for bcrypt hashing/verification
+    PASSWORD_POOL_MAX_PENDING: int = 64  # Queued password operations before answering 503
+    
+    # Bulk tenant import
+    BULK_IMPORT_BATCH_SIZE: int = 200  # Rows inserted per transaction
+    BULK_IMPORT_WORKERS: Optional[int] = None  # Hashing processes shared by all imports (default: CPU count)
+    
+    # Session identity cache
+    IDENTITY_CACHE_SIZE: int = 1024  # Tenant snapshots kept per process
+    IDENTITY_REVALIDATE_SECONDS: float = 60.0  # Snapshot age before its version is re-checked
     
     class Config:
         env_file = ".env"
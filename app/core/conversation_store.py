@@ -0,0 +1,272 @@
+"""
+Conversation store
+Chat turns are buffered in memory and flushed by a background thread in batched multi-row inserts
+"""
+from collections import defaultdict, deque
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import atexit
+import logging
+import threading
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.analytics import apply_rollups
+from app.core.compression import message_codec
+from app.core.config import settings
+from app.core.redaction import PiiRedactor, Redaction, pii_redactor
+from app.core.search import index_events
+from app.core.sharding import submit_tenant_write
+from app.models.chat_event import ChatEvent
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class ConversationLog:
+    """
+    Asynchronous, batched writer for chat events
+    
+    record() only appends to an in-memory buffer, so logging adds no database work to
+    the chat response. A background thread flushes the buffer every flush_interval_ms,
+    or as soon as batch_rows events are waiting, grouping rows per tenant into one
+    multi-row INSERT submitted through submit_tenant_write (write queue or shard writer).
+    The hourly/daily analytics rollups and the search index are updated in the same transaction,
+    message bodies are compressed before they reach the writer (app/core/compression.py).
+    With a redactor, personal data is replaced with placeholders when the turn is
+    recorded, so events, the search index and archive segments never hold it.
+    stop() flushes whatever is left and waits for the writes, so a graceful shutdown
+    loses nothing. If more than max_pending events pile up (database unavailable),
+    the oldest are dropped and counted instead of blocking chat requests.
+    """
+    
+    def __init__(
+        self,
+        flush_interval_ms: float = 500.0,
+        batch_rows: int = 200,
+        max_pending: int = 50000,
+        redactor: Optional[PiiRedactor] = None
+    ):
+        """
+        Initialize conversation log
+        
+        Args:
+            flush_interval_ms: Maximum time an event waits in memory
+            batch_rows: Buffered events that trigger an immediate flush
+            max_pending: Maximum buffered events before the oldest are dropped
+            redactor: Redacts messages before they are buffered (None = stored as given)
+        """
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_rows = batch_rows
+        self.max_pending = max_pending
+        self.redactor = redactor
+        self.dropped = 0
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._inflight: Dict[int, Dict[str, Any]] = {}  # Taken by a flush, not committed yet
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+    
+    def start(self) -> None:
+        """Start the flusher thread (idempotent)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="chat-log-flusher", daemon=True)
+            self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        """
+        Flush all buffered events and stop the flusher thread
+        
+        Args:
+            timeout: Seconds to wait for the final flush
+        """
+        with self._lock:
+            thread = self._thread
+            self._stopping = True
+        if thread and thread.is_alive():
+            self._wakeup.set()
+            thread.join(timeout)
+        else:
+            self.flush()
+        logger.info("Conversation log stopped")
+    
+    def record(
+        self,
+        tenant_id: int,
+        user_message: str,
+        assistant_message: Optional[str] = None,
+        model: Optional[str] = None,
+        latency_ms: Optional[int] = None,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        conversation_id: Optional[str] = None,
+        channel: str = "api",
+        error: Optional[str] = None
+    ) -> None:
+        """
+        Buffer a chat turn (never blocks on the database)
+        
+        Args:
+            tenant_id: Tenant ID
+            user_message: Message sent by the user
+            assistant_message: Assistant reply (None if the call failed)
+            model: Model used
+            latency_ms: Time spent producing the reply
+            prompt_tokens: Prompt tokens reported by the provider
+            completion_tokens: Completion tokens reported by the provider
+            conversation_id: Client supplied conversation identifier
+            channel: Source of the message (api, panel, ...)
+            error: Error message if the call failed
+        """
+        if self.redactor is not None:
+            # One set of placeholders per turn: a value echoed in the reply gets the same one.
+            # Text already redacted for the model keeps its placeholders.
+            redaction = Redaction()
+            user_message = self.redactor.redact(user_message, redaction)
+            if assistant_message:
+                assistant_message = self.redactor.redact(assistant_message, redaction)
+        
+        event = {
+            "tenant_id": tenant_id,
+            "conversation_id": conversation_id,
+            "channel": channel,
+            "user_message": user_message,
+            "assistant_message": assistant_message,
+            "model": model,
+            "status": "error" if error else "ok",
+            "error": error,
+            "latency_ms": latency_ms,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "created_at": datetime.now(timezone.utc),
+        }
+        
+        with self._lock:
+            self._buffer.append(event)
+            if len(self._buffer) > self.max_pending:
+                self._buffer.popleft()
+                self.dropped += 1
+                if self.dropped % 1000 == 1:
+                    logger.warning(f"Conversation log buffer full, {self.dropped} events dropped so far")
+            size = len(self._buffer)
+            running = self._thread is not None and self._thread.is_alive()
+        
+        if not running and not self._stopping:
+            self.start()
+        if size >= self.batch_rows:
+            self._wakeup.set()
+    
+    def pending(self) -> int:
+        """Number of buffered events"""
+        return len(self._buffer)
+    
+    def unwritten(self, tenant_id: int, conversation_id: str) -> List[Dict[str, Any]]:
+        """
+        Events of a conversation that may not be readable from the database yet
+        
+        Args:
+            tenant_id: Tenant ID
+            conversation_id: Conversation ID
+        
+        Returns:
+            Buffered events and events of a running flush, oldest first
+        """
+        with self._lock:
+            events = [
+                event for event in (*self._inflight.values(), *self._buffer)
+                if event["conversation_id"] == conversation_id and event["tenant_id"] == tenant_id
+            ]
+        return sorted(events, key=lambda event: event["created_at"])
+    
+    def flush(self) -> int:
+        """
+        Write all buffered events and wait until they are committed
+        
+        Returns:
+            Number of events written
+        """
+        with self._lock:
+            events = list(self._buffer)
+            self._buffer.clear()
+            for event in events:
+                self._inflight[id(event)] = event
+        if not events:
+            return 0
+        
+        by_tenant: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        for event in events:
+            by_tenant[event["tenant_id"]].append(event)
+        
+        writes: List[Tuple[List[Dict[str, Any]], Future]] = []
+        for tenant_id, rows in by_tenant.items():
+            writes.append((rows, submit_tenant_write(tenant_id, _insert_events(rows))))
+        
+        written = 0
+        failed: List[Dict[str, Any]] = []
+        for rows, future in writes:
+            try:
+                future.result()
+                written += len(rows)
+                message_codec.note_written(rows[0]["tenant_id"], len(rows))
+            except Exception as e:
+                logger.error(f"Failed to write {len(rows)} chat events for tenant {rows[0]['tenant_id']}: {e}")
+                failed.extend(rows)
+        
+        with self._lock:
+            if failed and not self._stopping:
+                # Keep the events for the next flush, ahead of newer ones
+                self._buffer.extendleft(reversed(failed))
+            for event in events:
+                self._inflight.pop(id(event), None)
+        return written
+    
+    def _run(self) -> None:
+        """Flusher thread main loop"""
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            stopping = self._stopping
+            started = time.monotonic()
+            try:
+                written = self.flush()
+            except Exception as e:
+                logger.error(f"Conversation log flush failed: {e}")
+            else:
+                if written:
+                    logger.debug(f"Flushed {written} chat events in {(time.monotonic() - started) * 1000:.1f} ms")
+            if stopping:
+                return
+
+
+def _insert_events(rows: List[Dict[str, Any]]):
+    """Build the write job inserting a batch of chat events, their rollups and search index entries"""
+    # Compressed here, in the calling thread, not in the writer
+    stored = [message_codec.encode_event(row) for row in rows]
+    
+    def _insert(session: Session) -> None:
+        event_ids = session.execute(
+            insert(ChatEvent).returning(ChatEvent.id, sort_by_parameter_order=True), stored
+        ).scalars().all()
+        apply_rollups(session, rows)
+        index_events(session, event_ids, rows)
+    return _insert
+
+
+# Global conversation log instance
+conversation_log = ConversationLog(
+    flush_interval_ms=settings.CHAT_LOG_FLUSH_MS,
+    batch_rows=settings.CHAT_LOG_BATCH_ROWS,
+    max_pending=settings.CHAT_LOG_MAX_PENDING,
+    redactor=pii_redactor if settings.CHAT_LOG_REDACT_PII else None
+)
+
+# Flush buffered events on interpreter shutdown (runs before the write queue is drained)
+atexit.register(conversation_log.stop)
@@ -1,23 +1,72 @@
 """
 Database configuration and session management
 """
-from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 from app.core.config import settings
+from app.core.db_profiles import create_profiled_async_engine, create_profiled_engine, get_engine_profile
 
 
-# Create database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Needed for SQLite
-)
+# Async drivers used when ASYNC_DATABASE_URL is not set explicitly
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
+
+
+def get_async_database_url(database_url: str) -> str:
+    """
+    Derive an async driver URL from a sync database URL
+    
+    Args:
+        database_url: Sync SQLAlchemy URL (e.g. sqlite:///./app.db)
+    
+    Returns:
+        URL using the matching async driver (e.g. sqlite+aiosqlite:///./app.db)
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if url.get_driver_name() == ASYNC_DRIVERS.get(backend):
+        return database_url
+    
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(
+            f"No async driver known for '{backend}', set ASYNC_DATABASE_URL explicitly"
+        )
+    
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(
+        hide_password=False
+    )
+
+
+# Connection setup (PRAGMAs, pool) selected per deployment via DATABASE_PROFILE
+engine_profile = get_engine_profile()
+
+# Create database engine (sync, used by scripts and background jobs)
+engine = create_profiled_engine(settings.DATABASE_URL, engine_profile)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Create async database engine (used by request handlers)
+async_engine = create_profiled_async_engine(
+    settings.ASYNC_DATABASE_URL or get_async_database_url(settings.DATABASE_URL),
+    engine_profile
+)
+
+# Create async session factory
+# expire_on_commit=False keeps attributes loaded after commit, lazy loads are not possible in async
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Base class for models
 Base = declarative_base()
 
@@ -36,11 +85,39 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency to get an async database session for request handlers
+    
+    Yields:
+        Async database session
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db() -> None:
     """
     Initialize database, create all tables
     """
     from app.models.tenant import Tenant  # Import models
+    from app.models.chat_event import ChatEvent
+    from app.models.chat_rollup import ChatRollup
+    from app.models.archived_conversation import ArchivedConversation
+    from app.models.usage import UsageDaily
+    from app.models.compression_dict import CompressionDictionary
+    from app.models.knowledge import KnowledgeDocument, KnowledgePassage
+    from app.models.appointment import Booking, Service, Staff, StaffService, WorkingHours
+    from app.models.reminder import Reminder
+    from app.models.outbound_message import OutboundMessage
+    from app.models.moderation import ModerationRule
+    from app.models.lease import JobLease
+    from app.core.migrations import migrate_schema
+    from app.core.sharding import main_tables
+    
+    # With tenant sharding enabled, per-tenant tables are created in the shard files instead
+    Base.metadata.create_all(bind=engine, tables=main_tables())
     
-    Base.metadata.create_all(bind=engine)
+    # Columns added to tables that existed before
+    migrate_schema(engine, main_tables())
     print("✅ Database initialized successfully")
@@ -0,0 +1,247 @@
+"""
+Database engine profiles
+Connection setup (PRAGMAs and pool tuning) applied to every new database connection
+"""
+from typing import Any, Dict, Optional
+import logging
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+
+from app.core.config import settings
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class EngineProfile:
+    """
+    Named engine configuration
+    
+    PRAGMAs are only applied to SQLite connections, pool settings apply to every backend.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        pragmas: Optional[Dict[str, Any]] = None,
+        pool_size: Optional[int] = None,
+        max_overflow: int = 10,
+        pool_timeout: float = 30.0
+    ):
+        """
+        Initialize engine profile
+        
+        Args:
+            name: Profile name used in DATABASE_PROFILE
+            pragmas: SQLite PRAGMAs executed on every new connection (in order)
+            pool_size: Persistent connections kept in the pool (None keeps SQLAlchemy's default pool)
+            max_overflow: Extra connections allowed above pool_size under load
+            pool_timeout: Seconds to wait for a free pooled connection
+        """
+        self.name = name
+        self.pragmas = dict(pragmas or {})
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+    
+    def with_overrides(
+        self,
+        pool_size: Optional[int] = None,
+        busy_timeout_ms: Optional[int] = None,
+        mmap_size_mb: Optional[int] = None,
+        cache_size_mb: Optional[int] = None
+    ) -> "EngineProfile":
+        """
+        Return a copy of this profile with deployment specific overrides
+        
+        Args:
+            pool_size: Pool size override
+            busy_timeout_ms: PRAGMA busy_timeout override (milliseconds)
+            mmap_size_mb: PRAGMA mmap_size override (megabytes)
+            cache_size_mb: PRAGMA cache_size override (megabytes)
+        
+        Returns:
+            New EngineProfile
+        """
+        pragmas = dict(self.pragmas)
+        if busy_timeout_ms is not None:
+            pragmas["busy_timeout"] = busy_timeout_ms
+        if mmap_size_mb is not None:
+            pragmas["mmap_size"] = mmap_size_mb * 1024 * 1024
+        if cache_size_mb is not None:
+            # Negative cache_size is interpreted by SQLite as KiB instead of pages
+            pragmas["cache_size"] = -cache_size_mb * 1024
+        
+        return EngineProfile(
+            name=self.name,
+            pragmas=pragmas,
+            pool_size=pool_size if pool_size is not None else self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=self.pool_timeout
+        )
+    
+    def __repr__(self):
+        return f"<EngineProfile(name='{self.name}', pragmas={self.pragmas}, pool_size={self.pool_size})>"
+
+
+ENGINE_PROFILES: Dict[str, EngineProfile] = {
+    # SQLite defaults: rollback journal, synchronous=FULL, SQLAlchemy default pool
+    "default": EngineProfile("default"),
+    
+    # WAL lets readers run next to the single writer, NORMAL sync is durable across app crashes
+    "performance": EngineProfile(
+        "performance",
+        pragmas={
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,
+            "cache_size": -64 * 1024,             # 64 MB page cache per connection
+            "mmap_size": 256 * 1024 * 1024,       # 256 MB memory-mapped reads
+            "temp_store": "MEMORY",
+        },
+        pool_size=10,
+        max_overflow=20
+    ),
+    
+    # WAL concurrency but fsync on every commit (survives power loss)
+    "durable": EngineProfile(
+        "durable",
+        pragmas={
+            "journal_mode": "WAL",
+            "synchronous": "FULL",
+            "busy_timeout": 10000,
+            "cache_size": -16 * 1024,
+        },
+        pool_size=5,
+        max_overflow=10
+    ),
+}
+
+
+def get_engine_profile(name: Optional[str] = None) -> EngineProfile:
+    """
+    Get an engine profile with settings overrides applied
+    
+    Args:
+        name: Profile name (defaults to settings.DATABASE_PROFILE)
+    
+    Returns:
+        EngineProfile
+    
+    Raises:
+        ValueError: If the profile name is unknown
+    """
+    name = name or settings.DATABASE_PROFILE
+    if name not in ENGINE_PROFILES:
+        raise ValueError(
+            f"Unknown database profile '{name}', choose one of: {', '.join(ENGINE_PROFILES)}"
+        )
+    
+    return ENGINE_PROFILES[name].with_overrides(
+        pool_size=settings.DATABASE_POOL_SIZE,
+        busy_timeout_ms=settings.SQLITE_BUSY_TIMEOUT_MS,
+        mmap_size_mb=settings.SQLITE_MMAP_SIZE_MB,
+        cache_size_mb=settings.SQLITE_CACHE_SIZE_MB
+    )
+
+
+def _is_sqlite(database_url: str) -> bool:
+    return make_url(database_url).get_backend_name() == "sqlite"
+
+
+def _is_sqlite_memory(database_url: str) -> bool:
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(database_url: str, profile: EngineProfile, is_async: bool = False) -> Dict[str, Any]:
+    """
+    Build create_engine() keyword arguments for a profile
+    
+    Args:
+        database_url: Database URL the engine is created for
+        profile: Engine profile
+        is_async: Whether the options are for an async engine
+    
+    Returns:
+        Keyword arguments for create_engine / create_async_engine
+    """
+    options: Dict[str, Any] = {}
+    
+    if _is_sqlite(database_url):
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}  # Needed for SQLite
+        
+        if _is_sqlite_memory(database_url):
+            # Every new connection to :memory: is a new empty database, keep exactly one
+            options["poolclass"] = StaticPool
+            return options
+    
+    if profile.pool_size is not None:
+        options["poolclass"] = AsyncAdaptedQueuePool if is_async else QueuePool
+        options["pool_size"] = profile.pool_size
+        options["max_overflow"] = profile.max_overflow
+        options["pool_timeout"] = profile.pool_timeout
+    
+    return options
+
+
+def apply_engine_profile(engine: Engine, profile: EngineProfile) -> None:
+    """
+    Register a connect hook that applies the profile's PRAGMAs to every new connection
+    
+    Args:
+        engine: Sync engine (use AsyncEngine.sync_engine for async engines)
+        profile: Engine profile
+    """
+    if engine.dialect.name != "sqlite" or not profile.pragmas:
+        return
+    
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma, value in profile.pragmas.items():
+                cursor.execute(f"PRAGMA {pragma}={value}")
+        finally:
+            cursor.close()
+    
+    logger.info(f"Database profile '{profile.name}' applied to {engine.url}")
+
+
+def create_profiled_engine(database_url: str, profile: Optional[EngineProfile] = None) -> Engine:
+    """
+    Create a sync engine configured with an engine profile
+    
+    Args:
+        database_url: Database URL
+        profile: Engine profile (defaults to the configured profile)
+    
+    Returns:
+        SQLAlchemy Engine
+    """
+    profile = profile or get_engine_profile()
+    engine = create_engine(database_url, **engine_options(database_url, profile))
+    apply_engine_profile(engine, profile)
+    return engine
+
+
+def create_profiled_async_engine(database_url: str, profile: Optional[EngineProfile] = None) -> AsyncEngine:
+    """
+    Create an async engine configured with an engine profile
+    
+    Args:
+        database_url: Async database URL
+        profile: Engine profile (defaults to the configured profile)
+    
+    Returns:
+        SQLAlchemy AsyncEngine
+    """
+    profile = profile or get_engine_profile()
+    engine = create_async_engine(database_url, **engine_options(database_url, profile, is_async=True))
+    apply_engine_profile(engine.sync_engine, profile)
+    return engine
@@ -0,0 +1,194 @@
+"""
+Embedding providers
+Turn passages and queries into L2-normalized float32 vectors for semantic retrieval
+"""
+from typing import List, Optional, Sequence
+import logging
+import math
+import zlib
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.text import analyze, word_tokens
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingError(Exception):
+    """Custom exception for embedding provider errors"""
+    pass
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scale every row to unit length (cosine similarity becomes a dot product)
+    
+    Args:
+        vectors: Matrix of shape (n, dimensions)
+    
+    Returns:
+        float32 matrix, all-zero rows stay zero
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class EmbeddingProvider:
+    """
+    Interface of embedding providers
+    
+    Subclasses set name and dimensions and implement embed(). The identity string
+    is stored with every vector index; an index built by another provider, model
+    or dimension is not used for queries.
+    """
+    
+    name = "base"
+    
+    def __init__(self, dimensions: int):
+        """
+        Initialize provider
+        
+        Args:
+            dimensions: Vector length
+        """
+        self.dimensions = dimensions
+    
+    @property
+    def identity(self) -> str:
+        """Provider, model and dimensions of the produced vectors"""
+        return f"{self.name}:{self.dimensions}"
+    
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed texts
+        
+        Args:
+            texts: Passages or queries
+        
+        Returns:
+            float32 matrix of shape (len(texts), dimensions) with unit-length rows
+        
+        Raises:
+            EmbeddingError: If the provider fails
+        """
+        raise NotImplementedError
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Local, deterministic stand-in for a real embedding model (no network, no model files)
+    
+    Stemmed terms and character trigrams of the folded words are hashed into a
+    fixed number of signed buckets with sublinear weights (feature hashing). Similar
+    wording gives similar vectors, synonyms do not; that is enough to exercise
+    the vector index and to run tests without an API key.
+    """
+    
+    name = "hashing"
+    TRIGRAM_WEIGHT = 0.5
+    
+    def _features(self, text: str) -> List[tuple]:
+        """(feature, weight) pairs of a text"""
+        counts = {}
+        for term in analyze(text):
+            counts[f"w:{term}"] = counts.get(f"w:{term}", 0) + 1
+        for word in word_tokens(text):
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                key = f"g:{padded[i:i + 3]}"
+                counts[key] = counts.get(key, 0) + 1
+        return [
+            (feature, (1 + math.log(count)) * (self.TRIGRAM_WEIGHT if feature[0] == "g" else 1.0))
+            for feature, count in counts.items()
+        ]
+    
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                # crc32 is stable across processes, unlike hash()
+                hashed = zlib.crc32(feature.encode("utf-8"))
+                vectors[row, hashed % self.dimensions] += weight if hashed & 0x80000000 else -weight
+        return normalize_rows(vectors)
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """
+    OpenAI embeddings API (platform key, not the tenants' keys)
+    """
+    
+    name = "openai"
+    
+    def __init__(self, dimensions: int, model: str = "text-embedding-3-small", api_key: Optional[str] = None,
+                 batch_size: int = 256):
+        """
+        Initialize provider
+        
+        Args:
+            dimensions: Vector length (text-embedding-3 models can shorten their vectors)
+            model: Embedding model
+            api_key: API key (None = OPENAI_API_KEY environment variable)
+            batch_size: Texts per API request
+        """
+        super().__init__(dimensions)
+        from openai import OpenAI
+        
+        self.model = model
+        self.batch_size = batch_size
+        self.client = OpenAI(api_key=api_key)
+    
+    @property
+    def identity(self) -> str:
+        return f"{self.name}:{self.model}:{self.dimensions}"
+    
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        from openai import OpenAIError
+        
+        rows: List[List[float]] = []
+        try:
+            for start in range(0, len(texts), self.batch_size):
+                response = self.client.embeddings.create(
+                    model=self.model,
+                    input=list(texts[start:start + self.batch_size]),
+                    dimensions=self.dimensions
+                )
+                rows.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        except OpenAIError as e:
+            raise EmbeddingError(f"OpenAI embedding error: {e}")
+        return normalize_rows(np.array(rows, dtype=np.float32).reshape(len(texts), self.dimensions))
+
+
+EMBEDDING_PROVIDERS = {
+    HashingEmbeddingProvider.name: HashingEmbeddingProvider,
+    OpenAIEmbeddingProvider.name: OpenAIEmbeddingProvider,
+}
+
+
+def create_embedding_provider(name: str, dimensions: int) -> EmbeddingProvider:
+    """
+    Create the configured embedding provider
+    
+    Args:
+        name: Provider name (see EMBEDDING_PROVIDERS)
+        dimensions: Vector length
+    
+    Returns:
+        Provider instance
+    
+    Raises:
+        ValueError: If the provider is unknown
+    """
+    if name not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Unknown embedding provider '{name}', choose one of: {', '.join(EMBEDDING_PROVIDERS)}")
+    if name == OpenAIEmbeddingProvider.name:
+        return OpenAIEmbeddingProvider(dimensions, model=settings.EMBEDDING_MODEL, api_key=settings.EMBEDDING_API_KEY)
+    return EMBEDDING_PROVIDERS[name](dimensions)
+
+
+# Global embedding provider instance
+embedding_provider = create_embedding_provider(settings.EMBEDDING_PROVIDER, settings.EMBEDDING_DIMENSIONS)
@@ -0,0 +1,166 @@
+"""
+Tenant identity snapshots
+The signed session carries a small tenant snapshot, an in-process cache holds the decrypted details
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import threading
+import time
+
+from app.core.config import settings
+from app.models.tenant import Tenant
+
+
+class TenantSnapshot:
+    """
+    Read-only copy of the tenant fields needed to render authenticated pages
+    
+    Built once per config version so the API key is decrypted once, not on every render.
+    """
+    
+    __slots__ = ("id", "username", "business_name", "system_prompt", "api_key", "version")
+    
+    def __init__(
+        self,
+        id: int,
+        username: str,
+        business_name: str,
+        system_prompt: str,
+        api_key: Optional[str],
+        version: int
+    ):
+        self.id = id
+        self.username = username
+        self.business_name = business_name
+        self.system_prompt = system_prompt
+        self.api_key = api_key
+        self.version = version
+    
+    @classmethod
+    def from_tenant(cls, tenant: Tenant) -> "TenantSnapshot":
+        """
+        Create a snapshot from a tenant (decrypts the API key)
+        
+        Args:
+            tenant: Loaded tenant
+        
+        Returns:
+            TenantSnapshot
+        """
+        return cls(
+            id=tenant.id,
+            username=tenant.username,
+            business_name=tenant.business_name,
+            system_prompt=tenant.system_prompt,
+            api_key=tenant.get_openai_api_key() if tenant.openai_api_key else None,
+            version=tenant.config_version
+        )
+    
+    def session_data(self) -> Dict[str, Any]:
+        """
+        Identity stored in the signed session cookie (no secrets)
+        
+        Returns:
+            Dictionary with id, username, business_name and version
+        """
+        return {
+            "id": self.id,
+            "username": self.username,
+            "business_name": self.business_name,
+            "version": self.version,
+        }
+    
+    def __repr__(self):
+        return f"<TenantSnapshot(id={self.id}, username='{self.username}', version={self.version})>"
+
+
+class IdentityCache:
+    """
+    Bounded in-process LRU cache of tenant snapshots
+    
+    An entry is served without touching the database while its version matches the
+    version in the caller's session and it was validated within revalidate_seconds.
+    Otherwise the caller re-checks the version (a single indexed column read) and
+    reloads the tenant only if the version actually changed.
+    """
+    
+    def __init__(self, max_entries: int = 1024, revalidate_seconds: float = 60.0):
+        """
+        Initialize identity cache
+        
+        Args:
+            max_entries: Maximum number of cached tenants
+            revalidate_seconds: How long an entry is trusted without checking the database
+        """
+        self.max_entries = max_entries
+        self.revalidate_seconds = revalidate_seconds
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, tenant_id: int) -> Optional[TenantSnapshot]:
+        """
+        Get a cached snapshot regardless of freshness
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            TenantSnapshot or None
+        """
+        with self._lock:
+            entry = self._entries.get(tenant_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(tenant_id)
+            return entry[0]
+    
+    def get_fresh(self, tenant_id: int, version: int) -> Optional[TenantSnapshot]:
+        """
+        Get a snapshot that can be used without a database round trip
+        
+        Args:
+            tenant_id: Tenant ID
+            version: Config version from the caller's session
+        
+        Returns:
+            TenantSnapshot, or None if missing, of another version or due for revalidation
+        """
+        with self._lock:
+            entry = self._entries.get(tenant_id)
+            if entry is None:
+                return None
+            snapshot, validated_at = entry
+            if snapshot.version != version or time.monotonic() - validated_at > self.revalidate_seconds:
+                return None
+            self._entries.move_to_end(tenant_id)
+            return snapshot
+    
+    def put(self, snapshot: TenantSnapshot) -> None:
+        """
+        Store or refresh a snapshot (marks it validated now)
+        
+        Args:
+            snapshot: Tenant snapshot
+        """
+        with self._lock:
+            self._entries[snapshot.id] = (snapshot, time.monotonic())
+            self._entries.move_to_end(snapshot.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, tenant_id: int) -> None:
+        """
+        Drop a tenant's snapshot (after updates made in this process)
+        
+        Args:
+            tenant_id: Tenant ID
+        """
+        with self._lock:
+            self._entries.pop(tenant_id, None)
+
+
+# Global identity cache instance
+identity_cache = IdentityCache(
+    max_entries=settings.IDENTITY_CACHE_SIZE,
+    revalidate_seconds=settings.IDENTITY_REVALIDATE_SECONDS
+)
@@ -0,0 +1,375 @@
+"""
+Intent fast path
+Answers frequent structured questions (opening hours, address, phone, prices) from the
+tenant's own data without calling the model. Keyword rules propose an intent, a small
+linear model over character n-grams confirms it; anything uncertain goes to the LLM.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+import re
+
+import numpy as np
+
+from app.core.appointments import TURKISH_WEEKDAYS, appointment_book, format_clock
+from app.core.config import settings
+from app.core.text import fold_text
+from app.models.tenant import Tenant
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Model name recorded for fast path answers ("fast-path:<intent>"), counted by the analytics rollups
+FAST_PATH_MODEL = "fast-path"
+
+OTHER = "other"
+
+# Rule-level intent of messages containing a FALL_THROUGH word (see IntentRouter.detect)
+BOOKING = "booking"
+
+# Keyword rules over folded text (see text.fold_text: lowercase, no diacritics, ı -> i)
+INTENT_RULES = {
+    "hours": re.compile(
+        r"\b(saat\s*kac\w*|kacta|kaca\s*kadar|acik\s*mi\w*|acilis\w*|kapanis\w*|kapali\s*mi\w*|"
+        r"calisma\s*saat\w*|mesai\w*|ne\s*zaman\s*(acik|acil|kapan)\w*|kacta\s*kapan\w*)"
+    ),
+    "address": re.compile(
+        r"\b(adres\w*|nerede\w*|neresi\w*|konum\w*|lokasyon\w*|yol\s*tarif\w*|nasil\s*gel\w*|hangi\s*semt\w*|harita\w*)"
+    ),
+    "phone": re.compile(
+        r"\b(telefon\w*|tel\s*no\w*|numara\w*|iletisim\w*|nasil\s*ulas\w*|arayabilece\w*)"
+    ),
+    "prices": re.compile(
+        r"\b(fiyat\w*|ucret\w*|ne\s*kadar\b(?!\s*sur)|kac\s*(tl|lira|para)\w*|tarife\w*)"
+    ),
+}
+
+# Words of a price question that names no service ("fiyat listeniz nedir", "ücretleriniz ne kadar");
+# the whole price list is only sent when every word of the message is one of these
+GENERIC_PRICE_WORDS = re.compile(
+    r"(fiyat|ucret|tarife|liste|bilgi|hizmet)\w*|ne|neler\w*|nedir|kadar|kac|tl|lira|para|genel|tum|butun|hepsi\w*|"
+    r"sizin|acaba|lutfen|merhaba|selam\w*|(alabilir|ogrenebilir|verebilir|verir|atar|atabilir|gonderir|paylasir)\w*|"
+    r"mi|mu|miyim|misiniz|musunuz|midir"
+)
+
+# Messages about bookings, symptoms or durations need the assistant even if a rule matches
+FALL_THROUGH = re.compile(
+    r"\b(randevu\w*|iptal\w*|ertele\w*|agri\w*|sizla\w*|sisl\w*|kanam\w*|acil\b|sur(er|uyor|e)\b|musait\w*|"
+    r"yarin|bugun|rezervasyon\w*)"
+)
+
+# Labelled examples the n-gram model is trained on (the "other" class keeps it conservative)
+TRAINING_EXAMPLES: Dict[str, Sequence[str]] = {
+    "hours": (
+        "saat kaçta açıksınız", "kaçta açılıyorsunuz", "kaça kadar açıksınız", "çalışma saatleriniz nedir",
+        "mesai saatleri", "cumartesi açık mısınız", "pazar günü açık mı", "hafta sonu çalışıyor musunuz",
+        "kaçta kapanıyorsunuz", "akşam kaça kadar açıksınız", "açılış saati", "hangi saatlerde açıksınız",
+        "öğlen arası kapalı mısınız", "saat kaça kadar hizmet veriyorsunuz", "bugün saat kaça kadar açık",
+        "mesainiz kaçta bitiyor", "sabah kaçta açılıyor", "çalışma saatleri nelerdir", "açık mısınız şu an",
+        "kaçta kapanış",
+    ),
+    "address": (
+        "adresiniz nerede", "adresiniz nedir", "neredesiniz", "klinik nerede", "konumunuzu atar mısınız",
+        "yol tarifi alabilir miyim", "size nasıl gelirim", "hangi semtte", "muayenehane nerede",
+        "adres bilgisi", "lokasyon nedir", "haritada neresi", "açık adresiniz", "metroya yakın mı nerede",
+        "neresi burası", "adres atar mısınız", "şubeniz nerede", "hangi caddede", "konum",
+        "nasıl gelebilirim",
+    ),
+    "phone": (
+        "telefon numaranız", "telefon numarası nedir", "sizi nasıl arayabilirim", "iletişim bilgileri",
+        "numaranızı verir misiniz", "tel no", "telefonla ulaşabilir miyim", "arayabileceğim bir numara",
+        "iletişim numarası", "telefonunuz var mı", "size nasıl ulaşırım", "santral numarası",
+        "whatsapp numaranız", "irtibat telefonu", "numara alabilir miyim",
+    ),
+    "prices": (
+        "fiyat ne kadar", "fiyatlarınız nedir", "dolgu ne kadar", "diş beyazlatma fiyatı", "muayene ücreti",
+        "ücret ne kadar", "kaç tl", "kaç lira", "implant fiyatları", "kanal tedavisi ücreti", "fiyat listesi",
+        "temizlik kaç para", "ücretler nedir", "diş taşı temizliği ne kadar", "fiyat bilgisi alabilir miyim",
+        "kontrol ücreti ne kadar", "tarifeniz nedir", "ortalama fiyat", "ücretli mi", "fiyat alabilir miyim",
+    ),
+    OTHER: (
+        "merhaba", "selam", "teşekkürler", "iyi günler", "randevu almak istiyorum", "yarın randevu var mı",
+        "dişim çok ağrıyor", "dolgu ne kadar sürer", "tedavi ne kadar sürüyor", "randevumu iptal etmek istiyorum",
+        "randevumu erteleyebilir miyim", "diş etim kanıyor", "çocuğum için doktor var mı", "kanal tedavisi acıtır mı",
+        "implant nedir", "sigorta geçiyor mu", "kredi kartı geçerli mi", "taksit yapıyor musunuz",
+        "saat kaçta randevu alabilirim", "yarın saat kaçta müsaitsiniz", "hangi doktor bakıyor",
+        "beyazlatma zararlı mı", "diş teli takıyor musunuz", "acil durum", "ne zaman gelebilirim",
+        "doktor bey orada mı", "sonuçlarım çıktı mı", "park yeri var mı", "ödeme nasıl yapılıyor",
+        "kaç seans sürer", "ağız kokusu için ne yapmalıyım", "yüzüm şişti", "bir sorum var",
+        "bilgi almak istiyorum", "tamam", "evet", "hayır", "perşembe günü uygun musunuz",
+        "fiyatlarınız çok pahalı", "ücret iadesi alabilir miyim", "numaramı kaydeder misiniz",
+        "telefon numaramı değiştirmek istiyorum", "adresimi güncellemek istiyorum", "hangi doktor nerede",
+    ),
+}
+
+
+def _normalize(text: str) -> str:
+    """Folded text with single spaces between words"""
+    return " ".join(re.findall(r"\w+", fold_text(text)))
+
+
+def char_ngrams(text: str, sizes: Tuple[int, ...] = (2, 3, 4)) -> List[str]:
+    """
+    Character n-grams of normalized text, padded so word starts and ends are features
+    
+    Args:
+        text: Message text
+        sizes: N-gram lengths
+    
+    Returns:
+        N-grams (with repetitions)
+    """
+    padded = f" {_normalize(text)} "
+    return [padded[i:i + n] for n in sizes for i in range(len(padded) - n + 1)]
+
+
+class IntentClassifier:
+    """
+    Multinomial logistic regression over character n-grams
+    
+    The vocabulary is the n-grams of the training examples (n-grams never seen in
+    training would get zero weight anyway). Training takes a few milliseconds at
+    startup; scoring a message sums the weight rows of its known n-grams, a few
+    tens of microseconds for a typical question.
+    """
+    
+    def __init__(
+        self,
+        examples: Dict[str, Sequence[str]],
+        epochs: int = 200,
+        learning_rate: float = 5.0,
+        l2: float = 1e-4
+    ):
+        """
+        Train the model
+        
+        Args:
+            examples: Texts by label
+            epochs: Full-batch gradient steps
+            learning_rate: Step size
+            l2: Weight decay
+        """
+        self.labels = list(examples)
+        texts = [(label, char_ngrams(text)) for label in self.labels for text in examples[label]]
+        self.vocabulary: Dict[str, int] = {}
+        for _, grams in texts:
+            for gram in grams:
+                self.vocabulary.setdefault(gram, len(self.vocabulary))
+        
+        features = np.zeros((len(texts), len(self.vocabulary)), dtype=np.float32)
+        targets = np.zeros((len(texts), len(self.labels)), dtype=np.float32)
+        for row, (label, grams) in enumerate(texts):
+            features[row] = self._vector(grams)
+            targets[row, self.labels.index(label)] = 1.0
+        
+        # Gradient descent from zero keeps the weights in the span of the examples
+        # (weights = features.T @ dual), so it runs on the small example-by-example
+        # kernel matrix instead of the vocabulary-sized one
+        kernel = features @ features.T
+        dual = np.zeros((len(texts), len(self.labels)), dtype=np.float32)
+        self.bias = np.zeros(len(self.labels), dtype=np.float32)
+        for _ in range(epochs):
+            gradient = self._softmax(kernel @ dual + self.bias) - targets
+            dual -= learning_rate * (gradient / len(texts) + l2 * dual)
+            self.bias -= learning_rate * gradient.mean(axis=0)
+        self.weights = features.T @ dual
+    
+    def _vector(self, grams: List[str]) -> np.ndarray:
+        """L2-normalized n-gram count vector over the vocabulary"""
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for gram in grams:
+            column = self.vocabulary.get(gram)
+            if column is not None:
+                vector[column] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    @staticmethod
+    def _softmax(scores: np.ndarray) -> np.ndarray:
+        """Row-wise softmax"""
+        scores = scores - scores.max(axis=-1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=-1, keepdims=True)
+    
+    def predict(self, text: str) -> Dict[str, float]:
+        """
+        Label probabilities of a message
+        
+        Args:
+            text: Message text
+        
+        Returns:
+            Probability by label
+        """
+        counts: Dict[int, int] = {}
+        for gram in char_ngrams(text):
+            column = self.vocabulary.get(gram)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        if not counts:
+            return {label: float(label == OTHER) for label in self.labels}
+        columns = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        scores = values @ self.weights[columns] / np.sqrt(values @ values) + self.bias
+        return dict(zip(self.labels, self._softmax(scores).tolist()))
+
+
+class IntentRouter:
+    """
+    Decides whether a message is answered locally and builds the answer
+    
+    A message is answered only when exactly one keyword rule matches, no fall-through
+    word (booking, symptoms, durations...) appears, the classifier agrees with at least
+    min_confidence, and the tenant has the data for the answer. Everything else returns
+    None and goes to the model.
+    """
+    
+    def __init__(self, classifier: IntentClassifier, min_confidence: float, max_chars: int):
+        """
+        Args:
+            classifier: Trained n-gram classifier
+            min_confidence: Classifier probability needed for the rule's intent
+            max_chars: Longer messages always go to the model
+        """
+        self.classifier = classifier
+        self.min_confidence = min_confidence
+        self.max_chars = max_chars
+    
+    def detect(self, message: str) -> str:
+        """
+        Rule-level intent of a message (no classifier, no length limit)
+        
+        Args:
+            message: User message
+        
+        Returns:
+            "booking" if a fall-through word appears (bookings, symptoms, dates), else the
+            structured intent when exactly one keyword rule matches, else "other"
+        """
+        folded = _normalize(message)
+        if FALL_THROUGH.search(folded):
+            return BOOKING
+        matched = [intent for intent, rule in INTENT_RULES.items() if rule.search(folded)]
+        return matched[0] if len(matched) == 1 else OTHER
+    
+    def classify(self, message: str) -> Tuple[str, float]:
+        """
+        Intent of a message
+        
+        Args:
+            message: User message
+        
+        Returns:
+            (intent, confidence), intent is "other" when the message should go to the model
+        """
+        if len(message) > self.max_chars:
+            return OTHER, 0.0
+        folded = _normalize(message)
+        if FALL_THROUGH.search(folded):
+            return OTHER, 0.0
+        matched = [intent for intent, rule in INTENT_RULES.items() if rule.search(folded)]
+        if len(matched) != 1:
+            return OTHER, 0.0
+        confidence = self.classifier.predict(message)[matched[0]]
+        if confidence < self.min_confidence:
+            return OTHER, confidence
+        return matched[0], confidence
+    
+    def answer(self, tenant: Tenant, message: str) -> Optional[Tuple[str, str]]:
+        """
+        Local answer to a message, if it is a confident structured question the tenant has data for
+        
+        Args:
+            tenant: Tenant the message was sent to
+            message: User message
+        
+        Returns:
+            (intent, answer text) or None to use the model
+        """
+        intent, confidence = self.classify(message)
+        if intent == OTHER:
+            return None
+        try:
+            text = getattr(self, f"_answer_{intent}")(tenant, message)
+        except Exception as e:
+            # The model can still answer
+            logger.error(f"Fast path answer {intent} failed for tenant {tenant.id}: {e}")
+            return None
+        if text is None:
+            return None
+        logger.info(f"Fast path answer for tenant {tenant.id}: {intent} ({confidence:.2f})")
+        return intent, text
+    
+    @staticmethod
+    def _answer_hours(tenant: Tenant, message: str) -> Optional[str]:
+        """Opening hours from the staff working hours, consecutive days with equal hours grouped"""
+        opening = appointment_book.availability(tenant.id).opening_hours()
+        if not opening:
+            return None
+        groups: List[List[Any]] = []  # [first weekday, last weekday, hours]
+        for weekday in range(7):
+            hours = opening.get(weekday)
+            if groups and groups[-1][2] == hours and groups[-1][1] == weekday - 1:
+                groups[-1][1] = weekday
+            else:
+                groups.append([weekday, weekday, hours])
+        open_parts, closed_days = [], []
+        for first, last, hours in groups:
+            days = TURKISH_WEEKDAYS[first] if first == last else f"{TURKISH_WEEKDAYS[first]}-{TURKISH_WEEKDAYS[last]}"
+            if hours is None:
+                closed_days.append(days)
+            else:
+                open_parts.append(f"{days} {format_clock(hours[0])}-{format_clock(hours[1])}")
+        text = f"Çalışma saatlerimiz: {', '.join(open_parts)}."
+        if closed_days:
+            text += f" {', '.join(closed_days)} kapalıyız."
+        return text
+    
+    @staticmethod
+    def _answer_address(tenant: Tenant, message: str) -> Optional[str]:
+        """Configured address"""
+        if not tenant.address:
+            return None
+        return f"Adresimiz: {tenant.address}"
+    
+    @staticmethod
+    def _answer_phone(tenant: Tenant, message: str) -> Optional[str]:
+        """Configured phone number"""
+        if not tenant.phone:
+            return None
+        return f"Bize {tenant.phone} numarasından ulaşabilirsiniz."
+    
+    @staticmethod
+    def _answer_prices(tenant: Tenant, message: str) -> Optional[str]:
+        """
+        Published prices of the services named in the message, or the price list for a
+        generic price question; None for anything else (e.g. a service the tenant does not list)
+        """
+        services = appointment_book.availability(tenant.id).services.values()
+        normalized = _normalize(message)
+        folded = f" {normalized} "
+        named = [service for service in services if f" {_normalize(service['name'])} " in folded]
+        if named and any(service.get("price") is None for service in named):
+            # Asked for a service without a published price
+            return None
+        if not named and not all(GENERIC_PRICE_WORDS.fullmatch(word) for word in normalized.split()):
+            # Asked about something that is not a listed service
+            return None
+        priced = [service for service in (named or services) if service.get("price") is not None]
+        if not priced:
+            return None
+        lines = [f"{service['name']}: {service['price']} TL" for service in priced[:settings.INTENT_MAX_PRICE_LINES]]
+        return "Fiyatlarımız:\n" + "\n".join(lines)
+
+
+def fast_path_model(intent: str) -> str:
+    """Model name recorded for a fast path answer"""
+    return f"{FAST_PATH_MODEL}:{intent}"
+
+
+# Global intent router instance
+intent_router = IntentRouter(
+    classifier=IntentClassifier(TRAINING_EXAMPLES),
+    min_confidence=settings.INTENT_MIN_CONFIDENCE,
+    max_chars=settings.INTENT_MAX_MESSAGE_CHARS
+)
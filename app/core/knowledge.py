@@ -0,0 +1,769 @@
+"""
+Tenant knowledge base
+Documents are split into passages and ranked with BM25 over a local in-memory inverted index
+and by embedding similarity, so only the passages relevant to a message are added to the prompt
+"""
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.embeddings import EmbeddingError, EmbeddingProvider, embedding_provider
+from app.core.sharding import submit_tenant_write, tenant_read_session
+from app.core.text import analyze
+from app.core.vector_index import VectorIndex, VectorStore, vector_store
+from app.models.knowledge import KnowledgeDocument, KnowledgePassage
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Title of the document edited in the panel
+PANEL_DOCUMENT_TITLE = "Panel"
+
+CONTEXT_HEADER = (
+    "Aşağıdaki bilgiler işletmenin bilgi bankasından alınmıştır. "
+    "Soruyla ilgiliyse bu bilgileri kullan, bilgi bankasında olmayan fiyat veya bilgi uydurma."
+)
+
+HEADING_CHARS = 80
+
+RETRIEVAL_MODES = ("bm25", "semantic", "hybrid")
+# Reciprocal rank fusion constant (scores 1 / (RRF_K + rank) from each ranking)
+RRF_K = 60
+# Candidates taken from each ranking per passage returned
+CANDIDATE_FACTOR = 2
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class KnowledgeBaseError(Exception):
+    """Custom exception for knowledge base errors"""
+    pass
+
+
+def _pieces(block: str, max_chars: int) -> List[str]:
+    """Lines of a paragraph, long lines split at sentence ends and then at spaces"""
+    pieces = []
+    for line in block.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        parts = [line] if len(line) <= max_chars else _SENTENCE_END.split(line)
+        for part in parts:
+            while len(part) > max_chars:
+                cut = part.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                pieces.append(part[:cut].strip())
+                part = part[cut:].strip()
+            if part:
+                pieces.append(part)
+    return pieces
+
+
+def split_passages(content: str, max_chars: int = 600) -> List[str]:
+    """
+    Split a document into passages of at most max_chars characters
+    
+    Paragraphs (separated by blank lines) become passages, a heading line stays
+    with the paragraph below it. Longer paragraphs, such as a price list with one
+    item per line, are cut at line ends into passages of up to max_chars.
+    
+    Args:
+        content: Document text
+        max_chars: Maximum passage length
+    
+    Returns:
+        Passages in document order
+    """
+    passages: List[str] = []
+    current: List[str] = []
+    size = 0
+    
+    def _close() -> None:
+        nonlocal current, size
+        if current:
+            passages.append("\n".join(current))
+        current, size = [], 0
+    
+    for block in re.split(r"\n\s*\n", content):
+        for piece in _pieces(block, max_chars):
+            if current and size + len(piece) + 1 > max_chars:
+                _close()
+            current.append(piece)
+            size += len(piece) + 1
+        # A lone short line is a heading, it belongs to the next paragraph
+        if len(current) > 1 or size > HEADING_CHARS:
+            _close()
+    _close()
+    return passages
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 of a passage (hex)"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class BM25Index:
+    """
+    Inverted index over a tenant's passages with Okapi BM25 ranking
+    
+    Postings map each term to (passage index, term frequency) pairs, so a query
+    only touches the passages containing at least one of its terms.
+    """
+    
+    def __init__(self, passages: List[Dict[str, Any]], k1: float = 1.2, b: float = 0.75):
+        """
+        Build the index
+        
+        Args:
+            passages: Passages with "document" (title) and "content"
+            k1: Term frequency saturation
+            b: Length normalization
+        """
+        self.passages = passages
+        self.by_id = {passage["id"]: passage for passage in passages if "id" in passage}
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._lengths: List[int] = []
+        
+        for number, passage in enumerate(passages):
+            # The title counts as part of every passage ("Fiyat Listesi" -> fiyat)
+            terms = analyze(f"{passage['document']}\n{passage['content']}")
+            self._lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                self._postings.setdefault(term, []).append((number, frequency))
+        
+        count = len(passages)
+        self._average_length = sum(self._lengths) / count if count else 0.0
+        self._idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+    
+    def __len__(self) -> int:
+        return len(self.passages)
+    
+    def search(self, query: str, k: int = 3) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Best passages for a query
+        
+        Args:
+            query: Query text
+            k: Maximum number of passages
+        
+        Returns:
+            (score, passage) pairs, best first, only passages sharing a term with the query
+        """
+        scores: Dict[int, float] = {}
+        for term in set(analyze(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf[term]
+            for number, frequency in postings:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[number] / self._average_length)
+                scores[number] = scores.get(number, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(score, self.passages[number]) for number, score in best]
+
+
+class KnowledgeBase:
+    """
+    Per-tenant document store with BM25 and vector indexes
+    
+    Documents and their passages live next to the tenant's conversations (shard
+    file when TENANT_SHARDING is enabled). Saving a document diffs its passages
+    by content hash: unchanged passages keep their rows and IDs, only added and
+    removed ones are written.
+    
+    With semantic retrieval enabled, a background indexing thread turns the
+    stored passages into a new vector store version after every change. It
+    reuses the vectors of unchanged passages from the previous version and
+    embeds only the new ones. The version carries a snapshot of its passages,
+    and queries (BM25 and vectors alike) are served from the published version
+    until the next one replaces it, in every worker process. Failed indexing is
+    retried with exponential backoff; while the stored passages differ from the
+    published snapshot (checked every cache_ttl seconds), BM25 runs over the
+    database passages so new and edited documents are found. Hybrid retrieval
+    fuses the BM25 and the cosine rankings by reciprocal rank, so a passage found
+    by both comes first and either ranking alone can still contribute (exact
+    prices and names from BM25, paraphrases from the embeddings).
+    
+    Without semantic retrieval, or before a tenant's first version is published,
+    the BM25 index is built from the database and cached for cache_ttl seconds.
+    """
+    
+    def __init__(
+        self,
+        top_k: int = 3,
+        passage_chars: int = 600,
+        max_context_chars: int = 2000,
+        cache_size: int = 256,
+        cache_ttl: float = 30.0,
+        retrieval: str = "hybrid",
+        min_score: float = 0.25,
+        provider: Optional[EmbeddingProvider] = None,
+        vectors: Optional[VectorStore] = None,
+        reindex_retries: int = 5,
+        reindex_backoff: float = 2.0
+    ):
+        """
+        Initialize knowledge base
+        
+        Args:
+            top_k: Passages added to a prompt
+            passage_chars: Maximum passage length
+            max_context_chars: Maximum characters of knowledge added to a prompt
+            cache_size: Tenant indexes kept in memory
+            cache_ttl: Seconds before an index built from the database is rebuilt
+            retrieval: bm25, semantic or hybrid
+            min_score: Cosine similarity below which a passage is not relevant
+            provider: Embedding provider (None = BM25 only)
+            vectors: Vector store (None = BM25 only)
+            reindex_retries: Retries of a failed background indexing
+            reindex_backoff: Seconds before the first retry, doubled for each next one
+        
+        Raises:
+            ValueError: If the retrieval mode is unknown
+        """
+        if retrieval not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{retrieval}', choose one of: {', '.join(RETRIEVAL_MODES)}")
+        self.top_k = top_k
+        self.passage_chars = passage_chars
+        self.max_context_chars = max_context_chars
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.retrieval = retrieval if provider is not None and vectors is not None else "bm25"
+        self.min_score = min_score
+        self.provider = provider
+        self.vectors = vectors
+        self.reindex_retries = reindex_retries
+        self.reindex_backoff = reindex_backoff
+        # tenant_id -> (checked at, published version or None for the database, index)
+        self._indexes: "OrderedDict[int, Tuple[float, Optional[str], BM25Index]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._indexing: Set[int] = set()
+        self._reindex: Set[int] = set()
+        self._indexer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="knowledge-indexer")
+    
+    def _load_passages(self, tenant_id: int) -> List[Dict[str, Any]]:
+        """Stored passages of a tenant in document order"""
+        with tenant_read_session(tenant_id) as db:
+            rows = db.execute(
+                select(
+                    KnowledgePassage.id,
+                    KnowledgePassage.content,
+                    KnowledgePassage.content_hash,
+                    KnowledgeDocument.title
+                )
+                .join(KnowledgeDocument, KnowledgeDocument.id == KnowledgePassage.document_id)
+                .where(KnowledgePassage.tenant_id == tenant_id)
+                .order_by(KnowledgePassage.document_id, KnowledgePassage.position)
+            ).all()
+        return [
+            {"id": row.id, "document": row.title, "content": row.content, "hash": row.content_hash}
+            for row in rows
+        ]
+    
+    def _stored_signature(self, tenant_id: int) -> Set[Tuple[int, str]]:
+        """(ID, content hash) of a tenant's stored passages"""
+        with tenant_read_session(tenant_id) as db:
+            rows = db.execute(
+                select(KnowledgePassage.id, KnowledgePassage.content_hash)
+                .where(KnowledgePassage.tenant_id == tenant_id)
+            ).all()
+        return {(row.id, row.content_hash) for row in rows}
+    
+    def published(self, tenant_id: int) -> Optional[VectorIndex]:
+        """
+        Published vector index version of a tenant that queries are served from
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            Index, None if semantic retrieval is disabled or the tenant has no
+            usable version yet (none built, or built by another provider)
+        """
+        if self.retrieval == "bm25":
+            return None
+        index = self.vectors.current(tenant_id)
+        if index is None or index.identity != self.provider.identity or index.passages is None:
+            return None
+        return index
+    
+    def index_for(self, tenant_id: int, published: Optional[VectorIndex] = None) -> Tuple[Optional[str], BM25Index]:
+        """
+        Cached BM25 index of a tenant
+        
+        The published version's passage snapshot is indexed as long as it matches
+        the stored passages. When they differ (the next version is not built yet,
+        or its indexing failed) the index is built from the database and a
+        reindex is scheduled. Either choice is rechecked after cache_ttl seconds.
+        
+        Args:
+            tenant_id: Tenant ID
+            published: Published vector index version
+        
+        Returns:
+            Version the index was built from (None = database) and the index
+            (empty if the tenant has no documents)
+        """
+        version = published.version if published is not None else None
+        now = time.monotonic()
+        with self._lock:
+            cached = self._indexes.get(tenant_id)
+            if cached is not None and now - cached[0] < self.cache_ttl and cached[1] in (version, None):
+                self._indexes.move_to_end(tenant_id)
+                return cached[1], cached[2]
+        
+        current = published is not None and self._stored_signature(tenant_id) == {
+            (passage["id"], passage["hash"]) for passage in published.passages
+        }
+        if current:
+            index = cached[2] if cached is not None and cached[1] == version else BM25Index(published.passages)
+        else:
+            version = None
+            index = BM25Index(self._load_passages(tenant_id))
+        with self._lock:
+            self._indexes[tenant_id] = (now, version, index)
+            self._indexes.move_to_end(tenant_id)
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
+            # Passages changed since the published version, saved before semantic retrieval was
+            # enabled, or the provider changed (a running indexing already picks up every save)
+            stale = version is None and (len(index) or published is not None) and tenant_id not in self._indexing
+        if stale and self.retrieval != "bm25":
+            self.schedule_reindex(tenant_id)
+        return version, index
+    
+    def invalidate(self, tenant_id: int) -> None:
+        """Drop a tenant's cached index"""
+        with self._lock:
+            self._indexes.pop(tenant_id, None)
+    
+    def _semantic_search(self, published: Optional[VectorIndex], query: str, k: int) -> List[Tuple[float, int]]:
+        """Passage IDs of a version by embedding similarity (empty without a version or on provider errors)"""
+        if published is None:
+            return []
+        try:
+            query_vector = self.provider.embed([query])[0]
+        except EmbeddingError as e:
+            logger.error(f"Query embedding failed for vector index {published.path}: {e}")
+            return []
+        results = published.search(query_vector, k, self.vectors.nprobe)
+        return [(score, passage_id) for score, passage_id in results if score >= self.min_score]
+    
+    def retrieve(self, tenant_id: int, query: str, k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Passages of a tenant relevant to a query
+        
+        Args:
+            tenant_id: Tenant ID
+            query: Query text (usually the user's message)
+            k: Maximum number of passages (default: top_k)
+        
+        Returns:
+            Passages with document title, content and score, best first
+            (BM25 score, cosine similarity or fused rank score depending on the retrieval mode)
+        """
+        k = k or self.top_k
+        published = self.published(tenant_id)
+        source, index = self.index_for(tenant_id, published)
+        if len(index) == 0:
+            return []
+        if self.retrieval == "bm25" or (self.retrieval == "semantic" and source is None):
+            # Without a current version the stored passages are only searchable by keywords
+            return [{**passage, "score": round(score, 4)} for score, passage in index.search(query, k)]
+        
+        semantic = [
+            (score, index.by_id[passage_id])
+            for score, passage_id in self._semantic_search(published, query, k * CANDIDATE_FACTOR)
+            if passage_id in index.by_id
+        ]
+        if self.retrieval == "semantic":
+            return [{**passage, "score": round(score, 4)} for score, passage in semantic[:k]]
+        
+        fused: Dict[int, float] = {}
+        passages: Dict[int, Dict[str, Any]] = {}
+        for ranking in (index.search(query, k * CANDIDATE_FACTOR), semantic):
+            for rank, (_, passage) in enumerate(ranking, start=1):
+                fused[passage["id"]] = fused.get(passage["id"], 0.0) + 1.0 / (RRF_K + rank)
+                passages[passage["id"]] = passage
+        best = sorted(fused.items(), key=lambda item: -item[1])[:k]
+        return [{**passages[passage_id], "score": round(score, 4)} for passage_id, score in best]
+    
+    def build_context(self, tenant_id: int, query: str) -> Optional[str]:
+        """
+        Knowledge section of the system prompt for one message
+        
+        Args:
+            tenant_id: Tenant ID
+            query: Query text
+        
+        Returns:
+            Header and relevant passages within max_context_chars, None if nothing matches
+        """
+        sections = []
+        size = 0
+        for passage in self.retrieve(tenant_id, query):
+            section = f"[{passage['document']}]\n{passage['content']}"
+            if sections and size + len(section) > self.max_context_chars:
+                break
+            sections.append(section[:self.max_context_chars])
+            size += len(section)
+        if not sections:
+            return None
+        return CONTEXT_HEADER + "\n\n" + "\n\n".join(sections)
+    
+    def reindex(self, tenant_id: int, full: bool = False) -> Optional[str]:
+        """
+        Publish a new vector index version of a tenant from its stored passages
+        
+        Vectors of passages whose document title and content hash are unchanged
+        are copied from the published version; only the others are embedded.
+        Partition centroids are carried over as well.
+        
+        Args:
+            tenant_id: Tenant ID
+            full: Embed every passage again
+        
+        Returns:
+            Published version, None if semantic retrieval is disabled
+        
+        Raises:
+            EmbeddingError: If the provider fails
+        """
+        if self.retrieval == "bm25":
+            return None
+        started = time.perf_counter()
+        passages = self._load_passages(tenant_id)
+        previous = None if full else self.published(tenant_id)
+        
+        reusable: Dict[Tuple[str, str], np.ndarray] = {}
+        if previous is not None:
+            rows = {int(passage_id): row for row, passage_id in enumerate(previous.ids)}
+            for passage in previous.passages:
+                row = rows.get(passage["id"])
+                if row is not None:
+                    reusable[(passage["document"], passage["hash"])] = previous.vectors[row]
+        
+        vectors = np.empty((len(passages), self.provider.dimensions), dtype=np.float32)
+        changed = []
+        for row, passage in enumerate(passages):
+            vector = reusable.get((passage["document"], passage["hash"]))
+            if vector is None:
+                changed.append(row)
+            else:
+                vectors[row] = vector
+        if changed:
+            vectors[changed] = self.provider.embed([
+                f"{passages[row]['document']}\n{passages[row]['content']}" for row in changed
+            ])
+        
+        version = self.vectors.write(
+            tenant_id,
+            [passage["id"] for passage in passages],
+            vectors,
+            self.provider.identity,
+            passages=passages,
+            centroids=previous.centroids if previous is not None else None,
+            meta={"embedded": len(changed), "reused": len(passages) - len(changed)}
+        )
+        logger.info(
+            f"Knowledge index {version} of tenant {tenant_id}: {len(changed)} of {len(passages)} passages embedded "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+        return version
+    
+    def schedule_reindex(self, tenant_id: int) -> None:
+        """
+        Reindex a tenant in the background indexing thread
+        
+        A request arriving while the tenant's indexing runs is remembered and runs
+        once after it, so the last version always reflects the latest passages.
+        
+        Args:
+            tenant_id: Tenant ID
+        """
+        if self.retrieval == "bm25":
+            return
+        with self._lock:
+            if tenant_id in self._indexing:
+                self._reindex.add(tenant_id)
+                return
+            self._indexing.add(tenant_id)
+        self._indexer.submit(self._reindex_in_background, tenant_id)
+    
+    def _reindex_in_background(self, tenant_id: int, attempt: int = 0) -> None:
+        """
+        Indexing thread job
+        
+        A failed run is retried after reindex_backoff * 2^attempt seconds; the tenant
+        stays marked as indexing meanwhile, so the retry also covers requests
+        arriving before it.
+        
+        Args:
+            tenant_id: Tenant ID
+            attempt: Failed runs so far
+        """
+        try:
+            self.reindex(tenant_id)
+        except Exception:
+            logger.exception(f"Knowledge indexing failed for tenant {tenant_id} (attempt {attempt + 1})")
+            if attempt < self.reindex_retries:
+                with self._lock:
+                    self._reindex.discard(tenant_id)
+                retry = threading.Timer(
+                    self.reindex_backoff * 2 ** attempt,
+                    self._indexer.submit,
+                    args=(self._reindex_in_background, tenant_id, attempt + 1)
+                )
+                retry.daemon = True
+                retry.start()
+                return
+        
+        with self._lock:
+            again = tenant_id in self._reindex
+            self._reindex.discard(tenant_id)
+            if not again:
+                self._indexing.discard(tenant_id)
+        if again:
+            self._indexer.submit(self._reindex_in_background, tenant_id)
+    
+    def index_status(self, tenant_id: int) -> Dict[str, Any]:
+        """
+        Published index version of a tenant and whether a newer one is being built
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            Status dictionary
+        """
+        published = self.published(tenant_id)
+        with self._lock:
+            indexing = tenant_id in self._indexing
+        return {
+            "retrieval": self.retrieval,
+            "version": published.version if published is not None else None,
+            "passages": len(published) if published is not None else None,
+            "embedded": published.meta.get("embedded") if published is not None else None,
+            "indexing": indexing,
+        }
+    
+    def list_documents(self, tenant_id: int) -> List[Dict[str, Any]]:
+        """
+        Documents of a tenant (without content)
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            Document dictionaries ordered by title
+        """
+        with tenant_read_session(tenant_id) as db:
+            documents = db.execute(
+                select(KnowledgeDocument)
+                .where(KnowledgeDocument.tenant_id == tenant_id)
+                .order_by(KnowledgeDocument.title)
+            ).scalars().all()
+            return [document.to_dict(include_content=False) for document in documents]
+    
+    def get_document(
+        self,
+        tenant_id: int,
+        document_id: Optional[int] = None,
+        title: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        A document of a tenant by ID or title
+        
+        Args:
+            tenant_id: Tenant ID
+            document_id: Document ID
+            title: Document title (used when no ID is given)
+        
+        Returns:
+            Document dictionary with content, or None
+        """
+        query = select(KnowledgeDocument).where(KnowledgeDocument.tenant_id == tenant_id)
+        if document_id is not None:
+            query = query.where(KnowledgeDocument.id == document_id)
+        else:
+            query = query.where(KnowledgeDocument.title == title)
+        with tenant_read_session(tenant_id) as db:
+            document = db.execute(query).scalar_one_or_none()
+            return document.to_dict() if document else None
+    
+    def save_document(self, tenant_id: int, title: str, content: str) -> Dict[str, Any]:
+        """
+        Create or replace a document (by title) and its passages
+        
+        Passages are matched with the stored ones by content hash: unchanged
+        passages keep their rows (only their position is updated), removed ones
+        are deleted and new ones inserted. The tenant is then reindexed in the
+        background.
+        
+        Args:
+            tenant_id: Tenant ID
+            title: Document title
+            content: Document text
+        
+        Returns:
+            Saved document dictionary with the number of passages and how many
+            were added, removed and kept
+        
+        Raises:
+            KnowledgeBaseError: If the document is empty
+        """
+        title = title.strip()
+        passages = split_passages(content, self.passage_chars)
+        if not title or not passages:
+            raise KnowledgeBaseError("Doküman başlığı ve içeriği boş olamaz")
+        
+        def _save(session: Session) -> Dict[str, Any]:
+            document = session.execute(
+                select(KnowledgeDocument)
+                .where(KnowledgeDocument.tenant_id == tenant_id, KnowledgeDocument.title == title)
+            ).scalar_one_or_none()
+            if document is None:
+                document = KnowledgeDocument(tenant_id=tenant_id, title=title, content=content)
+                session.add(document)
+            else:
+                document.content = content
+            session.flush()
+            
+            stored: Dict[str, List[KnowledgePassage]] = {}
+            for row in session.execute(
+                select(KnowledgePassage).where(KnowledgePassage.document_id == document.id)
+            ).scalars():
+                stored.setdefault(row.content_hash, []).append(row)
+            
+            added = []
+            kept = 0
+            for position, passage in enumerate(passages):
+                digest = content_hash(passage)
+                if stored.get(digest):
+                    row = stored[digest].pop(0)
+                    row.position = position
+                    kept += 1
+                else:
+                    added.append({
+                        "tenant_id": tenant_id,
+                        "document_id": document.id,
+                        "position": position,
+                        "content": passage,
+                        "content_hash": digest,
+                    })
+            removed = [row.id for rows in stored.values() for row in rows]
+            if removed:
+                session.execute(delete(KnowledgePassage).where(KnowledgePassage.id.in_(removed)))
+            if added:
+                session.execute(insert(KnowledgePassage), added)
+            session.flush()
+            session.refresh(document)
+            return {
+                **document.to_dict(),
+                "passages": len(passages),
+                "added": len(added),
+                "removed": len(removed),
+                "unchanged": kept,
+            }
+        
+        saved = submit_tenant_write(tenant_id, _save).result()
+        self.invalidate(tenant_id)
+        if saved["added"] or saved["removed"]:
+            self.schedule_reindex(tenant_id)
+        logger.info(
+            f"Knowledge document '{title}' of tenant {tenant_id} saved ({len(passages)} passages, "
+            f"{saved['added']} added, {saved['removed']} removed)"
+        )
+        return saved
+    
+    def delete_document(self, tenant_id: int, document_id: int) -> bool:
+        """
+        Delete a document and its passages
+        
+        Args:
+            tenant_id: Tenant ID
+            document_id: Document ID
+        
+        Returns:
+            True if the document existed
+        """
+        def _delete(session: Session) -> bool:
+            deleted = session.execute(
+                delete(KnowledgeDocument)
+                .where(KnowledgeDocument.tenant_id == tenant_id, KnowledgeDocument.id == document_id)
+            ).rowcount
+            if deleted:
+                session.execute(delete(KnowledgePassage).where(KnowledgePassage.document_id == document_id))
+            return bool(deleted)
+        
+        deleted = submit_tenant_write(tenant_id, _delete).result()
+        self.invalidate(tenant_id)
+        if deleted:
+            self.schedule_reindex(tenant_id)
+        return deleted
+    
+    def panel_content(self, tenant_id: int) -> str:
+        """
+        Text of the tenant's panel document
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            Document content, empty string if there is none
+        """
+        document = self.get_document(tenant_id, title=PANEL_DOCUMENT_TITLE)
+        return document["content"] if document else ""
+    
+    def save_panel_content(self, tenant_id: int, content: str) -> None:
+        """
+        Store the knowledge text entered in the panel (empty text deletes the document)
+        
+        Only the passages that changed are written and reindexed; submitting the
+        form without touching the text writes nothing.
+        
+        Args:
+            tenant_id: Tenant ID
+            content: Text from the panel form
+        """
+        document = self.get_document(tenant_id, title=PANEL_DOCUMENT_TITLE)
+        if content.strip():
+            if document is None or document["content"] != content:
+                self.save_document(tenant_id, PANEL_DOCUMENT_TITLE, content)
+            return
+        if document:
+            self.delete_document(tenant_id, document["id"])
+
+
+# Global knowledge base instance
+knowledge_base = KnowledgeBase(
+    top_k=settings.KNOWLEDGE_TOP_K,
+    passage_chars=settings.KNOWLEDGE_PASSAGE_CHARS,
+    max_context_chars=settings.KNOWLEDGE_MAX_CONTEXT_CHARS,
+    cache_size=settings.KNOWLEDGE_CACHE_SIZE,
+    cache_ttl=settings.KNOWLEDGE_CACHE_TTL_SECONDS,
+    retrieval=settings.KNOWLEDGE_RETRIEVAL,
+    min_score=settings.EMBEDDING_MIN_SCORE,
+    provider=embedding_provider,
+    vectors=vector_store,
+    reindex_retries=settings.KNOWLEDGE_REINDEX_RETRIES,
+    reindex_backoff=settings.KNOWLEDGE_REINDEX_BACKOFF_SECONDS
+)
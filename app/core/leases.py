@@ -0,0 +1,87 @@
+"""
+Job leases
+Makes a background job exclusive per tenant across worker processes: a lease row is claimed
+through the write queue and expires on its own if the holder dies
+"""
+from datetime import datetime, timedelta, timezone
+import logging
+import os
+import socket
+import uuid
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.write_queue import write_queue
+from app.models.lease import JobLease
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def lease_holder() -> str:
+    """Holder name of a new job instance: host, process and a random part"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def claim_lease(job: str, tenant_id: int, holder: str, seconds: float) -> bool:
+    """
+    Claim or extend a lease
+
+    Args:
+        job: Job name
+        tenant_id: Tenant ID
+        holder: Claiming job instance (lease_holder())
+        seconds: Lease duration from now
+
+    Returns:
+        True if holder has the lease until now + seconds, False if another holder's lease is running
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    until = now + timedelta(seconds=seconds)
+
+    def _claim(session: Session) -> bool:
+        # Conditional update: of two processes taking over an expired lease only one matches
+        claimed = session.execute(
+            update(JobLease)
+            .where(
+                JobLease.job == job,
+                JobLease.tenant_id == tenant_id,
+                (JobLease.holder == holder) | (JobLease.expires_at <= now)
+            )
+            .values(holder=holder, expires_at=until)
+        ).rowcount
+        if claimed:
+            return True
+        exists = session.execute(
+            select(JobLease.id).where(JobLease.job == job, JobLease.tenant_id == tenant_id)
+        ).first()
+        if exists:
+            return False
+        # A concurrent first claim fails on the unique constraint
+        session.execute(insert(JobLease).values(job=job, tenant_id=tenant_id, holder=holder, expires_at=until))
+        return True
+
+    try:
+        return write_queue.submit(_claim).result()
+    except Exception as e:
+        logger.debug(f"Lease {job} of tenant {tenant_id} not claimed: {e}")
+        return False
+
+
+def release_lease(job: str, tenant_id: int, holder: str) -> None:
+    """
+    Give up a lease (nothing happens if holder does not have it)
+
+    Args:
+        job: Job name
+        tenant_id: Tenant ID
+        holder: Job instance that claimed it
+    """
+    def _release(session: Session) -> None:
+        session.execute(
+            delete(JobLease).where(JobLease.job == job, JobLease.tenant_id == tenant_id, JobLease.holder == holder)
+        )
+
+    write_queue.submit(_release).result()
@@ -0,0 +1,217 @@
+"""
+Schema migrations
+create_all() only creates missing tables. Columns added to existing tables after their
+first release are listed here and added with ALTER TABLE ... ADD COLUMN when the table
+lacks them (checked through the inspector, PRAGMA table_info on SQLite), so the step is
+idempotent and runs on every startup against the main database and each shard file.
+"""
+from typing import Iterable, List, Tuple
+import logging
+
+from sqlalchemy import inspect, literal, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import Column, Table
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Columns added to existing tables, in release order: (table, column)
+ADDED_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("tenants", "shard"),  # Database-per-tenant sharding
+    ("tenants", "config_version"),  # Session snapshot revalidation
+    ("tenants", "daily_token_quota"),  # Token quotas
+    ("tenants", "monthly_token_quota"),
+    ("tenants", "retention_days"),  # Chat archiving
+    ("chat_rollups", "fast_path"),  # Intent fast path
+    ("tenants", "address"),
+    ("tenants", "phone"),
+    ("tenants", "latency_slo_ms"),  # Model router
+    ("chat_events", "user_body"),  # Compressed messages (filled by move_chat_bodies())
+    ("chat_events", "assistant_body"),
+    ("chat_events", "body_dict"),
+    ("moderation_rules", "revision"),  # Moderation cache signature
+    ("archived_conversations", "member_offset"),  # Per-conversation archive reads
+    ("archived_conversations", "member_length"),
+    ("reminders", "claimed_until"),  # Reminder delivery lease
+    ("tenants", "whatsapp_phone_number_id"),  # Channel webhook tenant check
+    ("tenants", "sms_number"),
+    ("tenants", "instagram_account_id"),
+)
+
+
+class MigrationError(Exception):
+    """Custom exception for schema migration errors"""
+    pass
+
+
+def column_ddl(column: Column, conn: Connection) -> str:
+    """
+    Column definition of an ADD COLUMN statement
+    
+    SQLite only accepts NOT NULL on an added column together with a constant default;
+    NOT NULL columns without one are added nullable and filled by their migration.
+    
+    Args:
+        column: Model column
+        conn: Connection (dialect used to render type and default)
+    
+    Returns:
+        Definition such as "fast_path INTEGER DEFAULT 0 NOT NULL"
+    """
+    dialect = conn.dialect
+    ddl = f"{dialect.identifier_preparer.quote(column.name)} {column.type.compile(dialect=dialect)}"
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        rendered = literal(default, column.type).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        ddl += f" DEFAULT {rendered}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    return ddl
+
+
+def add_missing_columns(conn: Connection, tables: Iterable[Table]) -> List[str]:
+    """
+    Add the ADDED_COLUMNS of the given tables that the database does not have yet
+    
+    Args:
+        conn: Connection inside a transaction
+        tables: Tables of this database (tables not created yet are skipped)
+    
+    Returns:
+        "table.column" of every column added
+    """
+    tables = {table.name: table for table in tables}
+    inspector = inspect(conn)
+    existing = {}
+    added = []
+    
+    for table_name, column_name in ADDED_COLUMNS:
+        table = tables.get(table_name)
+        if table is None:
+            continue
+        if table_name not in existing:
+            existing[table_name] = (
+                {column["name"] for column in inspector.get_columns(table_name)}
+                if inspector.has_table(table_name) else None
+            )
+        columns = existing[table_name]
+        if columns is None or column_name in columns:
+            continue
+        
+        ddl = column_ddl(table.c[column_name], conn)
+        conn.execute(text(f"ALTER TABLE {conn.dialect.identifier_preparer.quote(table_name)} ADD COLUMN {ddl}"))
+        columns.add(column_name)
+        added.append(f"{table_name}.{column_name}")
+    
+    return added
+
+
+def move_chat_bodies(conn: Connection) -> int:
+    """
+    Move messages of the plain-text chat_events layout into the body columns
+    
+    Rows get the codec's uncompressed format (body_dict NULL = plain UTF-8, see
+    MessageCodec.decode()); the old user_message/assistant_message columns are dropped
+    afterwards, their NOT NULL constraint would reject every new row.
+    
+    Args:
+        conn: Connection inside a transaction, after add_missing_columns()
+    
+    Returns:
+        Number of rows moved
+    """
+    inspector = inspect(conn)
+    if not inspector.has_table("chat_events"):
+        return 0
+    columns = {column["name"] for column in inspector.get_columns("chat_events")}
+    if "user_message" not in columns:
+        return 0
+    
+    moved = conn.execute(text(
+        "UPDATE chat_events SET user_body = CAST(user_message AS BLOB), "
+        "assistant_body = CAST(assistant_message AS BLOB), body_dict = NULL "
+        "WHERE user_body IS NULL"
+    )).rowcount
+    conn.execute(text("ALTER TABLE chat_events DROP COLUMN user_message"))
+    if "assistant_message" in columns:
+        conn.execute(text("ALTER TABLE chat_events DROP COLUMN assistant_message"))
+    return moved
+
+
+def build_search_index(conn: Connection, batch_size: int = 1000) -> int:
+    """
+    Create the chat_search index of a chat_events table created before it existed
+    
+    Args:
+        conn: Connection inside a transaction, after move_chat_bodies()
+        batch_size: Events indexed per statement
+    
+    Returns:
+        Number of events indexed
+    """
+    from app.core.compression import message_codec
+    from app.core.search import SEARCH_TABLE, _INSERT_SQL, search_document
+    from app.models.chat_event import SEARCH_TABLE_DDL
+    
+    inspector = inspect(conn)
+    if not inspector.has_table("chat_events") or inspector.has_table(SEARCH_TABLE):
+        return 0
+    conn.execute(text(SEARCH_TABLE_DDL))
+    
+    indexed = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, tenant_id, body_dict, user_body, assistant_body FROM chat_events "
+                "WHERE id > :last_id ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": batch_size}
+        ).all()
+        if not rows:
+            return indexed
+        conn.execute(_INSERT_SQL, [
+            search_document(
+                row.id,
+                row.tenant_id,
+                message_codec.decode(row.tenant_id, row.body_dict, row.user_body),
+                message_codec.decode(row.tenant_id, row.body_dict, row.assistant_body)
+            )
+            for row in rows
+        ])
+        indexed += len(rows)
+        last_id = rows[-1].id
+
+
+def migrate_schema(bind: Engine, tables: Iterable[Table]) -> List[str]:
+    """
+    Bring existing tables up to the current models
+    
+    Args:
+        bind: Engine of the main database or of a shard file
+        tables: Tables living in that database
+    
+    Returns:
+        "table.column" of every column added
+    
+    Raises:
+        MigrationError: If an ALTER TABLE fails
+    """
+    tables = list(tables)
+    try:
+        with bind.begin() as conn:
+            added = add_missing_columns(conn, tables)
+            chat_events = any(table.name == "chat_events" for table in tables)
+            moved = move_chat_bodies(conn) if chat_events else 0
+            indexed = build_search_index(conn) if chat_events else 0
+    except Exception as e:
+        raise MigrationError(f"Schema migration of {bind.url} failed: {e}") from e
+    
+    if added:
+        logger.info(f"Schema migrated ({bind.url}): added {', '.join(added)}")
+    if moved:
+        logger.info(f"Schema migrated ({bind.url}): {moved} chat events moved to compressed body columns")
+    if indexed:
+        logger.info(f"Schema migrated ({bind.url}): search index built over {indexed} chat events")
+    return added
@@ -0,0 +1,271 @@
+"""
+Model router
+Picks the model of each request sent with model "auto": trivial turns (greetings, short
+questions, structured questions) go to a fast, cheap model, long messages, deep
+conversations and booking or symptom talk to the strong one. A model whose recently
+observed call latency exceeds the tenant's latency target is swapped for the fast model,
+except for a periodic probe request that keeps its average current. Every decision is
+logged with its reason and counted.
+"""
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import re
+import threading
+import time
+
+from app.core.config import settings
+from app.core.intents import BOOKING, OTHER, intent_router
+from app.core.text import fold_text
+from app.models.tenant import Tenant
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Model name clients send to let the router choose
+AUTO_MODEL = "auto"
+
+# Greetings, thanks and acknowledgements over folded text (only short messages count)
+SMALL_TALK = re.compile(
+    r"^\W*(merhaba\w*|selam\w*|mrb|slm|gunaydin|iyi\s+(gunler|aksamlar|geceler)|tesekkur\w*|sagol\w*|"
+    r"sag\s*ol\w*|eyvallah|tamam\w*|ok|okey|peki|evet|hayir|anladim|gorusuruz|hosca\s*kal\w*|kolay\s*gelsin)\b"
+)
+
+
+class RouteDecision:
+    """Model chosen for one request and why"""
+    
+    __slots__ = ("model", "reason", "intent", "chars", "turns")
+    
+    def __init__(self, model: str, reason: str, intent: str = OTHER, chars: int = 0, turns: int = 0):
+        self.model = model
+        self.reason = reason
+        self.intent = intent
+        self.chars = chars
+        self.turns = turns
+    
+    def __repr__(self):
+        return f"<RouteDecision(model='{self.model}', reason='{self.reason}')>"
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert decision to dictionary"""
+        return {
+            "model": self.model,
+            "reason": self.reason,
+            "intent": self.intent,
+            "chars": self.chars,
+            "turns": self.turns,
+        }
+
+
+class ModelRouter:
+    """
+    Rule-based model selection with observed latencies
+    
+    Rules are checked in order: long message, deep conversation and booking/symptom
+    words choose the strong model; small talk, a structured question (hours, address,
+    phone, prices) or a short message choose the fast model; anything else gets the
+    strong model. Call latencies are kept per model as an exponentially weighted
+    average, failed calls counting as at least failure_ms; once a model has min_samples
+    calls and its average is above the tenant's target, the fast model is used instead
+    if it is observed to be faster. One request per probe_seconds still goes to the
+    swapped-out model, otherwise its average would never be updated again and the
+    swap would outlive the slowdown.
+    """
+    
+    def __init__(
+        self,
+        fast_model: str,
+        strong_model: str,
+        short_chars: int = 60,
+        long_chars: int = 400,
+        deep_turns: int = 6,
+        latency_slo_ms: int = 5000,
+        latency_alpha: float = 0.2,
+        min_samples: int = 5,
+        probe_seconds: float = 30.0,
+        failure_ms: int = 30000,
+        enabled: bool = True
+    ):
+        """
+        Initialize router
+        
+        Args:
+            fast_model: Model of trivial turns
+            strong_model: Model of complex turns and the default
+            short_chars: Messages up to this length count as short
+            long_chars: Messages from this length go to the strong model
+            deep_turns: Conversations with this many earlier user turns go to the strong model
+            latency_slo_ms: Latency target of tenants without their own
+            latency_alpha: Weight of the newest call in the latency average
+            min_samples: Calls observed before a model's latency average is used
+            probe_seconds: Interval of the requests still sent to a swapped-out model
+            failure_ms: Latency recorded (at least) for a failed or timed-out call
+            enabled: False = "auto" always means the strong model
+        """
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.short_chars = short_chars
+        self.long_chars = long_chars
+        self.deep_turns = deep_turns
+        self.latency_slo_ms = latency_slo_ms
+        self.latency_alpha = latency_alpha
+        self.min_samples = min_samples
+        self.probe_seconds = probe_seconds
+        self.failure_ms = failure_ms
+        self.enabled = enabled
+        self._latency: Dict[str, Tuple[float, int]] = {}
+        # model -> time.monotonic() of its last probe (or of the swap that started the interval)
+        self._probed: Dict[str, float] = {}
+        self._decisions: Counter = Counter()
+        self._lock = threading.Lock()
+    
+    # Latency observations
+    
+    def observe(self, model: str, latency_ms: float, failed: bool = False) -> None:
+        """
+        Record the latency of one model call
+        
+        Args:
+            model: Model called
+            latency_ms: Call duration
+            failed: The call timed out or the API failed (counts as at least failure_ms)
+        """
+        if failed:
+            latency_ms = max(latency_ms, self.failure_ms)
+        with self._lock:
+            average, samples = self._latency.get(model, (latency_ms, 0))
+            average += self.latency_alpha * (latency_ms - average)
+            self._latency[model] = (average, samples + 1)
+    
+    def latency(self, model: str) -> Optional[float]:
+        """
+        Recent average call latency of a model
+        
+        Args:
+            model: Model name
+        
+        Returns:
+            Average in milliseconds, None until min_samples calls were observed
+        """
+        average, samples = self._latency.get(model, (0.0, 0))
+        return average if samples >= self.min_samples else None
+    
+    def _probe_due(self, model: str) -> bool:
+        """Whether a swapped-out model should get this request (at most once per probe_seconds)"""
+        now = time.monotonic()
+        with self._lock:
+            last = self._probed.setdefault(model, now)
+            if now - last < self.probe_seconds:
+                return False
+            self._probed[model] = now
+            return True
+    
+    # Routing
+    
+    def _rule(self, message: str, turns: int) -> Tuple[str, str, str]:
+        """(model, reason, intent) of the content rules"""
+        chars = len(message)
+        if chars >= self.long_chars:
+            return self.strong_model, "long_message", OTHER
+        intent = intent_router.detect(message)
+        if turns >= self.deep_turns:
+            return self.strong_model, "deep_conversation", intent
+        if intent == BOOKING:
+            return self.strong_model, "booking_or_symptom", intent
+        if chars <= self.short_chars and SMALL_TALK.match(fold_text(message)):
+            return self.fast_model, "small_talk", intent
+        if intent != OTHER:
+            return self.fast_model, "structured_question", intent
+        if chars <= self.short_chars:
+            return self.fast_model, "short_message", intent
+        return self.strong_model, "default", intent
+    
+    def route(
+        self,
+        tenant: Tenant,
+        message: str,
+        conversation_history: Optional[List[Dict[str, Any]]] = None,
+        requested: Optional[str] = None
+    ) -> RouteDecision:
+        """
+        Choose the model of a request
+        
+        Args:
+            tenant: Tenant of the request (latency_slo_ms)
+            message: User message
+            conversation_history: Previous messages
+            requested: Model asked for by the client (anything but "auto" is used as is)
+        
+        Returns:
+            Route decision
+        """
+        if requested and requested != AUTO_MODEL:
+            return RouteDecision(requested, "requested")
+        if not self.enabled:
+            return RouteDecision(self.strong_model, "routing_disabled")
+        
+        turns = sum(1 for turn in conversation_history or () if turn.get("role") == "user")
+        model, reason, intent = self._rule(message, turns)
+        
+        # Latency target: swap a model running slow for the fast model if that one is faster
+        slo = tenant.latency_slo_ms or self.latency_slo_ms
+        observed = self.latency(model)
+        if model != self.fast_model and observed is not None and observed > slo:
+            fast = self.latency(self.fast_model)
+            if fast is None or fast < observed:
+                if self._probe_due(model):
+                    reason = f"{reason}+probe"
+                else:
+                    model, reason = self.fast_model, f"{reason}+latency"
+        
+        with self._lock:
+            self._decisions[(model, reason)] += 1
+        logger.info(
+            f"Model route for tenant {tenant.id}: {model} ({reason}, intent {intent}, "
+            f"{len(message)} chars, {turns} turns)"
+        )
+        return RouteDecision(model, reason, intent, len(message), turns)
+    
+    def status(self) -> Dict[str, Any]:
+        """
+        Router state
+        
+        Returns:
+            Configured models, latency averages and decision counts of this worker process
+        """
+        with self._lock:
+            latencies = {
+                model: {"average_ms": round(average, 1), "samples": samples}
+                for model, (average, samples) in self._latency.items()
+            }
+            decisions = [
+                {"model": model, "reason": reason, "count": count}
+                for (model, reason), count in self._decisions.most_common()
+            ]
+        return {
+            "enabled": self.enabled,
+            "fast_model": self.fast_model,
+            "strong_model": self.strong_model,
+            "latency_slo_ms": self.latency_slo_ms,
+            "probe_seconds": self.probe_seconds,
+            "latencies": latencies,
+            "decisions": decisions,
+        }
+
+
+# Global model router instance
+model_router = ModelRouter(
+    fast_model=settings.MODEL_ROUTING_FAST_MODEL,
+    strong_model=settings.MODEL_ROUTING_STRONG_MODEL,
+    short_chars=settings.MODEL_ROUTING_SHORT_CHARS,
+    long_chars=settings.MODEL_ROUTING_LONG_CHARS,
+    deep_turns=settings.MODEL_ROUTING_DEEP_TURNS,
+    latency_slo_ms=settings.MODEL_ROUTING_LATENCY_SLO_MS,
+    latency_alpha=settings.MODEL_ROUTING_LATENCY_ALPHA,
+    min_samples=settings.MODEL_ROUTING_MIN_SAMPLES,
+    probe_seconds=settings.MODEL_ROUTING_PROBE_SECONDS,
+    failure_ms=settings.MODEL_ROUTING_FAILURE_MS,
+    enabled=settings.MODEL_ROUTING_ENABLED
+)
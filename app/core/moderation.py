@@ -0,0 +1,497 @@
+"""
+Moderation pre-filter
+Checks incoming messages against each tenant's blocklist and allowlist before any model
+call. A tenant's patterns are compiled into one Aho-Corasick automaton, so a message is
+scanned once for all of them, with Turkish-aware normalization (case, diacritics,
+common digit/symbol substitutions and stretched letters) applied to messages and
+patterns alike.
+"""
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+import threading
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.sharding import submit_tenant_write, tenant_read_session
+from app.core.text import fold_text
+from app.models.moderation import ALLOW, BLOCK, REJECT, RULE_ACTIONS, ModerationRule
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Model name logged for moderated turns ("moderation:block", "moderation:reject")
+MODERATION_MODEL = "moderation"
+
+# Digits and symbols used in place of letters ("s4l4k", "@ptal")
+_SUBSTITUTIONS = str.maketrans({
+    "0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s", "€": "e",
+})
+
+# Higher wins when a message hits several patterns
+_SEVERITY = {BLOCK: 1, REJECT: 2}
+
+
+class ModerationError(Exception):
+    """Custom exception for moderation errors"""
+    pass
+
+
+def _characters(text: str):
+    """Normalized character stream: folded, substituted, non-word characters as one space, runs collapsed"""
+    previous = " "
+    for char in fold_text(text).translate(_SUBSTITUTIONS):
+        if not char.isalnum():
+            char = " "
+        if char != previous:
+            previous = char
+            yield char
+
+
+def normalize(text: str) -> str:
+    """
+    Normalize text the way messages are scanned
+    
+    "SALAAAK!!", "s4l4k" and "Salak" all become "salak". Letter runs are collapsed
+    in patterns and messages alike, so doubled letters still match.
+    
+    Args:
+        text: Original text
+    
+    Returns:
+        Normalized text without leading or trailing spaces
+    """
+    return "".join(_characters(text)).strip()
+
+
+def pattern_key(pattern: str) -> str:
+    """
+    Automaton key of a pattern
+    
+    Patterns match whole words; a trailing "*" also matches longer words ("salak*"
+    matches "salaksın") and a leading "*" matches inside words.
+    
+    Args:
+        pattern: Pattern as entered
+    
+    Returns:
+        Normalized pattern with the word boundaries it requires as spaces
+    
+    Raises:
+        ModerationError: If nothing is left after normalization
+    """
+    core = normalize(pattern.strip("*"))
+    if not core:
+        raise ModerationError("Kalıp en az bir harf veya rakam içermeli")
+    prefix = "" if pattern.startswith("*") else " "
+    suffix = "" if pattern.endswith("*") else " "
+    return f"{prefix}{core}{suffix}"
+
+
+class PatternAutomaton:
+    """
+    Aho-Corasick automaton over normalized text
+    
+    States are trie nodes with a transition dict, a failure link (longest proper
+    suffix that is also a trie path) and the patterns ending there, including those
+    reached through failure links. Scanning follows one transition per character,
+    so the cost depends on the message length, not on the number of patterns.
+    """
+    
+    def __init__(self, keys: Sequence[str]):
+        """
+        Build the automaton
+        
+        Args:
+            keys: Pattern keys (pattern_key()), matches report their index
+        """
+        self.keys = list(keys)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        for index, key in enumerate(self.keys):
+            self._insert(index, key)
+        self._link()
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    def _insert(self, index: int, key: str) -> None:
+        """Add a key to the trie"""
+        state = 0
+        for char in key:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][char] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = following
+        self._out[state] = self._out[state] + (index,)
+    
+    def _link(self) -> None:
+        """Compute failure links and merged outputs breadth-first"""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, following in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[following] = target if target != following else 0
+                self._out[following] = self._out[following] + self._out[self._fail[following]]
+                queue.append(following)
+    
+    def scan(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        Find every pattern occurrence in one pass
+        
+        Args:
+            text: Original message (normalized while scanning)
+        
+        Returns:
+            (key index, start, end) of each occurrence, positions in the normalized stream
+        """
+        goto, fail, out, keys = self._goto, self._fail, self._out, self.keys
+        hits = []
+        state = goto[0].get(" ", 0)  # The stream starts and ends at a word boundary
+        position = 1
+        for char in _characters(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            position += 1
+            for index in out[state]:
+                hits.append((index, position - len(keys[index]), position))
+        while state and " " not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(" ", 0)
+        for index in out[state]:
+            if keys[index].endswith(" "):
+                hits.append((index, position + 1 - len(keys[index]), position + 1))
+        return hits
+
+
+class ModerationVerdict:
+    """Outcome of a message that hit a block or reject pattern"""
+    
+    __slots__ = ("action", "rule_id", "pattern", "reply")
+    
+    def __init__(self, action: str, rule_id: int, pattern: str, reply: Optional[str]):
+        self.action = action
+        self.rule_id = rule_id
+        self.pattern = pattern
+        self.reply = reply  # None for rejected messages
+    
+    @property
+    def model(self) -> str:
+        """Model name logged for the turn"""
+        return f"{MODERATION_MODEL}:{self.action}"
+    
+    def __repr__(self):
+        return f"<ModerationVerdict(action='{self.action}', rule_id={self.rule_id})>"
+
+
+class TenantRules:
+    """A tenant's rules and their compiled automaton (immutable once built)"""
+    
+    __slots__ = ("rules", "automaton", "signature", "checked_at")
+    
+    def __init__(self, rules: List[Dict[str, Any]], signature: Tuple[int, int]):
+        self.rules = rules
+        self.automaton = PatternAutomaton([rule["key"] for rule in rules]) if rules else None
+        self.signature = signature
+        self.checked_at = time.monotonic()
+
+
+class ModerationFilter:
+    """
+    Per-tenant moderation with cached automatons
+    
+    A tenant's automaton is built on first use and kept in an LRU cache. Every
+    refresh_seconds the rule table signature (count, highest revision) is read and
+    the automaton is rebuilt only when it changed, so rules edited by another worker
+    process apply within refresh_seconds. Rules edited through this filter update
+    the cached rule list directly and rebuild only that tenant's automaton.
+    
+    Allow patterns win over block/reject patterns whose match they fully cover
+    ("amasya" allowed, "ama*" blocked). Hit statistics are kept per tenant and rule.
+    """
+    
+    def __init__(
+        self,
+        cache_size: int = 1024,
+        refresh_seconds: float = 30.0,
+        block_reply: str = "",
+        max_rules: int = 5000
+    ):
+        """
+        Initialize filter
+        
+        Args:
+            cache_size: Maximum number of cached tenant automatons
+            refresh_seconds: How long a cached automaton is used without checking the database
+            block_reply: Reply of block rules without their own reply
+            max_rules: Maximum number of rules per tenant
+        """
+        self.cache_size = cache_size
+        self.refresh_seconds = refresh_seconds
+        self.block_reply = block_reply
+        self.max_rules = max_rules
+        self._tenants: "OrderedDict[int, TenantRules]" = OrderedDict()
+        self._stats: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    # Rules
+    
+    def _signature(self, db: Session, tenant_id: int) -> Tuple[int, int]:
+        """Rule count and highest rule revision of a tenant (every save raises the revision)"""
+        count, highest = db.execute(
+            select(func.count(ModerationRule.id), func.max(ModerationRule.revision))
+            .where(ModerationRule.tenant_id == tenant_id)
+        ).one()
+        return count, highest or 0
+    
+    def _load(self, tenant_id: int) -> TenantRules:
+        """Read a tenant's rules and compile them"""
+        with tenant_read_session(tenant_id) as db:
+            rules = [
+                rule.to_dict() | {"key": rule.key}
+                for rule in db.execute(
+                    select(ModerationRule).where(ModerationRule.tenant_id == tenant_id).order_by(ModerationRule.id)
+                ).scalars()
+            ]
+            signature = self._signature(db, tenant_id)
+        return TenantRules(rules, signature)
+    
+    def _publish(self, tenant_id: int, compiled: TenantRules) -> TenantRules:
+        """Put a compiled rule set into the cache"""
+        with self._lock:
+            self._tenants[tenant_id] = compiled
+            self._tenants.move_to_end(tenant_id)
+            while len(self._tenants) > self.cache_size:
+                self._tenants.popitem(last=False)
+        return compiled
+    
+    def compiled(self, tenant_id: int) -> TenantRules:
+        """
+        Current compiled rules of a tenant
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            Rules and automaton (rebuilt if the stored rules changed)
+        """
+        now = time.monotonic()
+        with self._lock:
+            cached = self._tenants.get(tenant_id)
+            if cached is not None:
+                self._tenants.move_to_end(tenant_id)
+                if now - cached.checked_at < self.refresh_seconds:
+                    return cached
+        if cached is not None:
+            with tenant_read_session(tenant_id) as db:
+                signature = self._signature(db, tenant_id)
+            if signature == cached.signature:
+                cached.checked_at = now
+                return cached
+        return self._publish(tenant_id, self._load(tenant_id))
+    
+    def list_rules(self, tenant_id: int) -> List[Dict[str, Any]]:
+        """
+        A tenant's rules
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            Rule dictionaries with their hit counts
+        """
+        hits = self.stats(tenant_id)["rules"]
+        return [
+            {key: value for key, value in rule.items() if key != "key"} | {"hits": hits.get(rule["id"], 0)}
+            for rule in self.compiled(tenant_id).rules
+        ]
+    
+    def save_rule(self, tenant_id: int, pattern: str, action: str = BLOCK, reply: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Create a rule, or update the action and reply of the rule with the same normalized pattern
+        
+        Args:
+            tenant_id: Tenant ID
+            pattern: Word or phrase ("*" at either end matches inside longer words)
+            action: block, reject or allow
+            reply: Reply of a block rule (None = default reply)
+        
+        Returns:
+            Saved rule dictionary
+        
+        Raises:
+            ModerationError: If the pattern or action is invalid or the tenant has too many rules
+        """
+        if action not in RULE_ACTIONS:
+            raise ModerationError(f"Geçersiz işlem '{action}', seçenekler: {', '.join(RULE_ACTIONS)}")
+        pattern = pattern.strip()
+        key = pattern_key(pattern)
+        if action != BLOCK or not reply or not reply.strip():
+            reply = None
+        else:
+            reply = reply.strip()
+        current = self.compiled(tenant_id)
+        existing = next((rule for rule in current.rules if rule["key"] == key), None)
+        if existing is None and len(current.rules) >= self.max_rules:
+            raise ModerationError(f"En fazla {self.max_rules} kural tanımlanabilir")
+        
+        def _save(session: Session) -> Dict[str, Any]:
+            rule = session.execute(
+                select(ModerationRule).where(ModerationRule.tenant_id == tenant_id, ModerationRule.key == key)
+            ).scalar_one_or_none()
+            if rule is None:
+                rule = ModerationRule(tenant_id=tenant_id, key=key)
+                session.add(rule)
+            rule.pattern = pattern
+            rule.action = action
+            rule.reply = reply
+            rule.revision = (
+                session.execute(
+                    select(func.max(ModerationRule.revision)).where(ModerationRule.tenant_id == tenant_id)
+                ).scalar() or 0
+            ) + 1
+            session.flush()
+            return rule.to_dict() | {"key": rule.key}, rule.revision
+        
+        try:
+            saved, revision = submit_tenant_write(tenant_id, _save).result()
+        except IntegrityError:
+            # Same pattern saved concurrently: the next load picks it up
+            self.invalidate(tenant_id)
+            raise ModerationError("Bu kalıp zaten kayıtlı")
+        
+        count, highest = current.signature
+        if revision != highest + 1:
+            # Another worker process wrote rules since the cached copy was read
+            self._publish(tenant_id, self._load(tenant_id))
+        else:
+            rules = [rule for rule in current.rules if rule["key"] != key] + [saved]
+            signature = (count + (existing is None), revision)
+            self._publish(tenant_id, TenantRules(sorted(rules, key=lambda rule: rule["id"]), signature))
+        return {key: value for key, value in saved.items() if key != "key"}
+    
+    def delete_rule(self, tenant_id: int, rule_id: int) -> bool:
+        """
+        Delete a rule
+        
+        Args:
+            tenant_id: Tenant ID
+            rule_id: Rule ID
+        
+        Returns:
+            True if the rule existed
+        """
+        def _delete(session: Session) -> bool:
+            rule = session.execute(
+                select(ModerationRule).where(ModerationRule.tenant_id == tenant_id, ModerationRule.id == rule_id)
+            ).scalar_one_or_none()
+            if rule is None:
+                return False
+            session.delete(rule)
+            return True
+        
+        deleted = submit_tenant_write(tenant_id, _delete).result()
+        if deleted:
+            # The highest revision can change with a delete, so the signature is re-read
+            self._publish(tenant_id, self._load(tenant_id))
+        return deleted
+    
+    def invalidate(self, tenant_id: int) -> None:
+        """Drop a tenant's cached automaton"""
+        with self._lock:
+            self._tenants.pop(tenant_id, None)
+    
+    # Checking
+    
+    def _count(self, tenant_id: int, name: str, rule_id: Optional[int] = None) -> None:
+        """Increment a tenant's hit counters"""
+        with self._lock:
+            stats = self._stats.get(tenant_id)
+            if stats is None:
+                stats = self._stats[tenant_id] = {"checked": 0, "blocked": 0, "rejected": 0, "allowed": 0, "rules": Counter()}
+            stats[name] += 1
+            if rule_id is not None:
+                stats["rules"][rule_id] += 1
+    
+    def check(self, tenant_id: int, text: str) -> Optional[ModerationVerdict]:
+        """
+        Check a message before it is sent to the model
+        
+        Args:
+            tenant_id: Tenant ID
+            text: User message
+        
+        Returns:
+            Verdict if the message is blocked or rejected, None if it may pass
+        """
+        compiled = self.compiled(tenant_id)
+        self._count(tenant_id, "checked")
+        if compiled.automaton is None:
+            return None
+        hits = compiled.automaton.scan(text)
+        if not hits:
+            return None
+        
+        rules = compiled.rules
+        allowed = [(start, end, index) for index, start, end in hits if rules[index]["action"] == ALLOW]
+        worst = None
+        for index, start, end in hits:
+            rule = rules[index]
+            if rule["action"] == ALLOW:
+                continue
+            covering = next((allow for allow in allowed if allow[0] <= start and allow[1] >= end), None)
+            if covering is not None:
+                self._count(tenant_id, "allowed", rules[covering[2]]["id"])
+                continue
+            if worst is None or _SEVERITY[rule["action"]] > _SEVERITY[worst["action"]]:
+                worst = rule
+        if worst is None:
+            return None
+        
+        if worst["action"] == REJECT:
+            self._count(tenant_id, "rejected", worst["id"])
+            reply = None
+        else:
+            self._count(tenant_id, "blocked", worst["id"])
+            reply = worst["reply"] or self.block_reply
+        logger.info(f"Message of tenant {tenant_id} {worst['action']}ed by moderation rule {worst['id']}")
+        return ModerationVerdict(worst["action"], worst["id"], worst["pattern"], reply)
+    
+    def stats(self, tenant_id: int) -> Dict[str, Any]:
+        """
+        Hit statistics of a tenant (since process start)
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            Checked, blocked, rejected and allowed counts, and hits by rule ID
+        """
+        with self._lock:
+            stats = self._stats.get(tenant_id)
+            if stats is None:
+                return {"checked": 0, "blocked": 0, "rejected": 0, "allowed": 0, "rules": {}}
+            return {**stats, "rules": dict(stats["rules"])}
+
+
+# Global moderation filter instance
+moderation_filter = ModerationFilter(
+    cache_size=settings.MODERATION_CACHE_SIZE,
+    refresh_seconds=settings.MODERATION_REFRESH_SECONDS,
+    block_reply=settings.MODERATION_BLOCK_REPLY,
+    max_rules=settings.MODERATION_MAX_RULES
+)
@@ -0,0 +1,271 @@
+"""
+PII redaction
+Replaces personal data in messages (TC Kimlik numbers, IBANs, phone numbers and e-mail
+addresses) with placeholders before they are sent to the model, and puts the original
+values back into the reply. All patterns are combined into one compiled expression, so a
+message is scanned once; candidates are validated (TC Kimlik and IBAN checksums) before
+they are replaced.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+import re
+import threading
+
+from app.core.config import settings
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Placeholder label of each kind ("[TELEFON_1]")
+PII_LABELS = {
+    "tckn": "TC_KIMLIK",
+    "iban": "IBAN",
+    "email": "EPOSTA",
+    "phone": "TELEFON",
+}
+
+# System prompt note added when a message contained redacted values
+REDACTION_NOTE = (
+    "Köşeli parantez içindeki [TELEFON_1], [EPOSTA_1], [TC_KIMLIK_1], [IBAN_1] gibi etiketler "
+    "kullanıcının gizlenmiş bilgileridir. Bu bilgileri kullanman gerektiğinde etiketi aynen yaz."
+)
+
+# Turkish phone number after the first digit of the area code (landline 2xx-4xx, mobile 5xx, 850)
+_AREA_REST = r"\d{2}\)?[ .-]?\d{3}[ .-]?\d{2}[ .-]?\d{2}(?!\d)"
+_AREA = r"\(?[2-58]" + _AREA_REST
+
+# Every match starts at a digit, "@", "+" or "(": with a character class first the regex
+# engine skips to those characters in C instead of trying each alternative at every
+# position. The alternatives continue after that first character (checked through
+# lookbehinds); IBAN country letters and e-mail local parts lie before it and are
+# added by PiiRedactor.redact().
+_PII = re.compile(
+    r"[\d@+(](?:"
+    r"(?P<iban>(?<=\b[A-Za-z]{2}\d)\d(?: ?[A-Za-z0-9]{4}){2,7}(?: ?[A-Za-z0-9]{1,3})?\b)"
+    r"|(?P<email>(?<=[\w.+-]@)[\w-]+(?:\.[\w-]+)+)"
+    r"|(?P<tckn>(?<=[1-9])(?<!\d\d)\d{10}(?!\d))"
+    r"|(?P<phone>(?<![\w+(].)(?:"
+    r"(?<=\+)90[ .-]?" + _AREA +
+    r"|(?<=0)(?:090[ .-]?|[ .-]?)" + _AREA +
+    r"|(?<=9)0[ .-]?" + _AREA +
+    r"|(?<=\()0?[2-58]" + _AREA_REST +
+    r"|(?<=[2-58])" + _AREA_REST +
+    r"))"
+    r")"
+)
+
+_PLACEHOLDER = re.compile(r"\[(?:%s)_\d+\]" % "|".join(PII_LABELS.values()))
+
+# Longest placeholder a streamed chunk can end in the middle of
+_MAX_PLACEHOLDER = max(len(label) for label in PII_LABELS.values()) + 8
+
+# IBAN letters as the numbers of the mod-97 check (A = 10 ... Z = 35)
+_IBAN_DIGITS = str.maketrans({chr(code): str(code - 55) for code in range(65, 91)})
+
+
+def valid_tckn(value: str) -> bool:
+    """
+    Check the two check digits of a TC Kimlik number
+    
+    Args:
+        value: 11 digits, the first one not zero
+    
+    Returns:
+        True if both check digits match
+    """
+    digits = [ord(char) - 48 for char in value]
+    odd = digits[0] + digits[2] + digits[4] + digits[6] + digits[8]
+    even = digits[1] + digits[3] + digits[5] + digits[7]
+    return (odd * 7 - even) % 10 == digits[9] and sum(digits[:10]) % 10 == digits[10]
+
+
+def valid_iban(value: str) -> bool:
+    """
+    Check the length and mod-97 checksum of an IBAN (ISO 13616)
+    
+    Args:
+        value: IBAN with or without spaces
+    
+    Returns:
+        True if the checksum is valid (TR IBANs must also be 26 characters long)
+    """
+    compact = value.replace(" ", "").upper()
+    if not 15 <= len(compact) <= 34 or (compact.startswith("TR") and len(compact) != 26):
+        return False
+    rearranged = compact[4:] + compact[:4]
+    return int(rearranged.translate(_IBAN_DIGITS)) % 97 == 1
+
+
+_VALIDATORS = {"tckn": valid_tckn, "iban": valid_iban}
+
+
+class Redaction:
+    """
+    Placeholders of one request and the values they stand for
+    
+    The same value always gets the same placeholder, so a number repeated in the
+    history or returned by a tool is one placeholder for the model. Tools running
+    in parallel add values concurrently, hence the lock.
+    """
+    
+    __slots__ = ("_values", "_placeholders", "_counts", "_lock")
+    
+    def __init__(self):
+        self._values: Dict[str, str] = {}
+        self._placeholders: Dict[Tuple[str, str], str] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._values)
+    
+    def placeholder(self, kind: str, value: str) -> str:
+        """
+        Placeholder of a value, a new one if the value was not seen yet
+        
+        Args:
+            kind: Key of PII_LABELS
+            value: Original text
+        
+        Returns:
+            Placeholder such as "[TELEFON_1]"
+        """
+        key = (kind, value)
+        with self._lock:
+            placeholder = self._placeholders.get(key)
+            if placeholder is None:
+                count = self._counts.get(kind, 0) + 1
+                self._counts[kind] = count
+                placeholder = f"[{PII_LABELS[kind]}_{count}]"
+                self._placeholders[key] = placeholder
+                self._values[placeholder] = value
+            return placeholder
+    
+    def restore(self, text: str) -> str:
+        """
+        Put the original values back (unknown placeholders are left as they are)
+        
+        Args:
+            text: Model output
+        
+        Returns:
+            Text with the placeholders replaced
+        """
+        if not self._values or "[" not in text:
+            return text
+        values = self._values
+        return _PLACEHOLDER.sub(lambda match: values.get(match.group(0), match.group(0)), text)
+    
+    def restore_stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        """
+        Restore a streamed reply, holding back a chunk end that may be the start of a placeholder
+        
+        Args:
+            chunks: Model output chunks
+        
+        Returns:
+            Iterator over restored chunks
+        """
+        pending = ""
+        for chunk in chunks:
+            text = pending + chunk
+            pending = ""
+            start = text.rfind("[")
+            if start != -1 and "]" not in text[start:] and len(text) - start < _MAX_PLACEHOLDER:
+                text, pending = text[:start], text[start:]
+            if text:
+                yield self.restore(text)
+        if pending:
+            yield self.restore(pending)
+
+
+class PiiRedactor:
+    """
+    Single-pass scanner for personal data
+    
+    Messages without digits, "@", "+" or "(" are passed over by the regex engine
+    almost at memory speed. Candidates failing their checksum are left in the text.
+    """
+    
+    def __init__(self, kinds: Optional[Iterable[str]] = None):
+        """
+        Initialize redactor
+        
+        Args:
+            kinds: Kinds to redact (keys of PII_LABELS, None = all)
+        
+        Raises:
+            ValueError: If a kind is unknown
+        """
+        self.kinds = frozenset(PII_LABELS if kinds is None else kinds)
+        unknown = self.kinds - set(PII_LABELS)
+        if unknown:
+            raise ValueError(f"Unknown PII kind(s) {', '.join(sorted(unknown))}, choose from: {', '.join(PII_LABELS)}")
+    
+    def redact(self, text: str, redaction: Redaction) -> str:
+        """
+        Replace personal data with placeholders
+        
+        Args:
+            text: Message text
+            redaction: Placeholders of the request (extended with new values)
+        
+        Returns:
+            Redacted text
+        """
+        pieces = None
+        position = 0
+        for match in _PII.finditer(text):
+            kind = match.lastgroup
+            if kind not in self.kinds:
+                continue
+            start, end = match.span()
+            if kind == "iban":
+                start -= 2
+            elif kind == "email":
+                while start > 0 and (text[start - 1].isalnum() or text[start - 1] in "._+-"):
+                    start -= 1
+            if start < position:
+                continue
+            value = text[start:end]
+            validator = _VALIDATORS.get(kind)
+            if validator is not None and not validator(value):
+                continue
+            if pieces is None:
+                pieces = []
+            pieces.append(text[position:start])
+            pieces.append(redaction.placeholder(kind, value))
+            position = end
+        
+        if pieces is None:
+            return text
+        pieces.append(text[position:])
+        return "".join(pieces)
+    
+    def redact_messages(self, messages: Optional[List[Dict[str, str]]], redaction: Redaction) -> Optional[List[Dict[str, str]]]:
+        """
+        Redact the text content of chat messages (history turns)
+        
+        Args:
+            messages: Messages [{"role": ..., "content": ...}]
+            redaction: Placeholders of the request
+        
+        Returns:
+            New message list (the given one is not modified)
+        """
+        if not messages:
+            return messages
+        redacted = []
+        for message in messages:
+            content = message.get("content")
+            if isinstance(content, str):
+                cleaned = self.redact(content, redaction)
+                if cleaned != content:
+                    message = {**message, "content": cleaned}
+            redacted.append(message)
+        return redacted
+
+
+# Global PII redactor instance
+pii_redactor = PiiRedactor(kind.strip() for kind in settings.PII_REDACTION_KINDS.split(",") if kind.strip())
@@ -0,0 +1,705 @@
+"""
+Reminder scheduler
+Sends appointment reminders (by default 24 hours and 1 hour ahead) through a pluggable channel.
+Due reminders wait in an in-process hierarchical timing wheel: adding and cancelling are O(1)
+and a tick only touches the timers that expire or move down a level. Only reminders due
+within the load window are held in memory; later ones are loaded from the database as the
+window slides, and the reminder rows carry all state needed after a restart.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+import logging
+import threading
+import time
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.sharding import shard_router, submit_tenant_write, tenant_read_session
+from app.models.reminder import CANCELLED, FAILED, PENDING, SENDING, SENT, SKIPPED, Reminder
+from app.models.tenant import Tenant
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class ReminderError(Exception):
+    """Custom exception for reminder delivery errors"""
+    pass
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel over integer ticks
+    
+    Level L has 2**slot_bits slots of 2**(slot_bits * L) ticks each. A timer goes to
+    the lowest level whose range covers its distance from the current tick, in the
+    slot of its expiry at that level. When the current tick enters a new slot of a
+    higher level, that slot's timers are placed again, landing on lower levels.
+    Every timer is moved at most once per level, so adding, cancelling and the
+    amortized cost of firing are all O(1). Timers beyond the top level wait in an
+    overflow map that is re-examined once per top-level rotation.
+    """
+    
+    def __init__(self, current_tick: int, levels: int = 4, slot_bits: int = 6):
+        """
+        Args:
+            current_tick: Tick that counts as already processed
+            levels: Number of wheels
+            slot_bits: log2 of the slots per wheel (6 = 64 slots)
+        """
+        self.current = current_tick
+        self.levels = levels
+        self.slot_bits = slot_bits
+        self.mask = (1 << slot_bits) - 1
+        self._slots: List[List[Dict[Hashable, int]]] = [
+            [{} for _ in range(1 << slot_bits)] for _ in range(levels)
+        ]
+        self._overflow: Dict[Hashable, int] = {}
+        self._positions: Dict[Hashable, Dict[Hashable, int]] = {}  # key -> map holding it
+    
+    def __len__(self) -> int:
+        return len(self._positions)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._positions
+    
+    def _place(self, key: Hashable, expires: int, earliest: int) -> None:
+        """Put a timer into the slot matching its distance from the current tick"""
+        expires = max(expires, earliest)
+        delta = expires - self.current
+        for level in range(self.levels):
+            if delta < 1 << (self.slot_bits * (level + 1)):
+                bucket = self._slots[level][(expires >> (self.slot_bits * level)) & self.mask]
+                break
+        else:
+            bucket = self._overflow
+        bucket[key] = expires
+        self._positions[key] = bucket
+    
+    def add(self, key: Hashable, expires: int) -> None:
+        """
+        Schedule a timer (replaces a timer with the same key)
+        
+        Args:
+            key: Timer identity
+            expires: Tick to fire at (past ticks fire on the next tick)
+        """
+        self.cancel(key)
+        self._place(key, expires, self.current + 1)
+    
+    def cancel(self, key: Hashable) -> bool:
+        """
+        Remove a timer
+        
+        Args:
+            key: Timer identity
+        
+        Returns:
+            True if the timer was scheduled
+        """
+        bucket = self._positions.pop(key, None)
+        if bucket is None:
+            return False
+        del bucket[key]
+        return True
+    
+    def advance(self, to_tick: int) -> List[Hashable]:
+        """
+        Process all ticks up to and including to_tick
+        
+        Args:
+            to_tick: New current tick
+        
+        Returns:
+            Keys of the fired timers, in expiry order
+        """
+        fired: List[Hashable] = []
+        while self.current < to_tick:
+            if not self._positions:
+                # Nothing to fire or cascade: jump ahead
+                self.current = to_tick
+                break
+            tick = self.current + 1
+            self.current = tick
+            
+            # Cascade from the highest level whose slot boundary this tick crosses
+            cascades = []
+            for level in range(1, self.levels + 1):
+                if tick & ((1 << (self.slot_bits * level)) - 1):
+                    break
+                cascades.append(level)
+            for level in reversed(cascades):
+                if level == self.levels:
+                    moving, self._overflow = self._overflow, {}
+                else:
+                    slot = (tick >> (self.slot_bits * level)) & self.mask
+                    moving, self._slots[level][slot] = self._slots[level][slot], {}
+                for key, expires in moving.items():
+                    self._place(key, expires, tick)
+            
+            due, self._slots[0][tick & self.mask] = self._slots[0][tick & self.mask], {}
+            for key in due:
+                del self._positions[key]
+            fired.extend(due)
+        return fired
+
+
+class ReminderChannel:
+    """
+    Interface of reminder delivery channels
+    
+    Subclasses set name and implement send(); raising marks the attempt as failed
+    and the reminder is retried with backoff.
+    """
+    
+    name = "base"
+    
+    def send(self, recipient: str, text: str, reminder: Dict[str, Any]) -> None:
+        """
+        Deliver a reminder
+        
+        Args:
+            recipient: Phone number or channel address
+            text: Message text
+            reminder: Reminder dictionary
+        
+        Raises:
+            ReminderError: If delivery failed
+        """
+        raise NotImplementedError
+
+
+class LogReminderChannel(ReminderChannel):
+    """
+    Local stub: logs reminders and keeps the most recent ones in memory (tests, development)
+    """
+    
+    name = "log"
+    
+    def __init__(self, keep: int = 1000):
+        """
+        Args:
+            keep: Number of sent reminders kept in memory
+        """
+        self.sent: Deque[Tuple[str, str, Dict[str, Any]]] = deque(maxlen=keep)
+    
+    def send(self, recipient: str, text: str, reminder: Dict[str, Any]) -> None:
+        """Record a reminder, see ReminderChannel.send()"""
+        self.sent.append((recipient, text, reminder))
+        logger.info(f"Reminder {reminder['id']} of tenant {reminder['tenant_id']} to {recipient}: {text}")
+
+
+class OutboundReminderChannel(ReminderChannel):
+    """
+    Hands reminders to the outbound message queue of a messaging channel (app/core/channels.py)
+    
+    The reminder counts as sent once it is queued; the queue retries the delivery itself.
+    """
+    
+    def __init__(self, channel: str):
+        """
+        Args:
+            channel: Messaging channel (whatsapp, sms)
+        """
+        self.name = channel
+    
+    def send(self, recipient: str, text: str, reminder: Dict[str, Any]) -> None:
+        """Queue a reminder, see ReminderChannel.send()"""
+        from app.core.channels import outbound_queue
+        outbound_queue.enqueue(
+            reminder["tenant_id"], self.name, recipient, text, reference=f"reminder:{reminder['id']}"
+        ).result()
+
+
+REMINDER_CHANNELS = {
+    LogReminderChannel.name: LogReminderChannel,
+    "whatsapp": lambda: OutboundReminderChannel("whatsapp"),
+    "sms": lambda: OutboundReminderChannel("sms"),
+}
+
+
+def create_reminder_channel(name: str) -> ReminderChannel:
+    """
+    Create the configured reminder channel
+    
+    Args:
+        name: Channel name (see REMINDER_CHANNELS)
+    
+    Returns:
+        Channel instance
+    
+    Raises:
+        ValueError: If the channel is unknown
+    """
+    if name not in REMINDER_CHANNELS:
+        raise ValueError(f"Unknown reminder channel '{name}', choose one of: {', '.join(REMINDER_CHANNELS)}")
+    return REMINDER_CHANNELS[name]()
+
+
+def parse_offsets(value: str) -> List[int]:
+    """
+    Parse the REMINDER_OFFSETS_MINUTES setting
+    
+    Args:
+        value: Comma separated minutes before the appointment
+    
+    Returns:
+        Distinct positive offsets, largest first
+    """
+    offsets = {int(part) for part in value.split(",") if part.strip()}
+    return sorted((offset for offset in offsets if offset > 0), reverse=True)
+
+
+def reminder_text(reminder: Dict[str, Any], business_name: str) -> str:
+    """
+    Reminder message
+    
+    Args:
+        reminder: Reminder dictionary
+        business_name: Clinic name
+    
+    Returns:
+        Message text
+    """
+    appointment_at = datetime.fromisoformat(reminder["appointment_at"])
+    return (
+        f"Sayın {reminder['customer_name']}, {business_name} randevunuz "
+        f"{appointment_at:%d.%m.%Y} saat {appointment_at:%H:%M}'dedir. "
+        "Gelemeyecekseniz lütfen bize haber verin."
+    )
+
+
+class ReminderScheduler:
+    """
+    Background scheduler of appointment reminders
+    
+    Reminder rows are created in the booking transaction. The scheduler keeps the
+    ones due before loaded_until in a timing wheel, keyed by (tenant ID, reminder ID),
+    and extends the window by loading the next range every load_interval. A fired
+    reminder is claimed with a conditional update (pending -> sending, claimed until
+    now + lease) so several workers can run schedulers over the same data without
+    sending twice, then delivered on a small thread pool. Failures are retried with
+    exponential backoff up to max_attempts; reminders whose appointment already
+    started are skipped. After a restart the window is loaded again from the reminder
+    rows, including overdue ones. A row left in "sending" by a crashed worker (or a
+    lost status write) is loaded and claimed again by any worker once its lease has
+    expired, never while it runs.
+    """
+    
+    def __init__(
+        self,
+        channel: ReminderChannel,
+        offsets: Sequence[int],
+        tick_seconds: float = 1.0,
+        window_minutes: int = 120,
+        load_interval_seconds: float = 60.0,
+        max_attempts: int = 5,
+        retry_seconds: float = 60.0,
+        timezone: str = "Europe/Istanbul",
+        workers: int = 4,
+        lease_seconds: float = 300.0
+    ):
+        """
+        Initialize scheduler
+        
+        Args:
+            channel: Delivery channel
+            offsets: Minutes before the appointment to remind at
+            tick_seconds: Wheel resolution
+            window_minutes: How far ahead reminders are held in memory
+            load_interval_seconds: Time between window loads (must be well below the window)
+            max_attempts: Delivery attempts before a reminder is marked failed
+            retry_seconds: First retry delay, doubled on every further attempt
+            timezone: Clinic time zone of booking times
+            workers: Threads delivering reminders
+            lease_seconds: Time a claimed reminder is left to its worker before others may send it
+        """
+        self.channel = channel
+        self.offsets = list(offsets)
+        self.tick_seconds = tick_seconds
+        self.window = timedelta(minutes=window_minutes)
+        self.load_interval = load_interval_seconds
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.timezone = ZoneInfo(timezone)
+        self.workers = workers
+        self.lease = timedelta(seconds=lease_seconds)
+        self.loaded_until: Optional[datetime] = None  # Reminders due before this are in the wheel
+        self._wheel = TimingWheel(self._tick_of_epoch(time.time()))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.stats = {"sent": 0, "failed": 0, "skipped": 0, "retried": 0}
+    
+    # Time
+    
+    def now(self) -> datetime:
+        """Current clinic time (naive)"""
+        return datetime.now(self.timezone).replace(tzinfo=None, microsecond=0)
+    
+    def _tick_of_epoch(self, epoch: float) -> int:
+        """Wheel tick of a Unix time"""
+        return int(epoch // self.tick_seconds)
+    
+    def _tick_of(self, local: datetime) -> int:
+        """Wheel tick of a clinic-local time"""
+        return self._tick_of_epoch(local.replace(tzinfo=self.timezone).timestamp())
+    
+    # Booking hooks (called by the appointment book)
+    
+    def add_for_booking(self, session: Session, booking: Any) -> List[Tuple[int, datetime]]:
+        """
+        Create the reminder rows of a new booking (call inside the booking transaction)
+        
+        Args:
+            session: Write session of the booking
+            booking: Flushed Booking row
+        
+        Returns:
+            (reminder ID, due time) pairs, pass them to track() after the commit
+        """
+        if not booking.customer_phone:
+            return []
+        now = self.now()
+        reminders = [
+            Reminder(
+                tenant_id=booking.tenant_id,
+                booking_id=booking.id,
+                offset_minutes=offset,
+                due_at=booking.start_at - timedelta(minutes=offset),
+                appointment_at=booking.start_at,
+                channel=self.channel.name,
+                recipient=booking.customer_phone,
+                customer_name=booking.customer_name,
+                status=PENDING,
+                attempts=0
+            )
+            for offset in self.offsets
+            if booking.start_at - timedelta(minutes=offset) > now
+        ]
+        if not reminders:
+            return []
+        session.add_all(reminders)
+        session.flush()
+        return [(reminder.id, reminder.due_at) for reminder in reminders]
+    
+    def cancel_for_booking(self, session: Session, tenant_id: int, booking_id: int) -> List[int]:
+        """
+        Cancel the pending reminders of a booking (call inside the cancelling transaction)
+        
+        Args:
+            session: Write session
+            tenant_id: Tenant ID
+            booking_id: Booking ID
+        
+        Returns:
+            Cancelled reminder IDs, pass them to untrack() after the commit
+        """
+        ids = session.execute(
+            select(Reminder.id).where(
+                Reminder.tenant_id == tenant_id,
+                Reminder.booking_id == booking_id,
+                Reminder.status == PENDING
+            )
+        ).scalars().all()
+        if ids:
+            session.execute(update(Reminder).where(Reminder.id.in_(ids)).values(status=CANCELLED))
+        return list(ids)
+    
+    def track(self, tenant_id: int, reminders: Sequence[Tuple[int, datetime]]) -> None:
+        """
+        Put committed reminders into the wheel if they fall into the loaded window
+        
+        Later reminders are picked up when the window reaches them.
+        
+        Args:
+            tenant_id: Tenant ID
+            reminders: (reminder ID, due time) pairs
+        """
+        with self._lock:
+            if self.loaded_until is None:
+                return
+            for reminder_id, due_at in reminders:
+                if due_at < self.loaded_until:
+                    self._wheel.add((tenant_id, reminder_id), self._tick_of(due_at))
+    
+    def untrack(self, tenant_id: int, reminder_ids: Sequence[int]) -> None:
+        """
+        Remove cancelled reminders from the wheel
+        
+        Args:
+            tenant_id: Tenant ID
+            reminder_ids: Reminder IDs
+        """
+        with self._lock:
+            for reminder_id in reminder_ids:
+                self._wheel.cancel((tenant_id, reminder_id))
+    
+    # Loading
+    
+    def _pending_between(self, start: Optional[datetime], end: datetime) -> Iterator[Tuple[int, int, datetime]]:
+        """
+        Pending reminders due in [start, end) (start None = any earlier time)
+        
+        Yields:
+            (tenant ID, reminder ID, due time)
+        """
+        conditions = [Reminder.status == PENDING, Reminder.due_at < end]
+        if start is not None:
+            conditions.append(Reminder.due_at >= start)
+        return self._select_reminders(conditions)
+    
+    def _expired_claims(self, now: datetime) -> Iterator[Tuple[int, int, datetime]]:
+        """
+        Reminders in "sending" whose lease expired (worker died, or its status write failed)
+        
+        Yields:
+            (tenant ID, reminder ID, due time)
+        """
+        return self._select_reminders([
+            Reminder.status == SENDING,
+            or_(Reminder.claimed_until.is_(None), Reminder.claimed_until <= now),
+        ])
+    
+    def _select_reminders(self, conditions: List[Any]) -> Iterator[Tuple[int, int, datetime]]:
+        """Reminders matching conditions, from the main database or every tenant's shard"""
+        def _query(tenant_id: Optional[int] = None):
+            query = select(Reminder.tenant_id, Reminder.id, Reminder.due_at).where(*conditions)
+            if tenant_id is not None:
+                query = query.where(Reminder.tenant_id == tenant_id)
+            return query
+        
+        if shard_router is None:
+            # Every tenant's reminders are in the main database: one query
+            with SessionLocal() as db:
+                yield from db.execute(_query()).all()
+            return
+        
+        with SessionLocal() as db:
+            tenant_ids = db.execute(select(Tenant.id)).scalars().all()
+        for tenant_id in tenant_ids:
+            with tenant_read_session(tenant_id) as db:
+                yield from db.execute(_query(tenant_id)).all()
+    
+    def load(self) -> int:
+        """
+        Extend the in-memory window to now + window_minutes, and add the reminders
+        whose delivery lease expired (claimed again when they fire)
+        
+        Returns:
+            Number of reminders added to the wheel
+        """
+        now = self.now()
+        end = now + self.window
+        with self._lock:
+            # Move the window end first: bookings committed while the range is read are
+            # added by track() as well (the wheel keeps one timer per key)
+            start, self.loaded_until = self.loaded_until, end
+        rows = list(self._pending_between(start, end)) + list(self._expired_claims(now))
+        
+        with self._lock:
+            for tenant_id, reminder_id, due_at in rows:
+                self._wheel.add((tenant_id, reminder_id), self._tick_of(due_at))
+        if rows:
+            logger.info(f"Reminder window extended to {end:%Y-%m-%d %H:%M}: {len(rows)} reminders loaded")
+        return len(rows)
+    
+    # Delivery
+    
+    def advance(self, epoch: Optional[float] = None) -> List[Tuple[int, int]]:
+        """
+        Move the wheel to a time and hand the due reminders to the delivery threads
+        (delivered inline when the scheduler thread is not running)
+        
+        Args:
+            epoch: Unix time (default now)
+        
+        Returns:
+            (tenant ID, reminder ID) of the due reminders
+        """
+        with self._lock:
+            due = self._wheel.advance(self._tick_of_epoch(time.time() if epoch is None else epoch))
+        for tenant_id, reminder_id in due:
+            if self._executor is not None:
+                self._executor.submit(self.deliver, tenant_id, reminder_id)
+            else:
+                self.deliver(tenant_id, reminder_id)
+        return due
+    
+    def deliver(self, tenant_id: int, reminder_id: int) -> str:
+        """
+        Claim and send one reminder
+        
+        Args:
+            tenant_id: Tenant ID
+            reminder_id: Reminder ID
+        
+        Returns:
+            Resulting status (or the current one if another worker claimed it)
+        """
+        now = self.now()
+        
+        def _claim(session: Session) -> Tuple[str, Optional[Dict[str, Any]]]:
+            reminder = session.execute(
+                select(Reminder).where(Reminder.tenant_id == tenant_id, Reminder.id == reminder_id)
+            ).scalar_one_or_none()
+            if reminder is None:
+                return CANCELLED, None
+            if reminder.status == SENDING:
+                if reminder.claimed_until is not None and reminder.claimed_until > now:
+                    return SENDING, None  # Being sent by another worker
+                if reminder.attempts >= self.max_attempts:
+                    reminder.status = FAILED
+                    reminder.last_error = "Delivery did not finish"
+                    return FAILED, None
+            elif reminder.status != PENDING:
+                return reminder.status, None
+            if reminder.appointment_at <= now:
+                reminder.status = SKIPPED
+                return SKIPPED, None
+            if reminder.due_at > now:
+                # Rescheduled later (retry backoff) than this timer
+                return PENDING, reminder.to_dict()
+            reminder.status = SENDING
+            reminder.claimed_until = now + self.lease
+            reminder.attempts += 1
+            session.flush()
+            return SENDING, reminder.to_dict()
+        
+        try:
+            status, reminder = submit_tenant_write(tenant_id, _claim).result()
+        except Exception as e:
+            logger.error(f"Claiming reminder {reminder_id} of tenant {tenant_id} failed: {e}")
+            self.track(tenant_id, [(reminder_id, now + timedelta(seconds=self.retry_seconds))])
+            return PENDING
+        if status == SKIPPED:
+            self._count("skipped")
+        if status == PENDING and reminder is not None:
+            self.track(tenant_id, [(reminder_id, datetime.fromisoformat(reminder["due_at"]))])
+        if status == FAILED:
+            self._count("failed")
+        if status != SENDING or reminder is None:
+            return status
+        
+        try:
+            with SessionLocal() as db:
+                business_name = db.execute(select(Tenant.business_name).where(Tenant.id == tenant_id)).scalar()
+            self.channel.send(reminder["recipient"], reminder_text(reminder, business_name or ""), reminder)
+        except Exception as e:
+            return self._delivery_failed(tenant_id, reminder, str(e))
+        
+        def _sent(session: Session) -> None:
+            session.execute(
+                update(Reminder).where(Reminder.id == reminder_id).values(
+                    status=SENT, sent_at=self.now(), last_error=None, claimed_until=None
+                )
+            )
+        
+        self._count("sent")
+        try:
+            submit_tenant_write(tenant_id, _sent).result()
+        except Exception as e:
+            # Left in "sending": sent again once the lease expires (at least once)
+            logger.error(f"Marking reminder {reminder_id} of tenant {tenant_id} sent failed: {e}")
+        return SENT
+    
+    def _count(self, name: str) -> None:
+        """Increment a delivery counter"""
+        with self._lock:
+            self.stats[name] += 1
+    
+    def _delivery_failed(self, tenant_id: int, reminder: Dict[str, Any], error: str) -> str:
+        """Schedule a retry with backoff, or give up after max_attempts"""
+        attempts = reminder["attempts"]
+        if attempts >= self.max_attempts:
+            status, due_at = FAILED, None
+            self._count("failed")
+        else:
+            status = PENDING
+            due_at = self.now() + timedelta(seconds=self.retry_seconds * 2 ** (attempts - 1))
+            self._count("retried")
+        logger.warning(f"Reminder {reminder['id']} of tenant {tenant_id} attempt {attempts} failed: {error}")
+        
+        def _failed(session: Session) -> None:
+            values: Dict[str, Any] = {"status": status, "last_error": error[:1000], "claimed_until": None}
+            if due_at is not None:
+                values["due_at"] = due_at
+            session.execute(update(Reminder).where(Reminder.id == reminder["id"]).values(**values))
+        
+        submit_tenant_write(tenant_id, _failed).result()
+        if due_at is not None:
+            self.track(tenant_id, [(reminder["id"], due_at)])
+        return status
+    
+    # Background thread
+    
+    def start(self) -> None:
+        """Start the background thread (idempotent)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="reminder-sender")
+        self._thread = threading.Thread(target=self._run, name="reminders", daemon=True)
+        self._thread.start()
+        logger.info("Reminder scheduler started")
+    
+    def stop(self) -> None:
+        """Stop the background thread and wait for deliveries in progress"""
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(10.0)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+    
+    def _run(self) -> None:
+        """Background thread main loop: tick the wheel, extend the window every load_interval"""
+        next_load = 0.0
+        while not self._stop.is_set():
+            if time.monotonic() >= next_load:
+                try:
+                    self.load()
+                except Exception as e:
+                    logger.error(f"Loading reminders failed: {e}")
+                next_load = time.monotonic() + self.load_interval
+            try:
+                self.advance()
+            except Exception as e:
+                logger.error(f"Reminder tick failed: {e}")
+            self._stop.wait(self.tick_seconds - time.time() % self.tick_seconds)
+    
+    def status(self) -> Dict[str, Any]:
+        """
+        Scheduler state for monitoring
+        
+        Returns:
+            Scheduled reminder count, window end and delivery counters
+        """
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "scheduled": len(self._wheel),
+            "loaded_until": self.loaded_until.isoformat(timespec="minutes") if self.loaded_until else None,
+            **self.stats,
+        }
+
+
+# Global reminder scheduler instance
+reminder_scheduler = ReminderScheduler(
+    channel=create_reminder_channel(settings.REMINDER_CHANNEL),
+    offsets=parse_offsets(settings.REMINDER_OFFSETS_MINUTES),
+    tick_seconds=settings.REMINDER_TICK_SECONDS,
+    window_minutes=settings.REMINDER_WINDOW_MINUTES,
+    load_interval_seconds=settings.REMINDER_LOAD_INTERVAL_SECONDS,
+    max_attempts=settings.REMINDER_MAX_ATTEMPTS,
+    retry_seconds=settings.REMINDER_RETRY_SECONDS,
+    timezone=settings.APPOINTMENT_TIMEZONE,
+    lease_seconds=settings.REMINDER_LEASE_SECONDS
+)
@@ -0,0 +1,294 @@
+"""
+Retention engine
+Moves chat events older than each tenant's retention period into archive segments and deletes them in small chunks
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+import logging
+import os
+import shutil
+import threading
+import time
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.archive import conversation_index_rows, tenant_archive_dir, write_segment
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.leases import claim_lease, lease_holder, release_lease
+from app.core.search import unindex_events
+from app.core.sharding import shard_router, submit_tenant_write, tenant_read_session
+from app.models.archived_conversation import ArchivedConversation
+from app.models.chat_event import ChatEvent
+from app.models.chat_rollup import ChatRollup
+from app.models.tenant import Tenant
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+LEASE_JOB = "retention"
+
+
+class RetentionEngine:
+    """
+    Background archiver for chat events
+    
+    Per tenant, events older than the retention period are read in batches of
+    segment_max_events and written to new archive segments (one per month touched).
+    Only after a segment is durable are its index rows stored and the events
+    deleted, delete_chunk rows per transaction with a pause in between, so the
+    writer is never held for long. A crash in between leaves an event both archived
+    and hot; read-through de-duplicates by event ID. Archive months older than
+    archive_expiry_days are removed entirely.
+    
+    A tenant is archived by one worker process at a time: the run holds the
+    tenant's "retention" lease (renewed before every batch) and is skipped while
+    another process holds it.
+    """
+    
+    def __init__(
+        self,
+        default_retention_days: int = 180,
+        segment_max_events: int = 5000,
+        delete_chunk: int = 500,
+        chunk_pause_ms: float = 50.0,
+        interval_seconds: float = 3600.0,
+        archive_expiry_days: Optional[int] = None,
+        lease_seconds: float = 900.0
+    ):
+        """
+        Initialize retention engine
+        
+        Args:
+            default_retention_days: Retention of tenants without their own setting
+            segment_max_events: Maximum events per archive segment
+            delete_chunk: Events deleted per transaction
+            chunk_pause_ms: Pause between delete transactions
+            interval_seconds: Time between background runs
+            archive_expiry_days: Age after which archived months are deleted (None = keep)
+            lease_seconds: Duration of the per-tenant lease, renewed before every batch
+        """
+        self.default_retention_days = default_retention_days
+        self.segment_max_events = segment_max_events
+        self.delete_chunk = delete_chunk
+        self.chunk_pause = chunk_pause_ms / 1000
+        self.interval = interval_seconds
+        self.archive_expiry_days = archive_expiry_days
+        self.lease_seconds = lease_seconds
+        self.holder = lease_holder()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> None:
+        """Start the background thread (idempotent)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+        logger.info("Retention engine started")
+    
+    def stop(self) -> None:
+        """Stop the background thread after the current chunk"""
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(30.0)
+    
+    def _run(self) -> None:
+        """Background thread main loop"""
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Retention run failed: {e}")
+            self._stop.wait(self.interval)
+    
+    def tenant_policies(self) -> Dict[int, int]:
+        """
+        Retention period of every tenant that may have chat events
+        
+        Returns:
+            Mapping of tenant ID to retention days
+        """
+        with SessionLocal() as db:
+            policies = {
+                tenant_id: days if days is not None else self.default_retention_days
+                for tenant_id, days in db.execute(select(Tenant.id, Tenant.retention_days)).all()
+            }
+            if shard_router is None:
+                # Events can also be logged for IDs outside the tenants table (legacy main.py app)
+                logged = db.execute(
+                    select(ChatRollup.tenant_id).where(ChatRollup.granularity == "day").distinct()
+                ).scalars().all()
+                for tenant_id in logged:
+                    policies.setdefault(tenant_id, self.default_retention_days)
+        return policies
+    
+    def run_once(self) -> Dict[str, int]:
+        """
+        Archive expired events of all tenants and purge expired archive months
+        
+        Returns:
+            Statistics of the run
+        """
+        started = time.monotonic()
+        stats = {"tenants": 0, "archived": 0, "purged_months": 0}
+        
+        for tenant_id, days in self.tenant_policies().items():
+            if self._stop.is_set():
+                break
+            archived = self.archive_tenant(tenant_id, days)
+            stats["tenants"] += 1
+            stats["archived"] += archived
+            if self.archive_expiry_days is not None:
+                stats["purged_months"] += self.purge_archive(tenant_id, self.archive_expiry_days)
+        
+        logger.info(
+            f"Retention run: {stats['archived']} events archived, {stats['purged_months']} archive months purged, "
+            f"{stats['tenants']} tenants in {time.monotonic() - started:.1f}s"
+        )
+        return stats
+    
+    def archive_tenant(self, tenant_id: int, retention_days: int) -> int:
+        """
+        Archive a tenant's events older than its retention period
+        
+        Args:
+            tenant_id: Tenant ID
+            retention_days: Retention period in days
+        
+        Returns:
+            Number of archived events (0 if another process is archiving the tenant)
+        """
+        if not claim_lease(LEASE_JOB, tenant_id, self.holder, self.lease_seconds):
+            logger.info(f"Retention of tenant {tenant_id} skipped: running in another process")
+            return 0
+        try:
+            return self._archive_batches(tenant_id, retention_days)
+        finally:
+            release_lease(LEASE_JOB, tenant_id, self.holder)
+    
+    def _archive_batches(self, tenant_id: int, retention_days: int) -> int:
+        """Archive loop of archive_tenant, run while holding the tenant's lease"""
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=retention_days)
+        archived = 0
+        last_id = 0
+        
+        while not self._stop.is_set():
+            if not claim_lease(LEASE_JOB, tenant_id, self.holder, self.lease_seconds):
+                logger.warning(f"Retention of tenant {tenant_id} stopped: lease lost")
+                break
+            with tenant_read_session(tenant_id) as db:
+                events = db.execute(
+                    select(ChatEvent)
+                    .where(ChatEvent.tenant_id == tenant_id, ChatEvent.created_at < cutoff, ChatEvent.id > last_id)
+                    .order_by(ChatEvent.id)
+                    .limit(self.segment_max_events)
+                ).scalars().all()
+            if not events:
+                break
+            last_id = events[-1].id
+            
+            # 1. Durable segments first (one per month in the batch)
+            months: Dict[str, List[ChatEvent]] = OrderedDict()
+            for event in events:
+                months.setdefault(event.created_at.strftime("%Y-%m"), []).append(event)
+            
+            index_rows: List[Dict[str, Any]] = []
+            for month, month_events in months.items():
+                segment, members = write_segment(tenant_id, month, [event.to_dict() for event in month_events])
+                index_rows.extend(conversation_index_rows(tenant_id, month, segment, month_events, members))
+            
+            # 2. Make them reachable for read-through
+            submit_tenant_write(tenant_id, _insert_index_rows(index_rows)).result()
+            
+            # 3. Remove from the hot tables in small transactions
+            event_ids = [event.id for event in events]
+            for start in range(0, len(event_ids), self.delete_chunk):
+                archived += submit_tenant_write(tenant_id, _delete_events(event_ids[start:start + self.delete_chunk])).result()
+                time.sleep(self.chunk_pause)
+        
+        return archived
+    
+    def purge_archive(self, tenant_id: int, expiry_days: int) -> int:
+        """
+        Delete archived months that ended more than expiry_days ago
+        
+        Args:
+            tenant_id: Tenant ID
+            expiry_days: Archive expiry in days
+        
+        Returns:
+            Number of purged months
+        """
+        directory = tenant_archive_dir(tenant_id)
+        if not os.path.isdir(directory):
+            return 0
+        
+        cutoff_month = (datetime.now(timezone.utc) - timedelta(days=expiry_days)).strftime("%Y-%m")
+        purged = 0
+        for month in sorted(os.listdir(directory)):
+            if len(month) != 7 or month >= cutoff_month:
+                continue
+            # Index rows first, so read-through never points at a missing segment
+            while submit_tenant_write(tenant_id, _delete_index_chunk(tenant_id, month, self.delete_chunk)).result():
+                time.sleep(self.chunk_pause)
+            shutil.rmtree(os.path.join(directory, month))
+            purged += 1
+            logger.info(f"Purged archive month {month} of tenant {tenant_id}")
+        return purged
+
+
+def _insert_index_rows(rows: List[Dict[str, Any]]):
+    """Build the write job storing archive index rows"""
+    def _insert(session: Session) -> None:
+        if rows:
+            session.execute(insert(ArchivedConversation), rows)
+    return _insert
+
+
+def _delete_events(event_ids: List[int]):
+    """
+    Build the write job deleting archived events and their search index entries
+    
+    The events are read again inside the job: only rows still present are unindexed
+    (an FTS5 'delete' of text that is not indexed corrupts the index). The job
+    returns the number of deleted events.
+    """
+    def _delete(session: Session) -> int:
+        events = session.execute(select(ChatEvent).where(ChatEvent.id.in_(event_ids))).scalars().all()
+        if not events:
+            return 0
+        unindex_events(session, events)
+        session.execute(delete(ChatEvent).where(ChatEvent.id.in_([event.id for event in events])))
+        return len(events)
+    return _delete
+
+
+def _delete_index_chunk(tenant_id: int, month: str, limit: int):
+    """Build the write job deleting up to limit index rows of an archive month"""
+    def _delete(session: Session) -> int:
+        ids = session.execute(
+            select(ArchivedConversation.id)
+            .where(ArchivedConversation.tenant_id == tenant_id, ArchivedConversation.month == month)
+            .limit(limit)
+        ).scalars().all()
+        if ids:
+            session.execute(delete(ArchivedConversation).where(ArchivedConversation.id.in_(ids)))
+        return len(ids)
+    return _delete
+
+
+# Global retention engine instance (started by the application when RETENTION_ENABLED)
+retention_engine = RetentionEngine(
+    default_retention_days=settings.CHAT_RETENTION_DAYS,
+    segment_max_events=settings.ARCHIVE_SEGMENT_MAX_EVENTS,
+    delete_chunk=settings.RETENTION_DELETE_CHUNK,
+    chunk_pause_ms=settings.RETENTION_CHUNK_PAUSE_MS,
+    interval_seconds=settings.RETENTION_INTERVAL_SECONDS,
+    archive_expiry_days=settings.ARCHIVE_EXPIRY_DAYS,
+    lease_seconds=settings.RETENTION_LEASE_SECONDS
+)
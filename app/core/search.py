@@ -0,0 +1,244 @@
+"""
+Conversation search
+FTS5 index over chat messages with tenant-scoped, cursor-paginated queries and highlighted snippets
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import html
+import logging
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from app.core.sharding import tenant_read_session
+from app.core.text import WORD_PATTERN, fold_text, word_tokens
+from app.models.chat_event import ChatEvent
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = "chat_search"
+MAX_QUERY_TERMS = 8
+SNIPPET_WIDTH = 160
+
+_INSERT_SQL = text(
+    f"INSERT INTO {SEARCH_TABLE}(rowid, tenant, user_text, assistant_text) "
+    "VALUES (:id, :tenant, :user_text, :assistant_text)"
+)
+_DELETE_SQL = text(
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, tenant, user_text, assistant_text) "
+    "VALUES ('delete', :id, :tenant, :user_text, :assistant_text)"
+)
+
+
+def _tenant_token(tenant_id: int) -> str:
+    """Indexed tenant marker, every query is ANDed with it"""
+    return f"t{tenant_id}"
+
+
+def search_document(
+    event_id: int,
+    tenant_id: int,
+    user_message: str,
+    assistant_message: Optional[str]
+) -> Dict[str, Any]:
+    """
+    Index row of a chat event (the exact values are needed again to delete it)
+    
+    Args:
+        event_id: chat_events.id
+        tenant_id: Tenant ID
+        user_message: User message
+        assistant_message: Assistant reply
+    
+    Returns:
+        Parameters for the index INSERT/delete statements
+    """
+    return {
+        "id": event_id,
+        "tenant": _tenant_token(tenant_id),
+        "user_text": fold_text(user_message or ""),
+        "assistant_text": fold_text(assistant_message or ""),
+    }
+
+
+def index_events(session: Session, event_ids: Sequence[int], events: Sequence[Dict[str, Any]]) -> None:
+    """
+    Add chat events to the search index (call in the transaction that inserts them)
+    
+    Args:
+        session: Write session of the events' database
+        event_ids: IDs of the inserted events, in the order of events
+        events: Chat event rows
+    """
+    if not events:
+        return
+    session.execute(
+        _INSERT_SQL,
+        [
+            search_document(event_id, event["tenant_id"], event["user_message"], event.get("assistant_message"))
+            for event_id, event in zip(event_ids, events)
+        ]
+    )
+
+
+def unindex_events(session: Session, events: Sequence[ChatEvent]) -> None:
+    """
+    Remove chat events from the search index (before deleting the rows)
+    
+    Args:
+        session: Write session of the events' database
+        events: Loaded chat events
+    """
+    if not events:
+        return
+    session.execute(
+        _DELETE_SQL,
+        [
+            search_document(event.id, event.tenant_id, event.user_message, event.assistant_message)
+            for event in events
+        ]
+    )
+
+
+def parse_query(query: str) -> List[Tuple[str, bool]]:
+    """
+    Split a user query into folded terms
+    
+    All terms must match. The last term is a prefix term while the user is still
+    typing it (no trailing space), so "dolg" finds "dolgu".
+    
+    Args:
+        query: Raw search text
+    
+    Returns:
+        (term, is_prefix) pairs
+    """
+    tokens = word_tokens(query)[:MAX_QUERY_TERMS]
+    terms = [(token, False) for token in tokens]
+    if terms and not query[-1:].isspace() and len(terms[-1][0]) >= 2:
+        terms[-1] = (terms[-1][0], True)
+    return terms
+
+
+def build_match_query(tenant_id: int, terms: List[Tuple[str, bool]]) -> str:
+    """
+    FTS5 MATCH expression for a tenant's messages
+    
+    Args:
+        tenant_id: Tenant ID
+        terms: Parsed query terms
+    
+    Returns:
+        MATCH expression (terms are quoted, user input cannot inject FTS syntax)
+    """
+    parts = [f'"{term}"*' if is_prefix else f'"{term}"' for term, is_prefix in terms]
+    return f'tenant:"{_tenant_token(tenant_id)}" AND {{user_text assistant_text}}: ({" AND ".join(parts)})'
+
+
+def _term_matches(word: str, terms: List[Tuple[str, bool]]) -> bool:
+    """Whether a folded word is one of the query terms"""
+    return any(word.startswith(term) if is_prefix else word == term for term, is_prefix in terms)
+
+
+def build_snippet(original: Optional[str], terms: List[Tuple[str, bool]], width: int = SNIPPET_WIDTH) -> Optional[str]:
+    """
+    HTML snippet around the first match with matched words wrapped in <mark>
+    
+    Folding keeps string length, so match offsets in the folded text are used on the original.
+    
+    Args:
+        original: Original message text
+        terms: Parsed query terms
+        width: Maximum snippet length in characters
+    
+    Returns:
+        Escaped HTML snippet, or None if the text has no match
+    """
+    if not original:
+        return None
+    
+    folded = fold_text(original)
+    spans = [match.span() for match in WORD_PATTERN.finditer(folded) if _term_matches(match.group(), terms)]
+    if not spans:
+        return None
+    
+    start = max(0, spans[0][0] - width // 3)
+    if start > 0:
+        boundary = original.find(" ", start, spans[0][0])
+        start = boundary + 1 if boundary != -1 else start
+    end = min(len(original), start + width)
+    
+    pieces = ["…" if start > 0 else ""]
+    position = start
+    for span_start, span_end in spans:
+        if span_start < start or span_end > end:
+            continue
+        pieces.append(html.escape(original[position:span_start]))
+        pieces.append(f"<mark>{html.escape(original[span_start:span_end])}</mark>")
+        position = span_end
+    pieces.append(html.escape(original[position:end]))
+    pieces.append("…" if end < len(original) else "")
+    return "".join(pieces)
+
+
+def search_conversations(
+    tenant_id: int,
+    query: str,
+    limit: int = 20,
+    before_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Search a tenant's chat messages, newest first
+    
+    The index is walked in descending rowid order and stops after limit hits, so
+    the cost depends on the page size, not on the number of stored messages.
+    
+    Args:
+        tenant_id: Tenant ID
+        query: Search text
+        limit: Page size
+        before_id: Cursor from the previous page (next_cursor)
+    
+    Returns:
+        Results with highlighted snippets and the cursor of the next page
+    """
+    terms = parse_query(query)
+    if not terms:
+        return {"query": query, "results": [], "next_cursor": None}
+    
+    sql = f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match"
+    params: Dict[str, Any] = {"match": build_match_query(tenant_id, terms), "limit": limit}
+    if before_id is not None:
+        sql += " AND rowid < :before_id"
+        params["before_id"] = before_id
+    sql += " ORDER BY rowid DESC LIMIT :limit"
+    
+    with tenant_read_session(tenant_id) as db:
+        event_ids = db.execute(text(sql), params).scalars().all()
+        events = {
+            event.id: event
+            for event in db.execute(
+                select(ChatEvent).where(ChatEvent.id.in_(event_ids), ChatEvent.tenant_id == tenant_id)
+            ).scalars()
+        } if event_ids else {}
+    
+    results = []
+    for event_id in event_ids:
+        event = events.get(event_id)
+        if event is None:
+            continue
+        results.append({
+            "id": event.id,
+            "conversation_id": event.conversation_id,
+            "channel": event.channel,
+            "created_at": event.created_at.isoformat() if event.created_at else None,
+            "user_snippet": build_snippet(event.user_message, terms),
+            "assistant_snippet": build_snippet(event.assistant_message, terms),
+        })
+    
+    return {
+        "query": query,
+        "results": results,
+        "next_cursor": event_ids[-1] if len(event_ids) == limit else None,
+    }
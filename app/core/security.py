@@ -1,11 +1,17 @@
 """
 Security utilities for encryption and password hashing
 """
+from concurrent.futures import Future, ProcessPoolExecutor
 from cryptography.fernet import Fernet
 from passlib.context import CryptContext
-from typing import Optional
+from typing import Any, Callable, Optional
+import asyncio
 import base64
+import multiprocessing
 import os
+import threading
+
+from app.core.config import settings
 
 
 # Password hashing context
@@ -94,6 +100,125 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class PasswordPoolBusyError(Exception):
+    """Raised when too many password operations are already queued"""
+    pass
+
+
+class PasswordHasherPool:
+    """
+    Runs bcrypt hashing and verification in a bounded process pool
+    
+    Each bcrypt call burns ~200 ms of CPU. Running it in worker processes keeps the
+    event loop free for other requests; the number of queued operations is capped so
+    a login burst is rejected early instead of building an unbounded backlog.
+    """
+    
+    def __init__(self, max_workers: int = 2, max_pending: int = 64):
+        """
+        Initialize password hasher pool
+        
+        Args:
+            max_workers: Number of worker processes
+            max_pending: Maximum running + queued operations before rejecting new ones
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: the parent runs threads (write queue), forking it is not safe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+    
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+    
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a password function in the pool
+        
+        Args:
+            fn: Module level function (must be picklable)
+            *args: Function arguments
+            
+        Returns:
+            Function result
+            
+        Raises:
+            PasswordPoolBusyError: If max_pending operations are already queued
+        """
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise PasswordPoolBusyError("Too many password operations in progress")
+            self._pending += 1
+        
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+    
+    def shutdown(self) -> None:
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+# Global password pool instance
+password_pool = PasswordHasherPool(
+    max_workers=settings.PASSWORD_POOL_WORKERS,
+    max_pending=settings.PASSWORD_POOL_MAX_PENDING
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password against a hash without blocking the event loop
+    
+    Args:
+        plain_password: Plain text password
+        hashed_password: Hashed password
+        
+    Returns:
+        True if password matches
+        
+    Raises:
+        PasswordPoolBusyError: If the password pool is saturated
+    """
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Hash a password without blocking the event loop
+    
+    Args:
+        password: Plain text password
+        
+    Returns:
+        Hashed password
+        
+    Raises:
+        PasswordPoolBusyError: If the password pool is saturated
+    """
+    return await password_pool.run(get_password_hash, password)
+
+
 # Global encryption manager instance
-# In production, load the key from environment variable
-encryption_manager = EncryptionManager()
+# Without ENCRYPTION_KEY a random key is used and stored API keys cannot be decrypted after a restart
+encryption_manager = EncryptionManager(settings.ENCRYPTION_KEY)
@@ -0,0 +1,484 @@
+"""
+Database-per-tenant sharding
+The tenants directory stays in the main database, per-tenant data lives in one SQLite file per tenant
+"""
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import Base, SessionLocal
+from app.core.db_profiles import create_profiled_engine, get_engine_profile
+from app.core.write_queue import write_queue
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Bookkeeping table present in every shard file
+shard_metadata = MetaData()
+shard_meta = Table(
+    "shard_meta",
+    shard_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("tenant_id", Integer, nullable=False),
+    Column("moved_to", String(64), nullable=True),  # Set when the tenant was moved away (write fence)
+)
+
+
+class ShardingError(Exception):
+    """Custom exception for sharding errors"""
+    pass
+
+
+class TenantMovedError(ShardingError):
+    """Raised when a write hits a shard file the tenant has been moved away from"""
+    pass
+
+
+def shard_tables() -> List[Table]:
+    """
+    Tables that hold per-tenant data
+    
+    Models opt in with __table_args__ = {"info": {"sharded": True}}.
+    
+    Returns:
+        Sharded tables in dependency order
+    """
+    return [table for table in Base.metadata.sorted_tables if table.info.get("sharded")]
+
+
+def main_tables() -> List[Table]:
+    """
+    Tables that live in the main database for the configured storage mode
+    
+    Returns:
+        All tables, or only the non-sharded ones when TENANT_SHARDING is enabled
+    """
+    if not settings.TENANT_SHARDING:
+        return list(Base.metadata.sorted_tables)
+    return [table for table in Base.metadata.sorted_tables if not table.info.get("sharded")]
+
+
+def parse_shard_roots(value: str) -> Dict[str, str]:
+    """
+    Parse the SHARD_ROOTS setting
+    
+    Args:
+        value: Comma separated "name=directory" entries (a bare directory uses its basename as name)
+    
+    Returns:
+        Mapping of shard name to directory
+    """
+    roots: Dict[str, str] = {}
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        if "=" in entry:
+            name, path = (part.strip() for part in entry.split("=", 1))
+        else:
+            path = entry
+            name = os.path.basename(os.path.normpath(entry))
+        roots[name] = path
+    return roots
+
+
+class ShardRouter:
+    """
+    Resolves tenants to their shard file and caches open engines
+    
+    A shard is a storage root (directory, typically a disk); each tenant has its own
+    SQLite file inside exactly one shard. The tenant's shard is recorded in
+    tenants.shard and assigned on first use by hashing the tenant id.
+    
+    Engines are kept in an LRU cache of at most cache_size entries, evicted engines
+    are disposed so their connections (and file handles) are closed.
+    
+    Writes go through run_write(). Before committing, the write checks the shard
+    file's fence row; if the tenant has been moved away meanwhile the transaction is
+    rolled back and retried against the new location, so moves are safe with several
+    worker processes.
+    """
+    
+    def __init__(self, roots: Dict[str, str], cache_size: int = 256, route_ttl: float = 30.0):
+        """
+        Initialize shard router
+        
+        Args:
+            roots: Mapping of shard name to directory
+            cache_size: Maximum number of open tenant engines
+            route_ttl: Seconds a tenant -> shard resolution is cached
+        """
+        if not roots:
+            raise ShardingError("No shard roots configured")
+        
+        self.roots = roots
+        self.cache_size = cache_size
+        self.route_ttl = route_ttl
+        self._routes: Dict[int, Tuple[str, float]] = {}
+        self._engines: "OrderedDict[Tuple[str, int], Engine]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._tenant_locks: Dict[int, threading.Lock] = {}
+        # Small pools and caches: there can be hundreds of tenant engines open at once
+        self._profile = get_engine_profile().with_overrides(pool_size=2, cache_size_mb=4)
+    
+    def default_shard(self, tenant_id: int) -> str:
+        """
+        Deterministic initial placement of a tenant
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            Shard name
+        """
+        names = sorted(self.roots)
+        return names[zlib.crc32(str(tenant_id).encode()) % len(names)]
+    
+    def path_for(self, tenant_id: int, shard: str) -> str:
+        """
+        Database file of a tenant inside a shard
+        
+        Args:
+            tenant_id: Tenant ID
+            shard: Shard name
+        
+        Returns:
+            Absolute file path
+        """
+        if shard not in self.roots:
+            raise ShardingError(f"Unknown shard '{shard}'")
+        return os.path.abspath(os.path.join(self.roots[shard], f"tenant_{tenant_id}.db"))
+    
+    def resolve(self, tenant_id: int) -> str:
+        """
+        Find the shard of a tenant, assigning one on first use
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            Shard name
+        """
+        cached = self._routes.get(tenant_id)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        
+        from app.models.tenant import Tenant
+        
+        with SessionLocal() as db:
+            shard = db.execute(select(Tenant.shard).where(Tenant.id == tenant_id)).scalar_one_or_none()
+            if shard is None:
+                # First use: record the hash placement so adding shards never moves existing tenants
+                db.execute(
+                    update(Tenant)
+                    .where(Tenant.id == tenant_id, Tenant.shard.is_(None))
+                    .values(shard=self.default_shard(tenant_id))
+                )
+                db.commit()
+                shard = db.execute(select(Tenant.shard).where(Tenant.id == tenant_id)).scalar_one_or_none()
+        
+        if shard is None:
+            raise ShardingError(f"Tenant {tenant_id} not found")
+        
+        self._routes[tenant_id] = (shard, time.monotonic() + self.route_ttl)
+        return shard
+    
+    def invalidate(self, tenant_id: int) -> None:
+        """
+        Drop the cached route and engines of a tenant
+        
+        Args:
+            tenant_id: Tenant ID
+        """
+        with self._lock:
+            self._routes.pop(tenant_id, None)
+            for key in [key for key in self._engines if key[1] == tenant_id]:
+                self._engines.pop(key).dispose()
+    
+    def engine_for(self, tenant_id: int) -> Engine:
+        """
+        Get the (cached) engine of a tenant's shard file, creating the file on first use
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            SQLAlchemy Engine
+        """
+        shard = self.resolve(tenant_id)
+        key = (shard, tenant_id)
+        
+        with self._lock:
+            tenant_engine = self._engines.get(key)
+            if tenant_engine is not None:
+                self._engines.move_to_end(key)
+                return tenant_engine
+            
+            path = self.path_for(tenant_id, shard)
+            created = not os.path.exists(path)
+            if created:
+                self._create_shard_file(tenant_id, path)
+            
+            # mode=rw: a connection to a moved (deleted) file fails instead of recreating it empty
+            tenant_engine = create_profiled_engine(f"sqlite:///file:{path}?mode=rw&uri=true", self._profile)
+            if not created:
+                # Files written by an older release: add tables and columns introduced since
+                ensure_shard_schema(tenant_engine)
+            self._engines[key] = tenant_engine
+            
+            while len(self._engines) > self.cache_size:
+                _, evicted = self._engines.popitem(last=False)
+                evicted.dispose()
+            
+            return tenant_engine
+    
+    def _create_shard_file(self, tenant_id: int, path: str) -> None:
+        """Create a tenant's shard file with the shard schema"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        setup_engine = create_profiled_engine(f"sqlite:///{path}", self._profile)
+        try:
+            ensure_shard_schema(setup_engine)
+            with setup_engine.begin() as conn:
+                if conn.execute(select(shard_meta.c.id)).first() is None:
+                    conn.execute(shard_meta.insert().values(id=1, tenant_id=tenant_id))
+        finally:
+            setup_engine.dispose()
+        logger.info(f"Shard file created for tenant {tenant_id}: {path}")
+    
+    def _tenant_lock(self, tenant_id: int) -> threading.Lock:
+        with self._lock:
+            return self._tenant_locks.setdefault(tenant_id, threading.Lock())
+    
+    @contextmanager
+    def read_session(self, tenant_id: int) -> Iterator[Session]:
+        """
+        Session on the tenant's shard file for reads
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Yields:
+            Session
+        """
+        session = Session(bind=self.engine_for(tenant_id), autoflush=False)
+        try:
+            yield session
+        finally:
+            session.close()
+    
+    def run_write(self, tenant_id: int, fn: Callable[[Session], T], retries: int = 3) -> T:
+        """
+        Run a write function in one transaction on the tenant's shard file
+        
+        Args:
+            tenant_id: Tenant ID
+            fn: Function receiving the session (must not commit itself)
+            retries: How often to follow a concurrent move
+        
+        Returns:
+            fn's return value
+        """
+        for attempt in range(retries + 1):
+            with self._tenant_lock(tenant_id):
+                session = Session(bind=self.engine_for(tenant_id), autoflush=False, expire_on_commit=False)
+                try:
+                    result = fn(session)
+                    session.flush()
+                    # Inside the write transaction: a mover can't commit the fence between check and commit
+                    moved_to = session.execute(select(shard_meta.c.moved_to)).scalar()
+                    if moved_to is None:
+                        session.commit()
+                        return result
+                    session.rollback()
+                except Exception:
+                    session.rollback()
+                    raise
+                finally:
+                    session.close()
+            
+            logger.info(f"Tenant {tenant_id} moved to shard '{moved_to}', retrying write")
+            self.invalidate(tenant_id)
+        
+        raise TenantMovedError(f"Tenant {tenant_id} kept moving, write abandoned")
+    
+    def move_tenant(self, tenant_id: int, target_shard: str, remove_source: bool = True) -> str:
+        """
+        Move a tenant's shard file to another shard while the application keeps running
+        
+        Reads continue during the move. Writes to the tenant wait (busy_timeout) while the
+        final copy is taken under the source file's write lock; afterwards the directory
+        is switched and the source file is fenced so late writers retry on the new file.
+        
+        Args:
+            tenant_id: Tenant ID
+            target_shard: Destination shard name
+            remove_source: Delete the old file after the move
+        
+        Returns:
+            Path of the tenant's new shard file
+        """
+        source_shard = self.resolve(tenant_id)
+        if source_shard == target_shard:
+            return self.path_for(tenant_id, target_shard)
+        
+        source_path = self.path_for(tenant_id, source_shard)
+        target_path = self.path_for(tenant_id, target_shard)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        
+        if not os.path.exists(source_path):
+            # Nothing stored yet, only the directory entry has to change
+            self._set_shard(tenant_id, target_shard)
+            self.invalidate(tenant_id)
+            return target_path
+        
+        with self._tenant_lock(tenant_id):
+            # The fence connection holds the write lock, the copy is read through a second connection (WAL)
+            fence = sqlite3.connect(source_path, isolation_level=None, timeout=30)
+            reader = sqlite3.connect(source_path)
+            target = sqlite3.connect(target_path)
+            try:
+                fence.execute("BEGIN IMMEDIATE")
+                reader.backup(target)
+                target.execute("UPDATE shard_meta SET moved_to = NULL")
+                target.commit()
+                
+                self._set_shard(tenant_id, target_shard)
+                try:
+                    fence.execute("UPDATE shard_meta SET moved_to = ?", (target_shard,))
+                    fence.execute("COMMIT")
+                except Exception:
+                    # Keep the directory consistent with where writes still go
+                    self._set_shard(tenant_id, source_shard)
+                    raise
+            except Exception:
+                if fence.in_transaction:
+                    fence.execute("ROLLBACK")
+                target.close()
+                if os.path.exists(target_path):
+                    os.remove(target_path)
+                raise
+            finally:
+                fence.close()
+                reader.close()
+                target.close()
+            
+            self.invalidate(tenant_id)
+        
+        if remove_source:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(source_path + suffix):
+                    os.remove(source_path + suffix)
+        
+        logger.info(f"Tenant {tenant_id} moved from shard '{source_shard}' to '{target_shard}'")
+        return target_path
+    
+    def _set_shard(self, tenant_id: int, shard: str) -> None:
+        from app.models.tenant import Tenant
+        
+        with SessionLocal() as db:
+            db.execute(update(Tenant).where(Tenant.id == tenant_id).values(shard=shard))
+            db.commit()
+    
+    def dispose(self) -> None:
+        """Close all cached engines"""
+        with self._lock:
+            for tenant_engine in self._engines.values():
+                tenant_engine.dispose()
+            self._engines.clear()
+            self._routes.clear()
+
+
+def ensure_shard_schema(shard_engine: Engine) -> None:
+    """
+    Create the per-tenant tables in a shard file, or bring an existing file up to date
+    
+    Args:
+        shard_engine: Engine bound to a tenant's shard file
+    """
+    from app.core.migrations import migrate_schema
+    
+    shard_metadata.create_all(bind=shard_engine)
+    Base.metadata.create_all(bind=shard_engine, tables=shard_tables())
+    migrate_schema(shard_engine, shard_tables())
+
+
+# Global router (only used when TENANT_SHARDING is enabled)
+shard_router: Optional[ShardRouter] = (
+    ShardRouter(
+        parse_shard_roots(settings.SHARD_ROOTS),
+        cache_size=settings.SHARD_CACHE_SIZE,
+        route_ttl=settings.SHARD_ROUTE_TTL_SECONDS
+    )
+    if settings.TENANT_SHARDING else None
+)
+
+# Writes to different shard files can run in parallel
+_shard_writers = ThreadPoolExecutor(max_workers=4, thread_name_prefix="shard-writer")
+
+
+@contextmanager
+def tenant_read_session(tenant_id: int) -> Iterator[Session]:
+    """
+    Session for reading a tenant's own data (conversations, usage)
+    
+    Args:
+        tenant_id: Tenant ID
+    
+    Yields:
+        Session on the tenant's shard file, or on the main database when sharding is off
+    """
+    if shard_router is not None:
+        with shard_router.read_session(tenant_id) as session:
+            yield session
+    else:
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+
+def submit_tenant_write(tenant_id: int, fn: Callable[[Session], T]) -> "Future[T]":
+    """
+    Queue a write of a tenant's own data
+    
+    Args:
+        tenant_id: Tenant ID
+        fn: Function receiving the session (must not commit itself)
+    
+    Returns:
+        Future resolved with fn's return value after commit
+    """
+    if shard_router is not None:
+        return _shard_writers.submit(shard_router.run_write, tenant_id, fn)
+    return write_queue.submit(fn)
+
+
+async def run_tenant_write(tenant_id: int, fn: Callable[[Session], T]) -> T:
+    """
+    Write a tenant's own data from async code
+    
+    Args:
+        tenant_id: Tenant ID
+        fn: Function receiving the session (must not commit itself)
+    
+    Returns:
+        fn's return value after commit
+    """
+    return await asyncio.wrap_future(submit_tenant_write(tenant_id, fn))
@@ -0,0 +1,347 @@
+"""
+Bulk tenant import pipeline
+Streams CSV/NDJSON rows, checks usernames set-based, hashes in a process pool and inserts in batches
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple, Type
+import asyncio
+import codecs
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import threading
+
+from cryptography.fernet import Fernet
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.security import encryption_manager, get_password_hash
+from app.core.write_queue import write_queue
+from app.models.tenant import Tenant
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# Per-process Fernet instance of import workers (set by the pool initializer)
+_worker_fernet: Optional[Fernet] = None
+
+
+class TenantImportError(Exception):
+    """Custom exception for bulk import errors"""
+    pass
+
+
+def _init_import_worker(encryption_key: str) -> None:
+    """Pool initializer: use the parent's encryption key so the API keys stay decryptable"""
+    global _worker_fernet
+    _worker_fernet = Fernet(encryption_key.encode())
+
+
+def _prepare_credentials(items: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """
+    Hash passwords and encrypt API keys (runs in an import worker process)
+    
+    Args:
+        items: (password, plain API key) pairs
+    
+    Returns:
+        (password hash, encrypted API key) pairs
+    """
+    return [
+        (get_password_hash(password), _worker_fernet.encrypt(api_key.encode()).decode())
+        for password, api_key in items
+    ]
+
+
+class ImportWorkerPool:
+    """
+    Process pool that hashes and encrypts the credentials of every import in this process
+    
+    Separate from the login password pool so imports never starve interactive logins.
+    Started on the first import and kept for the next ones; concurrent imports share
+    its workers instead of each spawning a pool of CPU-count processes.
+    """
+    
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Initialize import worker pool
+        
+        Args:
+            max_workers: Number of worker processes (None = CPU count)
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+    
+    def get(self) -> ProcessPoolExecutor:
+        """Running pool, started on first use"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = _start_pool(self.max_workers)
+            return self._executor
+    
+    def shutdown(self) -> None:
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def _start_pool(workers: int) -> ProcessPoolExecutor:
+    """Import worker processes using this process' encryption key"""
+    # spawn: the parent runs threads (write queue), forking it is not safe
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_import_worker,
+        initargs=(encryption_manager.get_key(),)
+    )
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Split a byte stream into text lines without buffering the whole body
+    
+    Args:
+        chunks: Incoming byte chunks (e.g. request.stream())
+    
+    Yields:
+        Lines without trailing newline
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def parse_records(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Parse CSV (with header row) or NDJSON lines into records
+    
+    Args:
+        lines: Text lines
+        fmt: "csv" or "ndjson"
+    
+    Yields:
+        (row number, record) pairs; unparsable rows yield the exception as record
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise TenantImportError(f"Unsupported import format '{fmt}', use csv or ndjson")
+    
+    row_number = 0
+    header: Optional[List[str]] = None
+    buffered = ""
+    
+    async for line in lines:
+        if fmt == "ndjson":
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                yield row_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield row_number, e
+            continue
+        
+        # CSV: quoted fields may span lines, collect until the quotes are balanced
+        buffered = f"{buffered}\n{line}" if buffered else line
+        if buffered.count('"') % 2:
+            continue
+        record_text, buffered = buffered, ""
+        if not record_text.strip():
+            continue
+        
+        values = next(csv.reader([record_text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, TenantImportError(f"Expected {len(header)} columns, got {len(values)}")
+        else:
+            yield row_number, {key: value for key, value in zip(header, values) if value != ""}
+    
+    if buffered:
+        row_number += 1
+        yield row_number, TenantImportError("Unterminated quoted field")
+
+
+def _result(row: int, username: Optional[str], status: str, **extra: Any) -> Dict[str, Any]:
+    result = {"row": row, "username": username, "status": status}
+    result.update(extra)
+    return result
+
+
+async def _existing_usernames(usernames: List[str]) -> Set[str]:
+    """One set-based lookup for a whole batch of usernames"""
+    if not usernames:
+        return set()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Tenant.username).where(Tenant.username.in_(usernames)))
+        return set(result.scalars().all())
+
+
+async def _import_batch(
+    batch: List[Tuple[int, Any]],
+    schema: Type[BaseModel],
+    pool: ProcessPoolExecutor,
+    workers: int
+) -> List[Dict[str, Any]]:
+    """
+    Validate, deduplicate, prepare and insert one batch
+    
+    Args:
+        batch: (row number, record) pairs
+        schema: Pydantic model validating a row (e.g. TenantCreate)
+        pool: Import worker pool
+        workers: Number of worker processes
+    
+    Returns:
+        Per-row results of the batch
+    """
+    results: Dict[int, Dict[str, Any]] = {}
+    valid: List[Tuple[int, BaseModel]] = []
+    seen: Set[str] = set()
+    
+    for row, record in batch:
+        if isinstance(record, Exception):
+            results[row] = _result(row, None, "invalid", error=str(record))
+            continue
+        username = record.get("username") if isinstance(record, dict) else None
+        try:
+            data = schema(**record)
+        except (TypeError, ValidationError) as e:
+            error = e.errors()[0]["msg"] if isinstance(e, ValidationError) else str(e)
+            results[row] = _result(row, username, "invalid", error=error)
+            continue
+        if data.username in seen:
+            results[row] = _result(row, data.username, "duplicate", error="Duplicate username in import")
+            continue
+        seen.add(data.username)
+        valid.append((row, data))
+    
+    existing = await _existing_usernames([data.username for _, data in valid])
+    pending: List[Tuple[int, BaseModel]] = []
+    for row, data in valid:
+        if data.username in existing:
+            results[row] = _result(row, data.username, "duplicate", error="Username already exists")
+        else:
+            pending.append((row, data))
+    
+    if pending:
+        # Hash + encrypt in parallel, one chunk per worker
+        loop = asyncio.get_running_loop()
+        items = [(data.password, data.openai_api_key) for _, data in pending]
+        chunk_size = max(1, -(-len(items) // workers))
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        prepared = [
+            pair
+            for chunk in await asyncio.gather(
+                *(loop.run_in_executor(pool, _prepare_credentials, chunk) for chunk in chunks)
+            )
+            for pair in chunk
+        ]
+        
+        rows = [
+            {
+                "username": data.username,
+                "password_hash": password_hash,
+                "business_name": data.business_name,
+                "openai_api_key": encrypted_key,
+                "system_prompt": data.system_prompt,
+            }
+            for (_, data), (password_hash, encrypted_key) in zip(pending, prepared)
+        ]
+        row_numbers = {data.username: row for row, data in pending}
+        
+        def _insert(session: Session) -> List[Tuple[int, str]]:
+            result = session.execute(insert(Tenant).returning(Tenant.id, Tenant.username), rows)
+            return [tuple(r) for r in result.all()]
+        
+        try:
+            inserted = await write_queue.run(_insert)
+        except IntegrityError:
+            # A username was taken concurrently: drop the taken ones and retry once
+            taken = await _existing_usernames([row["username"] for row in rows])
+            for username in taken:
+                row = row_numbers[username]
+                results[row] = _result(row, username, "duplicate", error="Username already exists")
+            rows = [row for row in rows if row["username"] not in taken]
+            inserted = await write_queue.run(_insert) if rows else []
+        
+        for tenant_id, username in inserted:
+            row = row_numbers[username]
+            results[row] = _result(row, username, "created", id=tenant_id)
+    
+    return [results[row] for row in sorted(results)]
+
+
+async def import_tenants(
+    records: AsyncIterator[Tuple[int, Any]],
+    schema: Type[BaseModel],
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Import tenants from a stream of parsed records
+    
+    Args:
+        records: (row number, record) pairs, see parse_records()
+        schema: Pydantic model validating a row (e.g. TenantCreate)
+        batch_size: Rows per transaction (defaults to BULK_IMPORT_BATCH_SIZE)
+        workers: Hashing processes of a dedicated pool for this import
+            (default: the shared import_pool)
+    
+    Returns:
+        Summary counts and per-row results
+    """
+    batch_size = batch_size or settings.BULK_IMPORT_BATCH_SIZE
+    results: List[Dict[str, Any]] = []
+    
+    dedicated = workers is not None
+    pool = _start_pool(workers) if dedicated else import_pool.get()
+    workers = workers or import_pool.max_workers
+    try:
+        batch: List[Tuple[int, Any]] = []
+        async for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                results.extend(await _import_batch(batch, schema, pool, workers))
+                batch = []
+        if batch:
+            results.extend(await _import_batch(batch, schema, pool, workers))
+    finally:
+        if dedicated:
+            pool.shutdown(wait=True)
+    
+    summary: Dict[str, Any] = {"total": len(results)}
+    for status in ("created", "duplicate", "invalid"):
+        summary[status] = sum(1 for result in results if result["status"] == status)
+    summary["results"] = results
+    
+    logger.info(
+        f"Bulk import finished: {summary['created']} created, "
+        f"{summary['duplicate']} duplicates, {summary['invalid']} invalid"
+    )
+    return summary
+
+
+# Global import pool instance
+import_pool = ImportWorkerPool(max_workers=settings.BULK_IMPORT_WORKERS)
@@ -0,0 +1,160 @@
+"""
+Turkish text normalization
+Shared by the search index and snippet building so indexed and queried text fold the same way
+"""
+from functools import lru_cache
+from typing import Dict, List
+import re
+import unicodedata
+
+
+# Turkish dotted/dotless I variants all fold to plain "i" (unicode61 would keep "ı" distinct)
+_TURKISH_I = {"I": "i", "İ": "i", "ı": "i"}
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def _build_fold_table() -> Dict[int, str]:
+    """
+    Per-character fold table for Latin scripts: lowercase and strip diacritics
+    
+    Every character maps to exactly one character, so offsets in folded text
+    are valid offsets in the original text.
+    
+    Returns:
+        Translation table for str.translate
+    """
+    table: Dict[int, str] = {}
+    for codepoint in range(0x250):
+        char = chr(codepoint)
+        folded = _TURKISH_I.get(char)
+        if folded is None:
+            lowered = char.lower()
+            folded = lowered if len(lowered) == 1 else char
+            base = unicodedata.normalize("NFD", folded)[0]
+            if base != folded and base.isalpha():
+                folded = base
+        if folded != char:
+            table[codepoint] = folded
+    return table
+
+
+_FOLD_TABLE = _build_fold_table()
+
+
+def fold_text(text: str) -> str:
+    """
+    Fold text for matching: Turkish-aware lowercase without diacritics
+    
+    "İSTANBUL", "Istanbul" and "ıstanbul" all become "istanbul", "Şişli" becomes "sisli".
+    The result has the same length as the input.
+    
+    Args:
+        text: Original text
+    
+    Returns:
+        Folded text
+    """
+    folded = text.translate(_FOLD_TABLE)
+    lowered = folded.lower()
+    return lowered if len(lowered) == len(folded) else folded
+
+
+def word_tokens(text: str) -> List[str]:
+    """
+    Folded word tokens of a text (query parsing)
+    
+    Args:
+        text: Original text
+    
+    Returns:
+        List of folded words
+    """
+    return WORD_PATTERN.findall(fold_text(text))
+
+
+# Frequent function words (folded), they carry no meaning for retrieval
+TURKISH_STOPWORDS = frozenset(
+    "acaba ama ancak bana ben beni bir biraz bize biz bu da daha de diye en gibi hem hep her "
+    "icin ile ise ki kim mi mu nasil ne neden nerede o olan olarak ona onu sen seni siz size "
+    "sey su ve veya ya yani".split()
+)
+
+# Inflectional suffixes in folded form; Turkish word order is stem + plural + possessive + case
+_CASE_SUFFIXES = (
+    "ndaki ndeki ndan nden daki deki dan den tan ten nin nun nda nde yla yle "
+    "la le da de ta te ya ye yi yu na in un i u a e"
+).split()
+_POSSESSIVE_SUFFIXES = "imiz umuz iniz unuz miz muz niz nuz si su im um in un i u".split()
+_PLURAL_SUFFIXES = ("lar", "ler")
+_VOWELS = "aeiou"
+MIN_STEM_LENGTH = 3
+
+
+def _build_suffix_chains() -> List[str]:
+    """All plural + possessive + case combinations, longest first"""
+    chains = {
+        plural + possessive + case
+        for plural in ("",) + _PLURAL_SUFFIXES
+        for possessive in [""] + _POSSESSIVE_SUFFIXES
+        for case in [""] + _CASE_SUFFIXES
+    }
+    chains.discard("")
+    return sorted(chains, key=lambda chain: (-len(chain), chain))
+
+
+_SUFFIX_CHAINS = _build_suffix_chains()
+
+
+def _can_strip(stem: str, chain: str) -> bool:
+    """Whether removing a suffix chain leaves a plausible stem"""
+    if len(stem) < MIN_STEM_LENGTH:
+        return False
+    # "hasta" is not "has" + "ta"
+    if chain[0] in "dt" and len(stem) <= MIN_STEM_LENGTH:
+        return False
+    # Instrumental "la"/"le" follows consonants only ("kanala" is "kanal" + "a")
+    if chain[0] == "l" and not chain.startswith(_PLURAL_SUFFIXES) and stem[-1] in _VOWELS:
+        return False
+    return True
+
+
+@lru_cache(maxsize=65536)
+def stem_lite(word: str) -> str:
+    """
+    Light Turkish stemmer for folded words
+    
+    Removes the longest plausible plural + possessive + case suffix chain, undoes
+    the k -> ğ softening and drops a final vowel, so "doktorlarimiz" and "doktor",
+    "dolgusu" and "dolgu", "klinigimiz" and "klinik" share a stem while "pazartesi"
+    stays apart from "pazar". Not a morphological analyzer: it only has to map the
+    common inflected forms of a word to the same key for indexed text and queries alike.
+    
+    Args:
+        word: Folded word (fold_text)
+    
+    Returns:
+        Stem
+    """
+    for chain in _SUFFIX_CHAINS:
+        if word.endswith(chain) and _can_strip(word[:-len(chain)], chain):
+            word = word[:-len(chain)]
+            if chain[0] in _VOWELS and word.endswith("g") and word[-2] in _VOWELS:
+                word = word[:-1] + "k"
+            break
+    if word[-1:] in _VOWELS and len(word) > MIN_STEM_LENGTH:
+        word = word[:-1]
+    return word
+
+
+def analyze(text: str) -> List[str]:
+    """
+    Retrieval terms of a text: folded words without stopwords, stemmed
+    
+    Args:
+        text: Original text
+    
+    Returns:
+        List of terms (in text order, with repetitions)
+    """
+    return [stem_lite(word) for word in word_tokens(text) if word not in TURKISH_STOPWORDS]
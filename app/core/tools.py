@@ -0,0 +1,516 @@
+"""
+Assistant Tools
+Local functions the assistant can call through OpenAI tool calls: services, availability,
+booking, cancelling and clinic hours. Read-only tools answer from the cached availability
+index, so a tool round trip costs microseconds next to the model call.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import json
+import logging
+import re
+import time
+
+from app.core.appointments import (
+    TURKISH_WEEKDAYS,
+    AppointmentError,
+    BookingConflictError,
+    appointment_book,
+    format_clock,
+)
+from app.core.config import settings
+from app.core.redaction import Redaction, pii_redactor
+from app.models.appointment import BOOKED
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Most slots a single availability call returns
+MAX_SLOTS = 10
+
+# (call ID, tool name, JSON arguments) as sent by the model
+ToolCall = Tuple[str, str, str]
+
+
+class ToolError(Exception):
+    """Raised by a tool for a failure the model should explain to the user"""
+    pass
+
+
+class ToolContext:
+    """
+    Request state a tool runs with (never taken from the model's arguments)
+    """
+    
+    def __init__(
+        self,
+        tenant_id: int,
+        conversation_id: Optional[str] = None,
+        redaction: Optional[Redaction] = None
+    ):
+        """
+        Args:
+            tenant_id: Tenant of the conversation
+            conversation_id: Client conversation ID (recorded on bookings)
+            redaction: Placeholders of the request (arguments are restored, results redacted)
+        """
+        self.tenant_id = tenant_id
+        self.conversation_id = conversation_id
+        self.redaction = redaction
+
+
+class Tool:
+    """
+    A local function exposed to the model
+    """
+    
+    def __init__(self, name: str, description: str, parameters: Dict[str, Any], handler: Callable[..., Any]):
+        """
+        Args:
+            name: Function name the model calls
+            description: What the function does (shown to the model)
+            parameters: JSON schema of the arguments
+            handler: fn(context, **arguments) returning a JSON-serializable result
+        """
+        self.name = name
+        self.description = description
+        self.parameters = parameters
+        self.handler = handler
+    
+    @property
+    def schema(self) -> Dict[str, Any]:
+        """OpenAI tool definition"""
+        return {
+            "type": "function",
+            "function": {"name": self.name, "description": self.description, "parameters": self.parameters},
+        }
+
+
+class ToolRegistry:
+    """
+    Registered tools and the executor running them
+    
+    Calls never raise: bad arguments, tool errors and crashes become an {"error": ...}
+    result, so the model can recover or tell the user instead of failing the chat.
+    Parallel calls of one model turn run concurrently.
+    """
+    
+    def __init__(self, workers: int):
+        """
+        Args:
+            workers: Threads running parallel tool calls
+        """
+        self._tools: Dict[str, Tool] = {}
+        self._schemas: Optional[List[Dict[str, Any]]] = None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-tool")
+    
+    def register(self, name: str, description: str, parameters: Dict[str, Any]) -> Callable:
+        """
+        Decorator registering a tool handler
+        
+        Args:
+            name: Function name the model calls
+            description: What the function does
+            parameters: JSON schema of the arguments
+        
+        Returns:
+            Decorator returning the handler unchanged
+        """
+        def _register(handler: Callable[..., Any]) -> Callable[..., Any]:
+            self._tools[name] = Tool(name, description, parameters, handler)
+            self._schemas = None
+            return handler
+        return _register
+    
+    def schemas(self) -> List[Dict[str, Any]]:
+        """OpenAI tool definitions of all tools (built once)"""
+        if self._schemas is None:
+            self._schemas = [tool.schema for tool in self._tools.values()]
+        return self._schemas
+    
+    def run(self, context: ToolContext, name: str, arguments: str) -> str:
+        """
+        Run one tool call
+        
+        Args:
+            context: Request state
+            name: Tool name
+            arguments: JSON arguments from the model
+        
+        Returns:
+            JSON result for the tool message
+        """
+        started = time.perf_counter()
+        tool = self._tools.get(name)
+        redaction = context.redaction
+        if redaction is not None:
+            # The model only saw placeholders: the tools get the real phone number back
+            arguments = redaction.restore(arguments)
+        try:
+            if tool is None:
+                raise ToolError(f"Bilinmeyen araç: {name}")
+            try:
+                parsed = json.loads(arguments) if arguments else {}
+            except json.JSONDecodeError:
+                raise ToolError("Araç argümanları geçerli JSON değil")
+            if not isinstance(parsed, dict):
+                raise ToolError("Araç argümanları bir nesne olmalıdır")
+            try:
+                result = tool.handler(context, **parsed)
+            except TypeError as e:
+                raise ToolError(f"Geçersiz araç argümanları: {e}")
+        except (ToolError, AppointmentError) as e:
+            result = {"error": str(e)}
+        except Exception as e:
+            logger.exception(f"Tool {name} failed for tenant {context.tenant_id}: {e}")
+            result = {"error": "İşlem şu anda yapılamıyor"}
+        
+        logger.debug(f"Tool {name} for tenant {context.tenant_id}: {(time.perf_counter() - started) * 1000:.2f} ms")
+        output = json.dumps(result, ensure_ascii=False, separators=(",", ":"), default=str)
+        if redaction is not None:
+            output = pii_redactor.redact(output, redaction)
+        return output
+    
+    def submit(self, context: ToolContext, name: str, arguments: str) -> "Future[str]":
+        """Run a tool call on the executor, see run()"""
+        return self._executor.submit(self.run, context, name, arguments)
+    
+    def run_all(self, context: ToolContext, calls: Sequence[ToolCall]) -> List[str]:
+        """
+        Run the tool calls of one model turn, concurrently if there are several
+        
+        Args:
+            context: Request state
+            calls: Tool calls in the model's order
+        
+        Returns:
+            JSON results in the same order
+        """
+        if len(calls) == 1:
+            # No thread hop for the common single call
+            _, name, arguments = calls[0]
+            return [self.run(context, name, arguments)]
+        futures = [self.submit(context, name, arguments) for _, name, arguments in calls]
+        return [future.result() for future in futures]
+
+
+class StreamedToolCalls:
+    """
+    Assembles tool calls from streamed deltas
+    
+    The model streams parallel calls one after another, each as an ID and name
+    followed by argument fragments. When the next call starts, the previous one's
+    arguments are complete and it is started right away, so the tools run while
+    the model is still writing the remaining calls.
+    """
+    
+    def __init__(self, registry: ToolRegistry, context: ToolContext):
+        """
+        Args:
+            registry: Registry running the calls
+            context: Request state
+        """
+        self.registry = registry
+        self.context = context
+        self._ids: List[str] = []
+        self._names: List[str] = []
+        self._arguments: List[List[str]] = []
+        self._futures: List["Future[str]"] = []
+    
+    def __bool__(self) -> bool:
+        return bool(self._ids)
+    
+    def add(self, deltas: Sequence[Any]) -> None:
+        """
+        Add the tool call deltas of one stream chunk
+        
+        Args:
+            deltas: ChoiceDeltaToolCall objects (index, id, function.name, function.arguments)
+        """
+        for delta in deltas:
+            while delta.index >= len(self._ids):
+                # A new call begins: every call before it is complete
+                self._start(len(self._ids))
+                self._ids.append("")
+                self._names.append("")
+                self._arguments.append([])
+            if delta.id:
+                self._ids[delta.index] = delta.id
+            function = delta.function
+            if function is not None:
+                if function.name:
+                    self._names[delta.index] += function.name
+                if function.arguments:
+                    self._arguments[delta.index].append(function.arguments)
+    
+    def _start(self, count: int) -> None:
+        """Submit the complete calls before position count that are not running yet"""
+        while len(self._futures) < count:
+            position = len(self._futures)
+            self._futures.append(
+                self.registry.submit(self.context, self._names[position], "".join(self._arguments[position]))
+            )
+    
+    @property
+    def calls(self) -> List[ToolCall]:
+        """Assembled calls"""
+        return [
+            (call_id, name, "".join(fragments))
+            for call_id, name, fragments in zip(self._ids, self._names, self._arguments)
+        ]
+    
+    def results(self) -> List[str]:
+        """
+        Run the remaining calls and wait for all results (call after the stream ends)
+        
+        Returns:
+            JSON results in call order
+        """
+        if not self._futures and len(self._ids) == 1:
+            return self.registry.run_all(self.context, self.calls)
+        self._start(len(self._ids))
+        return [future.result() for future in self._futures]
+
+
+def assistant_tool_message(content: Optional[str], calls: Sequence[ToolCall]) -> Dict[str, Any]:
+    """
+    Assistant message carrying tool calls, to send back with the results
+    
+    Args:
+        content: Text the model wrote before the calls
+        calls: Tool calls
+    
+    Returns:
+        Chat message dictionary
+    """
+    return {
+        "role": "assistant",
+        "content": content or None,
+        "tool_calls": [
+            {"id": call_id, "type": "function", "function": {"name": name, "arguments": arguments}}
+            for call_id, name, arguments in calls
+        ],
+    }
+
+
+def tool_messages(calls: Sequence[ToolCall], results: Sequence[str]) -> List[Dict[str, Any]]:
+    """
+    Tool result messages
+    
+    Args:
+        calls: Tool calls
+        results: JSON results in the same order
+    
+    Returns:
+        Chat message dictionaries
+    """
+    return [
+        {"role": "tool", "tool_call_id": call_id, "content": result}
+        for (call_id, _, _), result in zip(calls, results)
+    ]
+
+
+def appointment_tools_for(tenant_id: int) -> Optional[List[Dict[str, Any]]]:
+    """
+    Tool definitions to offer a tenant's assistant
+    
+    Tools are only offered when the tenant has bookable services, so other
+    tenants do not pay the tool definition tokens on every message.
+    
+    Args:
+        tenant_id: Tenant ID
+    
+    Returns:
+        OpenAI tool definitions, None if the tenant gets no tools
+    """
+    if not settings.AI_TOOLS_ENABLED:
+        return None
+    try:
+        if not appointment_book.availability(tenant_id).services:
+            return None
+    except Exception as e:
+        # Answer without tools rather than failing the chat
+        logger.error(f"Availability lookup failed for tenant {tenant_id}: {e}")
+        return None
+    return tool_registry.schemas()
+
+
+def tool_instructions() -> str:
+    """
+    System prompt addition for assistants with tools: the clinic's current date and the booking rules
+    
+    Returns:
+        Prompt text
+    """
+    now = appointment_book.now()
+    return (
+        f"Şu an: {now:%d.%m.%Y} {TURKISH_WEEKDAYS[now.weekday()]}, saat {now:%H:%M}. "
+        "Randevu işlemleri için araçları kullan. Müsaitliğe bakmadan saat önerme. "
+        "Randevu oluşturmadan önce hizmeti, saati, müşterinin adını ve telefonunu netleştir. "
+        "Araç bir hata döndürürse bunu kullanıcıya kısaca açıkla."
+    )
+
+
+def _parse_time(value: Optional[str], field: str) -> Optional[datetime]:
+    """Parse an ISO date or date-time argument"""
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        raise ToolError(f"{field} YYYY-AA-GGTSS:DD biçiminde olmalıdır")
+
+
+def _phone_digits(value: Optional[str]) -> str:
+    """Last 10 digits of a phone number (ignores the country prefix and formatting)"""
+    return re.sub(r"\D", "", value or "")[-10:]
+
+
+# Global tool registry instance
+tool_registry = ToolRegistry(workers=settings.AI_TOOL_WORKERS)
+
+
+@tool_registry.register(
+    "list_services",
+    "Kliniğin randevu alınabilen hizmetlerini süre ve fiyatlarıyla listeler.",
+    {"type": "object", "properties": {}},
+)
+def list_services(context: ToolContext) -> Dict[str, Any]:
+    """Bookable services of the tenant"""
+    index = appointment_book.availability(context.tenant_id)
+    return {
+        "services": [
+            {
+                "id": service_id,
+                "name": service["name"],
+                "duration_minutes": service["duration_minutes"],
+                "price_tl": service.get("price"),
+            }
+            for service_id, service in index.services.items()
+        ]
+    }
+
+
+@tool_registry.register(
+    "check_availability",
+    "Bir hizmet için en yakın boş randevu saatlerini verir.",
+    {
+        "type": "object",
+        "properties": {
+            "service_id": {"type": "integer", "description": "list_services sonucundaki hizmet ID'si"},
+            "after": {"type": "string", "description": "Bu zamandan sonrası, YYYY-AA-GG veya YYYY-AA-GGTSS:DD (boş = şimdi)"},
+            "staff_id": {"type": "integer", "description": "Sadece bu personel"},
+            "limit": {"type": "integer", "description": f"En fazla kaç saat (1-{MAX_SLOTS}, varsayılan 5)"},
+        },
+        "required": ["service_id"],
+    },
+)
+def check_availability(
+    context: ToolContext,
+    service_id: int,
+    after: Optional[str] = None,
+    staff_id: Optional[int] = None,
+    limit: int = 5
+) -> Dict[str, Any]:
+    """Next free times for a service"""
+    slots = appointment_book.find_slots(
+        context.tenant_id,
+        service_id,
+        after=_parse_time(after, "after"),
+        limit=max(1, min(int(limit), MAX_SLOTS)),
+        staff_id=staff_id
+    )
+    return {"slots": slots}
+
+
+@tool_registry.register(
+    "book_appointment",
+    "Randevu oluşturur. Saat check_availability ile bulunmuş olmalıdır.",
+    {
+        "type": "object",
+        "properties": {
+            "service_id": {"type": "integer"},
+            "start": {"type": "string", "description": "Başlangıç, YYYY-AA-GGTSS:DD"},
+            "customer_name": {"type": "string"},
+            "customer_phone": {"type": "string"},
+            "staff_id": {"type": "integer", "description": "Personel (boş = uygun olan ilk personel)"},
+        },
+        "required": ["service_id", "start", "customer_name", "customer_phone"],
+    },
+)
+def book_appointment(
+    context: ToolContext,
+    service_id: int,
+    start: str,
+    customer_name: str,
+    customer_phone: Optional[str] = None,
+    staff_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """Book an appointment, with alternatives when the time is taken"""
+    start_at = _parse_time(start, "start")
+    try:
+        booking = appointment_book.book(
+            context.tenant_id,
+            service_id,
+            start_at,
+            customer_name=customer_name.strip(),
+            customer_phone=customer_phone,
+            staff_id=staff_id,
+            conversation_id=context.conversation_id
+        )
+    except BookingConflictError as e:
+        # Offer the next times in the same answer instead of another round trip
+        alternatives = appointment_book.find_slots(context.tenant_id, service_id, after=start_at, limit=3, staff_id=staff_id)
+        return {"error": str(e), "alternatives": alternatives}
+    index = appointment_book.availability(context.tenant_id)
+    return {"booking": {**booking, "staff": index.staff.get(booking["staff_id"])}}
+
+
+@tool_registry.register(
+    "cancel_appointment",
+    "Randevuyu iptal eder. Randevuyu alan telefon numarası gerekir.",
+    {
+        "type": "object",
+        "properties": {
+            "booking_id": {"type": "integer"},
+            "customer_phone": {"type": "string", "description": "Randevudaki telefon numarası"},
+        },
+        "required": ["booking_id"],
+    },
+)
+def cancel_appointment(context: ToolContext, booking_id: int, customer_phone: Optional[str] = None) -> Dict[str, Any]:
+    """Cancel a booking made in this conversation or under the given phone number"""
+    booking = appointment_book.get_booking(context.tenant_id, booking_id)
+    if booking is None or booking["status"] != BOOKED:
+        raise ToolError("Aktif randevu bulunamadı")
+    same_conversation = context.conversation_id is not None and booking["conversation_id"] == context.conversation_id
+    same_phone = bool(_phone_digits(customer_phone)) and _phone_digits(customer_phone) == _phone_digits(booking["customer_phone"])
+    if not (same_conversation or same_phone):
+        raise ToolError("Randevu bilgileri doğrulanamadı, randevudaki telefon numarası gerekli")
+    cancelled = appointment_book.cancel(context.tenant_id, booking_id)
+    if cancelled is None:
+        raise ToolError("Aktif randevu bulunamadı")
+    return {"cancelled": {"id": cancelled["id"], "start_at": cancelled["start_at"]}}
+
+
+@tool_registry.register(
+    "clinic_hours",
+    "Kliniğin haftalık çalışma saatlerini verir.",
+    {"type": "object", "properties": {}},
+)
+def clinic_hours(context: ToolContext) -> Dict[str, Any]:
+    """Opening hours per weekday"""
+    opening = appointment_book.availability(context.tenant_id).opening_hours()
+    return {
+        "timezone": settings.APPOINTMENT_TIMEZONE,
+        "days": [
+            {
+                "day": TURKISH_WEEKDAYS[weekday],
+                "open": format_clock(opening[weekday][0]) if weekday in opening else None,
+                "close": format_clock(opening[weekday][1]) if weekday in opening else None,
+            }
+            for weekday in range(7)
+        ],
+    }
@@ -0,0 +1,280 @@
+"""
+Token usage metering and quota enforcement
+Usage is counted in memory, flushed periodically to the usage_daily rollup and checked without database access
+"""
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+import atexit
+import logging
+import threading
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.write_queue import write_queue
+from app.models.usage import UsageDaily
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class QuotaExceededError(Exception):
+    """Raised when a tenant has used up its daily or monthly token quota"""
+    
+    def __init__(self, period: str, used: int, quota: int):
+        self.period = period
+        self.used = used
+        self.quota = quota
+        super().__init__(f"{period.capitalize()} token quota exceeded ({used}/{quota})")
+
+
+def _today() -> date:
+    """Current UTC day (usage periods are UTC)"""
+    return datetime.now(timezone.utc).date()
+
+
+class UsageMeter:
+    """
+    In-memory per-tenant token counters backed by the usage_daily rollup
+    
+    For every tenant the meter keeps today's and this month's totals. record()
+    adds to them and to a pending delta; check() compares the totals with the
+    quotas, both dictionary lookups. A background thread upserts the pending
+    deltas every flush_seconds and reloads the totals of the flushed tenants,
+    so usage recorded by other worker processes is picked up at the same pace.
+    Totals of all tenants for the current month are loaded once at start; if
+    that fails, quotas fail open (counting from zero) and the flusher thread
+    retries the load.
+    """
+    
+    def __init__(self, flush_seconds: float = 5.0):
+        """
+        Initialize usage meter
+        
+        Args:
+            flush_seconds: Interval between flushes of pending usage
+        """
+        self.flush_seconds = flush_seconds
+        self._day = _today()
+        self._daily: Dict[int, int] = defaultdict(int)
+        self._monthly: Dict[int, int] = defaultdict(int)
+        self._pending: Dict[Tuple[int, date], List[int]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loaded = False
+        self._load_failed = False
+    
+    def start(self) -> None:
+        """Load current totals and start the flusher thread (idempotent)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="usage-flusher", daemon=True)
+            if not self._loaded:
+                self._try_load()
+            self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop the flusher thread and write pending usage"""
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(10.0)
+        self.flush()
+    
+    def _try_load(self) -> None:
+        """Load the totals, failing open on errors (caller holds the lock)"""
+        try:
+            self._load()
+            self._load_failed = False
+        except Exception as e:
+            logger.warning(f"Usage meter could not load token totals, quotas are not enforced until it can: {e}")
+            self._loaded = True
+            self._load_failed = True
+    
+    def _load(self) -> None:
+        """Load today's and this month's totals of all tenants (caller holds the lock)"""
+        today = _today()
+        total = UsageDaily.prompt_tokens + UsageDaily.completion_tokens
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(
+                    UsageDaily.tenant_id,
+                    func.sum(total),
+                    func.sum(total).filter(UsageDaily.day == today)
+                )
+                .where(UsageDaily.day >= today.replace(day=1))
+                .group_by(UsageDaily.tenant_id)
+            ).all()
+        
+        self._day = today
+        self._daily = defaultdict(int, {tenant_id: daily or 0 for tenant_id, _, daily in rows})
+        self._monthly = defaultdict(int, {tenant_id: monthly or 0 for tenant_id, monthly, _ in rows})
+        # Usage recorded while a failed load was retried is not stored yet
+        for (tenant_id, day), counts in self._pending.items():
+            if day == today:
+                self._daily[tenant_id] += counts[1] + counts[2]
+            if day >= today.replace(day=1):
+                self._monthly[tenant_id] += counts[1] + counts[2]
+        self._loaded = True
+        logger.info(f"Usage meter loaded totals of {len(rows)} tenants")
+    
+    def _roll_period(self, today: date) -> None:
+        """Reset counters when the UTC day or month changed (caller holds the lock)"""
+        if today == self._day:
+            return
+        if (today.year, today.month) != (self._day.year, self._day.month):
+            self._monthly = defaultdict(int)
+        self._daily = defaultdict(int)
+        self._day = today
+    
+    def record(self, tenant_id: int, prompt_tokens: int, completion_tokens: int) -> None:
+        """
+        Count the tokens of one upstream call
+        
+        Args:
+            tenant_id: Tenant ID
+            prompt_tokens: Prompt tokens reported by the provider
+            completion_tokens: Completion tokens reported by the provider
+        """
+        if not self._loaded:
+            self.start()
+        
+        today = _today()
+        tokens = prompt_tokens + completion_tokens
+        with self._lock:
+            self._roll_period(today)
+            self._daily[tenant_id] += tokens
+            self._monthly[tenant_id] += tokens
+            pending = self._pending.setdefault((tenant_id, today), [0, 0, 0])
+            pending[0] += 1
+            pending[1] += prompt_tokens
+            pending[2] += completion_tokens
+    
+    def usage(self, tenant_id: int) -> Dict[str, int]:
+        """
+        Current totals of a tenant
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            Dictionary with daily_tokens and monthly_tokens
+        """
+        if not self._loaded:
+            self.start()
+        with self._lock:
+            self._roll_period(_today())
+            return {"daily_tokens": self._daily.get(tenant_id, 0), "monthly_tokens": self._monthly.get(tenant_id, 0)}
+    
+    def check(self, tenant_id: int, daily_quota: Optional[int], monthly_quota: Optional[int]) -> None:
+        """
+        Reject a call if the tenant already used up a quota (no database access)
+        
+        Args:
+            tenant_id: Tenant ID
+            daily_quota: Daily token quota (None = unlimited)
+            monthly_quota: Monthly token quota (None = unlimited)
+        
+        Raises:
+            QuotaExceededError: If a quota is reached
+        """
+        if daily_quota is None and monthly_quota is None:
+            return
+        
+        usage = self.usage(tenant_id)
+        if daily_quota is not None and usage["daily_tokens"] >= daily_quota:
+            raise QuotaExceededError("daily", usage["daily_tokens"], daily_quota)
+        if monthly_quota is not None and usage["monthly_tokens"] >= monthly_quota:
+            raise QuotaExceededError("monthly", usage["monthly_tokens"], monthly_quota)
+    
+    def flush(self) -> None:
+        """Write pending usage to the rollup and refresh the flushed tenants' totals"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        
+        rows = [
+            {
+                "tenant_id": tenant_id,
+                "day": day,
+                "requests": counts[0],
+                "prompt_tokens": counts[1],
+                "completion_tokens": counts[2],
+            }
+            for (tenant_id, day), counts in pending.items()
+        ]
+        tenant_ids = sorted({row["tenant_id"] for row in rows})
+        today = _today()
+        
+        def _upsert(session: Session) -> List[Tuple[int, int, int]]:
+            stmt = sqlite_insert(UsageDaily)
+            session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[UsageDaily.tenant_id, UsageDaily.day],
+                    set_={
+                        "requests": UsageDaily.requests + stmt.excluded.requests,
+                        "prompt_tokens": UsageDaily.prompt_tokens + stmt.excluded.prompt_tokens,
+                        "completion_tokens": UsageDaily.completion_tokens + stmt.excluded.completion_tokens,
+                    }
+                ),
+                rows
+            )
+            total = UsageDaily.prompt_tokens + UsageDaily.completion_tokens
+            return session.execute(
+                select(
+                    UsageDaily.tenant_id,
+                    func.sum(total),
+                    func.sum(total).filter(UsageDaily.day == today)
+                )
+                .where(UsageDaily.tenant_id.in_(tenant_ids), UsageDaily.day >= today.replace(day=1))
+                .group_by(UsageDaily.tenant_id)
+            ).all()
+        
+        try:
+            totals = write_queue.submit(_upsert).result()
+        except Exception as e:
+            logger.error(f"Failed to flush token usage of {len(tenant_ids)} tenants: {e}")
+            with self._lock:
+                for key, counts in pending.items():
+                    merged = self._pending.setdefault(key, [0, 0, 0])
+                    for i, value in enumerate(counts):
+                        merged[i] += value
+            return
+        
+        # Adopt the stored totals (they include other processes' usage) plus what arrived meanwhile
+        with self._lock:
+            self._roll_period(today)
+            if self._day != today:
+                return
+            unflushed: Dict[int, int] = defaultdict(int)
+            for (tenant_id, _), counts in self._pending.items():
+                unflushed[tenant_id] += counts[1] + counts[2]
+            for tenant_id, monthly, daily in totals:
+                self._daily[tenant_id] = (daily or 0) + unflushed[tenant_id]
+                self._monthly[tenant_id] = (monthly or 0) + unflushed[tenant_id]
+    
+    def _run(self) -> None:
+        """Flusher thread main loop"""
+        while not self._stop.wait(self.flush_seconds):
+            if self._load_failed:
+                with self._lock:
+                    self._try_load()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Usage flush failed: {e}")
+
+
+# Global usage meter instance
+usage_meter = UsageMeter(flush_seconds=settings.USAGE_FLUSH_SECONDS)
+
+# Write pending usage on interpreter shutdown (runs before the write queue is drained)
+atexit.register(usage_meter.stop)
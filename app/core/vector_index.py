@@ -0,0 +1,377 @@
+"""
+Vector index
+Per-tenant embedding matrices persisted as versioned .npy files and memory-mapped for cosine top-k search
+"""
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+import uuid
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.embeddings import normalize_rows
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+POINTER_FILE = "CURRENT"
+KEEP_VERSIONS = 2  # The previous version stays for readers that still map it
+
+# Rows scored per matrix product while partitioning (bounds temporary memory)
+ASSIGN_CHUNK_ROWS = 8192
+# Vectors k-means is trained on per partition (the rest are only assigned)
+TRAIN_ROWS_PER_LIST = 64
+
+
+class VectorIndexError(Exception):
+    """Custom exception for vector index errors"""
+    pass
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k highest scores, best first
+    
+    argpartition selects the k best in linear time, only those k are sorted.
+    
+    Args:
+        scores: 1-D score array
+        k: Number of positions
+    
+    Returns:
+        Array of positions
+    """
+    if k <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        best = np.argpartition(-scores, k - 1)[:k]
+    else:
+        best = np.arange(len(scores))
+    return best[np.argsort(-scores[best], kind="stable")]
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Closest centroid (by cosine) of every vector"""
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_CHUNK_ROWS):
+        chunk = vectors[start:start + ASSIGN_CHUNK_ROWS]
+        assignment[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignment
+
+
+def train_partitions(vectors: np.ndarray, lists: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means centroids of an IVF index
+    
+    Args:
+        vectors: Unit-length vectors
+        lists: Number of partitions
+        iterations: k-means iterations
+        seed: Random seed (builds are reproducible)
+    
+    Returns:
+        float32 centroid matrix of shape (lists, dimensions)
+    """
+    rng = np.random.default_rng(seed)
+    if len(vectors) > lists * TRAIN_ROWS_PER_LIST:
+        vectors = vectors[np.sort(rng.choice(len(vectors), lists * TRAIN_ROWS_PER_LIST, replace=False))]
+    centroids = vectors[rng.choice(len(vectors), lists, replace=False)].copy()
+    
+    for _ in range(iterations):
+        assignment = _assign(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=lists)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        # Empty partitions keep their previous centroid
+        centroids[filled] = normalize_rows(np.add.reduceat(vectors[order], starts, axis=0))
+    return centroids
+
+
+class VectorIndex:
+    """
+    One version of a tenant's vector index
+    
+    vectors.npy is a contiguous float32 matrix of unit-length rows and ids.npy
+    the passage ID of every row. Both are opened with mmap, so the operating
+    system loads pages on demand and processes serving the same tenant share
+    them; opening an index costs a few system calls regardless of its size.
+    
+    An IVF index additionally stores k-means centroids and the rows sorted by
+    partition (offsets.npy holds partition boundaries); a query scores the
+    centroids first and then only the rows of the nprobe closest partitions.
+    
+    passages.json is a snapshot of the passages the version was built from, so
+    keyword search and vector search of a version always agree with each other.
+    """
+    
+    def __init__(self, path: Path):
+        """
+        Open an index version
+        
+        Args:
+            path: Version directory
+        
+        Raises:
+            VectorIndexError: If the files are missing or inconsistent
+        """
+        self.path = path
+        self.version = path.name
+        try:
+            self.meta: Dict[str, Any] = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+            self.vectors: np.ndarray = np.load(path / "vectors.npy", mmap_mode="r")
+            self.ids: np.ndarray = np.load(path / "ids.npy", mmap_mode="r")
+            self.centroids: Optional[np.ndarray] = None
+            self.offsets: Optional[np.ndarray] = None
+            if self.meta.get("lists"):
+                self.centroids = np.load(path / "centroids.npy")
+                self.offsets = np.load(path / "offsets.npy")
+            passages_file = path / "passages.json"
+            self.passages: Optional[List[Dict[str, Any]]] = (
+                json.loads(passages_file.read_text(encoding="utf-8")) if passages_file.exists() else None
+            )
+        except (OSError, ValueError) as e:
+            raise VectorIndexError(f"Cannot open vector index {path}: {e}")
+        if len(self.vectors) != len(self.ids):
+            raise VectorIndexError(f"Vector index {path} has {len(self.vectors)} vectors for {len(self.ids)} IDs")
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    @property
+    def identity(self) -> str:
+        """Embedding provider identity the vectors were built with"""
+        return self.meta.get("identity", "")
+    
+    def search(self, query: np.ndarray, k: int, nprobe: int = 8) -> List[Tuple[float, int]]:
+        """
+        Most similar rows to a query vector
+        
+        Args:
+            query: Unit-length query vector
+            k: Maximum number of results
+            nprobe: Partitions scanned (IVF indexes only)
+        
+        Returns:
+            (cosine similarity, passage ID) pairs, best first
+        """
+        if len(self) == 0:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        
+        if self.centroids is None:
+            scores = self.vectors @ query
+            best = top_k(scores, k)
+            return [(float(scores[row]), int(self.ids[row])) for row in best]
+        
+        probes = top_k(self.centroids @ query, nprobe)
+        rows = np.concatenate([
+            np.arange(self.offsets[probe], self.offsets[probe + 1]) for probe in probes
+        ])
+        if len(rows) == 0:
+            return []
+        # Partitions are contiguous, so each slice is a sequential read of the mapped file
+        scores = np.concatenate([
+            self.vectors[self.offsets[probe]:self.offsets[probe + 1]] @ query for probe in probes
+        ])
+        best = top_k(scores, k)
+        return [(float(scores[position]), int(self.ids[rows[position]])) for position in best]
+
+
+class VectorStore:
+    """
+    Versioned on-disk vector indexes of all tenants
+    
+    Layout: <root>/tenant_<id>/v<NNNNNN>/ with one directory per build and a
+    CURRENT file naming the active version. A build is written to a temporary
+    directory, renamed into place and then published by replacing CURRENT, so
+    readers see either the old or the new index, never a partial one. Every
+    lookup re-reads CURRENT (one small cached file) and switches to a newer
+    version as soon as it is published, in all worker processes.
+    """
+    
+    def __init__(self, root: str = "./vector_index", ivf_min_vectors: int = 20000, nprobe: int = 8,
+                 cache_size: int = 256):
+        """
+        Initialize vector store
+        
+        Args:
+            root: Directory of the tenant indexes
+            ivf_min_vectors: Vector count from which builds are partitioned
+            nprobe: Partitions scanned per IVF query
+            cache_size: Opened tenant indexes kept per process
+        """
+        self.root = Path(root)
+        self.ivf_min_vectors = ivf_min_vectors
+        self.nprobe = nprobe
+        self.cache_size = cache_size
+        self._indexes: "OrderedDict[int, VectorIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def tenant_dir(self, tenant_id: int) -> Path:
+        """Directory of a tenant's index versions"""
+        return self.root / f"tenant_{tenant_id}"
+    
+    def current_version(self, tenant_id: int) -> Optional[str]:
+        """
+        Active index version of a tenant
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            Version directory name, None if the tenant has no index
+        """
+        try:
+            return (self.tenant_dir(tenant_id) / POINTER_FILE).read_text(encoding="utf-8").strip() or None
+        except FileNotFoundError:
+            return None
+    
+    def current(self, tenant_id: int) -> Optional[VectorIndex]:
+        """
+        Active index of a tenant (opened on first use, reopened after a new version is published)
+        
+        Args:
+            tenant_id: Tenant ID
+        
+        Returns:
+            Index, None if the tenant has none or it cannot be opened
+        """
+        version = self.current_version(tenant_id)
+        if version is None:
+            return None
+        with self._lock:
+            index = self._indexes.get(tenant_id)
+            if index is not None and index.version == version:
+                self._indexes.move_to_end(tenant_id)
+                return index
+        
+        try:
+            index = VectorIndex(self.tenant_dir(tenant_id) / version)
+        except VectorIndexError as e:
+            logger.error(f"Vector index of tenant {tenant_id}: {e}")
+            return None
+        with self._lock:
+            self._indexes[tenant_id] = index
+            self._indexes.move_to_end(tenant_id)
+            while len(self._indexes) > self.cache_size:
+                self._indexes.popitem(last=False)
+        return index
+    
+    def _next_version(self, tenant_dir: Path) -> str:
+        """Name of the next version directory"""
+        numbers = [int(path.name[1:]) for path in tenant_dir.glob("v[0-9]*") if path.name[1:].isdigit()]
+        return f"v{max(numbers, default=0) + 1:06d}"
+    
+    def write(
+        self,
+        tenant_id: int,
+        ids: List[int],
+        vectors: np.ndarray,
+        identity: str,
+        passages: Optional[List[Dict[str, Any]]] = None,
+        centroids: Optional[np.ndarray] = None,
+        meta: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Build and publish a new index version of a tenant
+        
+        Args:
+            tenant_id: Tenant ID
+            ids: Passage ID of every vector
+            vectors: Unit-length vectors, one row per ID
+            identity: Embedding provider identity
+            passages: Passage snapshot stored with the version
+            centroids: Partition centroids of the previous version, reused while
+                the index has not outgrown them (saves the k-means training)
+            meta: Additional metadata stored with the version
+        
+        Returns:
+            Published version
+        
+        Raises:
+            VectorIndexError: If the input is inconsistent
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids_array = np.asarray(ids, dtype=np.int64)
+        if vectors.ndim != 2 or len(vectors) != len(ids_array):
+            raise VectorIndexError(f"Expected one vector per ID, got {vectors.shape} for {len(ids_array)} IDs")
+        
+        lists = 0
+        offsets = None
+        if len(vectors) >= self.ivf_min_vectors:
+            # sqrt(n) partitions; inherited centroids serve until n has grown to (2 * partitions)^2
+            if centroids is None or centroids.shape[1] != vectors.shape[1] or len(vectors) > 4 * len(centroids) ** 2:
+                centroids = train_partitions(vectors, max(1, int(math.sqrt(len(vectors)))))
+            lists = len(centroids)
+            assignment = _assign(vectors, centroids)
+            order = np.argsort(assignment, kind="stable")
+            vectors, ids_array = vectors[order], ids_array[order]
+            offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=lists)))).astype(np.int64)
+        
+        tenant_dir = self.tenant_dir(tenant_id)
+        tenant_dir.mkdir(parents=True, exist_ok=True)
+        staging = tenant_dir / f".tmp-{uuid.uuid4().hex}"
+        staging.mkdir()
+        try:
+            np.save(staging / "vectors.npy", vectors)
+            np.save(staging / "ids.npy", ids_array)
+            if lists:
+                np.save(staging / "centroids.npy", centroids)
+                np.save(staging / "offsets.npy", offsets)
+            if passages is not None:
+                (staging / "passages.json").write_text(json.dumps(passages, ensure_ascii=False), encoding="utf-8")
+            (staging / "meta.json").write_text(json.dumps({
+                **(meta or {}),
+                "identity": identity,
+                "count": len(ids_array),
+                "dimensions": int(vectors.shape[1]),
+                "lists": lists,
+            }), encoding="utf-8")
+            
+            # Another process may publish concurrently, renaming onto its version fails
+            for _ in range(10):
+                version = self._next_version(tenant_dir)
+                try:
+                    os.rename(staging, tenant_dir / version)
+                    break
+                except OSError:
+                    continue
+            else:
+                raise VectorIndexError(f"Could not allocate a vector index version for tenant {tenant_id}")
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        
+        pointer = tenant_dir / f".{POINTER_FILE}-{uuid.uuid4().hex}"
+        pointer.write_text(version, encoding="utf-8")
+        os.replace(pointer, tenant_dir / POINTER_FILE)
+        self._prune(tenant_dir, version)
+        logger.info(
+            f"Vector index {version} of tenant {tenant_id} published "
+            f"({len(ids_array)} vectors{f', {lists} partitions' if lists else ''})"
+        )
+        return version
+    
+    def _prune(self, tenant_dir: Path, current: str) -> None:
+        """Delete versions older than the last KEEP_VERSIONS (open mappings stay valid)"""
+        versions = sorted(path.name for path in tenant_dir.glob("v[0-9]*") if path.name <= current)
+        for name in versions[:-KEEP_VERSIONS]:
+            shutil.rmtree(tenant_dir / name, ignore_errors=True)
+
+
+# Global vector store instance
+vector_store = VectorStore(
+    root=settings.VECTOR_INDEX_ROOT,
+    ivf_min_vectors=settings.VECTOR_IVF_MIN_VECTORS,
+    nprobe=settings.VECTOR_IVF_NPROBE,
+    cache_size=settings.KNOWLEDGE_CACHE_SIZE
+)
@@ -0,0 +1,232 @@
+"""
+Single-writer queue for database writes
+All writes of a process are funneled into one writer thread that groups them into shared transactions
+"""
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, TypeVar
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.core.database import engine
+
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Write sessions keep loaded attributes after commit so results can be used by the caller thread
+WriteSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+
+class WriteQueueError(Exception):
+    """Custom exception for write queue errors"""
+    pass
+
+
+class WriteQueueFullError(WriteQueueError):
+    """Raised when too many writes are pending"""
+    pass
+
+
+class _WriteJob:
+    """A queued write: a function receiving the batch session, and the caller's future"""
+    
+    __slots__ = ("fn", "future")
+    
+    def __init__(self, fn: Callable[[Session], Any]):
+        self.fn = fn
+        self.future: Future = Future()
+
+
+class WriteQueue:
+    """
+    Serializes database writes through a dedicated writer thread
+    
+    Jobs are plain functions that receive a Session and return a result. The writer
+    collects up to max_batch jobs (waiting at most max_delay_ms for more to arrive),
+    runs them in one transaction and commits once. If the grouped transaction fails,
+    the jobs of that batch are replayed one by one so a single bad write only fails
+    its own caller. Jobs must not commit or roll back themselves.
+    
+    Reads do not go through the queue and stay fully concurrent (WAL mode).
+    With several worker processes each process has its own writer, so SQLite sees
+    at most one writer per process instead of one per request.
+    """
+    
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = WriteSessionLocal,
+        max_batch: int = 100,
+        max_delay_ms: float = 2.0,
+        max_pending: int = 10000
+    ):
+        """
+        Initialize write queue
+        
+        Args:
+            session_factory: Factory for the writer's sessions
+            max_batch: Maximum number of jobs grouped into one transaction
+            max_delay_ms: How long the writer waits to fill a batch after the first job arrives
+            max_pending: Maximum number of queued jobs before submit() is rejected
+        """
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self._queue: "queue.Queue[Optional[_WriteJob]]" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopping = False
+    
+    def start(self) -> None:
+        """Start the writer thread (idempotent)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+            logger.info("Database write queue started")
+    
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        """
+        Stop the writer thread after all queued jobs are written
+        
+        Args:
+            timeout: Seconds to wait for the writer to drain
+        """
+        with self._lock:
+            if not self._thread or not self._thread.is_alive():
+                return
+            self._stopping = True
+            self._queue.put(None)
+            thread = self._thread
+        
+        thread.join(timeout)
+        logger.info("Database write queue stopped")
+    
+    def submit(self, fn: Callable[[Session], T]) -> "Future[T]":
+        """
+        Queue a write
+        
+        Args:
+            fn: Function executed in the writer thread with the batch session
+        
+        Returns:
+            Future resolved with fn's return value after the batch is committed
+        
+        Raises:
+            WriteQueueError: If the queue is stopping
+            WriteQueueFullError: If max_pending jobs are already queued
+        """
+        if self._stopping:
+            raise WriteQueueError("Write queue is shutting down")
+        if not self._thread or not self._thread.is_alive():
+            self.start()
+        
+        job = _WriteJob(fn)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            raise WriteQueueFullError("Too many pending database writes")
+        return job.future
+    
+    async def run(self, fn: Callable[[Session], T]) -> T:
+        """
+        Queue a write and await its result from async code
+        
+        Args:
+            fn: Function executed in the writer thread with the batch session
+        
+        Returns:
+            fn's return value after the batch is committed
+        """
+        return await asyncio.wrap_future(self.submit(fn))
+    
+    def pending(self) -> int:
+        """Number of jobs waiting for the writer"""
+        return self._queue.qsize()
+    
+    def _run(self) -> None:
+        """Writer thread main loop"""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            
+            batch = [job]
+            stop_after_batch = False
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    next_job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if next_job is None:
+                    stop_after_batch = True
+                    break
+                batch.append(next_job)
+            
+            self._write_batch(batch)
+            if stop_after_batch:
+                return
+    
+    def _write_batch(self, batch: List[_WriteJob]) -> None:
+        """
+        Run a batch of jobs in one transaction, falling back to one transaction per job
+        
+        Args:
+            batch: Jobs to write
+        """
+        jobs = [job for job in batch if job.future.set_running_or_notify_cancel()]
+        if not jobs:
+            return
+        
+        session = self.session_factory()
+        try:
+            results = [job.fn(session) for job in jobs]
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            if len(jobs) == 1:
+                jobs[0].future.set_exception(e)
+                return
+            logger.warning(f"Grouped write of {len(jobs)} jobs failed ({e}), retrying individually")
+        else:
+            for job, result in zip(jobs, results):
+                job.future.set_result(result)
+            return
+        finally:
+            session.close()
+        
+        for job in jobs:
+            session = self.session_factory()
+            try:
+                result = job.fn(session)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                job.future.set_exception(e)
+            else:
+                job.future.set_result(result)
+            finally:
+                session.close()
+
+
+# Global write queue instance
+write_queue = WriteQueue(
+    max_batch=settings.WRITE_QUEUE_MAX_BATCH,
+    max_delay_ms=settings.WRITE_QUEUE_MAX_DELAY_MS,
+    max_pending=settings.WRITE_QUEUE_MAX_PENDING
+)
+
+# Drain pending writes on interpreter shutdown
+atexit.register(write_queue.stop)
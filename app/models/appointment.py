@@ -0,0 +1,182 @@
+"""
+Appointment Models
+Staff, services, weekly working hours and bookings of a tenant
+Booking times are naive datetimes in the clinic's local time (APPOINTMENT_TIMEZONE)
+"""
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String, UniqueConstraint
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+BOOKED = "booked"
+CANCELLED = "cancelled"
+
+
+def _minutes_to_clock(minutes: int) -> str:
+    """Minute of the day as HH:MM"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class Staff(Base):
+    """
+    Staff member (doctor, hygienist...) who can be booked
+    """
+    
+    __tablename__ = "staff"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "name", name="uq_staff_name"),
+        {"info": {"sharded": True}},
+    )
+    
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # Owner and details
+    tenant_id = Column(Integer, nullable=False)
+    name = Column(String(100), nullable=False)
+    active = Column(Boolean, nullable=False, default=True)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<Staff(id={self.id}, tenant_id={self.tenant_id}, name='{self.name}')>"
+    
+    def to_dict(self) -> dict:
+        """Convert staff member to dictionary"""
+        return {"id": self.id, "tenant_id": self.tenant_id, "name": self.name, "active": self.active}
+
+
+class Service(Base):
+    """
+    Bookable service with its duration
+    """
+    
+    __tablename__ = "services"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "name", name="uq_services_name"),
+        {"info": {"sharded": True}},
+    )
+    
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # Owner and details
+    tenant_id = Column(Integer, nullable=False)
+    name = Column(String(100), nullable=False)
+    duration_minutes = Column(Integer, nullable=False)
+    price = Column(Integer, nullable=True)  # TL, None = not published
+    active = Column(Boolean, nullable=False, default=True)
+    
+    def __repr__(self):
+        return f"<Service(id={self.id}, tenant_id={self.tenant_id}, name='{self.name}')>"
+    
+    def to_dict(self) -> dict:
+        """Convert service to dictionary"""
+        return {
+            "id": self.id,
+            "tenant_id": self.tenant_id,
+            "name": self.name,
+            "duration_minutes": self.duration_minutes,
+            "price": self.price,
+            "active": self.active,
+        }
+
+
+class StaffService(Base):
+    """
+    Service a staff member provides (a service without rows is provided by all staff)
+    """
+    
+    __tablename__ = "staff_services"
+    __table_args__ = (
+        {"info": {"sharded": True}},
+    )
+    
+    tenant_id = Column(Integer, nullable=False)
+    staff_id = Column(Integer, primary_key=True)
+    service_id = Column(Integer, primary_key=True)
+
+
+class WorkingHours(Base):
+    """
+    Weekly working interval of a staff member (several rows per day for breaks)
+    """
+    
+    __tablename__ = "working_hours"
+    __table_args__ = (
+        Index("ix_working_hours_staff", "tenant_id", "staff_id"),
+        {"info": {"sharded": True}},
+    )
+    
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # Owner and interval
+    tenant_id = Column(Integer, nullable=False)
+    staff_id = Column(Integer, nullable=False)
+    weekday = Column(Integer, nullable=False)  # 0 = Monday
+    start_minute = Column(Integer, nullable=False)  # Minutes after midnight
+    end_minute = Column(Integer, nullable=False)
+    
+    def to_dict(self) -> dict:
+        """Convert interval to dictionary"""
+        return {
+            "weekday": self.weekday,
+            "start": _minutes_to_clock(self.start_minute),
+            "end": _minutes_to_clock(self.end_minute),
+        }
+
+
+class Booking(Base):
+    """
+    Appointment of a customer with a staff member
+    """
+    
+    __tablename__ = "bookings"
+    __table_args__ = (
+        Index("ix_bookings_staff_start", "tenant_id", "staff_id", "start_at"),
+        Index("ix_bookings_start", "tenant_id", "start_at"),
+        {"info": {"sharded": True}},
+    )
+    
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # Owner, staff and service
+    tenant_id = Column(Integer, nullable=False)
+    staff_id = Column(Integer, nullable=False)
+    service_id = Column(Integer, nullable=False)
+    
+    # Time (clinic local time)
+    start_at = Column(DateTime, nullable=False)
+    end_at = Column(DateTime, nullable=False)
+    
+    # Customer
+    customer_name = Column(String(100), nullable=False)
+    customer_phone = Column(String(30), nullable=True)
+    conversation_id = Column(String(64), nullable=True)
+    
+    # State
+    status = Column(String(20), nullable=False, default=BOOKED)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    cancelled_at = Column(DateTime(timezone=True), nullable=True)
+    
+    def __repr__(self):
+        return f"<Booking(id={self.id}, staff_id={self.staff_id}, start_at={self.start_at}, status='{self.status}')>"
+    
+    def to_dict(self) -> dict:
+        """Convert booking to dictionary"""
+        return {
+            "id": self.id,
+            "tenant_id": self.tenant_id,
+            "staff_id": self.staff_id,
+            "service_id": self.service_id,
+            "start_at": self.start_at.isoformat(timespec="minutes"),
+            "end_at": self.end_at.isoformat(timespec="minutes"),
+            "customer_name": self.customer_name,
+            "customer_phone": self.customer_phone,
+            "conversation_id": self.conversation_id,
+            "status": self.status,
+        }
@@ -0,0 +1,45 @@
+"""
+Archived Conversation Model
+Index of chat events moved out of the hot tables into archive segments
+"""
+from sqlalchemy import Column, DateTime, Index, Integer, String
+
+from app.core.database import Base
+
+
+class ArchivedConversation(Base):
+    """
+    One conversation's events within one archive segment
+    Lets read-through open a conversation without scanning the archive (sharded with the events)
+    """
+    
+    __tablename__ = "archived_conversations"
+    __table_args__ = (
+        Index("ix_archived_conversations_lookup", "tenant_id", "conversation_id"),
+        {"info": {"sharded": True}},
+    )
+    
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # Owner and conversation (NULL for events logged without a conversation ID)
+    tenant_id = Column(Integer, nullable=False)
+    conversation_id = Column(String(64), nullable=True)
+    
+    # Location: segment path relative to ARCHIVE_ROOT, partitioned by tenant and month
+    month = Column(String(7), nullable=False)  # YYYY-MM
+    segment = Column(String(255), nullable=False)
+    
+    # Covered events
+    first_event_id = Column(Integer, nullable=False)
+    last_event_id = Column(Integer, nullable=False)
+    first_at = Column(DateTime, nullable=False)
+    last_at = Column(DateTime, nullable=False)
+    messages = Column(Integer, nullable=False)
+    
+    # Byte range of the conversation's gzip member in the segment (NULL = older segment, read whole)
+    member_offset = Column(Integer, nullable=True)
+    member_length = Column(Integer, nullable=True)
+    
+    def __repr__(self):
+        return f"<ArchivedConversation(tenant_id={self.tenant_id}, conversation='{self.conversation_id}', segment='{self.segment}')>"
@@ -0,0 +1,96 @@
+"""
+Chat Event Model
+One row per chat turn (user message, assistant reply, latency and token usage)
+"""
+from typing import Optional
+
+from sqlalchemy import DDL, Column, DateTime, Index, Integer, LargeBinary, String, Text, event
+from sqlalchemy.sql import func
+
+from app.core.compression import message_codec
+from app.core.database import Base
+
+
+class ChatEvent(Base):
+    """
+    Logged chat turn of a tenant's assistant
+    Stored in the tenant's shard file when TENANT_SHARDING is enabled
+    """
+    
+    __tablename__ = "chat_events"
+    __table_args__ = (
+        Index("ix_chat_events_tenant_created", "tenant_id", "created_at"),
+        {"info": {"sharded": True}},
+    )
+    
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # Owner and conversation
+    tenant_id = Column(Integer, nullable=False)
+    conversation_id = Column(String(64), nullable=True, index=True)
+    channel = Column(String(32), nullable=False, default="api")
+    
+    # Turn content, compressed (app/core/compression.py), read through user_message/assistant_message
+    user_body = Column(LargeBinary, nullable=False)
+    assistant_body = Column(LargeBinary, nullable=True)
+    body_dict = Column(Integer, nullable=True)  # Dictionary version (0 = none), NULL = plain UTF-8
+    model = Column(String(64), nullable=True)
+    
+    # Outcome and cost
+    status = Column(String(16), nullable=False, default="ok")  # ok / error
+    error = Column(Text, nullable=True)
+    latency_ms = Column(Integer, nullable=True)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    def __repr__(self):
+        return f"<ChatEvent(id={self.id}, tenant_id={self.tenant_id}, status='{self.status}')>"
+    
+    @property
+    def user_message(self) -> str:
+        """Decompressed user message"""
+        return message_codec.decode(self.tenant_id, self.body_dict, self.user_body)
+    
+    @property
+    def assistant_message(self) -> Optional[str]:
+        """Decompressed assistant reply (None if the call failed)"""
+        return message_codec.decode(self.tenant_id, self.body_dict, self.assistant_body)
+    
+    def to_dict(self) -> dict:
+        """
+        Convert chat event to dictionary
+        
+        Returns:
+            Dictionary representation
+        """
+        return {
+            "id": self.id,
+            "tenant_id": self.tenant_id,
+            "conversation_id": self.conversation_id,
+            "channel": self.channel,
+            "user_message": self.user_message,
+            "assistant_message": self.assistant_message,
+            "model": self.model,
+            "status": self.status,
+            "error": self.error,
+            "latency_ms": self.latency_ms,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+# Full-text index over the messages, created next to chat_events (main database or shard file).
+# Contentless: rowid is chat_events.id and the text is indexed folded (app/core/text.py), so
+# snippets are built from chat_events; remove_diacritics and prefix indexes serve Turkish queries.
+SEARCH_TABLE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chat_search USING fts5("
+    "tenant, user_text, assistant_text, content='', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+
+event.listen(ChatEvent.__table__, "after_create", DDL(SEARCH_TABLE_DDL))
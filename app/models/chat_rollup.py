@@ -0,0 +1,40 @@
+"""
+Chat Rollup Model
+Hourly and daily per-tenant aggregates of chat events, maintained as events are written
+"""
+from sqlalchemy import Column, DateTime, Integer, String, UniqueConstraint
+
+from app.core.database import Base
+
+
+class ChatRollup(Base):
+    """
+    Aggregated chat activity of a tenant for one hour or one day
+    Periods are in ANALYTICS_TIMEZONE local time; stored next to the events (sharded)
+    """
+    
+    __tablename__ = "chat_rollups"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "granularity", "period_start", name="uq_chat_rollups_period"),
+        {"info": {"sharded": True}},
+    )
+    
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # Owner and period
+    tenant_id = Column(Integer, nullable=False)
+    granularity = Column(String(8), nullable=False)  # hour / day
+    period_start = Column(DateTime, nullable=False)
+    
+    # Counters (averages are derived: latency_ms_total / latency_samples)
+    messages = Column(Integer, nullable=False, default=0)
+    errors = Column(Integer, nullable=False, default=0)
+    latency_ms_total = Column(Integer, nullable=False, default=0)
+    latency_samples = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    fast_path = Column(Integer, nullable=False, default=0)  # Messages answered by the intent fast path
+    
+    def __repr__(self):
+        return f"<ChatRollup(tenant_id={self.tenant_id}, {self.granularity}={self.period_start}, messages={self.messages})>"
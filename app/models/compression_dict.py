@@ -0,0 +1,38 @@
+"""
+Compression Dictionary Model
+Versioned per-tenant zstd dictionaries used to compress stored message bodies
+"""
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, UniqueConstraint
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class CompressionDictionary(Base):
+    """
+    A trained zstd dictionary of a tenant
+    Rows are never updated or deleted while messages compressed with them exist
+    """
+    
+    __tablename__ = "compression_dicts"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "version", name="uq_compression_dicts_version"),
+        {"info": {"sharded": True}},
+    )
+    
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # Owner and version (chat_events.body_dict refers to the version)
+    tenant_id = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False)
+    
+    # Dictionary content and training info
+    data = Column(LargeBinary, nullable=False)
+    samples = Column(Integer, nullable=False)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<CompressionDictionary(tenant_id={self.tenant_id}, version={self.version}, size={len(self.data or b'')})>"
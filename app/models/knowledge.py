@@ -0,0 +1,85 @@
+"""
+Knowledge Base Models
+Tenant documents (price lists, doctors, FAQ) and the passages they are split into for retrieval
+"""
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, UniqueConstraint
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class KnowledgeDocument(Base):
+    """
+    Knowledge base document of a tenant
+    Stored in the tenant's shard file when TENANT_SHARDING is enabled
+    """
+    
+    __tablename__ = "knowledge_documents"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "title", name="uq_knowledge_documents_title"),
+        {"info": {"sharded": True}},
+    )
+    
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # Owner and content
+    tenant_id = Column(Integer, nullable=False)
+    title = Column(String(200), nullable=False)
+    content = Column(Text, nullable=False)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<KnowledgeDocument(id={self.id}, tenant_id={self.tenant_id}, title='{self.title}')>"
+    
+    def to_dict(self, include_content: bool = True) -> dict:
+        """
+        Convert document to dictionary
+        
+        Args:
+            include_content: Include the full text
+        
+        Returns:
+            Dictionary representation
+        """
+        data = {
+            "id": self.id,
+            "tenant_id": self.tenant_id,
+            "title": self.title,
+            "characters": len(self.content),
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+        if include_content:
+            data["content"] = self.content
+        return data
+
+
+class KnowledgePassage(Base):
+    """
+    Retrieval unit of a knowledge document (a few paragraphs or list lines)
+    """
+    
+    __tablename__ = "knowledge_passages"
+    __table_args__ = (
+        Index("ix_knowledge_passages_tenant", "tenant_id", "document_id", "position"),
+        {"info": {"sharded": True}},
+    )
+    
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # Owner and place in the document
+    tenant_id = Column(Integer, nullable=False)
+    document_id = Column(Integer, nullable=False)
+    position = Column(Integer, nullable=False)
+    
+    # Passage text and its SHA-256
+    content = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    
+    def __repr__(self):
+        return f"<KnowledgePassage(id={self.id}, document_id={self.document_id}, position={self.position})>"
@@ -0,0 +1,34 @@
+"""
+Job Lease Model
+Time-limited claims that make background jobs exclusive across worker processes
+"""
+from sqlalchemy import Column, DateTime, Integer, String, UniqueConstraint
+
+from app.core.database import Base
+
+
+class JobLease(Base):
+    """
+    Claim of one job for one tenant (e.g. the retention run of tenant 7)
+    Kept in the main database, so every worker process sees the same claims also with
+    TENANT_SHARDING. A holder that dies leaves the lease to expire. Times are naive UTC.
+    """
+    
+    __tablename__ = "job_leases"
+    __table_args__ = (
+        UniqueConstraint("job", "tenant_id", name="uq_job_leases_job_tenant"),
+    )
+    
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # Claimed job
+    job = Column(String(50), nullable=False)
+    tenant_id = Column(Integer, nullable=False)
+    
+    # Claim
+    holder = Column(String(100), nullable=False)  # host:pid:instance of the claiming process
+    expires_at = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<JobLease(job='{self.job}', tenant_id={self.tenant_id}, holder='{self.holder}')>"
@@ -0,0 +1,59 @@
+"""
+Moderation Rule Model
+Per-tenant blocklist and allowlist patterns checked before a message reaches the model
+"""
+from sqlalchemy import Column, DateTime, Integer, String, Text, UniqueConstraint
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+ALLOW = "allow"
+BLOCK = "block"
+REJECT = "reject"
+
+RULE_ACTIONS = (ALLOW, BLOCK, REJECT)
+
+
+class ModerationRule(Base):
+    """
+    Moderation pattern of a tenant
+    
+    block answers the message with a fixed reply, reject drops it without a reply,
+    allow exempts text that would otherwise hit a block or reject pattern.
+    """
+    
+    __tablename__ = "moderation_rules"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "key", name="uq_moderation_rules_key"),
+        {"info": {"sharded": True}},
+    )
+    
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # Owner and rule
+    tenant_id = Column(Integer, nullable=False)
+    pattern = Column(String(200), nullable=False)
+    key = Column(String(200), nullable=False)  # Normalized pattern (app/core/moderation.py normalize())
+    action = Column(String(10), nullable=False, default=BLOCK)
+    reply = Column(Text, nullable=True)  # Reply of block rules (None = MODERATION_BLOCK_REPLY)
+    
+    # Tenant-wide write counter: set to the tenant's highest revision + 1 on every save
+    revision = Column(Integer, nullable=False, default=0)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<ModerationRule(id={self.id}, tenant_id={self.tenant_id}, action='{self.action}')>"
+    
+    def to_dict(self) -> dict:
+        """Convert moderation rule to dictionary"""
+        return {
+            "id": self.id,
+            "tenant_id": self.tenant_id,
+            "pattern": self.pattern,
+            "action": self.action,
+            "reply": self.reply,
+        }
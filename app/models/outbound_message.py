@@ -0,0 +1,73 @@
+"""
+Outbound Message Model
+Persistent queue of messages to deliver over messaging channels (WhatsApp, SMS, Instagram)
+Stored in the main database so one dispatcher sees every tenant's queue
+"""
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+
+class OutboundMessage(Base):
+    """
+    Queued outbound message
+    
+    next_attempt_at is the earliest time the message may be sent: the retry time of
+    pending messages and the lease expiry of messages being sent (a dispatcher that
+    died mid-send leaves them to be picked up again once the lease runs out).
+    Times are naive UTC.
+    """
+    
+    __tablename__ = "outbound_messages"
+    __table_args__ = (
+        Index("ix_outbound_messages_due", "status", "next_attempt_at"),
+    )
+    
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # Owner and destination
+    tenant_id = Column(Integer, nullable=False, index=True)
+    channel = Column(String(20), nullable=False)
+    recipient = Column(String(100), nullable=False)
+    text = Column(Text, nullable=False)
+    reference = Column(String(100), nullable=True)  # Inbound message or reminder this answers
+    
+    # Delivery state
+    status = Column(String(20), nullable=False, default=PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)
+    last_error = Column(Text, nullable=True)
+    provider_message_id = Column(String(100), nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<OutboundMessage(id={self.id}, channel='{self.channel}', status='{self.status}')>"
+    
+    def to_dict(self) -> dict:
+        """Convert outbound message to dictionary"""
+        return {
+            "id": self.id,
+            "tenant_id": self.tenant_id,
+            "channel": self.channel,
+            "recipient": self.recipient,
+            "text": self.text,
+            "reference": self.reference,
+            "status": self.status,
+            "attempts": self.attempts,
+            "next_attempt_at": self.next_attempt_at.isoformat(timespec="seconds"),
+            "last_error": self.last_error,
+            "provider_message_id": self.provider_message_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "sent_at": self.sent_at.isoformat(timespec="seconds") if self.sent_at else None,
+        }
@@ -0,0 +1,73 @@
+"""
+Reminder Model
+Pending and delivered appointment reminders, stored next to the bookings (sharded)
+Times are naive datetimes in the clinic's local time (APPOINTMENT_TIMEZONE), like bookings
+"""
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+
+from app.core.database import Base
+
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+CANCELLED = "cancelled"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class Reminder(Base):
+    """
+    Reminder of one booking at one offset (e.g. 24 hours and 1 hour before)
+    """
+    
+    __tablename__ = "reminders"
+    __table_args__ = (
+        Index("ix_reminders_due", "tenant_id", "status", "due_at"),
+        Index("ix_reminders_booking", "tenant_id", "booking_id"),
+        {"info": {"sharded": True}},
+    )
+    
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # Owner and booking
+    tenant_id = Column(Integer, nullable=False)
+    booking_id = Column(Integer, nullable=False)
+    offset_minutes = Column(Integer, nullable=False)  # Minutes before the appointment
+    
+    # Delivery
+    due_at = Column(DateTime, nullable=False)
+    appointment_at = Column(DateTime, nullable=False)  # Reminders are skipped once the appointment started
+    channel = Column(String(20), nullable=False)
+    recipient = Column(String(100), nullable=False)
+    customer_name = Column(String(100), nullable=False)
+    
+    # State
+    status = Column(String(20), nullable=False, default=PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    claimed_until = Column(DateTime, nullable=True)  # While "sending": other workers may claim it again after this
+    last_error = Column(Text, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<Reminder(id={self.id}, booking_id={self.booking_id}, due_at={self.due_at}, status='{self.status}')>"
+    
+    def to_dict(self) -> dict:
+        """Convert reminder to dictionary"""
+        return {
+            "id": self.id,
+            "tenant_id": self.tenant_id,
+            "booking_id": self.booking_id,
+            "offset_minutes": self.offset_minutes,
+            "due_at": self.due_at.isoformat(timespec="minutes"),
+            "appointment_at": self.appointment_at.isoformat(timespec="minutes"),
+            "channel": self.channel,
+            "recipient": self.recipient,
+            "customer_name": self.customer_name,
+            "status": self.status,
+            "attempts": self.attempts,
+            "claimed_until": self.claimed_until.isoformat(timespec="seconds") if self.claimed_until else None,
+            "last_error": self.last_error,
+            "sent_at": self.sent_at.isoformat(timespec="seconds") if self.sent_at else None,
+        }
@@ -33,10 +33,37 @@ class Tenant(Base):
     # Bot Configuration
     system_prompt = Column(Text, nullable=False, default="Sen bir sanal resepsiyonistsin.")
     
+    # Business details, answered directly by the intent fast path
+    address = Column(String(500), nullable=True)
+    phone = Column(String(30), nullable=True)
+    
+    # Business identities on the messaging channels, webhooks addressed to others are rejected
+    whatsapp_phone_number_id = Column(String(50), nullable=True)
+    sms_number = Column(String(30), nullable=True)
+    instagram_account_id = Column(String(50), nullable=True)
+
+    # Token quotas (None = unlimited), enforced by the in-memory usage meter
+    daily_token_quota = Column(Integer, nullable=True)
+    monthly_token_quota = Column(Integer, nullable=True)
+    
+    # Chat events older than this many days are archived (None = CHAT_RETENTION_DAYS)
+    retention_days = Column(Integer, nullable=True)
+    
+    # Model call latency target of the model router (None = MODEL_ROUTING_LATENCY_SLO_MS)
+    latency_slo_ms = Column(Integer, nullable=True)
+    
+    # Storage shard holding the tenant's conversation data (only used with TENANT_SHARDING)
+    shard = Column(String(64), nullable=True)
+    
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # Incremented on every update, cached session snapshots are revalidated against it
+    config_version = Column(Integer, nullable=False, default=1)
+    
+    __mapper_args__ = {"version_id_col": config_version}
+    
     def __repr__(self):
         return f"<Tenant(id={self.id}, username='{self.username}', business='{self.business_name}')>"
     
@@ -73,6 +100,11 @@ class Tenant(Base):
             "username": self.username,
             "business_name": self.business_name,
             "system_prompt": self.system_prompt,
+            "address": self.address,
+            "phone": self.phone,
+            "whatsapp_phone_number_id": self.whatsapp_phone_number_id,
+            "sms_number": self.sms_number,
+            "instagram_account_id": self.instagram_account_id,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
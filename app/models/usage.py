@@ -0,0 +1,40 @@
+"""
+Usage Rollup Model
+Token usage per tenant per day, aggregated in memory and flushed periodically
+"""
+from sqlalchemy import Column, Date, Integer, UniqueConstraint
+
+from app.core.database import Base
+
+
+class UsageDaily(Base):
+    """
+    Daily token usage of a tenant
+    Monthly usage is the sum of the month's days. Kept in the main database (also with
+    TENANT_SHARDING) so the usage meter loads all tenants' counters with one query.
+    """
+    
+    __tablename__ = "usage_daily"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "day", name="uq_usage_daily_tenant_day"),
+    )
+    
+    # Primary Key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # Owner and period (UTC day)
+    tenant_id = Column(Integer, nullable=False)
+    day = Column(Date, nullable=False)
+    
+    # Counters
+    requests = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<UsageDaily(tenant_id={self.tenant_id}, day={self.day}, tokens={self.total_tokens})>"
+    
+    @property
+    def total_tokens(self) -> int:
+        """Prompt plus completion tokens"""
+        return (self.prompt_tokens or 0) + (self.completion_tokens or 0)
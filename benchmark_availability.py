@@ -0,0 +1,122 @@
+"""
+Availability index benchmark
+Builds slot bitsets for many synthetic tenants and measures memory, next-free-slot and conflict-check latency
+
+Usage:
+    python benchmark_availability.py [--tenants 500] [--staff 8] [--fill 0.6] [--slot-minutes 15]
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from app.core.appointments import TenantAvailability
+
+
+HORIZON_DAYS = 90
+SERVICE_MINUTES = [15, 30, 40, 60, 90]
+
+
+def build_tenant(rng: random.Random, first_day: date, staff: int, fill: float, slot_minutes: int) -> TenantAvailability:
+    """
+    Synthetic clinic: weekday and Saturday hours with a lunch break, bookings until `fill` of the time is taken
+    
+    Args:
+        rng: Random generator
+        first_day: First day of the horizon
+        staff: Number of staff members
+        fill: Share of working slots to book
+        slot_minutes: Slot length
+    
+    Returns:
+        Availability index
+    """
+    hours = []
+    for staff_id in range(1, staff + 1):
+        for weekday in range(5):
+            hours.append((staff_id, weekday, 9 * 60, 12 * 60 + 30))
+            hours.append((staff_id, weekday, 13 * 60 + 30, 19 * 60))
+        hours.append((staff_id, 5, 10 * 60, 16 * 60))
+    services = {
+        number: {"name": f"service-{number}", "duration_minutes": minutes, "staff": []}
+        for number, minutes in enumerate(SERVICE_MINUTES, start=1)
+    }
+    index = TenantAvailability(first_day, HORIZON_DAYS, slot_minutes, {i: f"staff-{i}" for i in range(1, staff + 1)}, hours, services, [])
+    
+    # Book random 30-60 minute appointments until the fill rate is reached
+    working_days = sum(1 for day in range(HORIZON_DAYS) if (first_day + timedelta(days=day)).weekday() < 6)
+    target = int(working_days * staff * 9 * 60 * fill / 45)
+    for _ in range(target):
+        staff_id = rng.randint(1, staff)
+        day = first_day + timedelta(days=rng.randrange(HORIZON_DAYS))
+        start = datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.randrange(9 * 60, 18 * 60, slot_minutes))
+        end = start + timedelta(minutes=rng.choice([30, 45, 60]))
+        if index.is_free(staff_id, start, end):
+            index.reserve(staff_id, start, end)
+    return index
+
+
+def timed(fn, count: int) -> float:
+    """Average microseconds per call"""
+    started = time.perf_counter()
+    for _ in range(count):
+        fn()
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the appointment availability index")
+    parser.add_argument("--tenants", type=int, default=500)
+    parser.add_argument("--staff", type=int, default=8)
+    parser.add_argument("--fill", type=float, default=0.6)
+    parser.add_argument("--slot-minutes", type=int, default=15)
+    parser.add_argument("--queries", type=int, default=20000)
+    args = parser.parse_args()
+    
+    rng = random.Random(7)
+    first_day = date.today()
+    started = time.perf_counter()
+    tenants = [build_tenant(rng, first_day, args.staff, args.fill, args.slot_minutes) for _ in range(args.tenants)]
+    build_seconds = time.perf_counter() - started
+    memory = sum(index.nbytes for index in tenants)
+    print(
+        f"🔧 {args.tenants} tenants × {args.staff} staff × {HORIZON_DAYS} days, "
+        f"{args.slot_minutes} minute slots, {args.fill:.0%} booked"
+    )
+    print(f"📦 Bitsets: {memory / 1024 / 1024:.1f} MB ({memory / args.tenants / 1024:.1f} KB per tenant), "
+          f"built in {build_seconds:.1f} s")
+    print()
+    
+    now = datetime.combine(first_day, datetime.min.time()) + timedelta(hours=10, minutes=7)
+    queries = [
+        (
+            rng.choice(tenants),
+            rng.randint(1, len(SERVICE_MINUTES)),
+            now + timedelta(days=rng.randrange(60), minutes=rng.randrange(0, 600, 5)),
+        )
+        for _ in range(1000)
+    ]
+    
+    def next_free():
+        index, service_id, after = queries[rng.randrange(len(queries))]
+        service = index.services[service_id]
+        index.find(index.service_staff(service_id), index.slots_for(service["duration_minutes"]), after, 5)
+    
+    def first_free():
+        index, service_id, after = queries[rng.randrange(len(queries))]
+        service = index.services[service_id]
+        index.find(index.service_staff(service_id), index.slots_for(service["duration_minutes"]), after, 1)
+    
+    def conflict_check():
+        index, service_id, after = queries[rng.randrange(len(queries))]
+        start = after.replace(minute=after.minute - after.minute % args.slot_minutes)
+        index.is_free(rng.randint(1, args.staff), start, start + timedelta(minutes=45))
+    
+    print(f"{'operation':<28}{'µs/call':>10}")
+    print(f"{'next 5 free slots':<28}{timed(next_free, args.queries):>10.1f}")
+    print(f"{'first free slot':<28}{timed(first_free, args.queries):>10.1f}")
+    print(f"{'conflict check':<28}{timed(conflict_check, args.queries):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
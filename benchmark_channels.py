@@ -0,0 +1,121 @@
+"""
+Messaging channel load test
+Pushes synthetic WhatsApp, SMS and Instagram webhooks through the channel gateway and the
+outbound queue with stub providers, fully offline: the questions (hours, address, phone)
+are answered by the intent fast path, so no OpenAI call is made.
+
+Usage:
+    python benchmark_channels.py [--messages 3000] [--latency-ms 20] [--failure-rate 0.05]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from urllib.parse import urlencode
+
+# Separate database, created before the app modules read the settings
+_workdir = tempfile.mkdtemp(prefix="channels-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_workdir}/channels.db"
+os.environ["OUTBOUND_PROVIDER"] = "stub"
+
+from app.core.appointments import appointment_book
+from app.core.channels import StubProvider, TokenBucket, channel_gateway, outbound_queue
+from app.core.conversation_store import conversation_log
+from app.core.database import init_db
+from app.core.write_queue import write_queue
+from app.models.tenant import Tenant
+
+
+QUESTIONS = [
+    "Adresiniz nedir?",
+    "Telefon numaranız nedir?",
+    "Cumartesi açık mısınız?",
+    "Kaçta kapanıyorsunuz?",
+]
+
+
+def create_tenant() -> int:
+    """Demo clinic with address, phone and working hours so every question takes the fast path"""
+    tenant = Tenant(
+        username="bench",
+        password_hash="-",
+        business_name="Klinik Bench",
+        system_prompt="Sen bir sanal resepsiyonistsin.",
+        address="Bağdat Cd. 12, Kadıköy",
+        phone="0216 555 00 00"
+    )
+    tenant.set_openai_api_key("sk-" + "x" * 40)
+    
+    def _insert(session):
+        session.add(tenant)
+        session.flush()
+        return tenant.id
+    
+    tenant_id = write_queue.submit(_insert).result()
+    hours = [(weekday, 9 * 60, 18 * 60) for weekday in range(5)] + [(5, 10 * 60, 14 * 60)]
+    appointment_book.save_staff(tenant_id, "Dr. Bench", hours=hours)
+    return tenant_id
+
+
+def webhook(channel: str, number: int):
+    """Synthetic webhook body and content type of one message"""
+    text = QUESTIONS[number % len(QUESTIONS)]
+    sender = f"90555{number % 500:07d}"
+    if channel == "whatsapp":
+        body = {"entry": [{"changes": [{"value": {"messages": [
+            {"from": sender, "id": f"wamid.{number}", "type": "text", "text": {"body": text}}
+        ]}}]}]}
+        return json.dumps(body).encode(), "application/json"
+    if channel == "instagram":
+        body = {"entry": [{"messaging": [{"sender": {"id": sender}, "message": {"mid": f"m.{number}", "text": text}}]}]}
+        return json.dumps(body).encode(), "application/json"
+    return urlencode({"From": "+" + sender, "Body": text, "MessageSid": f"SM{number}"}).encode(), "application/x-www-form-urlencoded"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the messaging channel pipeline offline")
+    parser.add_argument("--messages", type=int, default=3000)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Stub provider latency per batch")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="Share of sends failing temporarily")
+    parser.add_argument("--rate", type=float, default=0.0, help="Messages per second per channel (0 = unlimited)")
+    args = parser.parse_args()
+    
+    init_db()
+    tenant_id = create_tenant()
+    for channel in list(outbound_queue.providers):
+        outbound_queue.providers[channel] = StubProvider(channel, args.latency_ms, args.failure_rate)
+        outbound_queue.buckets[channel] = TokenBucket(args.rate)
+    outbound_queue.retry_seconds = 0.1
+    outbound_queue.start()
+    
+    channels = list(outbound_queue.providers)
+    started = time.perf_counter()
+    for number in range(args.messages):
+        channel = channels[number % len(channels)]
+        body, content_type = webhook(channel, number)
+        channel_gateway.receive(channel, tenant_id, body, {}, "http://localhost/webhook", content_type)
+    accepted = time.perf_counter() - started
+    
+    # Wait until every reply is delivered (or failed for good)
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        stats = outbound_queue.stats
+        if stats["sent"] + stats["failed"] >= args.messages:
+            break
+        time.sleep(0.05)
+    total = time.perf_counter() - started
+    channel_gateway.stop()
+    outbound_queue.stop()
+    conversation_log.stop()
+    
+    stats = outbound_queue.stats
+    print(f"🔧 {args.messages:,} webhooks over {len(channels)} channels, stub latency {args.latency_ms:g} ms, "
+          f"{args.failure_rate:.0%} temporary failures")
+    print(f"📥 Accepted in {accepted:.2f} s ({args.messages / accepted:,.0f} webhooks/s)")
+    print(f"📤 Delivered {stats['sent']:,} replies in {total:.2f} s ({stats['sent'] / total:,.0f} messages/s), "
+          f"{stats['batches']:,} batches, {stats['retried']:,} retries, {stats['failed']:,} failed")
+
+
+if __name__ == "__main__":
+    main()
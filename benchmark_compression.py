@@ -0,0 +1,198 @@
+"""
+Message compression benchmark
+Compares storage size and read latency of chat events stored as plain text, zstd and zstd with a trained dictionary
+
+Usage:
+    python benchmark_compression.py [--conversations 2000] [--reads 500]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List
+
+# The benchmark works on its own temporary database
+WORKDIR = tempfile.mkdtemp(prefix="bench_compression_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'main.db')}"
+os.environ["TENANT_SHARDING"] = "False"
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.core.compression import MessageCodec, message_codec
+from app.core.database import Base, init_db
+from app.core.db_profiles import create_profiled_engine, get_engine_profile
+from app.core.write_queue import write_queue
+from app.models.chat_event import ChatEvent
+
+
+TENANT_ID = 1
+
+SERVICES = ["dolgu", "kanal tedavisi", "diş beyazlatma", "implant", "diş taşı temizliği", "ortodonti kontrolü"]
+DAYS = ["pazartesi", "salı", "çarşamba", "perşembe", "cuma", "cumartesi"]
+NAMES = ["Ayşe", "Mehmet", "Zeynep", "Ali", "Elif", "Mustafa", "Fatma", "Emre"]
+
+USER_TEMPLATES = [
+    "Merhaba, {service} için randevu almak istiyorum.",
+    "{day} günü saat {hour}:00 müsait misiniz?",
+    "{service} fiyatı ne kadar?",
+    "Kliniğiniz {day} açık mı?",
+    "Adım {name}, randevumu {day} gününe alabilir miyiz?",
+    "{service} ne kadar sürüyor, ağrılı mı?",
+    "Teşekkürler, görüşmek üzere.",
+]
+ASSISTANT_TEMPLATES = [
+    "Merhaba! {service} için {day} günü saat {hour}:00 ve {hour2}:30 müsaitliğimiz var. Hangisi size uygun olur?",
+    "{service} ücretimiz muayene sonrası netleşir, ortalama fiyat bilgisini klinik ile paylaşabilirim. Randevu oluşturmamı ister misiniz?",
+    "Kliniğimiz hafta içi 09:00-19:00, cumartesi 10:00-16:00 saatleri arasında açıktır. Pazar günleri kapalıyız.",
+    "Sayın {name}, randevunuz {day} günü saat {hour}:00 olarak güncellendi. Randevunuzdan bir gün önce hatırlatma mesajı göndereceğiz.",
+    "{service} genellikle 30-60 dakika sürer ve lokal anestezi ile yapıldığı için ağrı hissetmezsiniz.",
+    "Rica ederim {name}, sağlıklı günler dileriz!",
+]
+
+
+def fill(template: str, rng: random.Random) -> str:
+    """Template with random slot values"""
+    hour = rng.randint(9, 17)
+    return template.format(
+        service=rng.choice(SERVICES),
+        day=rng.choice(DAYS),
+        name=rng.choice(NAMES),
+        hour=hour,
+        hour2=hour + 1
+    )
+
+
+def generate_events(conversations: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    Synthetic receptionist conversations as buffered by the conversation log
+    
+    Args:
+        conversations: Number of conversations
+        seed: Random seed
+    
+    Returns:
+        Chat event rows
+    """
+    rng = random.Random(seed)
+    events = []
+    for number in range(conversations):
+        for _ in range(rng.randint(2, 8)):
+            events.append({
+                "tenant_id": TENANT_ID,
+                "conversation_id": f"conv-{seed}-{number}",
+                "channel": "web",
+                "user_message": fill(rng.choice(USER_TEMPLATES), rng),
+                "assistant_message": fill(rng.choice(ASSISTANT_TEMPLATES), rng),
+                "model": "gpt-3.5-turbo",
+                "status": "ok",
+                "error": None,
+                "latency_ms": rng.randint(400, 2500),
+                "prompt_tokens": rng.randint(200, 600),
+                "completion_tokens": rng.randint(20, 120),
+            })
+    return events
+
+
+def run_mode(codec: MessageCodec, events: List[Dict[str, Any]], reads: int) -> Dict[str, float]:
+    """
+    Store the events with a codec in a fresh database and read conversations back
+    
+    Args:
+        codec: Codec used to encode the rows (decoding always uses the global codec)
+        events: Chat event rows
+        reads: Number of random conversations to read
+    
+    Returns:
+        Result metrics
+    """
+    path = os.path.join(WORKDIR, f"mode-{len(os.listdir(WORKDIR))}.db")
+    engine = create_profiled_engine(f"sqlite:///{path}", get_engine_profile())
+    try:
+        Base.metadata.create_all(engine, tables=[ChatEvent.__table__])
+        
+        started = time.perf_counter()
+        rows = [codec.encode_event(event) for event in events]
+        encode_seconds = time.perf_counter() - started
+        
+        with engine.begin() as conn:
+            conn.execute(insert(ChatEvent), rows)
+            body_bytes = conn.execute(
+                select(func.sum(func.length(ChatEvent.user_body) + func.coalesce(func.length(ChatEvent.assistant_body), 0)))
+            ).scalar()
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            conn.execute(text("VACUUM"))
+            conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+        
+        rng = random.Random(0)
+        conversation_ids = sorted({event["conversation_id"] for event in events})
+        turns = 0
+        started = time.perf_counter()
+        with Session(engine) as db:
+            for _ in range(reads):
+                conversation = db.execute(
+                    select(ChatEvent).where(ChatEvent.conversation_id == rng.choice(conversation_ids))
+                ).scalars().all()
+                for event in conversation:
+                    event.user_message, event.assistant_message
+                    turns += 1
+                db.expunge_all()
+        read_seconds = time.perf_counter() - started
+        
+        return {
+            "body_kb": body_bytes / 1024,
+            "file_kb": os.path.getsize(path) / 1024,
+            "encode_us": encode_seconds / len(events) * 1e6,
+            "read_ms": read_seconds / reads * 1000,
+            "turn_us": read_seconds / turns * 1e6,
+        }
+    finally:
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark stored message compression")
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=500)
+    args = parser.parse_args()
+    
+    try:
+        init_db()
+        events = generate_events(args.conversations, seed=2)
+        raw_kb = sum(
+            len(event["user_message"].encode("utf-8")) + len(event["assistant_message"].encode("utf-8"))
+            for event in events
+        ) / 1024
+        print(f"🔧 {len(events)} chat turns in {args.conversations} conversations, {raw_kb:.0f} KB of text")
+        print()
+        
+        results = {"plain": run_mode(MessageCodec(enabled=False), events, args.reads)}
+        results["zstd"] = run_mode(MessageCodec(), events, args.reads)
+        
+        # Train on earlier conversations of the tenant, apply to the benchmark set
+        training = generate_events(args.conversations // 2, seed=1)
+        write_queue.submit(lambda session: session.execute(
+            insert(ChatEvent), [MessageCodec(enabled=False).encode_event(event) for event in training]
+        )).result()
+        started = time.perf_counter()
+        version = message_codec.train(TENANT_ID)
+        print(f"📚 Dictionary {version} trained in {(time.perf_counter() - started) * 1000:.0f} ms")
+        print()
+        results["zstd+dict"] = run_mode(message_codec, events, args.reads)
+        
+        print(f"{'mode':<12}{'bodies KB':>12}{'ratio':>8}{'file KB':>10}{'encode µs':>12}{'read ms':>10}{'µs/turn':>9}")
+        for mode, result in results.items():
+            print(
+                f"{mode:<12}{result['body_kb']:>12.0f}{raw_kb / result['body_kb']:>8.2f}{result['file_kb']:>10.0f}"
+                f"{result['encode_us']:>12.1f}{result['read_ms']:>10.3f}{result['turn_us']:>9.1f}"
+            )
+    finally:
+        write_queue.stop()
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Database profile benchmark
+Compares mixed read/write throughput of the engine profiles in app/core/db_profiles.py
+
+Usage:
+    python benchmark_database.py [--threads 8] [--seconds 5] [--write-ratio 0.2] [profile ...]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, Text, insert, select, update
+from sqlalchemy.exc import OperationalError
+
+from app.core.db_profiles import ENGINE_PROFILES, create_profiled_engine
+
+
+SEED_ROWS = 5000
+
+metadata = MetaData()
+bench_items = Table(
+    "bench_items",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("name", String(100), nullable=False),
+    Column("body", Text, nullable=False),
+)
+
+
+def run_profile(profile_name: str, threads: int, seconds: float, write_ratio: float) -> Dict[str, float]:
+    """
+    Run the mixed workload against a fresh database file using one profile
+    
+    Args:
+        profile_name: Engine profile name
+        threads: Number of concurrent worker threads
+        seconds: Benchmark duration
+        write_ratio: Fraction of operations that are writes (0-1)
+    
+    Returns:
+        Result metrics
+    """
+    workdir = tempfile.mkdtemp(prefix="bench_db_")
+    engine = create_profiled_engine(
+        f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        ENGINE_PROFILES[profile_name]
+    )
+    
+    try:
+        metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(
+                insert(bench_items),
+                [{"name": f"item-{i}", "body": "x" * 200} for i in range(SEED_ROWS)]
+            )
+        
+        stop_at = time.perf_counter() + seconds
+        lock = threading.Lock()
+        reads = writes = errors = 0
+        latencies: List[float] = []
+        
+        def worker():
+            nonlocal reads, writes, errors
+            rng = random.Random()
+            local_latencies = []
+            local_reads = local_writes = local_errors = 0
+            
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                try:
+                    if rng.random() < write_ratio:
+                        with engine.begin() as conn:
+                            conn.execute(
+                                update(bench_items)
+                                .where(bench_items.c.id == rng.randint(1, SEED_ROWS))
+                                .values(body="y" * rng.randint(100, 300))
+                            )
+                        local_writes += 1
+                    else:
+                        with engine.connect() as conn:
+                            conn.execute(
+                                select(bench_items).where(bench_items.c.id == rng.randint(1, SEED_ROWS))
+                            ).first()
+                        local_reads += 1
+                except OperationalError:
+                    # "database is locked" under contention
+                    local_errors += 1
+                local_latencies.append(time.perf_counter() - started)
+            
+            with lock:
+                reads += local_reads
+                writes += local_writes
+                errors += local_errors
+                latencies.extend(local_latencies)
+        
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        
+        latencies.sort()
+        total = reads + writes
+        return {
+            "ops_per_sec": total / seconds,
+            "reads": reads,
+            "writes": writes,
+            "errors": errors,
+            "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+            "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+        }
+    finally:
+        engine.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark database engine profiles")
+    parser.add_argument("profiles", nargs="*", default=["default", "performance"])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+    
+    print(f"🔧 Mixed workload: {args.threads} threads, {args.seconds}s, {args.write_ratio:.0%} writes")
+    print()
+    print(f"{'profile':<14}{'ops/s':>10}{'reads':>10}{'writes':>10}{'errors':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    
+    for profile_name in args.profiles:
+        result = run_profile(profile_name, args.threads, args.seconds, args.write_ratio)
+        print(
+            f"{profile_name:<14}{result['ops_per_sec']:>10.0f}{result['reads']:>10}{result['writes']:>10}"
+            f"{result['errors']:>8}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Reminder timing wheel benchmark
+Schedules many timers spread over the reminder horizon and measures add, cancel and tick cost
+
+Usage:
+    python benchmark_reminders.py [--timers 1000000] [--horizon-days 30] [--tick-seconds 1]
+"""
+import argparse
+import random
+import time
+
+from app.core.reminders import TimingWheel
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the reminder timing wheel")
+    parser.add_argument("--timers", type=int, default=1_000_000)
+    parser.add_argument("--horizon-days", type=int, default=30)
+    parser.add_argument("--tick-seconds", type=float, default=1.0)
+    parser.add_argument("--cancel", type=float, default=0.1, help="Share of timers cancelled")
+    args = parser.parse_args()
+    
+    rng = random.Random(7)
+    horizon = int(args.horizon_days * 86400 / args.tick_seconds)
+    expires = [rng.randrange(1, horizon) for _ in range(args.timers)]
+    wheel = TimingWheel(0)
+    
+    started = time.perf_counter()
+    for key, tick in enumerate(expires):
+        wheel.add(key, tick)
+    add_seconds = time.perf_counter() - started
+    
+    cancelled = rng.sample(range(args.timers), int(args.timers * args.cancel))
+    started = time.perf_counter()
+    for key in cancelled:
+        wheel.cancel(key)
+    cancel_seconds = time.perf_counter() - started
+    
+    # Tick through the whole horizon one tick at a time, like the scheduler thread
+    fired = 0
+    slowest = 0.0
+    started = time.perf_counter()
+    for tick in range(1, horizon + 1):
+        tick_started = time.perf_counter()
+        fired += len(wheel.advance(tick))
+        slowest = max(slowest, time.perf_counter() - tick_started)
+    tick_seconds = time.perf_counter() - started
+    
+    print(f"🔧 {args.timers:,} timers over {args.horizon_days} days, {args.tick_seconds:g} s ticks ({horizon:,} ticks)")
+    print(f"{'operation':<28}{'µs/op':>10}")
+    print(f"{'add':<28}{add_seconds / args.timers * 1e6:>10.2f}")
+    print(f"{'cancel':<28}{cancel_seconds / max(len(cancelled), 1) * 1e6:>10.2f}")
+    print(f"{'tick':<28}{tick_seconds / horizon * 1e6:>10.2f}")
+    print(f"{'slowest tick':<28}{slowest * 1e6:>10.0f}")
+    print(f"✅ Fired {fired:,} of {args.timers - len(cancelled):,} live timers")
+
+
+if __name__ == "__main__":
+    main()
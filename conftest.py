@@ -0,0 +1,116 @@
+"""
+Pytest configuration
+Tests that touch the database run against a throwaway SQLite file, never the configured database,
+and model calls go to a scripted stand-in for the OpenAI client
+"""
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Union
+import itertools
+import os
+import tempfile
+
+import pytest
+
+
+# Must be set before app.core.config is imported by the test modules
+_database_dir = tempfile.mkdtemp(prefix="randevu-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_database_dir, 'test.db')}"
+os.environ["TENANT_SHARDING"] = "false"
+
+_tenant_numbers = itertools.count(1)
+
+
+def completion(content: Optional[str] = "Tamam", tool_calls: Optional[List[Any]] = None) -> SimpleNamespace:
+    """Non-streamed chat completion response"""
+    message = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=message)],
+        usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5)
+    )
+
+
+def stream(*deltas: SimpleNamespace) -> List[SimpleNamespace]:
+    """Streamed chat completion: one chunk per delta, then the usage chunk"""
+    chunks = [SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None) for delta in deltas]
+    chunks.append(SimpleNamespace(choices=[], usage={"prompt_tokens": 10, "completion_tokens": 5}))
+    return chunks
+
+
+def text_delta(content: str) -> SimpleNamespace:
+    """Stream delta carrying answer text"""
+    return SimpleNamespace(content=content, tool_calls=None)
+
+
+class ScriptedCompletions:
+    """
+    chat.completions of the scripted client
+    
+    Each create() call takes the next reply: a response object, or a function of the
+    call's keyword arguments returning one. Without replies left the answer is "Tamam".
+    """
+    
+    def __init__(self):
+        self.replies: List[Union[Any, Callable[[Dict[str, Any]], Any]]] = []
+        self.calls: List[Dict[str, Any]] = []
+    
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        reply = self.replies.pop(0) if self.replies else None
+        if callable(reply):
+            reply = reply(kwargs)
+        if reply is None:
+            reply = stream(text_delta("Tamam")) if kwargs.get("stream") else completion()
+        return iter(reply) if kwargs.get("stream") else reply
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Create the tables once; background writers are drained in the order of the app shutdown"""
+    from app.core.channels import channel_gateway, outbound_queue
+    from app.core.conversation_store import conversation_log
+    from app.core.database import init_db
+    from app.core.usage import usage_meter
+    from app.core.write_queue import write_queue
+    
+    init_db()
+    yield
+    channel_gateway.stop()
+    outbound_queue.stop()
+    conversation_log.stop()
+    usage_meter.stop()
+    write_queue.stop()
+
+
+@pytest.fixture
+def tenant(database):
+    """A new tenant (own ID, so per-tenant caches and counters start empty)"""
+    from app.core.database import SessionLocal
+    from app.models.tenant import Tenant
+    
+    number = next(_tenant_numbers)
+    with SessionLocal() as db:
+        tenant = Tenant(
+            username=f"klinik{number}",
+            password_hash="-",
+            business_name=f"Klinik {number}",
+            system_prompt="Sen bir diş kliniğinin resepsiyonistisin.",
+            address="Atatürk Cad. No: 1, Kadıköy",
+            phone="0216 555 12 34"
+        )
+        tenant.set_openai_api_key(f"sk-test-{number}")
+        db.add(tenant)
+        db.commit()
+        db.refresh(tenant)
+        db.expunge(tenant)
+    return tenant
+
+
+@pytest.fixture
+def openai_stub(tenant, monkeypatch):
+    """Scripted OpenAI client used by the tenant's AIService instances (client cache entry)"""
+    from app.core import ai_service
+    
+    completions = ScriptedCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setitem(ai_service._clients, tenant.get_openai_api_key(), client)
+    return completions
@@ -0,0 +1,74 @@
+"""
+Bulk tenant import script
+Imports tenants from a CSV (with header row) or NDJSON file
+
+CSV columns / NDJSON keys: username, password, business_name, openai_api_key, system_prompt (optional)
+
+Usage:
+    python import_tenants.py tenants.csv
+    python import_tenants.py tenants.ndjson --batch-size 500 --workers 8
+"""
+from typing import AsyncIterator
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from app.api.tenants import TenantCreate
+from app.core.config import settings
+from app.core.database import init_db
+from app.core.tenant_import import IMPORT_FORMATS, import_pool, import_tenants, parse_records
+
+
+async def read_lines(path: str) -> AsyncIterator[str]:
+    """Yield the lines of a file without loading it whole"""
+    with open(path, encoding="utf-8-sig") as f:
+        for line in f:
+            yield line.rstrip("\r\n")
+
+
+async def run(args: argparse.Namespace) -> dict:
+    """Run the import and return the summary"""
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    records = parse_records(read_lines(args.path), fmt)
+    return await import_tenants(records, TenantCreate, batch_size=args.batch_size, workers=args.workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import tenants")
+    parser.add_argument("path", help="CSV or NDJSON file")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="Defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, help="Rows per transaction")
+    parser.add_argument("--workers", type=int, help="Hashing processes")
+    parser.add_argument("--results", help="Write per-row results to this NDJSON file")
+    args = parser.parse_args()
+    
+    if not settings.ENCRYPTION_KEY:
+        # A key generated for this run would leave every imported API key undecryptable
+        print("❌ ENCRYPTION_KEY is not set; configure the key the server uses before importing")
+        sys.exit(2)
+    
+    init_db()
+    print(f"📥 Importing tenants from {args.path}...")
+    started = time.perf_counter()
+    try:
+        summary = asyncio.run(run(args))
+    finally:
+        import_pool.shutdown()
+    elapsed = time.perf_counter() - started
+    
+    if args.results:
+        with open(args.results, "w", encoding="utf-8") as f:
+            for result in summary["results"]:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    else:
+        for result in summary["results"]:
+            if result["status"] != "created":
+                print(f"   ⚠️  Row {result['row']} ({result['username']}): {result['status']} - {result.get('error')}")
+    
+    print(
+        f"✅ {summary['created']} created, {summary['duplicate']} duplicates, "
+        f"{summary['invalid']} invalid ({summary['total']} rows in {elapsed:.1f}s)"
+    )
+    sys.exit(0 if summary["created"] or not summary["total"] else 1)
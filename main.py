@@ -1,18 +1,37 @@
 import os
 import time
+import uuid
+from typing import Optional
 from fastapi import FastAPI, Request, Form, Depends
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy import create_engine, Column, Integer, String, Text
+from sqlalchemy import create_engine, select, Column, Integer, String, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from pydantic import BaseModel
-from passlib.context import CryptContext
+from pydantic import BaseModel, Field
 import openai  # OpenAI kütüphanesini ekledik
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt işlemleri ayrı süreçlerde çalışır (event loop bloklanmaz)
+from app.core.security import PasswordPoolBusyError, get_password_hash_async, password_pool, verify_password_async
+
+# Sohbet kayıtları bellekte biriktirilip arka planda toplu yazılır
+from app.core.conversation_store import conversation_log
+from app.core.analytics import get_dashboard
+from app.core.knowledge import knowledge_base
+from app.core.config import settings as app_settings
+from app.core.retention import retention_engine
+from app.core.reminders import reminder_scheduler
+from app.core.channels import channel_gateway, check_channel_config, outbound_queue
+from app.core.moderation import moderation_filter
+from app.core.redaction import REDACTION_NOTE, Redaction, pii_redactor
+from app.core.usage import QuotaExceededError, usage_meter
+from fastapi.concurrency import run_in_threadpool
+from app.core.database import SessionLocal as AppSessionLocal, init_db as init_app_db
+from app.models.tenant import Tenant as AppTenant
+
+BUSY_ERROR = "⏳ Sunucu şu anda yoğun, lütfen biraz sonra tekrar deneyin."
+NO_CLINIC_ERROR = "Bu hesap için klinik kaydı bulunamadı. Lütfen yöneticiye bildirin."
 
 # --- AYARLAR ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -41,6 +60,7 @@ templates = Jinja2Templates(directory=TEMPLATES_DIR)
 # Gelen mesaj formatı
 class ChatMessage(BaseModel):
     message: str
+    conversation_id: Optional[str] = Field(default=None, max_length=64)  # Yoksa sunucu yeni bir tane verir
 
 def get_db():
     db = SessionLocal()
@@ -49,6 +69,19 @@ def get_db():
     finally:
         db.close()
 
+# Bilgi bankası, sohbet kayıtları ve istatistikler uygulama veritabanındaki klinik (app.models.tenant)
+# ID'siyle tutulur; bu veritabanının ID'leri onlarla ilgisizdir, iki kayıt kullanıcı adıyla eşleşir
+def app_tenant(username: str):
+    with AppSessionLocal() as app_db:
+        return app_db.execute(
+            select(AppTenant.id, AppTenant.daily_token_quota, AppTenant.monthly_token_quota)
+            .where(AppTenant.username == username)
+        ).first()
+
+def app_tenant_id(username: str):
+    clinic = app_tenant(username)
+    return clinic.id if clinic else None
+
 # --- BAŞLANGIÇ KONTROLÜ ---
 @app.on_event("startup")
 def startup_db_check():
@@ -67,6 +100,36 @@ def startup_db_check():
             print("--- DEMO KULLANICI HAZIR ---")
     finally:
         db.close()
+    
+    # chat_events tablosu uygulama veritabanında
+    init_app_db()
+    
+    # Token sayaçları ilk istekten önce yüklenir (kota kontrolü veritabanına gitmez)
+    usage_meter.start()
+    
+    # Eski konuşmaları arşive taşıyan arka plan işi
+    if app_settings.RETENTION_ENABLED:
+        retention_engine.start()
+    
+    # Mesajlaşma kanalları ve giden mesaj kuyruğu (önceki çalışmadan kalan ve yeniden denenecek mesajlar)
+    if app_settings.CHANNELS_ENABLED:
+        check_channel_config()
+        outbound_queue.start()
+    
+    # Randevu hatırlatmaları
+    if app_settings.REMINDERS_ENABLED:
+        reminder_scheduler.start()
+
+# --- KAPANIŞ: bekleyen sohbet kayıtlarını yaz ---
+@app.on_event("shutdown")
+def flush_chat_log():
+    retention_engine.stop()
+    reminder_scheduler.stop()
+    channel_gateway.stop()
+    outbound_queue.stop()
+    conversation_log.stop()
+    usage_meter.stop()
+    password_pool.shutdown()
 
 # --- SAYFALAR ---
 
@@ -83,7 +146,10 @@ async def login_submit(request: Request, username: str = Form(...), password: st
         return templates.TemplateResponse("giris.html", {"request": request, "error": "Kullanıcı bulunamadı!"})
     
     # Try plain text first (backwards compatibility), then try bcrypt verification
-    password_valid = (user.password == password) or pwd_context.verify(password, user.password)
+    try:
+        password_valid = (user.password == password) or await verify_password_async(password, user.password)
+    except PasswordPoolBusyError:
+        return templates.TemplateResponse("giris.html", {"request": request, "error": BUSY_ERROR}, status_code=503)
     
     if not password_valid:
         return templates.TemplateResponse("giris.html", {"request": request, "error": "Hatalı Şifre!"})
@@ -98,39 +164,71 @@ async def dashboard(request: Request, db: Session = Depends(get_db)):
     if not user_id: return RedirectResponse(url="/giris")
     
     user = db.query(Tenant).filter(Tenant.id == int(user_id)).first()
+    tenant_id = app_tenant_id(user.username)
     return templates.TemplateResponse("panel.html", {
         "request": request, 
         "username": user.username,
         "business_name": user.business_name,
         "api_key": user.openai_api_key or "",
         "system_prompt": user.system_prompt or "",
+        "knowledge_base": await run_in_threadpool(knowledge_base.panel_content, tenant_id) if tenant_id else "",
         "success": None,
-        "error": None
+        "error": None if tenant_id else NO_CLINIC_ERROR
     })
 
+# --- PANEL İSTATİSTİKLERİ (saatlik/günlük özetlerden okunur) ---
+@app.get("/panel/analytics")
+async def panel_analytics(request: Request, days: int = 30, db: Session = Depends(get_db)):
+    user_id = request.cookies.get("user_id")
+    if not user_id:
+        return JSONResponse(content={"detail": "Oturum bulunamadı"}, status_code=401)
+    user = db.query(Tenant).filter(Tenant.id == int(user_id)).first()
+    if not user:
+        return JSONResponse(content={"detail": "Oturum bulunamadı"}, status_code=401)
+    tenant_id = app_tenant_id(user.username)
+    if not tenant_id:
+        return JSONResponse(content={"detail": NO_CLINIC_ERROR}, status_code=404)
+    return await run_in_threadpool(get_dashboard, tenant_id, max(1, min(days, 365)))
+
 @app.post("/ayarlari-kaydet")
 async def save_settings(
     request: Request, 
     openai_key: str = Form(...), 
     bot_prompt: str = Form(...),
     business_name: str = Form(...),
+    knowledge_text: str = Form("", alias="knowledge_base"),
     db: Session = Depends(get_db)
 ):
     user_id = request.cookies.get("user_id")
     if not user_id: return RedirectResponse(url="/giris")
-
+    
     user = db.query(Tenant).filter(Tenant.id == int(user_id)).first()
     user.openai_api_key = openai_key
     user.system_prompt = bot_prompt
     user.business_name = business_name
     db.commit()
     
+    # Bilgi bankası parçalara bölünüp indekslenir, her soruya sadece ilgili kısımlar eklenir
+    tenant_id = app_tenant_id(user.username)
+    if not tenant_id:
+        return templates.TemplateResponse("panel.html", {
+            "request": request,
+            "username": user.username,
+            "business_name": business_name,
+            "api_key": openai_key,
+            "system_prompt": bot_prompt,
+            "knowledge_base": knowledge_text,
+            "error": NO_CLINIC_ERROR
+        })
+    await run_in_threadpool(knowledge_base.save_panel_content, tenant_id, knowledge_text)
+    
     return templates.TemplateResponse("panel.html", {
         "request": request,
         "username": user.username,
         "business_name": business_name,
         "api_key": openai_key,
         "system_prompt": bot_prompt,
+        "knowledge_base": knowledge_text,
         "success": "✅ Ayarlar ve Anahtar Güvenle Kaydedildi!"
     })
 
@@ -148,38 +246,107 @@ async def chat_page(request: Request, db: Session = Depends(get_db)):
 # --- YENİ EKLENEN KISIM: YAPAY ZEKA API (BEYİN) ---
 @app.post("/chat-api")
 async def chat_endpoint(chat_data: ChatMessage, db: Session = Depends(get_db)):
+    started = time.perf_counter()
+    
     # 1. Veritabanından müşterinin kaydettiği Key'i bul (demo user)
     user = db.query(Tenant).filter(Tenant.username == "demo").first()
     
     if not user or not user.openai_api_key:
         return JSONResponse(content={"error": "Klinik henüz API anahtarı girmemiş. Lütfen yöneticiye bildirin."}, status_code=400)
-
+    
+    # Klinik kaydı olmadan başka bir kliniğin bilgi bankası ve kayıtları kullanılabilirdi
+    clinic = app_tenant(user.username)
+    if not clinic:
+        return JSONResponse(content={"error": NO_CLINIC_ERROR}, status_code=400)
+    tenant_id = clinic.id
+    
+    # Aynı sohbetin mesajları birlikte kaydedilir ve arşivlenir
+    conversation_id = chat_data.conversation_id or uuid.uuid4().hex
+    
+    # Kişisel veriler (TC kimlik, telefon, IBAN, e-posta) OpenAI'ya ve sohbet kayıtlarına etiket olarak gider
+    redaction = Redaction() if app_settings.PII_REDACTION_ENABLED else None
+    user_text = pii_redactor.redact(chat_data.message, redaction) if redaction is not None else chat_data.message
+    
+    # Moderasyon: engellenen mesajlar modele hiç gitmez
+    if app_settings.MODERATION_ENABLED:
+        verdict = await run_in_threadpool(moderation_filter.check, tenant_id, chat_data.message)
+        if verdict is not None:
+            conversation_log.record(
+                tenant_id=tenant_id, user_message=user_text, assistant_message=verdict.reply,
+                model=verdict.model, latency_ms=int((time.perf_counter() - started) * 1000), channel="web",
+                conversation_id=conversation_id
+            )
+            if verdict.reply is None:
+                return JSONResponse(content={"error": "Mesajınız gönderilemedi."}, status_code=403)
+            return {"reply": verdict.reply, "conversation_id": conversation_id}
+    
+    # Token kotası (bellekteki sayaçlarla kontrol edilir)
+    try:
+        usage_meter.check(
+            tenant_id,
+            clinic.daily_token_quota if clinic.daily_token_quota is not None else app_settings.DEFAULT_DAILY_TOKEN_QUOTA,
+            clinic.monthly_token_quota if clinic.monthly_token_quota is not None else app_settings.DEFAULT_MONTHLY_TOKEN_QUOTA
+        )
+    except QuotaExceededError:
+        return JSONResponse(content={"error": "Kliniğin kullanım kotası doldu. Lütfen daha sonra tekrar deneyin."}, status_code=429)
+    
     # SIMULATION MODE: API key "TEST" ise gerçek OpenAI çağrısı yapma
     if user.openai_api_key.upper() == "TEST":
         # Network delay simülasyonu (1 saniye bekle)
         time.sleep(1)
         
         # Simülasyon yanıtı döndür
-        return {"reply": "Sistem BAŞARIYLA çalışıyor! Paran cebinde kaldı. Mesajın sunucuya ulaştı ve bu yapay cevap döndü. 🚀"}
+        bot_reply = "Sistem BAŞARIYLA çalışıyor! Paran cebinde kaldı. Mesajın sunucuya ulaştı ve bu yapay cevap döndü. 🚀"
+        conversation_log.record(
+            tenant_id=tenant_id, user_message=user_text, assistant_message=bot_reply,
+            model="simulation", latency_ms=int((time.perf_counter() - started) * 1000), channel="web",
+            conversation_id=conversation_id
+        )
+        return {"reply": bot_reply, "conversation_id": conversation_id}
     
     # GERÇEK MOD: OpenAI'ya bağlan
     try:
         # 2. Müşterinin kendi anahtarını kullanarak OpenAI'ya bağlan
         client = openai.OpenAI(api_key=user.openai_api_key)
         
-        # 3. Müşterinin yazdığı talimatla (prompt) cevap ver
+        # 3. Müşterinin yazdığı talimatla (prompt) ve bilgi bankasının ilgili kısımlarıyla cevap ver
+        system_prompt = user.system_prompt or ""
+        context = await run_in_threadpool(knowledge_base.build_context, tenant_id, user_text)
+        if context:
+            system_prompt = f"{system_prompt}\n\n{context}"
+        if redaction:
+            system_prompt = f"{system_prompt}\n\n{REDACTION_NOTE}"
         response = client.chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
-                {"role": "system", "content": user.system_prompt},
-                {"role": "user", "content": chat_data.message}
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_text}
             ]
         )
         
-        bot_reply = response.choices[0].message.content
-        return {"reply": bot_reply}
+        # Kayda modelin etiketli yanıtı yazılır, kullanıcıya asıl değerler döner
+        model_reply = response.choices[0].message.content
+        bot_reply = redaction.restore(model_reply) if redaction is not None and model_reply else model_reply
         
+        # 4. Konuşmayı kaydet (yanıtı geciktirmez, arka planda toplu yazılır)
+        usage = response.usage
+        if usage:
+            usage_meter.record(tenant_id, usage.prompt_tokens or 0, usage.completion_tokens or 0)
+        conversation_log.record(
+            tenant_id=tenant_id, user_message=user_text, assistant_message=model_reply,
+            model="gpt-3.5-turbo", latency_ms=int((time.perf_counter() - started) * 1000),
+            prompt_tokens=usage.prompt_tokens if usage else None,
+            completion_tokens=usage.completion_tokens if usage else None,
+            channel="web", conversation_id=conversation_id
+        )
+        return {"reply": bot_reply, "conversation_id": conversation_id}
+    
     except Exception as e:
+        conversation_log.record(
+            tenant_id=tenant_id, user_message=user_text, model="gpt-3.5-turbo",
+            latency_ms=int((time.perf_counter() - started) * 1000), channel="web",
+            conversation_id=conversation_id, error=str(e)
+        )
         return JSONResponse(content={"error": f"OpenAI Hatası: {str(e)}"}, status_code=500)
 
 @app.post("/update-credentials")
@@ -201,7 +368,20 @@ async def update_credentials(
         return RedirectResponse(url="/giris")
     
     # 1. Verify current password
-    password_valid = (user.password == current_password) or pwd_context.verify(current_password, user.password)
+    try:
+        password_valid = (user.password == current_password) or await verify_password_async(current_password, user.password)
+    except PasswordPoolBusyError:
+        password_valid = None
+    
+    if password_valid is None:
+        return templates.TemplateResponse("panel.html", {
+            "request": request,
+            "username": user.username,
+            "business_name": user.business_name,
+            "api_key": user.openai_api_key or "",
+            "system_prompt": user.system_prompt or "",
+            "error": BUSY_ERROR
+        }, status_code=503)
     
     if not password_valid:
         return templates.TemplateResponse("panel.html", {
@@ -241,7 +421,17 @@ async def update_credentials(
                 "error": "❌ Şifreler uyuşmuyor! Lütfen aynı şifreyi iki kez girin."
             })
         
-        user.password = pwd_context.hash(new_password)
+        try:
+            user.password = await get_password_hash_async(new_password)
+        except PasswordPoolBusyError:
+            return templates.TemplateResponse("panel.html", {
+                "request": request,
+                "username": user.username,
+                "business_name": user.business_name,
+                "api_key": user.openai_api_key or "",
+                "system_prompt": user.system_prompt or "",
+                "error": BUSY_ERROR
+            }, status_code=503)
     
     # 4. Commit changes
     db.commit()
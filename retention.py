@@ -0,0 +1,60 @@
+"""
+Chat retention script
+Archives chat events older than the retention period and purges expired archive months
+
+Usage:
+    python retention.py run                                 # Run once for all tenants
+    python retention.py tenant <tenant_id> [days]           # Archive one tenant now
+    python retention.py show <tenant_id> <conversation_id>  # Print a conversation (read-through)
+"""
+import sys
+
+from app.core.archive import load_conversation
+from app.core.database import init_db
+from app.core.retention import retention_engine
+
+
+def run_all():
+    """Run the retention engine once"""
+    print("🗄️  Archiving old conversations...")
+    stats = retention_engine.run_once()
+    print(f"✅ {stats['archived']} events archived, {stats['purged_months']} archive months purged ({stats['tenants']} tenants)")
+
+
+def run_tenant(tenant_id: int, days: int):
+    """Archive one tenant"""
+    print(f"🗄️  Archiving events of tenant {tenant_id} older than {days} days...")
+    archived = retention_engine.archive_tenant(tenant_id, days)
+    print(f"✅ {archived} events archived")
+
+
+def show_conversation(tenant_id: int, conversation_id: str):
+    """Print a conversation including archived messages"""
+    messages = load_conversation(tenant_id, conversation_id)
+    if messages is None:
+        print("❌ Conversation not found")
+        sys.exit(1)
+    for message in messages:
+        marker = "📦" if message["archived"] else "💬"
+        print(f"{marker} {message['created_at']}  {message['user_message']}")
+        if message["assistant_message"]:
+            print(f"   ↳ {message['assistant_message']}")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    init_db()
+    
+    if command == "run":
+        run_all()
+    elif command == "tenant" and len(sys.argv) in (3, 4):
+        tenant_id = int(sys.argv[2])
+        days = int(sys.argv[3]) if len(sys.argv) == 4 else retention_engine.tenant_policies().get(
+            tenant_id, retention_engine.default_retention_days
+        )
+        run_tenant(tenant_id, days)
+    elif command == "show" and len(sys.argv) == 4:
+        show_conversation(int(sys.argv[2]), sys.argv[3])
+    else:
+        print(__doc__)
+        sys.exit(1)
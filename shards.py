@@ -0,0 +1,62 @@
+"""
+Tenant shard management script
+Requires TENANT_SHARDING=True
+
+Usage:
+    python shards.py list                       # Show shard roots and tenant placement
+    python shards.py locate <tenant_id>         # Show the shard file of a tenant
+    python shards.py move <tenant_id> <shard>   # Move a tenant to another shard (online)
+"""
+import os
+import sys
+
+from sqlalchemy import func, select
+
+from app.core.database import SessionLocal
+from app.core.sharding import shard_router
+from app.models.tenant import Tenant
+
+
+def list_shards():
+    """Print configured shards with their tenant counts"""
+    with SessionLocal() as db:
+        counts = dict(db.execute(select(Tenant.shard, func.count(Tenant.id)).group_by(Tenant.shard)).all())
+    
+    print("📦 Shards:")
+    for name, root in sorted(shard_router.roots.items()):
+        print(f"   {name:<10} {os.path.abspath(root):<50} {counts.get(name, 0)} tenants")
+    if counts.get(None):
+        print(f"   (unassigned) {counts[None]} tenants, placed on first use")
+
+
+def locate_tenant(tenant_id: int):
+    """Print where a tenant's data lives"""
+    shard = shard_router.resolve(tenant_id)
+    path = shard_router.path_for(tenant_id, shard)
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    print(f"🔎 Tenant {tenant_id}: shard '{shard}' -> {path} ({size / 1024:.1f} KB)")
+
+
+def move_tenant(tenant_id: int, target_shard: str):
+    """Move a tenant to another shard"""
+    print(f"🚚 Moving tenant {tenant_id} to shard '{target_shard}'...")
+    path = shard_router.move_tenant(tenant_id, target_shard)
+    print(f"✅ Tenant {tenant_id} now stored in {path}")
+
+
+if __name__ == "__main__":
+    if shard_router is None:
+        print("❌ Tenant sharding is disabled, set TENANT_SHARDING=True")
+        sys.exit(1)
+    
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    
+    if command == "list":
+        list_shards()
+    elif command == "locate" and len(sys.argv) == 3:
+        locate_tenant(int(sys.argv[2]))
+    elif command == "move" and len(sys.argv) == 4:
+        move_tenant(int(sys.argv[2]), sys.argv[3])
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,102 @@
+"""
+Tests for the appointment availability index
+Free-slot bitsets: finding runs of free slots, conflict checks, reserving and releasing
+"""
+from datetime import date, datetime, timedelta
+
+from app.core.appointments import TenantAvailability, lowest_bits, parse_clock, run_starts
+
+
+MONDAY = date(2030, 1, 7)
+
+
+def index(bookings=(), days: int = 14) -> TenantAvailability:
+    """Two staff members working 09:00-12:00 and 13:00-17:00 on weekdays, 15 minute slots"""
+    hours = []
+    for staff_id in (1, 2):
+        for weekday in range(5):
+            hours.append((staff_id, weekday, parse_clock("09:00"), parse_clock("12:00")))
+            hours.append((staff_id, weekday, parse_clock("13:00"), parse_clock("17:00")))
+    services = {10: {"name": "Dolgu", "duration_minutes": 40, "price": 1500, "staff": [1]}}
+    return TenantAvailability(MONDAY, days, 15, {1: "Dr. Ayşe", 2: "Dr. Mehmet"}, hours, services, bookings)
+
+
+def at(day: date, clock: str) -> datetime:
+    """Clinic time of a day and HH:MM"""
+    return datetime.combine(day, datetime.strptime(clock, "%H:%M").time())
+
+
+def test_run_starts_and_lowest_bits():
+    """Start bits of free runs of a length, lowest set bits in order"""
+    free = 0b0111_1011
+    assert run_starts(free, 2) == 0b0011_1001
+    assert run_starts(free, 4) == 0b0000_1000
+    assert run_starts(free, 5) == 0
+    assert lowest_bits(0b1010_0100, 2) == [2, 5]
+
+
+def test_find_earliest_free_run():
+    """A 40 minute service needs three free 15 minute slots inside working hours"""
+    availability = index()
+    slots = availability.find([1], availability.slots_for(40), at(MONDAY, "11:00"), limit=3)
+    assert slots == [
+        (at(MONDAY, "11:00"), 1),
+        (at(MONDAY, "11:15"), 1),
+        (at(MONDAY, "13:00"), 1),
+    ]
+
+
+def test_find_rounds_up_and_skips_weekend():
+    """Search starts at the next slot boundary; days without working hours are skipped"""
+    availability = index()
+    friday = MONDAY + timedelta(days=4)
+    assert availability.find([1], 1, at(friday, "16:50"), limit=2) == [
+        (at(MONDAY + timedelta(days=7), "09:00"), 1),
+        (at(MONDAY + timedelta(days=7), "09:15"), 1),
+    ]
+
+
+def test_booking_conflict():
+    """A booked range is not free for the same staff member, overlapping ranges conflict too"""
+    availability = index(bookings=[(1, at(MONDAY, "10:00"), at(MONDAY, "10:40"))])
+    assert not availability.is_free(1, at(MONDAY, "10:00"), at(MONDAY, "10:45"))
+    assert not availability.is_free(1, at(MONDAY, "10:30"), at(MONDAY, "11:00"))
+    assert not availability.is_free(1, at(MONDAY, "09:30"), at(MONDAY, "10:15"))
+    assert availability.is_free(1, at(MONDAY, "09:15"), at(MONDAY, "10:00"))
+    assert availability.is_free(1, at(MONDAY, "10:45"), at(MONDAY, "11:30"))
+    assert availability.is_free(2, at(MONDAY, "10:00"), at(MONDAY, "10:45"))
+
+
+def test_outside_working_hours_is_not_free():
+    """Lunch break, weekends, unknown staff and days beyond the horizon are never free"""
+    availability = index()
+    assert not availability.is_free(1, at(MONDAY, "11:45"), at(MONDAY, "12:15"))
+    assert not availability.is_free(1, at(MONDAY + timedelta(days=5), "10:00"), at(MONDAY + timedelta(days=5), "10:15"))
+    assert not availability.is_free(3, at(MONDAY, "10:00"), at(MONDAY, "10:15"))
+    assert not availability.is_free(1, at(MONDAY + timedelta(days=30), "10:00"), at(MONDAY + timedelta(days=30), "10:15"))
+
+
+def test_reserve_and_release():
+    """Reserved slots disappear from the search and come back when released"""
+    availability = index()
+    start, end = at(MONDAY, "09:00"), at(MONDAY, "09:45")
+    availability.reserve(1, start, end)
+    assert availability.find([1], 1, at(MONDAY, "09:00"), limit=1) == [(at(MONDAY, "09:45"), 1)]
+    assert availability.find([1, 2], 1, at(MONDAY, "09:00"), limit=1) == [(at(MONDAY, "09:00"), 2)]
+    
+    availability.release(1, start, end)
+    assert availability.is_free(1, start, end)
+    
+    # Releasing never frees time outside working hours
+    availability.release(1, at(MONDAY, "12:00"), at(MONDAY, "13:00"))
+    assert not availability.is_free(1, at(MONDAY, "12:00"), at(MONDAY, "12:15"))
+
+
+def test_fully_booked_days_are_skipped():
+    """Days after the first week without a free slot are skipped by the vectorized scan"""
+    availability = index(days=21)
+    for day in range(21):
+        current = MONDAY + timedelta(days=day)
+        if day != 16:
+            availability.reserve(1, at(current, "00:00"), at(current, "23:45"))
+    assert availability.find([1], 1, at(MONDAY, "09:00"), limit=1) == [(at(MONDAY + timedelta(days=16), "09:00"), 1)]
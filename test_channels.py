@@ -0,0 +1,175 @@
+"""
+Tests for the messaging channels
+Claiming due messages under a lease, retrying provider failures and re-claiming expired leases,
+and webhooks accepted only for the tenant they are addressed to
+"""
+from datetime import timedelta
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import delete
+
+from app.api import channels
+from app.core.channels import (
+    ChannelTenantError,
+    OutboundQueue,
+    SmsAdapter,
+    StubProvider,
+    WhatsAppAdapter,
+    _utcnow,
+    channel_gateway,
+    parse_rate_limits,
+    split_text,
+)
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.outbound_message import FAILED, PENDING, SENDING, SENT, OutboundMessage
+from app.models.tenant import Tenant
+
+
+TENANT_ID = 1
+
+
+@pytest.fixture
+def outbound(database):
+    """Factory of queues over an empty message table, dispatched inline in the test thread"""
+    def _queue(failure_rate: float = 0.0, **options) -> OutboundQueue:
+        queue = OutboundQueue({"sms": StubProvider("sms", failure_rate=failure_rate)}, **options)
+        queue.stop()  # No dispatcher thread: dispatch() sends inline
+        return queue
+    
+    with SessionLocal() as db:
+        db.execute(delete(OutboundMessage))
+        db.commit()
+    return _queue
+
+
+def stored(message_id: int) -> OutboundMessage:
+    """Outbound message row as committed"""
+    with SessionLocal() as db:
+        return db.get(OutboundMessage, message_id)
+
+
+def test_split_text():
+    """Long messages are cut at whitespace, words longer than half the limit are cut hard"""
+    assert split_text("  kısa mesaj ", 20) == ["kısa mesaj"]
+    assert split_text("bir iki üç dört beş", 8) == ["bir iki", "üç dört", "beş"]
+    assert split_text("x" * 10, 4) == ["xxxx", "xxxx", "xx"]
+    assert parse_rate_limits("whatsapp:80, sms:10,") == {"whatsapp": 80.0, "sms": 10.0}
+
+
+def test_messages_are_claimed_and_sent(outbound):
+    """Queued messages are claimed in one batch and marked sent with the provider ID"""
+    queue = outbound()
+    ids = queue.enqueue(TENANT_ID, "sms", "05321234567", "Randevunuz yarın 10:00'da.").result()
+    ids += queue.enqueue(TENANT_ID, "sms", "05321234567", "x " * 1000).result()
+    assert len(ids) == 3  # The long message is split
+    
+    assert queue.dispatch() == 3
+    assert queue.dispatch() == 0
+    for message_id in ids:
+        row = stored(message_id)
+        assert (row.status, row.attempts, row.provider_message_id) == (SENT, 1, f"stub-sms-{message_id}")
+    assert queue.stats["sent"] == 3 and queue.stats["batches"] == 1
+
+
+def test_provider_failures_are_retried(outbound):
+    """Temporary failures go back to pending with backoff and fail after max_attempts"""
+    queue = outbound(failure_rate=1.0, max_attempts=2, retry_seconds=60)
+    message_id = queue.enqueue(TENANT_ID, "sms", "05321234567", "Hatırlatma").result()[0]
+    
+    assert queue.dispatch() == 1
+    row = stored(message_id)
+    assert (row.status, row.attempts, row.last_error) == (PENDING, 1, "stub failure")
+    assert row.next_attempt_at >= _utcnow() + timedelta(seconds=50)
+    assert queue.dispatch() == 0  # Not due yet
+    
+    with SessionLocal() as db:
+        db.get(OutboundMessage, message_id).next_attempt_at = _utcnow()
+        db.commit()
+    assert queue.dispatch() == 1
+    assert (stored(message_id).status, stored(message_id).attempts) == (FAILED, 2)
+    assert queue.stats["retried"] == 1 and queue.stats["failed"] == 1
+
+
+def test_every_message_is_delivered_once_despite_failures(outbound):
+    """With half the sends failing every message is still delivered, and none twice"""
+    queue = outbound(failure_rate=0.5, max_attempts=50, retry_seconds=0)
+    ids = [queue.enqueue(TENANT_ID, "sms", f"0532123{i:04d}", f"Mesaj {i}").result()[0] for i in range(40)]
+    
+    for _ in range(200):
+        if not queue.dispatch():
+            break
+    provider = queue.providers["sms"]
+    assert sorted(message["id"] for message in provider.sent) == ids
+    assert all(stored(message_id).status == SENT for message_id in ids)
+
+
+def test_expired_lease_is_claimed_again(outbound):
+    """Messages of a dispatcher that died mid-send are sent once their lease expires"""
+    queue = outbound(max_attempts=2)
+    first, second, last = [queue.enqueue(TENANT_ID, "sms", "05321234567", f"Mesaj {i}").result()[0] for i in range(3)]
+    now = _utcnow()
+    with SessionLocal() as db:
+        for message_id, attempts, lease in ((first, 1, now - timedelta(seconds=1)), (second, 1, now + timedelta(minutes=2)), (last, 2, now - timedelta(seconds=1))):
+            message = db.get(OutboundMessage, message_id)
+            message.status, message.attempts, message.next_attempt_at = SENDING, attempts, lease
+        db.commit()
+    
+    assert queue.dispatch() == 1
+    assert (stored(first).status, stored(first).attempts) == (SENT, 2)
+    assert stored(second).status == SENDING  # Lease still running
+    assert (stored(last).status, stored(last).last_error) == (FAILED, "Delivery did not finish")
+
+
+def test_rate_limit_caps_the_batch(outbound):
+    """A channel never gets more messages per batch than its token bucket holds"""
+    queue = outbound(rate_limits={"sms": 2})
+    for i in range(5):
+        queue.enqueue(TENANT_ID, "sms", "05321234567", f"Mesaj {i}").result()
+    assert queue.dispatch() == 2
+    assert queue.dispatch() == 0
+
+
+def test_webhook_must_be_addressed_to_the_tenant():
+    """The business identity in the payload must be the tenant's, required while signatures are"""
+    whatsapp = WhatsAppAdapter(require_signature=True)
+    payload = json.dumps({"entry": [{"changes": [{"value": {
+        "metadata": {"phone_number_id": "1055"},
+        "messages": [{"from": "905321234567", "id": "wamid.1", "type": "text", "text": {"body": "Merhaba"}}],
+    }}]}]}).encode()
+    messages = whatsapp.parse(payload, "application/json")
+    assert messages[0].recipient == "1055"
+    whatsapp.check_recipients(messages, "1055")
+    with pytest.raises(ChannelTenantError):
+        whatsapp.check_recipients(messages, "2077")
+    with pytest.raises(ChannelTenantError):
+        whatsapp.check_recipients(messages, None)
+    WhatsAppAdapter(require_signature=False).check_recipients(messages, None)  # Offline stub setup
+    
+    sms = SmsAdapter(require_signature=True)
+    messages = sms.parse(b"From=%2B905551112233&To=%2B902165551234&Body=Merhaba", "application/x-www-form-urlencoded")
+    sms.check_recipients(messages, "0216 555 12 34")
+    with pytest.raises(ChannelTenantError):
+        sms.check_recipients(messages, "0216 555 99 99")
+
+
+def test_webhook_of_another_tenant_is_rejected(tenant, openai_stub, monkeypatch):
+    """A message sent to another tenant's number is refused with 403 and not answered"""
+    monkeypatch.setattr(settings, "CHANNELS_ENABLED", True)
+    with SessionLocal() as db:
+        db.get(Tenant, tenant.id).sms_number = "+90 216 555 12 34"
+        db.commit()
+    app = FastAPI()
+    app.include_router(channels.router, prefix="/api")
+    
+    with TestClient(app) as client:
+        url = f"/api/channels/sms/{tenant.id}/webhook"
+        response = client.post(url, data={"From": "+905551112233", "To": "+902165559999", "Body": "Merhaba", "MessageSid": f"SMx{tenant.id}"})
+        assert response.status_code == 403
+        response = client.post(url, data={"From": "+905551112233", "To": "+902165551234", "Body": "Merhaba", "MessageSid": f"SMx{tenant.id}"})
+        assert response.status_code == 200  # Not remembered as a duplicate by the rejected attempt
+    channel_gateway.stop()
+    assert len(openai_stub.calls) == 1
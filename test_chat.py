@@ -0,0 +1,87 @@
+"""
+Tests for the chat and channel endpoints
+Turns are logged without personal data, whichever path answered them
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import select
+
+from app.api import channels, chat
+from app.core.channels import channel_gateway
+from app.core.config import settings
+from app.core.conversation_store import conversation_log
+from app.core.database import SessionLocal
+from app.core.search import search_conversations
+from app.models.chat_event import ChatEvent
+from conftest import completion, stream, text_delta
+
+
+PHONE = "0532 123 45 67"
+TCKN = "10000000146"
+MESSAGE = f"Adım Ayşe, numaram {PHONE} ve TC kimlik numaram {TCKN}. Dolgum düştü, ne yapmalıyım?"
+
+
+@pytest.fixture
+def client(database):
+    """Chat and channel routes as mounted by the API"""
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/api")
+    app.include_router(channels.router, prefix="/api")
+    with TestClient(app) as client:
+        yield client
+
+
+def echo_placeholders(kwargs):
+    """Model reply repeating the phone placeholder it was given"""
+    assert PHONE not in kwargs["messages"][-1]["content"]
+    return completion("Sizi [TELEFON_1] numarasından arayacağız.")
+
+
+def stored_turns(tenant_id: int):
+    """(user message, assistant message) of the tenant's logged turns"""
+    conversation_log.flush()
+    with SessionLocal() as db:
+        events = db.execute(select(ChatEvent).where(ChatEvent.tenant_id == tenant_id).order_by(ChatEvent.id)).scalars().all()
+        return [(event.user_message, event.assistant_message) for event in events]
+
+
+def assert_masked(tenant_id: int):
+    """The turn is stored with placeholders and cannot be found by the personal data"""
+    turns = stored_turns(tenant_id)
+    assert turns == [(
+        "Adım Ayşe, numaram [TELEFON_1] ve TC kimlik numaram [TC_KIMLIK_1]. Dolgum düştü, ne yapmalıyım?",
+        "Sizi [TELEFON_1] numarasından arayacağız.",
+    )]
+    assert search_conversations(tenant_id, TCKN)["results"] == []
+
+
+def test_chat_turn_is_stored_masked(client, tenant, openai_stub):
+    """/api/chat answers with the real number but logs placeholders"""
+    openai_stub.replies.append(echo_placeholders)
+    response = client.post("/api/chat", json={"tenant_id": tenant.id, "user_message": MESSAGE, "model": "gpt-4o"})
+    assert response.status_code == 200
+    assert response.json()["assistant_message"] == f"Sizi {PHONE} numarasından arayacağız."
+    assert_masked(tenant.id)
+
+
+def test_streamed_turn_is_stored_masked(client, tenant, openai_stub):
+    """/api/chat/stream restores the number in the stream but logs placeholders"""
+    openai_stub.replies.append(stream(text_delta("Sizi [TELE"), text_delta("FON_1] numarasından arayacağız.")))
+    response = client.post("/api/chat/stream", json={"tenant_id": tenant.id, "user_message": MESSAGE, "model": "gpt-4o"})
+    assert response.status_code == 200
+    assert response.text == f"Sizi {PHONE} numarasından arayacağız."
+    assert_masked(tenant.id)
+
+
+def test_channel_turn_is_stored_masked(client, tenant, openai_stub, monkeypatch):
+    """A channel message is answered and logged with placeholders"""
+    monkeypatch.setattr(settings, "CHANNELS_ENABLED", True)
+    openai_stub.replies.append(echo_placeholders)
+    response = client.post(
+        f"/api/channels/sms/{tenant.id}/webhook",
+        data={"From": "+905551112233", "To": tenant.phone, "Body": MESSAGE, "MessageSid": f"SM{tenant.id}"}
+    )
+    assert response.status_code == 200
+    channel_gateway.stop()  # Wait for the answer
+    assert_masked(tenant.id)
@@ -0,0 +1,68 @@
+"""
+Tests for message compression
+Bodies round-trip with per-tenant dictionaries, and the dictionary and codec caches stay bounded
+"""
+import pytest
+
+from app.core.compression import NO_DICTIONARY, MessageCodec
+from app.core.conversation_store import conversation_log
+
+
+MESSAGES = [
+    f"Merhaba, {day} günü saat {hour}:{minute} için {service} randevusu almak istiyorum."
+    for day in ("Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma")
+    for hour in range(9, 18)
+    for minute, service in (("00", "dolgu"), ("30", "kontrol"))
+]
+
+
+def event(tenant_id: int, message: str):
+    """Buffered chat event as the conversation log hands it to the codec"""
+    return {"tenant_id": tenant_id, "user_message": message, "assistant_message": "Tamam"}
+
+
+@pytest.fixture(scope="module")
+def trained_tenants(database):
+    """IDs of three tenants (outside the tenants table) that each have a trained dictionary"""
+    tenant_ids = [900001, 900002, 900003]
+    for tenant_id in tenant_ids:
+        for message in MESSAGES:
+            conversation_log.record(tenant_id, message, "Randevunuz için uygun saatlere bakıyorum.")
+    conversation_log.flush()
+    trainer = MessageCodec(min_samples=50)
+    for tenant_id in tenant_ids:
+        assert trainer.train(tenant_id) == 1
+    return tenant_ids
+
+
+def test_bodies_round_trip(trained_tenants):
+    """Messages are compressed with the tenant's latest dictionary and decode to the same text"""
+    codec = MessageCodec()
+    tenant_id = trained_tenants[0]
+    row = codec.encode_event(event(tenant_id, MESSAGES[0]))
+    assert row["body_dict"] == 1
+    assert len(row["user_body"]) < len(MESSAGES[0].encode()) / 2
+    assert codec.decode(tenant_id, 1, row["user_body"]) == MESSAGES[0]
+    
+    plain = MessageCodec(enabled=False).encode_event(event(tenant_id, MESSAGES[0]))
+    assert plain["body_dict"] is None
+    assert codec.decode(tenant_id, None, plain["user_body"]) == MESSAGES[0]
+    assert codec.current_version(10 ** 7) == NO_DICTIONARY
+
+
+def test_caches_are_bounded(trained_tenants):
+    """Dictionaries and per-thread codecs are evicted least recently used first and reloaded on use"""
+    codec = MessageCodec(cache_size=2, codec_cache_size=3)
+    rows = {}
+    for tenant_id in trained_tenants:
+        rows[tenant_id] = codec.encode_event(event(tenant_id, MESSAGES[1]))
+        assert codec.decode(tenant_id, 1, rows[tenant_id]["user_body"]) == MESSAGES[1]
+    
+    assert list(codec._dicts) == [(tenant_id, 1) for tenant_id in trained_tenants[1:]]
+    assert list(codec._local.codecs) == [("d", trained_tenants[1], 1), ("c", trained_tenants[2], 1), ("d", trained_tenants[2], 1)]
+    
+    # The evicted tenant is loaded again
+    first = trained_tenants[0]
+    assert codec.decode(first, 1, rows[first]["user_body"]) == MESSAGES[1]
+    assert list(codec._dicts) == [(trained_tenants[2], 1), (first, 1)]
+    assert len(codec._local.codecs) == 3
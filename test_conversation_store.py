@@ -0,0 +1,103 @@
+"""
+Tests for the conversation log
+Buffered turns written in batches, readable through unwritten() until they are committed,
+kept for the next flush when a write fails and dropped oldest first when the buffer is full
+"""
+from concurrent.futures import Future
+import time
+
+import pytest
+from sqlalchemy import select
+
+from app.core import conversation_store
+from app.core.conversation_store import ConversationLog
+from app.core.database import SessionLocal
+from app.models.chat_event import ChatEvent
+
+
+@pytest.fixture
+def log(database):
+    """Conversation log flushed only by the test (or when batch_rows are waiting)"""
+    log = ConversationLog(flush_interval_ms=3600 * 1000, batch_rows=1000, redactor=None)
+    yield log
+    log.stop()
+
+
+def stored_messages(tenant_id: int):
+    """User messages of the tenant's committed events, oldest first"""
+    with SessionLocal() as db:
+        events = db.execute(select(ChatEvent).where(ChatEvent.tenant_id == tenant_id).order_by(ChatEvent.id)).scalars().all()
+        return [event.user_message for event in events]
+
+
+def test_turns_are_written_in_one_flush(log, tenant):
+    """Recorded turns wait in memory and are written by flush(), grouped per tenant"""
+    other = tenant.id + 10000
+    log.record(tenant.id, "bir", "Tamam", conversation_id="c1")
+    log.record(other, "iki", "Tamam", conversation_id="c1")
+    log.record(tenant.id, "üç", "Tamam", conversation_id="c1")
+    assert log.pending() == 3
+    assert stored_messages(tenant.id) == []
+    
+    assert log.flush() == 3
+    assert log.pending() == 0
+    assert stored_messages(tenant.id) == ["bir", "üç"]
+    assert stored_messages(other) == ["iki"]
+    assert log.flush() == 0
+
+
+def test_full_batch_is_flushed_right_away(database, tenant):
+    """batch_rows waiting events wake the flusher without waiting for the interval"""
+    log = ConversationLog(flush_interval_ms=3600 * 1000, batch_rows=2, redactor=None)
+    try:
+        log.record(tenant.id, "bir")
+        log.record(tenant.id, "iki")
+        deadline = time.monotonic() + 5
+        while len(stored_messages(tenant.id)) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert stored_messages(tenant.id) == ["bir", "iki"]
+    finally:
+        log.stop()
+
+
+def test_unwritten_returns_the_conversation_until_committed(log, tenant):
+    """Buffered turns of a conversation are returned oldest first, and no longer once written"""
+    log.record(tenant.id, "bir", "Tamam", conversation_id="c1")
+    log.record(tenant.id, "başka", "Tamam", conversation_id="c2")
+    log.record(tenant.id, "iki", "Tamam", conversation_id="c1")
+    log.record(tenant.id + 10000, "başka kiracı", "Tamam", conversation_id="c1")
+    assert [event["user_message"] for event in log.unwritten(tenant.id, "c1")] == ["bir", "iki"]
+    
+    log.flush()
+    assert log.unwritten(tenant.id, "c1") == []
+
+
+def test_failed_write_is_kept_for_the_next_flush(log, tenant, monkeypatch):
+    """Events of a failed write stay readable and are written, in order, by the next flush"""
+    log.record(tenant.id, "bir", conversation_id="c1")
+    
+    def unavailable(tenant_id, job):
+        future = Future()
+        future.set_exception(RuntimeError("database is locked"))
+        return future
+    with monkeypatch.context() as patched:
+        patched.setattr(conversation_store, "submit_tenant_write", unavailable)
+        assert log.flush() == 0
+    assert [event["user_message"] for event in log.unwritten(tenant.id, "c1")] == ["bir"]
+    
+    log.record(tenant.id, "iki", conversation_id="c1")
+    assert log.flush() == 2
+    assert stored_messages(tenant.id) == ["bir", "iki"]
+
+
+def test_full_buffer_drops_the_oldest(database, tenant):
+    """Beyond max_pending the oldest turns are dropped and counted, recording never blocks"""
+    log = ConversationLog(flush_interval_ms=3600 * 1000, batch_rows=1000, max_pending=2, redactor=None)
+    try:
+        for message in ("bir", "iki", "üç"):
+            log.record(tenant.id, message, conversation_id="c1")
+        assert log.dropped == 1
+        assert [event["user_message"] for event in log.unwritten(tenant.id, "c1")] == ["iki", "üç"]
+    finally:
+        log.stop()
+    assert stored_messages(tenant.id) == ["iki", "üç"]
@@ -0,0 +1,82 @@
+"""
+Tests for the intent fast path
+Structured questions answered from the tenant's data, everything else left to the model,
+and fast path answers counted in the analytics rollups
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+
+from app.api import chat
+from app.core.analytics import get_dashboard
+from app.core.appointments import parse_clock
+from app.core.conversation_store import conversation_log
+from app.core.database import SessionLocal
+from app.core.intents import OTHER, intent_router
+from app.models.appointment import Service, Staff, StaffService, WorkingHours
+
+
+@pytest.fixture
+def clinic(tenant):
+    """The tenant with one dentist (weekdays 09:00-18:00, Saturday 10:00-14:00) and three services"""
+    with SessionLocal() as db:
+        staff = Staff(tenant_id=tenant.id, name="Dr. Ayşe")
+        services = [
+            Service(tenant_id=tenant.id, name="Dolgu", duration_minutes=40, price=1500),
+            Service(tenant_id=tenant.id, name="Kanal Tedavisi", duration_minutes=60, price=4000),
+            Service(tenant_id=tenant.id, name="İmplant", duration_minutes=90, price=None),
+        ]
+        db.add_all([staff, *services])
+        db.flush()
+        db.add_all(StaffService(tenant_id=tenant.id, staff_id=staff.id, service_id=service.id) for service in services)
+        for weekday in range(5):
+            db.add(WorkingHours(tenant_id=tenant.id, staff_id=staff.id, weekday=weekday, start_minute=parse_clock("09:00"), end_minute=parse_clock("18:00")))
+        db.add(WorkingHours(tenant_id=tenant.id, staff_id=staff.id, weekday=5, start_minute=parse_clock("10:00"), end_minute=parse_clock("14:00")))
+        db.commit()
+    return tenant
+
+
+def test_structured_questions_are_answered_locally(clinic):
+    """Hours, address, phone and price questions get an answer from the tenant's data"""
+    assert intent_router.answer(clinic, "Saat kaçta açıksınız?") == (
+        "hours", "Çalışma saatlerimiz: Pazartesi-Cuma 09:00-18:00, Cumartesi 10:00-14:00. Pazar kapalıyız."
+    )
+    assert intent_router.answer(clinic, "Adresiniz nerede?") == ("address", "Adresimiz: Atatürk Cad. No: 1, Kadıköy")
+    assert intent_router.answer(clinic, "Telefon numaranız nedir?") == ("phone", "Bize 0216 555 12 34 numarasından ulaşabilirsiniz.")
+    assert intent_router.answer(clinic, "Fiyat ne kadar?") == ("prices", "Fiyatlarımız:\nDolgu: 1500 TL\nKanal Tedavisi: 4000 TL")
+    assert intent_router.answer(clinic, "Dolgu ne kadar?") == ("prices", "Fiyatlarımız:\nDolgu: 1500 TL")
+
+
+@pytest.mark.parametrize("message", [
+    "Yarın için randevu almak istiyorum, saat kaçta açıksınız?",
+    "Dişim çok ağrıyor, adresiniz nerede?",
+    "Dolgu ne kadar sürer?",
+    "Randevumu iptal etmek istiyorum",
+    "Merhaba",
+    "Adresiniz nerede ve telefon numaranız nedir?",
+])
+def test_other_messages_fall_through(clinic, message):
+    """Bookings, symptoms, durations, small talk and mixed questions go to the model"""
+    assert intent_router.classify(message)[0] == OTHER
+    assert intent_router.answer(clinic, message) is None
+
+
+def test_price_questions_without_a_listed_price_fall_through(clinic):
+    """Services the tenant does not list, or lists without a price, are left to the model"""
+    assert intent_router.answer(clinic, "Diş beyazlatma fiyatı ne kadar?") is None
+    assert intent_router.answer(clinic, "İmplant fiyatı ne kadar?") is None
+
+
+def test_fast_path_turns_are_counted(clinic, openai_stub):
+    """A fast path answer needs no model call and is counted in the fast_path rollup"""
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/api")
+    with TestClient(app) as client:
+        for message in ("Adresiniz nerede?", "Dolgum düştü, ne yapmalıyım?"):
+            response = client.post("/api/chat", json={"tenant_id": clinic.id, "user_message": message, "model": "gpt-4o"})
+            assert response.status_code == 200
+    
+    assert len(openai_stub.calls) == 1
+    conversation_log.flush()
+    totals = get_dashboard(clinic.id, days=1)["totals"]
+    assert (totals["messages"], totals["fast_path"], totals["fast_path_rate"]) == (2, 1, 0.5)
@@ -0,0 +1,141 @@
+"""
+Tests for knowledge retrieval
+BM25 ranking, reciprocal rank fusion of the hybrid mode and publishing vector index versions
+"""
+import numpy as np
+import pytest
+
+from app.core.embeddings import HashingEmbeddingProvider
+from app.core.knowledge import RRF_K, BM25Index, KnowledgeBase, content_hash, split_passages
+from app.core.vector_index import POINTER_FILE, VectorStore
+
+
+TENANT_ID = 1
+
+
+def passage(passage_id: int, content: str, document: str = "Fiyat Listesi") -> dict:
+    """Passage dictionary as stored with an index version"""
+    return {"id": passage_id, "document": document, "content": content, "hash": content_hash(content)}
+
+
+PASSAGES = [
+    passage(1, "Dolgu 1500 TL. Dolgu işlemi yaklaşık 40 dakika sürer."),
+    passage(2, "Kanal tedavisi 4000 TL. Kanal tedavisi iki seansta tamamlanır."),
+    passage(3, "Diş beyazlatma 3000 TL."),
+    passage(4, "Pazartesi - Cuma 09:00 - 18:00 arası açığız.", document="Çalışma Saatleri"),
+]
+
+
+@pytest.fixture
+def knowledge(tmp_path, monkeypatch):
+    """Hybrid knowledge base over a temporary vector store, with PASSAGES as the stored passages"""
+    provider = HashingEmbeddingProvider(64)
+    store = VectorStore(root=str(tmp_path))
+    kb = KnowledgeBase(retrieval="hybrid", min_score=0.0, provider=provider, vectors=store)
+    store.write(
+        TENANT_ID,
+        [item["id"] for item in PASSAGES],
+        provider.embed([f"{item['document']}\n{item['content']}" for item in PASSAGES]),
+        provider.identity,
+        passages=PASSAGES
+    )
+    stored = list(PASSAGES)
+    monkeypatch.setattr(kb, "_load_passages", lambda tenant_id: list(stored))
+    monkeypatch.setattr(kb, "_stored_signature", lambda tenant_id: {(item["id"], item["hash"]) for item in stored})
+    kb.stored = stored
+    kb.scheduled = []
+    monkeypatch.setattr(kb, "schedule_reindex", kb.scheduled.append)
+    yield kb
+    kb._indexer.shutdown(wait=False)
+
+
+def test_bm25_ranks_matching_passage_first():
+    """The passage sharing the rarest terms ranks first, passages without query terms are left out"""
+    index = BM25Index(PASSAGES)
+    results = index.search("kanal tedavisi ne kadar", k=3)
+    assert [item["id"] for _, item in results] == [2]
+    
+    ranked = index.search("dolgu mu beyazlatma mı", k=3)
+    assert {item["id"] for _, item in ranked} == {1, 3}
+    assert all(score > 0 for score, _ in ranked)
+
+
+def test_bm25_counts_title_and_limits_results():
+    """Document titles are searchable and k caps the result list"""
+    index = BM25Index(PASSAGES)
+    assert [item["id"] for _, item in index.search("çalışma saatleri")] == [4]
+    assert len(index.search("fiyat", k=2)) == 2
+    assert BM25Index([]).search("dolgu") == []
+
+
+def test_split_passages_keeps_heading_with_paragraph():
+    """A short heading line stays with the paragraph below it, long text is cut at max_chars"""
+    text = "Fiyatlar\n\nDolgu 1500 TL\nKanal 4000 TL\n\n" + "\n".join(f"Hizmet {i} 100 TL" for i in range(40))
+    passages = split_passages(text, max_chars=120)
+    assert passages[0].startswith("Fiyatlar\nDolgu 1500 TL")
+    assert all(len(item) <= 120 for item in passages)
+
+
+def test_hybrid_fuses_rankings_by_reciprocal_rank(knowledge, monkeypatch):
+    """A passage found by both rankings beats the top passage of either ranking alone"""
+    monkeypatch.setattr(BM25Index, "search", lambda self, query, k=3: [(9.0, self.by_id[1]), (5.0, self.by_id[2])])
+    monkeypatch.setattr(knowledge, "_semantic_search", lambda published, query, k: [(0.9, 3), (0.8, 2)])
+    
+    results = knowledge.retrieve(TENANT_ID, "dolgu", k=3)
+    assert [item["id"] for item in results] == [2, 1, 3]
+    assert results[0]["score"] == round(2 / (RRF_K + 2), 4)
+    assert results[1]["score"] == round(1 / (RRF_K + 1), 4)
+
+
+def test_semantic_results_of_removed_passages_are_dropped(knowledge, monkeypatch):
+    """Vector hits are only returned for passages the served BM25 index knows"""
+    monkeypatch.setattr(knowledge, "_semantic_search", lambda published, query, k: [(0.9, 99), (0.5, 3)])
+    assert 99 not in [item["id"] for item in knowledge.retrieve(TENANT_ID, "beyazlatma")]
+
+
+def test_stale_version_falls_back_to_stored_passages(knowledge):
+    """Passages added after the published version are found by BM25 and a reindex is scheduled"""
+    knowledge.stored.append(passage(5, "Lazer tedavisi 7000 TL."))
+    results = knowledge.retrieve(TENANT_ID, "lazer tedavisi", k=3)
+    assert 5 in [item["id"] for item in results]
+    assert knowledge.scheduled == [TENANT_ID]
+
+
+def test_current_version_is_served_without_reindex(knowledge):
+    """While the stored passages match the published snapshot, the snapshot is indexed"""
+    source, index = knowledge.index_for(TENANT_ID, knowledge.published(TENANT_ID))
+    assert source == knowledge.vectors.current_version(TENANT_ID)
+    assert len(index) == len(PASSAGES)
+    assert knowledge.scheduled == []
+
+
+def test_vector_store_publishes_by_swapping_current(tmp_path):
+    """Readers keep their open version, CURRENT names the newest and old versions are pruned"""
+    store = VectorStore(root=str(tmp_path))
+    assert store.current(TENANT_ID) is None
+    
+    first = store.write(TENANT_ID, [1, 2], np.eye(2, 4, dtype=np.float32), "test:4")
+    opened = store.current(TENANT_ID)
+    assert opened.version == first
+    assert store.current(TENANT_ID) is opened  # Cached while CURRENT is unchanged
+    
+    second = store.write(TENANT_ID, [1, 2, 3], np.eye(3, 4, dtype=np.float32), "test:4")
+    assert second > first
+    assert (tmp_path / f"tenant_{TENANT_ID}" / POINTER_FILE).read_text(encoding="utf-8") == second
+    assert len(opened) == 2  # The old mapping stays readable
+    assert len(store.current(TENANT_ID)) == 3
+    
+    third = store.write(TENANT_ID, [4], np.eye(1, 4, dtype=np.float32), "test:4")
+    versions = sorted(path.name for path in (tmp_path / f"tenant_{TENANT_ID}").glob("v*"))
+    assert versions == [second, third]
+    assert [passage_id for _, passage_id in store.current(TENANT_ID).search(np.eye(1, 4, dtype=np.float32)[0], 1)] == [4]
+
+
+def test_vector_store_rejects_mismatched_input(tmp_path):
+    """A build with a different number of vectors and IDs publishes nothing"""
+    from app.core.vector_index import VectorIndexError
+    
+    store = VectorStore(root=str(tmp_path))
+    with pytest.raises(VectorIndexError):
+        store.write(TENANT_ID, [1, 2], np.eye(1, 4, dtype=np.float32), "test:4")
+    assert store.current_version(TENANT_ID) is None
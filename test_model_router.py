@@ -0,0 +1,94 @@
+"""
+Tests for the model router
+Content rules, the latency swap with its periodic probe and failed calls in the latency average
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import model_router as router_module
+from app.core.model_router import ModelRouter
+
+
+TENANT = SimpleNamespace(id=1, latency_slo_ms=None)
+
+
+@pytest.fixture
+def router():
+    """Router with a 1000 ms target and latency averages used after two calls"""
+    return ModelRouter("fast", "strong", latency_slo_ms=1000, min_samples=2, probe_seconds=30, failure_ms=20000)
+
+
+def decide(router: ModelRouter, message: str, history=None, tenant=TENANT):
+    """(model, reason) of an "auto" request"""
+    decision = router.route(tenant, message, history, "auto")
+    return decision.model, decision.reason
+
+
+def test_content_rules(router):
+    """Trivial turns go to the fast model, long, deep and booking turns to the strong one"""
+    assert decide(router, "Merhaba") == ("fast", "small_talk")
+    assert decide(router, "Çalışma saatleriniz nedir?") == ("fast", "structured_question")
+    assert decide(router, "Yarın için randevu almak istiyorum") == ("strong", "booking_or_symptom")
+    assert decide(router, "Bir şey soracaktım") == ("fast", "short_message")
+    assert decide(router, "x" * 100) == ("strong", "default")
+    assert decide(router, "Merhaba " * 60) == ("strong", "long_message")
+    assert decide(router, "Merhaba", [{"role": "user", "content": "..."}] * 6) == ("strong", "deep_conversation")
+
+
+def test_requested_and_disabled(router):
+    """An explicit model is used as is, a disabled router always picks the strong model"""
+    assert router.route(TENANT, "Merhaba", requested="gpt-4o").model == "gpt-4o"
+    router.enabled = False
+    assert decide(router, "Merhaba") == ("strong", "routing_disabled")
+
+
+def test_slow_model_is_swapped(router):
+    """Over the target the fast model is used, if it is not slower itself"""
+    for _ in range(2):
+        router.observe("strong", 3000)
+    message = "x" * 100
+    assert decide(router, message) == ("fast", "default+latency")
+    
+    for _ in range(2):
+        router.observe("fast", 4000)
+    assert decide(router, message) == ("strong", "default")
+    
+    # Tenants with their own target
+    router = ModelRouter("fast", "strong", latency_slo_ms=1000, min_samples=2)
+    for _ in range(2):
+        router.observe("strong", 3000)
+    assert decide(router, message, tenant=SimpleNamespace(id=2, latency_slo_ms=5000)) == ("strong", "default")
+
+
+def test_swapped_model_is_probed(router, monkeypatch):
+    """One request per probe_seconds still goes to the swapped-out model"""
+    now = [1000.0]
+    monkeypatch.setattr(router_module.time, "monotonic", lambda: now[0])
+    for _ in range(2):
+        router.observe("strong", 3000)
+    message = "x" * 100
+    
+    assert decide(router, message) == ("fast", "default+latency")
+    now[0] += 10
+    assert decide(router, message) == ("fast", "default+latency")
+    now[0] += 25
+    assert decide(router, message) == ("strong", "default+probe")
+    assert decide(router, message) == ("fast", "default+latency")
+    
+    # A fast probe brings the average back under the target
+    for _ in range(20):
+        router.observe("strong", 500)
+    assert decide(router, message) == ("strong", "default")
+
+
+def test_failed_calls_count_as_failure_ms(router):
+    """A failed call is recorded as at least failure_ms, so a failing model stays swapped out"""
+    router.observe("strong", 100, failed=True)
+    router.observe("strong", 200)
+    assert router.latency("strong") == pytest.approx(20000 + 0.2 * (200 - 20000))
+    assert router.latency("fast") is None
+    
+    status = router.status()
+    assert status["latencies"]["strong"]["samples"] == 2
+    assert status["probe_seconds"] == 30
@@ -0,0 +1,92 @@
+"""
+Tests for message moderation
+Normalization, the Aho-Corasick pattern scan and allow patterns overriding block/reject patterns
+"""
+import pytest
+
+from app.core.moderation import ModerationError, ModerationFilter, PatternAutomaton, TenantRules, normalize, pattern_key
+from app.models.moderation import ALLOW, BLOCK, REJECT
+
+
+TENANT_ID = 1
+
+
+def rule(rule_id: int, pattern: str, action: str = BLOCK, reply=None) -> dict:
+    """Rule dictionary as cached by the filter"""
+    return {"id": rule_id, "key": pattern_key(pattern), "action": action, "pattern": pattern, "reply": reply}
+
+
+@pytest.fixture
+def moderation(monkeypatch):
+    """Filter serving the rules set on it without a database"""
+    moderation = ModerationFilter(block_reply="Bu mesaja yanıt veremiyorum.")
+    moderation.rules = []
+    monkeypatch.setattr(moderation, "compiled", lambda tenant_id: TenantRules(moderation.rules, (len(moderation.rules), 0)))
+    return moderation
+
+
+def test_normalize():
+    """Case, repeated letters, digit substitutions and punctuation are folded"""
+    assert normalize("SALAAAK!!") == "salak"
+    assert normalize("s4l4k") == "salak"
+    assert normalize("  Sa-lak ,  aptal ") == "sa lak aptal"
+
+
+def test_pattern_key_word_boundaries():
+    """Plain patterns match whole words, "*" removes the boundary on its side"""
+    assert pattern_key("salak") == " salak "
+    assert pattern_key("salak*") == " salak"
+    assert pattern_key("*salak") == "salak "
+    with pytest.raises(ModerationError):
+        pattern_key("*!!*")
+
+
+def test_automaton_finds_every_occurrence():
+    """All keys are found in one pass, including overlapping keys and the last word"""
+    keys = [pattern_key("aptal"), pattern_key("ama*"), pattern_key("*tal")]
+    automaton = PatternAutomaton(keys)
+    hits = automaton.scan("Aptal mısın, amaan")
+    assert {keys[index] for index, _, _ in hits} == set(keys)
+    assert [index for index, _, _ in automaton.scan("bu aptal")] == [0, 2]
+    assert automaton.scan("aptallık yok") == []
+    assert automaton.scan("kapital") == [(2, 5, 9)]
+
+
+def test_whole_word_patterns_skip_longer_words(moderation):
+    """A plain pattern does not hit a longer word, a trailing "*" pattern does"""
+    moderation.rules = [rule(1, "salak")]
+    assert moderation.check(TENANT_ID, "salaksın") is None
+    assert moderation.check(TENANT_ID, "sen S4L4K mısın").rule_id == 1
+    
+    moderation.rules = [rule(1, "salak*")]
+    assert moderation.check(TENANT_ID, "salaksın").rule_id == 1
+
+
+def test_block_and_reject(moderation):
+    """Block rules answer with their reply or the default, reject wins over block"""
+    moderation.rules = [rule(1, "aptal"), rule(2, "küfür", REJECT), rule(3, "ahmak", reply="Lütfen nazik olun.")]
+    verdict = moderation.check(TENANT_ID, "aptal")
+    assert (verdict.action, verdict.reply) == (BLOCK, "Bu mesaja yanıt veremiyorum.")
+    assert verdict.model == "moderation:block"
+    assert moderation.check(TENANT_ID, "ahmak").reply == "Lütfen nazik olun."
+    
+    verdict = moderation.check(TENANT_ID, "aptal ve küfür")
+    assert (verdict.action, verdict.rule_id, verdict.reply) == (REJECT, 2, None)
+    assert moderation.check(TENANT_ID, "randevu almak istiyorum") is None
+
+
+def test_allow_overrides_covered_match(moderation):
+    """An allow pattern covering the whole match lets the message pass and is counted"""
+    moderation.rules = [rule(1, "ama*"), rule(2, "amasya", ALLOW)]
+    assert moderation.check(TENANT_ID, "Amasya şubeniz açık mı") is None
+    assert moderation.check(TENANT_ID, "amasya ama yine de").rule_id == 1
+    
+    stats = moderation.stats(TENANT_ID)
+    assert (stats["checked"], stats["allowed"], stats["blocked"]) == (2, 2, 1)
+    assert stats["rules"] == {2: 2, 1: 1}
+
+
+def test_no_rules(moderation):
+    """Tenants without rules are never moderated"""
+    assert moderation.check(TENANT_ID, "aptal") is None
+    assert moderation.stats(TENANT_ID)["checked"] == 1
@@ -0,0 +1,106 @@
+"""
+Tests for PII redaction
+Phone formats, TC Kimlik and IBAN checksums, e-mail addresses and restoring streamed replies
+"""
+import pytest
+
+from app.core.redaction import PiiRedactor, Redaction, pii_redactor, valid_iban, valid_tckn
+
+
+VALID_TCKN = "10000000146"
+VALID_IBAN = "TR330006100519786457841326"
+
+
+def redact(text: str, redactor: PiiRedactor = pii_redactor) -> str:
+    """Redact a text with a fresh set of placeholders"""
+    return redactor.redact(text, Redaction())
+
+
+@pytest.mark.parametrize("phone", [
+    "0532 123 45 67",
+    "05321234567",
+    "0532-123-45-67",
+    "0532.123.45.67",
+    "532 123 45 67",
+    "+90 532 123 45 67",
+    "+905321234567",
+    "0090 532 123 45 67",
+    "90 532 123 45 67",
+    "0 (532) 123 45 67",
+    "(532) 123 45 67",
+    "+90 (532) 123 45 67",
+    "(0532) 123 45 67",
+    "(0212) 555 12 34",
+    "0212 555 12 34",
+    "0312 555 12 34",
+    "0850 123 45 67",
+])
+def test_phone_formats(phone):
+    """Mobile, landline and 850 numbers with every prefix and separator are replaced whole"""
+    assert redact(f"Numaram {phone}, arayın") == "Numaram [TELEFON_1], arayın"
+
+
+@pytest.mark.parametrize("text", [
+    "0132 123 45 67",  # No area code starts with 1
+    "0632 123 45 67",  # ... or with 6
+    "0532 123 45 678",  # One digit too many
+    "0532 123 45",  # Too short
+    "(05321) 123 45 67",
+    "a(0532) 123 45 67",  # Part of a word
+    "sipariş 12345678901234",
+])
+def test_not_a_phone(text):
+    """Digit runs that are not Turkish phone numbers stay as they are"""
+    assert redact(text) == text
+
+
+def test_tckn():
+    """TC Kimlik numbers are replaced only when both check digits match"""
+    assert valid_tckn(VALID_TCKN)
+    assert not valid_tckn("10000000147")
+    assert redact(f"TC: {VALID_TCKN}") == "TC: [TC_KIMLIK_1]"
+    assert redact("TC: 10000000147") == "TC: 10000000147"
+
+
+def test_iban():
+    """IBANs are replaced with their country letters, spaced or not, when the mod-97 check passes"""
+    spaced = " ".join(VALID_IBAN[i:i + 4] for i in range(0, len(VALID_IBAN), 4))
+    assert valid_iban(VALID_IBAN)
+    assert valid_iban(spaced)
+    assert valid_iban("DE89370400440532013000")
+    assert not valid_iban(VALID_IBAN[:-1] + "7")
+    assert not valid_iban("TR33000610051978645784132")  # TR IBANs have 26 characters
+    assert redact(f"IBAN {VALID_IBAN} hesabıma") == "IBAN [IBAN_1] hesabıma"
+    assert redact(f"IBAN: {spaced}.") == "IBAN: [IBAN_1]."
+    assert redact(f"IBAN {VALID_IBAN[:-1]}7") == f"IBAN {VALID_IBAN[:-1]}7"
+
+
+def test_email():
+    """E-mail addresses are replaced including the local part"""
+    assert redact("Mail: ali.veli+randevu@example.com.tr") == "Mail: [EPOSTA_1]"
+
+
+def test_same_value_same_placeholder():
+    """A repeated value keeps its placeholder, different values are numbered"""
+    redaction = Redaction()
+    text = pii_redactor.redact("0532 123 45 67 veya 0533 765 43 21, yine 0532 123 45 67", redaction)
+    assert text == "[TELEFON_1] veya [TELEFON_2], yine [TELEFON_1]"
+    assert redaction.restore(text) == "0532 123 45 67 veya 0533 765 43 21, yine 0532 123 45 67"
+
+
+def test_kinds():
+    """Only the configured kinds are redacted"""
+    redactor = PiiRedactor(["email"])
+    assert redact("0532 123 45 67 a@b.co", redactor) == "0532 123 45 67 [EPOSTA_1]"
+    with pytest.raises(ValueError):
+        PiiRedactor(["passport"])
+
+
+def test_restore_stream():
+    """Placeholders split across streamed chunks are restored, other text passes through"""
+    redaction = Redaction()
+    pii_redactor.redact(f"0532 123 45 67 {VALID_TCKN}", redaction)
+    chunks = ["Sizi [TEL", "EFON_1] numarası", "ndan arayacağız. TC: [TC_KIMLIK", "_1]", " [bilgi] ["]
+    restored = list(redaction.restore_stream(chunks))
+    assert "".join(restored) == f"Sizi 0532 123 45 67 numarasından arayacağız. TC: {VALID_TCKN} [bilgi] ["
+    assert all("[TEL" not in chunk and "[TC_" not in chunk for chunk in restored)
@@ -0,0 +1,252 @@
+"""
+Tests for appointment reminders
+The timing wheel (firing order, cancelling, cascading from the higher levels and the overflow)
+and the scheduler's claim, retry and recovery of reminder rows
+"""
+from datetime import timedelta
+from typing import Optional
+import time
+
+import pytest
+from sqlalchemy import delete
+
+from app.core import reminders as reminders_module
+from app.core.database import SessionLocal
+from app.core.reminders import LogReminderChannel, ReminderChannel, ReminderError, ReminderScheduler, TimingWheel, parse_offsets
+from app.core.sharding import submit_tenant_write
+from app.models.reminder import FAILED, PENDING, SENDING, SENT, SKIPPED, Reminder
+
+
+TENANT_ID = 1
+
+
+def test_fires_in_expiry_order():
+    """Timers fire on their tick, in expiry order, and are removed from the wheel"""
+    wheel = TimingWheel(0)
+    wheel.add("c", 30)
+    wheel.add("a", 5)
+    wheel.add("b", 12)
+    assert wheel.advance(4) == []
+    assert wheel.advance(12) == ["a", "b"]
+    assert "a" not in wheel and "c" in wheel
+    assert wheel.advance(100) == ["c"]
+    assert len(wheel) == 0
+
+
+def test_past_ticks_fire_on_next_tick():
+    """A timer at or before the current tick fires on the next one"""
+    wheel = TimingWheel(100)
+    wheel.add("late", 50)
+    wheel.add("now", 100)
+    assert sorted(wheel.advance(101)) == ["late", "now"]
+
+
+def test_cancel_and_replace():
+    """Cancelled timers never fire, adding the same key again moves the timer"""
+    wheel = TimingWheel(0)
+    wheel.add("a", 10)
+    wheel.add("b", 20)
+    assert wheel.cancel("a")
+    assert not wheel.cancel("a")
+    wheel.add("b", 5)
+    assert len(wheel) == 1
+    assert wheel.advance(10) == ["b"]
+    assert wheel.advance(30) == []
+
+
+def test_cascades_through_levels():
+    """Timers on the higher levels are placed again as the wheel turns and fire on time"""
+    wheel = TimingWheel(0, levels=3, slot_bits=2)  # Levels of 4, 16 and 64 ticks
+    expiries = {f"t{tick}": tick for tick in (3, 4, 7, 15, 16, 17, 63, 64, 65, 200)}
+    for key, tick in expiries.items():
+        wheel.add(key, tick)
+    
+    fired = []
+    for tick in range(1, 210):
+        for key in wheel.advance(tick):
+            fired.append(key)
+            assert expiries[key] == tick
+    assert fired == sorted(expiries, key=expiries.get)
+    assert len(wheel) == 0
+
+
+def test_overflow_beyond_top_level():
+    """Timers past the top wheel wait in the overflow and still fire on their tick"""
+    wheel = TimingWheel(5, levels=2, slot_bits=3)  # 64 ticks before the overflow
+    wheel.add("far", 1000)
+    wheel.add("near", 70)
+    assert wheel.advance(999) == ["near"]
+    assert "far" in wheel
+    assert wheel.advance(1000) == ["far"]
+
+
+def test_jump_ahead_when_empty():
+    """An empty wheel jumps to the target tick, later timers are placed from there"""
+    wheel = TimingWheel(0)
+    assert wheel.advance(10 ** 6) == []
+    assert wheel.current == 10 ** 6
+    wheel.add("a", 10 ** 6 + 3)
+    assert wheel.advance(10 ** 6 + 3) == ["a"]
+
+
+def test_parse_offsets():
+    """Distinct positive offsets, largest first"""
+    assert parse_offsets("60, 1440,60,,0,-5") == [1440, 60]
+
+
+class FailingChannel(ReminderChannel):
+    """Channel whose deliveries always fail"""
+    
+    name = "failing"
+    
+    def send(self, recipient, text, reminder):
+        raise ReminderError("Sağlayıcıya ulaşılamadı")
+
+
+@pytest.fixture
+def reminders(database):
+    """Empty reminder table, rows added with reminders(status, due in minutes, appointment in minutes, ...)"""
+    def _add(
+        status: str = PENDING,
+        due_minutes: int = -1,
+        appointment_minutes: int = 60,
+        attempts: int = 0,
+        claimed_minutes: Optional[int] = None
+    ) -> int:
+        now = ReminderScheduler(LogReminderChannel(), [60]).now()
+        with SessionLocal() as db:
+            reminder = Reminder(
+                tenant_id=TENANT_ID,
+                booking_id=1,
+                offset_minutes=60,
+                due_at=now + timedelta(minutes=due_minutes),
+                appointment_at=now + timedelta(minutes=appointment_minutes),
+                channel="log",
+                recipient="05321234567",
+                customer_name="Ayşe",
+                status=status,
+                attempts=attempts,
+                claimed_until=now + timedelta(minutes=claimed_minutes) if claimed_minutes is not None else None
+            )
+            db.add(reminder)
+            db.commit()
+            return reminder.id
+    
+    with SessionLocal() as db:
+        db.execute(delete(Reminder))
+        db.commit()
+    return _add
+
+
+def stored(reminder_id: int) -> Reminder:
+    """Reminder row as committed"""
+    with SessionLocal() as db:
+        return db.get(Reminder, reminder_id)
+
+
+def test_due_reminder_is_claimed_and_sent_once(reminders):
+    """A fired reminder is sent and marked sent; a second delivery of the same row sends nothing"""
+    channel = LogReminderChannel()
+    scheduler = ReminderScheduler(channel, [60])
+    reminder_id = reminders()
+    later_id = reminders(due_minutes=30)
+    
+    assert scheduler.load() == 2
+    assert scheduler.advance(time.time() + 2) == [(TENANT_ID, reminder_id)]
+    assert stored(reminder_id).status == SENT
+    assert stored(reminder_id).attempts == 1
+    assert [item[0] for item in channel.sent] == ["05321234567"]
+    
+    assert scheduler.deliver(TENANT_ID, reminder_id) == SENT
+    assert len(channel.sent) == 1
+    assert stored(later_id).status == PENDING
+
+
+def test_started_appointment_is_skipped(reminders):
+    """Reminders of appointments that already started are not sent"""
+    channel = LogReminderChannel()
+    scheduler = ReminderScheduler(channel, [60])
+    reminder_id = reminders(appointment_minutes=-5)
+    assert scheduler.deliver(TENANT_ID, reminder_id) == SKIPPED
+    assert stored(reminder_id).status == SKIPPED
+    assert not channel.sent
+
+
+def test_failed_delivery_is_retried_with_backoff(reminders):
+    """A failed attempt goes back to pending with a later due time, the last attempt marks it failed"""
+    scheduler = ReminderScheduler(FailingChannel(), [60], max_attempts=2, retry_seconds=120)
+    reminder_id = reminders()
+    
+    assert scheduler.deliver(TENANT_ID, reminder_id) == PENDING
+    row = stored(reminder_id)
+    assert (row.attempts, row.last_error) == (1, "Sağlayıcıya ulaşılamadı")
+    assert row.due_at >= scheduler.now() + timedelta(seconds=110)
+    
+    # Fired early (timer of the old due time): left pending
+    assert scheduler.deliver(TENANT_ID, reminder_id) == PENDING
+    assert stored(reminder_id).attempts == 1
+    
+    with SessionLocal() as db:
+        db.get(Reminder, reminder_id).due_at = scheduler.now() - timedelta(minutes=1)
+        db.commit()
+    assert scheduler.deliver(TENANT_ID, reminder_id) == FAILED
+    assert stored(reminder_id).attempts == 2
+    assert scheduler.stats["retried"] == 1 and scheduler.stats["failed"] == 1
+
+
+def test_expired_claims_are_sent_again(reminders):
+    """Rows left in "sending" are claimed again once their lease expired, never while it runs"""
+    channel = LogReminderChannel()
+    expired_id = reminders(status=SENDING, due_minutes=-10, attempts=1, claimed_minutes=-1)
+    running_id = reminders(status=SENDING, due_minutes=-10, attempts=1, claimed_minutes=4)
+    exhausted_id = reminders(status=SENDING, due_minutes=-10, attempts=5, claimed_minutes=-1)
+    
+    scheduler = ReminderScheduler(channel, [60], max_attempts=5)
+    assert scheduler.load() == 2
+    scheduler.advance(time.time() + 2)
+    assert (stored(expired_id).status, stored(expired_id).attempts, stored(expired_id).claimed_until) == (SENT, 2, None)
+    assert (stored(exhausted_id).status, stored(exhausted_id).last_error) == (FAILED, "Delivery did not finish")
+    
+    # A restart does not touch the running claim, a fired timer of it sends nothing
+    restarted = ReminderScheduler(channel, [60])
+    assert restarted.load() == 0
+    assert restarted.deliver(TENANT_ID, running_id) == SENDING
+    assert stored(running_id).attempts == 1
+    assert len(channel.sent) == 1
+    
+    # Picked up by a later load of any scheduler once it expired
+    with SessionLocal() as db:
+        db.get(Reminder, running_id).claimed_until = scheduler.now() - timedelta(seconds=1)
+        db.commit()
+    assert scheduler.load() == 1
+    scheduler.advance(time.time() + 4)
+    assert stored(running_id).status == SENT
+    assert len(channel.sent) == 2
+
+
+def test_lost_status_write_is_recovered(reminders, monkeypatch):
+    """A reminder whose "sent" write failed stays claimed and is sent again after the lease"""
+    channel = LogReminderChannel()
+    scheduler = ReminderScheduler(channel, [60], lease_seconds=60)
+    reminder_id = reminders()
+    
+    writes = []
+    def failing_sent_write(tenant_id, job):
+        writes.append(job)
+        if len(writes) == 2:
+            raise RuntimeError("database is locked")
+        return submit_tenant_write(tenant_id, job)
+    monkeypatch.setattr(reminders_module, "submit_tenant_write", failing_sent_write)
+    
+    assert scheduler.deliver(TENANT_ID, reminder_id) == SENT
+    row = stored(reminder_id)
+    assert row.status == SENDING
+    assert row.claimed_until >= scheduler.now() + timedelta(seconds=50)
+    assert scheduler.deliver(TENANT_ID, reminder_id) == SENDING
+    
+    with SessionLocal() as db:
+        db.get(Reminder, reminder_id).claimed_until = scheduler.now() - timedelta(seconds=1)
+        db.commit()
+    assert scheduler.deliver(TENANT_ID, reminder_id) == SENT
+    assert (stored(reminder_id).status, stored(reminder_id).attempts) == (SENT, 2)
+    assert len(channel.sent) == 2
@@ -0,0 +1,91 @@
+"""
+Tests for the retention engine
+Archiving expired events, one worker per tenant at a time, and deletes of events already gone
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select, update
+
+from app.core.config import settings
+from app.core.conversation_store import conversation_log
+from app.core.database import SessionLocal
+from app.core.leases import claim_lease, release_lease
+from app.core.retention import LEASE_JOB, RetentionEngine, _delete_events
+from app.core.search import search_conversations
+from app.core.write_queue import write_queue
+from app.models.chat_event import ChatEvent
+
+
+@pytest.fixture
+def expired_events(tenant, tmp_path, monkeypatch):
+    """Factory logging turns of the tenant dated a year ago; returns their IDs"""
+    monkeypatch.setattr(settings, "ARCHIVE_ROOT", str(tmp_path))
+    
+    def _log(*messages: str):
+        for i, message in enumerate(messages):
+            conversation_log.record(tenant.id, message, "Tamam", conversation_id=f"c{i}")
+        conversation_log.flush()
+        with SessionLocal() as db:
+            db.execute(
+                update(ChatEvent).where(ChatEvent.tenant_id == tenant.id).values(created_at=datetime(2020, 3, 1))
+            )
+            db.commit()
+            return db.execute(select(ChatEvent.id).where(ChatEvent.tenant_id == tenant.id)).scalars().all()
+    return _log
+
+
+def hot_events(tenant_id: int) -> int:
+    """Number of the tenant's events still in the chat_events table"""
+    with SessionLocal() as db:
+        return db.execute(select(func.count()).where(ChatEvent.tenant_id == tenant_id)).scalar()
+
+
+def test_expired_events_are_archived(tenant, expired_events):
+    """Events past the retention period leave the hot table and the search index"""
+    expired_events("dolgu fiyatı", "kanal tedavisi")
+    engine = RetentionEngine(chunk_pause_ms=0, delete_chunk=1)
+    assert engine.archive_tenant(tenant.id, 30) == 2
+    assert hot_events(tenant.id) == 0
+    assert search_conversations(tenant.id, "dolgu")["results"] == []
+    assert engine.archive_tenant(tenant.id, 30) == 0
+
+
+def test_one_worker_archives_a_tenant_at_a_time(tenant, expired_events):
+    """A run is skipped while another process holds the tenant's lease, and runs once it is released"""
+    expired_events("dolgu fiyatı")
+    other = RetentionEngine(chunk_pause_ms=0)
+    engine = RetentionEngine(chunk_pause_ms=0)
+    assert claim_lease(LEASE_JOB, tenant.id, other.holder, 60)
+    
+    assert engine.archive_tenant(tenant.id, 30) == 0
+    assert hot_events(tenant.id) == 1
+    
+    release_lease(LEASE_JOB, tenant.id, other.holder)
+    assert engine.archive_tenant(tenant.id, 30) == 1
+    assert claim_lease(LEASE_JOB, tenant.id, other.holder, 60)  # Released after the run
+    release_lease(LEASE_JOB, tenant.id, other.holder)
+
+
+def test_expired_lease_is_taken_over(tenant, database):
+    """A lease whose holder died can be claimed by another process; a running one cannot"""
+    assert claim_lease("test", tenant.id, "a", 60)
+    assert claim_lease("test", tenant.id, "a", 60)  # Renewal
+    assert not claim_lease("test", tenant.id, "b", 60)
+    assert claim_lease("test", tenant.id, "a", -1)  # Expired
+    assert claim_lease("test", tenant.id, "b", 60)
+    assert not claim_lease("test", tenant.id, "a", 60)
+    release_lease("test", tenant.id, "b")
+
+
+def test_deleting_events_already_gone(tenant, expired_events):
+    """Deleting the same events twice deletes nothing the second time and keeps the index intact"""
+    first, second = expired_events("dolgu fiyatı", "dolgu randevusu")
+    assert write_queue.submit(_delete_events([first])).result() == 1
+    assert write_queue.submit(_delete_events([first, second])).result() == 1
+    assert write_queue.submit(_delete_events([first, second])).result() == 0
+    
+    conversation_log.record(tenant.id, "dolgu sonrası ağrı", "Tamam", conversation_id="c9")
+    conversation_log.flush()
+    results = search_conversations(tenant.id, "dolgu")["results"]
+    assert [result["conversation_id"] for result in results] == ["c9"]
@@ -0,0 +1,74 @@
+"""
+Tests for conversation search
+Tenant isolation of the shared FTS5 index, prefix and diacritic-insensitive matching,
+cursor pagination and highlighted snippets
+"""
+import pytest
+
+from app.core.conversation_store import conversation_log
+from app.core.search import parse_query, search_conversations
+
+
+@pytest.fixture
+def log_turns(tenant):
+    """Factory logging (tenant ID, user message, assistant message) turns and flushing them"""
+    def _log(*turns):
+        for number, (tenant_id, user_message, assistant_message) in enumerate(turns):
+            conversation_log.record(tenant_id, user_message, assistant_message, conversation_id=f"c{number}")
+        conversation_log.flush()
+    return _log
+
+
+def conversations(tenant_id: int, query: str, **kwargs):
+    """Conversation IDs of the search results, newest first"""
+    return [result["conversation_id"] for result in search_conversations(tenant_id, query, **kwargs)["results"]]
+
+
+def test_tenants_only_find_their_own_messages(tenant, log_turns):
+    """The tenant token is matched exactly: tenant N does not see tenant N0's messages"""
+    other = int(f"{tenant.id}0")
+    log_turns(
+        (tenant.id, "Dolgum düştü", "Sizi arayalım"),
+        (other, "Dolgu fiyatı nedir?", "1500 TL"),
+    )
+    assert conversations(tenant.id, "dolgu") == ["c0"]
+    assert conversations(tenant.id, "fiyat") == []
+    assert conversations(other, "dolgu") == ["c1"]
+    assert conversations(other, "arayalım") == []
+
+
+def test_prefix_and_folded_matching(tenant, log_turns):
+    """The last term matches as a prefix while it is typed; case and diacritics are ignored"""
+    log_turns(
+        (tenant.id, "Dolgu yaptırmak istiyorum", "Tabii"),
+        (tenant.id, "Dişim çok AĞRIYOR", "Geçmiş olsun"),
+    )
+    assert parse_query("dolgu yap") == [("dolgu", False), ("yap", True)]
+    assert conversations(tenant.id, "dolg") == ["c0"]
+    assert conversations(tenant.id, "dolg ") == []  # Finished word: exact term
+    assert conversations(tenant.id, "disim agri") == ["c1"]
+    assert conversations(tenant.id, "GEÇMİŞ") == ["c1"]
+    assert conversations(tenant.id, "dolgu ağrı") == []  # All terms must match
+
+
+def test_query_syntax_is_not_interpreted(tenant, log_turns):
+    """Quotes, operators and column filters in the query are plain words"""
+    log_turns((tenant.id, "Kanal tedavisi ne kadar sürer", "Bir saat"))
+    for query in ('kanal" OR "x', "tenant:t1", "NOT kanal", "kanal*)", ""):
+        search_conversations(tenant.id, query)  # No FTS5 syntax error
+    assert conversations(tenant.id, 'kanal" OR "x') == []
+    assert conversations(tenant.id, "kanal*)") == ["c0"]
+
+
+def test_pages_and_snippets(tenant, log_turns):
+    """Pages walk newest first through next_cursor; snippets mark the matched words, escaped"""
+    log_turns(*[(tenant.id, f"Diş beyazlatma <{number}>", "Beyazlatma 3000 TL") for number in range(5)])
+    first = search_conversations(tenant.id, "beyaz", limit=2)
+    assert [result["conversation_id"] for result in first["results"]] == ["c4", "c3"]
+    assert first["results"][0]["user_snippet"] == "Diş <mark>beyazlatma</mark> &lt;4&gt;"
+    assert first["results"][0]["assistant_snippet"] == "<mark>Beyazlatma</mark> 3000 TL"
+    
+    second = search_conversations(tenant.id, "beyaz", limit=2, before_id=first["next_cursor"])
+    last = search_conversations(tenant.id, "beyaz", limit=2, before_id=second["next_cursor"])
+    assert [result["conversation_id"] for result in second["results"] + last["results"]] == ["c2", "c1", "c0"]
+    assert last["next_cursor"] is None
@@ -0,0 +1,141 @@
+"""
+Tests for the assistant tools
+Registry calls that never raise, parallel results in call order, tool calls assembled from
+stream deltas, and the model/tool loop of AIService with its iteration cap
+"""
+from types import SimpleNamespace
+import json
+import threading
+import time
+
+import pytest
+
+from app.core import ai_service
+from app.core.ai_service import AIService
+from app.core.config import settings
+from app.core.tools import StreamedToolCalls, ToolContext, ToolError, ToolRegistry
+from conftest import completion, stream, text_delta
+
+
+@pytest.fixture
+def registry():
+    """Registry with a few test tools"""
+    registry = ToolRegistry(workers=4)
+    
+    @registry.register("echo", "Argümanı geri döndürür", {"type": "object", "properties": {"value": {"type": "string"}}})
+    def echo(context, value):
+        return {"value": value, "tenant_id": context.tenant_id}
+    
+    @registry.register("slow", "Bekleyip sırasını döndürür", {"type": "object", "properties": {"position": {"type": "integer"}, "delay": {"type": "number"}}})
+    def slow(context, position, delay):
+        time.sleep(delay)
+        return {"position": position, "thread": threading.current_thread().name}
+    
+    @registry.register("broken", "Hata verir", {"type": "object", "properties": {}})
+    def broken(context):
+        raise ToolError("Randevu bulunamadı")
+    
+    return registry
+
+
+def tool_call_delta(index, call_id=None, name=None, arguments=None):
+    """Stream delta fragment of one tool call"""
+    return SimpleNamespace(index=index, id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def test_run_returns_errors_as_results(registry):
+    """Bad JSON, unknown tools, wrong arguments and tool errors become {"error": ...} results"""
+    context = ToolContext(tenant_id=7)
+    assert json.loads(registry.run(context, "echo", '{"value": "merhaba"}')) == {"value": "merhaba", "tenant_id": 7}
+    assert json.loads(registry.run(context, "echo", '{"value": ')) == {"error": "Araç argümanları geçerli JSON değil"}
+    assert json.loads(registry.run(context, "echo", '["merhaba"]')) == {"error": "Araç argümanları bir nesne olmalıdır"}
+    assert json.loads(registry.run(context, "missing", "{}")) == {"error": "Bilinmeyen araç: missing"}
+    assert json.loads(registry.run(context, "broken", "")) == {"error": "Randevu bulunamadı"}
+    assert "Geçersiz araç argümanları" in json.loads(registry.run(context, "echo", '{"other": 1}'))["error"]
+
+
+def test_parallel_results_come_back_in_call_order(registry):
+    """Parallel calls run concurrently, their results are in the model's order"""
+    context = ToolContext(tenant_id=1)
+    calls = [
+        (f"call_{position}", "slow", json.dumps({"position": position, "delay": delay}))
+        for position, delay in enumerate((0.3, 0.0, 0.2))
+    ]
+    started = time.perf_counter()
+    results = [json.loads(result) for result in registry.run_all(context, calls)]
+    assert [result["position"] for result in results] == [0, 1, 2]
+    assert all(result["thread"].startswith("ai-tool") for result in results)
+    assert time.perf_counter() - started < 0.45  # One after another: 0.5 s
+
+
+def test_streamed_arguments_are_reassembled(registry):
+    """Calls split across deltas are joined, and each starts once the next call begins"""
+    calls = StreamedToolCalls(registry, ToolContext(tenant_id=3))
+    assert not calls
+    calls.add([tool_call_delta(0, "call_a", "ec", '{"val')])
+    calls.add([tool_call_delta(0, name="ho", arguments='ue": "bir')])
+    calls.add([tool_call_delta(0, arguments='"}')])
+    calls.add([tool_call_delta(1, "call_b", "echo", "")])
+    assert len(calls._futures) == 1  # The first call is complete and running
+    calls.add([tool_call_delta(1, arguments='{"value": "iki"}')])
+    
+    assert calls.calls == [("call_a", "echo", '{"value": "bir"}'), ("call_b", "echo", '{"value": "iki"}')]
+    assert [json.loads(result)["value"] for result in calls.results()] == ["bir", "iki"]
+
+
+@pytest.fixture
+def tool_loop(tenant, openai_stub, registry, monkeypatch):
+    """AIService of the tenant offered the test tools"""
+    monkeypatch.setattr(ai_service, "tool_registry", registry)
+    monkeypatch.setattr(ai_service, "appointment_tools_for", lambda tenant_id: registry.schemas())
+    return AIService(tenant.id, tenant=tenant)
+
+
+def model_call(call_id, name, arguments):
+    """Tool call object of a non-streamed response"""
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def test_tool_results_are_sent_back(tool_loop, openai_stub):
+    """Tool calls run and their results go back to the model in call order before the answer"""
+    openai_stub.replies += [
+        completion(None, [model_call("call_1", "echo", '{"value": "bir"}'), model_call("call_2", "missing", "{}")]),
+        completion("Tamamlandı"),
+    ]
+    assert tool_loop.chat_completion("Yarın randevu alabilir miyim?", model="gpt-4o") == "Tamamlandı"
+    
+    first, second = openai_stub.calls
+    assert first["tool_choice"] == "auto"
+    tool_results = [message for message in second["messages"] if message["role"] == "tool"]
+    assert [message["tool_call_id"] for message in tool_results] == ["call_1", "call_2"]
+    assert json.loads(tool_results[1]["content"]) == {"error": "Bilinmeyen araç: missing"}
+    assert tool_loop.last_usage == {"prompt_tokens": 20, "completion_tokens": 10}
+
+
+def test_last_iteration_must_answer_in_text(tool_loop, openai_stub, monkeypatch):
+    """The AI_TOOL_MAX_ITERATIONS-th model call is made with tool_choice="none" """
+    monkeypatch.setattr(settings, "AI_TOOL_MAX_ITERATIONS", 3)
+    looping = completion(None, [model_call("call", "echo", '{"value": "tekrar"}')])
+    openai_stub.replies += [looping, looping, completion("Son cevap")]
+    
+    assert tool_loop.chat_completion("Yarın randevu alabilir miyim?", model="gpt-4o") == "Son cevap"
+    assert [call["tool_choice"] for call in openai_stub.calls] == ["auto", "auto", "none"]
+
+
+def test_streamed_tool_calls_run_in_the_loop(tool_loop, openai_stub, monkeypatch):
+    """Streamed tool call deltas are assembled, run, and the answer after them streams on"""
+    monkeypatch.setattr(settings, "AI_TOOL_MAX_ITERATIONS", 2)
+    openai_stub.replies += [
+        stream(
+            SimpleNamespace(content=None, tool_calls=[tool_call_delta(0, "call_1", "echo", '{"value":')]),
+            SimpleNamespace(content=None, tool_calls=[tool_call_delta(0, arguments=' "bir"}')]),
+        ),
+        stream(text_delta("Randevu"), text_delta(" hazır.")),
+    ]
+    
+    text = "".join(tool_loop.chat_completion_stream("Yarın randevu alabilir miyim?", model="gpt-4o"))
+    assert text == "Randevu hazır."
+    first, second = openai_stub.calls
+    assert (first["tool_choice"], second["tool_choice"]) == ("auto", "none")
+    tool_result = next(message for message in second["messages"] if message["role"] == "tool")
+    assert json.loads(tool_result["content"])["value"] == "bir"
@@ -0,0 +1,82 @@
+"""
+Tests for token metering and quotas
+Quotas checked from the in-memory totals, totals shared between worker processes through the
+usage_daily rollup, and over-quota chat requests rejected before the model is called
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import select
+
+from app.api import chat
+from app.core.database import SessionLocal
+from app.core.usage import QuotaExceededError, UsageMeter, _today, usage_meter
+from app.models.tenant import Tenant
+from app.models.usage import UsageDaily
+
+
+@pytest.fixture
+def meters(database):
+    """Factory of usage meters (one per simulated worker process), flushed only by the test"""
+    created = []
+    
+    def _meter() -> UsageMeter:
+        meter = UsageMeter(flush_seconds=3600)
+        meter.start()
+        created.append(meter)
+        return meter
+    
+    yield _meter
+    for meter in created:
+        meter.stop()
+
+
+def test_quota_is_enforced_from_memory(meters, tenant):
+    """A call is rejected once the recorded tokens reach the daily or the monthly quota"""
+    meter = meters()
+    meter.check(tenant.id, 100, None)
+    meter.record(tenant.id, 60, 30)
+    meter.check(tenant.id, 100, 1000)
+    meter.check(tenant.id, None, None)
+    
+    meter.record(tenant.id, 5, 5)
+    with pytest.raises(QuotaExceededError) as daily:
+        meter.check(tenant.id, 100, 1000)
+    assert (daily.value.period, daily.value.used, daily.value.quota) == ("daily", 100, 100)
+    with pytest.raises(QuotaExceededError) as monthly:
+        meter.check(tenant.id, None, 50)
+    assert monthly.value.period == "monthly"
+
+
+def test_usage_is_stored_and_shared_between_processes(meters, tenant):
+    """Flushed usage lands in usage_daily; other processes see it at start and on their next flush"""
+    first, second = meters(), meters()
+    first.record(tenant.id, 400, 100)
+    second.record(tenant.id, 10, 10)
+    first.flush()
+    
+    with SessionLocal() as db:
+        row = db.execute(select(UsageDaily).where(UsageDaily.tenant_id == tenant.id, UsageDaily.day == _today())).scalar_one()
+        assert (row.requests, row.prompt_tokens, row.completion_tokens) == (1, 400, 100)
+    
+    assert meters().usage(tenant.id) == {"daily_tokens": 500, "monthly_tokens": 500}  # Loaded at start
+    assert second.usage(tenant.id)["daily_tokens"] == 20
+    second.flush()
+    assert second.usage(tenant.id) == {"daily_tokens": 520, "monthly_tokens": 520}
+    with pytest.raises(QuotaExceededError):
+        second.check(tenant.id, 500, None)
+
+
+def test_over_quota_chat_is_rejected(database, tenant, openai_stub):
+    """/api/chat answers 429 without calling the model once the tenant's quota is used up"""
+    with SessionLocal() as db:
+        db.get(Tenant, tenant.id).daily_token_quota = 1000
+        db.commit()
+    usage_meter.record(tenant.id, 900, 100)
+    
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/api")
+    with TestClient(app) as client:
+        response = client.post("/api/chat", json={"tenant_id": tenant.id, "user_message": "Dolgum düştü, ne yapmalıyım?", "model": "gpt-4o"})
+    assert response.status_code == 429
+    assert openai_stub.calls == []